@@ -1,11 +1,10 @@
 import asyncio
 import base64
 import os
-from asyncio import Future
-from asyncio import Queue, sleep
+import re
 from io import BytesIO
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import aiohttp
 import pysilk
@@ -16,49 +15,52 @@ from pymediainfo import MediaInfo
 from .base import *
 from .protect import protector
 from ..errors import *
+from ..media_cache import cdn_image_ref, cdn_image_xml, file_md5, media_cache
+from ..send_scheduler import SendScheduler
+from ..streaming_upload import Base64Source, ProgressCallback, StreamingJsonPayload
 
 
 class MessageMixin(WechatAPIClientBase):
     def __init__(self, ip: str, port: int):
-        # 初始化消息队列
         super().__init__(ip, port)
-        self._message_queue = Queue()
-        self._is_processing = False
+        # 发送调度器，首次发送时在当前事件循环中创建；参数见 SendScheduler，由 configure_send_scheduler 设置
+        self._send_scheduler = None
+        self._send_scheduler_options = {}
+        # 上一次同步返回的 KeyBuf，下次同步从这里继续
+        self._sync_key = ""
+
+    def _get_send_scheduler(self) -> SendScheduler:
+        scheduler = self._send_scheduler
+        if scheduler is None or scheduler.loop is not asyncio.get_running_loop():
+            scheduler = SendScheduler(**self._send_scheduler_options)
+            self._send_scheduler = scheduler
+        return scheduler
+
+    def configure_send_scheduler(self, **options):
+        """设置发送调度参数，在首次发送前调用。
 
-    async def _process_message_queue(self):
-        """
-        处理消息队列的异步方法
+        Args:
+            **options: SendScheduler 的参数，例如 recipient_interval、global_rate、global_burst、
+                max_concurrency、coalesce_text
         """
-        if self._is_processing:
-            return
-
-        self._is_processing = True
-        while True:
-            if self._message_queue.empty():
-                self._is_processing = False
-                break
-
-            func, args, kwargs, future = await self._message_queue.get()
-            try:
-                result = await func(*args, **kwargs)
-                future.set_result(result)
-            except Exception as e:
-                future.set_exception(e)
-            finally:
-                self._message_queue.task_done()
-                await sleep(1)  # 消息发送间隔1秒
+        self._send_scheduler_options = dict(options)
+        self._send_scheduler = None
 
     async def _queue_message(self, func, *args, **kwargs):
         """
-        将消息添加到队列
+        将消息加入接收人的发送队列，等待发送完成后返回结果
         """
-        future = Future()
-        await self._message_queue.put((func, args, kwargs, future))
+        return await self._get_send_scheduler().submit(func, *args, **kwargs)
 
-        if not self._is_processing:
-            asyncio.create_task(self._process_message_queue())
+    def get_send_queue_stats(self) -> dict:
+        """获取发送队列的深度和延迟统计。
 
-        return await future
+        Returns:
+            dict: 见 SendScheduler.stats
+        """
+        if self._send_scheduler is None:
+            return {}
+        return self._send_scheduler.stats()
 
     async def revoke_message(self, wxid: str, client_msg_id: int, create_time: int, new_msg_id: int) -> bool:
         """撤回消息。
@@ -82,7 +84,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
                           "NewMsgId": new_msg_id}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/Revoke', json=json_param)
@@ -133,7 +135,7 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("Argument 'at' should be str or list")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": 1, "At": at_str}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendTxt', json=json_param)
             json_resp = await response.json()
@@ -145,12 +147,14 @@ class MessageMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
-    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> dict:
+    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike],
+                                 progress: Optional[ProgressCallback] = None) -> dict:
         """发送图片消息。
 
         Args:
             wxid (str): 接收人wxid
             image (str, byte, os.PathLike): 图片，支持base64字符串，图片byte，图片路径
+            progress (ProgressCallback, optional): 上传进度回调，参数为(已发送字节数, 总字节数)
 
         Returns:
             tuple[int, int, int]: 返回(ClientImgId, CreateTime, NewMsgId)
@@ -161,45 +165,60 @@ class MessageMixin(WechatAPIClientBase):
             ValueError: image_path和image_base64都为空或都不为空时
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_image_message, wxid, image)
+        return await self._queue_message(self._send_image_message, wxid, image, progress)
 
-    async def _send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> dict:
+    async def _send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike],
+                                  progress: Optional[ProgressCallback] = None) -> dict:
         if not self.wxid:
             raise UserLoggedOut("请先登录")
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        if isinstance(image, str):
-            pass
-        elif isinstance(image, bytes):
-            image = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, 'rb') as f:
-                image = base64.b64encode(f.read()).decode()
-        else:
+        if not isinstance(image, (str, bytes, os.PathLike)):
             raise ValueError("Argument 'image' can only be str, bytes, or os.PathLike")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/UploadImg', json=json_param)
+        # 相同图片上传过时直接转发服务器上的图片，失败再重新上传
+        md5 = await file_md5(image)
+        uploaded = media_cache.get_upload("img", md5)
+        if uploaded is not None:
+            async with self._http() as session:
+                json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": cdn_image_xml(uploaded, md5)}
+                response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendCDNImg', json=json_param)
+                json_resp = await response.json()
+            if json_resp.get("Success"):
+                logger.info("发送图片消息: 对方wxid:{} 复用已上传的图片", wxid)
+                return json_resp
+            logger.debug("复用已上传的图片失败，重新上传: {}", json_resp.get("Message"))
+            media_cache.forget_upload("img", md5)
+
+        async with self._http() as session:
+            # 图片边读边编码发送，不在内存中生成完整的 base64
+            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": Base64Source(image)}
+            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/UploadImg',
+                                          data=StreamingJsonPayload(json_param, progress))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
                 json_param.pop('Base64')
                 logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
+                ref = cdn_image_ref(json_resp.get("Data"))
+                if ref is not None:
+                    media_cache.record_upload("img", md5, ref)
                 # 返回完整的响应结果
                 return json_resp
             else:
                 self.error_handler(json_resp)
 
     async def send_video_message(self, wxid: str, video: Union[str, bytes, os.PathLike],
-                                 image: [str, bytes, os.PathLike] = None):
+                                 image: [str, bytes, os.PathLike] = None,
+                                 progress: Optional[ProgressCallback] = None):
         """发送视频消息。不推荐使用，上传速度很慢300KB/s。如要使用，可压缩视频，或者发送链接卡片而不是视频。
 
                 Args:
                     wxid (str): 接收人wxid
                     video (str, bytes, os.PathLike): 视频 接受base64字符串，字节，文件路径
                     image (str, bytes, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径
+                    progress (ProgressCallback, optional): 上传进度回调，参数为(已发送字节数, 总字节数)
 
                 Returns:
                     tuple[int, int]: 返回(ClientMsgid, NewMsgId)
@@ -212,20 +231,19 @@ class MessageMixin(WechatAPIClientBase):
                 """
         if not image:
             image = Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
-        # get video base64 and duration
+        # get video source and duration，视频在发送时才边读边编码
         if isinstance(video, str):
-            vid_base64 = video
+            vid_source = Base64Source(video, prefix="data:video/mp4;base64,")
             video = base64.b64decode(video)
             file_len = len(video)
             media_info = MediaInfo.parse(BytesIO(video))
         elif isinstance(video, bytes):
-            vid_base64 = base64.b64encode(video).decode()
+            vid_source = Base64Source(video, prefix="data:video/mp4;base64,")
             file_len = len(video)
             media_info = MediaInfo.parse(BytesIO(video))
         elif isinstance(video, os.PathLike):
-            with open(video, "rb") as f:
-                file_len = len(f.read())
-                vid_base64 = base64.b64encode(f.read()).decode()
+            vid_source = Base64Source(video, prefix="data:video/mp4;base64,")
+            file_len = vid_source.raw_size
             media_info = MediaInfo.parse(video)
         else:
             raise ValueError("video should be str, bytes, or path")
@@ -262,25 +280,20 @@ class MessageMixin(WechatAPIClientBase):
         else:
             logger.info(f"使用外部提供的视频时长: {video_duration}秒")
 
-        # get image base64
-        if isinstance(image, str):
-            image_base64 = image
-        elif isinstance(image, bytes):
-            image_base64 = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, "rb") as f:
-                image_base64 = base64.b64encode(f.read()).decode()
-        else:
+        # get image source
+        if not isinstance(image, (str, bytes, os.PathLike)):
             raise ValueError("image should be str, bytes, or path")
+        image_source = Base64Source(image, prefix="data:image/jpeg;base64,")
 
         # 打印预估时间，300KB/s
         predict_time = int(file_len / 1024 / 300)
         logger.info("开始发送视频: 对方wxid:{} 视频base64略 图片base64略 预计耗时:{}秒", wxid, predict_time)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": "data:video/mp4;base64,"+ vid_base64, "ImageBase64": "data:image/jpeg;base64,"+image_base64,
+        async with self._http() as session:
+            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_source, "ImageBase64": image_source,
                           "PlayLength": duration}
-            async with session.post(f'http://{self.ip}:{self.port}/api/Msg/SendVideo', json=json_param) as resp:
+            async with session.post(f'http://{self.ip}:{self.port}/api/Msg/SendVideo',
+                                    data=StreamingJsonPayload(json_param, progress)) as resp:
                 json_resp = await resp.json()
 
         if json_resp.get("Success"):
@@ -335,17 +348,15 @@ class MessageMixin(WechatAPIClientBase):
         # get voice duration and b64
         if format.lower() == "amr":
             audio = AudioSegment.from_file(BytesIO(voice_byte), format="amr")
-            voice_base64 = base64.b64encode(voice_byte).decode()
+            voice_base64 = Base64Source(voice_byte)
         elif format.lower() == "wav":
             audio = AudioSegment.from_file(BytesIO(voice_byte), format="wav").set_channels(1)
             audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
+            voice_base64 = Base64Source(await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate))
         elif format.lower() == "mp3":
             audio = AudioSegment.from_file(BytesIO(voice_byte), format="mp3").set_channels(1)
             audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
+            voice_base64 = Base64Source(await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate))
         else:
             raise ValueError("format must be one of amr, wav, mp3")
 
@@ -353,10 +364,11 @@ class MessageMixin(WechatAPIClientBase):
 
         format_dict = {"amr": 0, "wav": 4, "mp3": 4}
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
                           "Type": format_dict[format]}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendVoice', json=json_param)
+            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendVoice',
+                                          data=StreamingJsonPayload(json_param))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
@@ -409,7 +421,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
                           "ThumbUrl": thumb_url}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/ShareLink', json=json_param)
@@ -434,7 +446,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Infourl": Infourl, "Label": Label, "Scale": Scale,
                           "X": X,"Y": Y, "Poiname": Poiname}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/ShareLocation', json=json_param)
@@ -478,7 +490,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendEmoji', json=json_param)
             json_resp = await response.json()
@@ -516,7 +528,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
                           "CardNickname": card_nickname}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendCard', json=json_param)
@@ -557,7 +569,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendApp', json=json_param)
             json_resp = await response.json()
@@ -593,7 +605,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendCDNFile', json=json_param)
             json_resp = await response.json()
@@ -603,6 +615,10 @@ class MessageMixin(WechatAPIClientBase):
                 # 返回完整的响应结果
                 return json_resp
             else:
+                # 附件ID可能来自复用的上传结果，已失效时删除记录，下次重新上传
+                attach_id = re.search(r"<attachid>(.*?)</attachid>", xml, re.S)
+                if attach_id:
+                    media_cache.forget_upload_by("file", "mediaId", attach_id.group(1).strip())
                 self.error_handler(json_resp)
 
     async def send_cdn_img_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
@@ -628,7 +644,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendCDNImg', json=json_param)
             json_resp = await response.json()
@@ -663,7 +679,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendCDNVideo', json=json_param)
             json_resp = await response.json()
@@ -699,7 +715,7 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_len}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/SendEmoji', json=json_param)
             json_resp = await response.json()
@@ -711,7 +727,7 @@ class MessageMixin(WechatAPIClientBase):
                 self.error_handler(json_resp)
 
     async def sync_message(self) -> dict:
-        """同步消息。
+        """同步消息。会带上上一次同步返回的 KeyBuf 继续同步。
 
         Returns:
             dict: 返回同步到的消息数据
@@ -723,12 +739,19 @@ class MessageMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/Sync', json=json_param)
+        async with self._http() as session:
+            json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": self._sync_key}
+            response = await session.post(f'http://{self.ip}:{self.port}/api/Msg/Sync', json=json_param,
+                                          timeout=aiohttp.ClientTimeout(total=10))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
-                return True,json_resp.get("Data")
+                data = json_resp.get("Data")
+                # 保存 KeyBuf 用于下次同步，避免服务端重复下发已同步的消息
+                if isinstance(data, dict):
+                    key_buf = data.get("KeyBuf")
+                    if isinstance(key_buf, dict) and key_buf.get("buffer"):
+                        self._sync_key = key_buf["buffer"]
+                return True,data
             else:
                 return False,json_resp.get("Message")
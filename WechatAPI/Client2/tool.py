@@ -1,7 +1,8 @@
 import base64
 import io
 import os
-from typing import Union
+from pathlib import Path
+from typing import Optional, Union
 
 import aiohttp
 import pysilk
@@ -11,6 +12,8 @@ from loguru import logger
 from .base import *
 from .protect import protector
 from ..errors import *
+from ..media_cache import file_md5, media_cache
+from ..streaming_upload import Base64Source, ProgressCallback, StreamingJsonPayload
 
 
 class ToolMixin(WechatAPIClientBase):
@@ -31,15 +34,20 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/CdnDownloadImg', json=json_param)
-            json_resp = await response.json()
+        async def fetch():
+            async with self._http() as session:
+                json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
+                response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/CdnDownloadImg', json=json_param)
+                json_resp = await response.json()
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+                if json_resp.get("Success"):
+                    return json_resp.get("Data")
+                else:
+                    self.error_handler(json_resp)
+
+        # 同一张图片多次引用时只下载一次
+        return await media_cache.fetch_base64(media_cache.key("cdnimg", cdnmidimgurl), fetch,
+                                              media_cache.key("aeskey", aeskey))
 
     async def download_voice(self, msg_id: str, voiceurl: str, length: int) -> str:
         """下载语音文件。
@@ -59,7 +67,7 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/DownloadVoice', json=json_param)
             json_resp = await response.json()
@@ -85,18 +93,21 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            # 设置请求超时时间为5分钟，以处理大文件
-            timeout = aiohttp.ClientTimeout(total=300)  # 5分钟
+        async def fetch():
+            async with self._http() as session:
+                # 设置请求超时时间为5分钟，以处理大文件
+                timeout = aiohttp.ClientTimeout(total=300)  # 5分钟
 
-            json_param = {"Wxid": self.wxid, "AttachId": attach_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/DownloadAttach', json=json_param,timeout=timeout)
-            json_resp = await response.json()
+                json_param = {"Wxid": self.wxid, "AttachId": attach_id}
+                response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/DownloadAttach', json=json_param,timeout=timeout)
+                json_resp = await response.json()
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+                if json_resp.get("Success"):
+                    return json_resp.get("Data").get("data").get("buffer")
+                else:
+                    self.error_handler(json_resp)
+
+        return await media_cache.fetch_base64(media_cache.key("attach", attach_id), fetch)
 
     async def download_video(self, msg_id) -> str:
         """下载视频。
@@ -114,15 +125,18 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/DownloadVideo', json=json_param)
-            json_resp = await response.json()
+        async def fetch():
+            async with self._http() as session:
+                json_param = {"Wxid": self.wxid, "MsgId": msg_id}
+                response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/DownloadVideo', json=json_param)
+                json_resp = await response.json()
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+                if json_resp.get("Success"):
+                    return json_resp.get("Data").get("data").get("buffer")
+                else:
+                    self.error_handler(json_resp)
+
+        return await media_cache.fetch_base64(media_cache.key("video", msg_id), fetch)
 
     async def set_step(self, count: int) -> bool:
         """设置步数。
@@ -143,7 +157,7 @@ class ToolMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "StepCount": count}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/SetStep', json=json_param)
             json_resp = await response.json()
@@ -169,7 +183,7 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid,
                           "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
                                     "ProxyUser": proxy.username,
@@ -188,7 +202,7 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bool: 数据库正常返回True，否则返回False
         """
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             response = await session.get(f'http://{self.ip}:{self.port}/api/Tools/CheckDatabaseOK')
             json_resp = await response.json()
 
@@ -364,11 +378,13 @@ class ToolMixin(WechatAPIClientBase):
         """
         return await ToolMixin.silk_byte_to_byte_wav_byte(base64.b64decode(silk_base64))
 
-    async def upload_file(self, file_data: Union[str, bytes, os.PathLike]) -> dict:
+    async def upload_file(self, file_data: Union[str, bytes, os.PathLike],
+                          progress: Optional[ProgressCallback] = None) -> dict:
         """上传文件到服务器。
 
         Args:
             file_data (Union[str, bytes, os.PathLike]): 文件数据，支持base64字符串，字节数据或文件路径
+            progress (ProgressCallback, optional): 上传进度回调，参数为(已发送字节数, 总字节数)
 
         Returns:
             dict: 包含上传文件信息的字典，包括MD5和总长度
@@ -385,31 +401,37 @@ class ToolMixin(WechatAPIClientBase):
         if isinstance(file_data, str):
             # 如果是字符串，假定是base64编码或文件路径
             if os.path.exists(file_data):
-                # 如果是文件路径
-                with open(file_data, 'rb') as f:
-                    file_base64 = base64.b64encode(f.read()).decode()
+                # 如果是文件路径，发送时边读边编码
+                file_data = Path(file_data)
+                file_base64 = Base64Source(file_data)
             else:
                 # 假定是base64字符串
-                file_base64 = file_data
-        elif isinstance(file_data, bytes):
-            # 如果是字节数据，转换为base64
-            file_base64 = base64.b64encode(file_data).decode()
-        elif isinstance(file_data, os.PathLike):
-            # 如果是文件路径对象
-            with open(file_data, 'rb') as f:
-                file_base64 = base64.b64encode(f.read()).decode()
+                file_base64 = Base64Source(file_data)
+        elif isinstance(file_data, (bytes, os.PathLike)):
+            # 字节数据或文件路径对象，发送时分块编码
+            file_base64 = Base64Source(file_data)
         else:
             raise ValueError("文件数据必须是base64字符串、字节数据或文件路径")
 
+        # 相同内容上传过且未过期时直接返回上次的结果，由调用方通过 send_cdn_file_msg 转发
+        md5 = await file_md5(file_data)
+        uploaded = media_cache.get_upload("file", md5)
+        if uploaded is not None:
+            logger.debug("文件已上传过，复用上传结果: {}", md5)
+            return dict(uploaded)
+
         # 发送请求上传文件
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "Base64": file_base64}
-            response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/UploadFile', json=json_param)
+            response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/UploadFile',
+                                          data=StreamingJsonPayload(json_param, progress))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
                 # 返回数据，可能在Data中或直接在根层级
                 data = json_resp.get("Data") or json_resp
+                if isinstance(data, dict) and data.get("mediaId"):
+                    media_cache.record_upload("file", md5, data)
                 return data
             else:
                 self.error_handler(json_resp)
@@ -430,7 +452,7 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
+        async with self._http() as session:
             json_param = {"Wxid": self.wxid, "Md5": md5}
             response = await session.post(f'http://{self.ip}:{self.port}/api/Tools/EmojiDownload', json=json_param)
             json_resp = await response.json()
@@ -1,5 +1,9 @@
+import asyncio
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 
+import aiohttp
+
 from WechatAPI.errors import *
 
 
@@ -45,6 +49,12 @@ class WechatAPIClientBase:
         phone (str): 手机号
         ignore_protect (bool): 是否忽略保护机制
     """
+    # 共享 HTTP 连接池设置，可在创建客户端前按需修改
+    http_pool_limit = 100  # 连接池总连接数上限
+    http_pool_limit_per_host = 30  # 单个主机的连接数上限
+    http_keepalive_timeout = 60  # 空闲连接保持时间（秒）
+    http_timeout = aiohttp.ClientTimeout(total=300, connect=10, sock_connect=10)
+
     def __init__(self, ip: str, port: int):
         self.ip = ip
         self.port = port
@@ -56,9 +66,72 @@ class WechatAPIClientBase:
 
         self.ignore_protect = False
 
+        # 事件循环 -> 所有 Mixin 共用的 HTTP 会话，每个事件循环首次请求时创建
+        # （机器人和管理后台运行在不同线程的事件循环中，会话不能跨循环使用）
+        self._http_sessions = {}
+
         # 调用所有 Mixin 的初始化方法
         super().__init__()
 
+    async def get_http_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的共享 HTTP 会话，不存在或已关闭时创建
+
+        Returns:
+            aiohttp.ClientSession: 带连接池和 keep-alive 的会话
+        """
+        loop = asyncio.get_running_loop()
+        session = self._http_sessions.get(loop)
+        if session is not None and not session.closed:
+            return session
+
+        # 顺便丢弃已关闭的事件循环留下的会话
+        for other in [other for other in self._http_sessions if other.is_closed()]:
+            del self._http_sessions[other]
+        connector = aiohttp.TCPConnector(limit=self.http_pool_limit,
+                                         limit_per_host=self.http_pool_limit_per_host,
+                                         keepalive_timeout=self.http_keepalive_timeout)
+        session = aiohttp.ClientSession(connector=connector, timeout=self.http_timeout)
+        self._http_sessions[loop] = session
+        return session
+
+    async def close_http_session(self, timeout: float = 5):
+        """关闭所有事件循环中的共享 HTTP 会话，下次请求时会重新创建
+
+        其他线程事件循环中的会话提交到所属循环关闭，最多等待 timeout 秒。
+
+        Args:
+            timeout (float): 等待其他事件循环关闭会话的最长时间（秒）
+        """
+        current = asyncio.get_running_loop()
+        sessions, self._http_sessions = self._http_sessions, {}
+        for loop, session in sessions.items():
+            if session.closed:
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                except Exception:
+                    pass
+
+    async def on_login(self):
+        """登录成功后调用，准备好共享 HTTP 会话"""
+        await self.get_http_session()
+
+    async def on_logout(self):
+        """登出后调用，释放共享 HTTP 会话中的连接"""
+        await self.close_http_session()
+
+    @asynccontextmanager
+    async def _http(self):
+        """在请求中使用当前事件循环的共享会话，用法同 ``async with aiohttp.ClientSession() as session``
+
+        退出时不会关闭会话。
+        """
+        yield await self.get_http_session()
+
     @staticmethod
     def error_handler(json_resp):
         """处理API响应中的错误码
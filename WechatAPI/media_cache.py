@@ -0,0 +1,359 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from loguru import logger
+
+
+class MediaCache:
+    """按内容寻址的媒体缓存
+
+    文件内容以其 MD5 为文件名保存在磁盘上，查找键（CDN 地址、附件ID、消息ID、图片MD5等）
+    映射到内容 MD5，同一份内容只保存一次。内存中保存索引和按最近使用排序的文件列表，
+    磁盘占用超过 max_bytes 时淘汰最久未使用的文件。同一个键同时只会下载一次。
+    还记录上传结果（CDN 引用），再次发送相同内容时可以直接转发而不必重新上传。
+
+    Args:
+        root (str): 缓存目录
+        max_bytes (int): 缓存文件总大小上限（字节）
+        upload_ttl (float): 上传结果的有效期（秒），过期后重新上传
+    """
+
+    def __init__(self, root: str = os.path.join("files", "media_cache"), max_bytes: int = 512 * 1024 * 1024,
+                 upload_ttl: float = 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.upload_ttl = upload_ttl
+
+        self._loaded = False
+        # 内容MD5 -> 文件大小，按最近使用排序
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        # 查找键 -> 内容MD5
+        self._keys: Dict[str, str] = {}
+        # "类型:内容MD5" -> {"ref": 上传结果, "time": 记录时间}
+        self._uploads: Dict[str, dict] = {}
+        # 查找键 -> 正在进行的下载
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._save_handle = None
+        self._save_loop = None
+
+    @staticmethod
+    def key(kind: str, *parts) -> str:
+        """生成查找键，例如 key("attach", attach_id)"""
+        return ":".join([kind, *(str(part) for part in parts)])
+
+    # 索引
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def _blob_path(self, md5: str) -> str:
+        return os.path.join(self.root, md5[:2], md5)
+
+    def _load(self):
+        """首次使用时扫描缓存目录并读取索引"""
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.root, exist_ok=True)
+
+        blobs = []
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if len(sub) != 2 or not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                try:
+                    stat = os.stat(os.path.join(sub_dir, name))
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, md5, size in sorted(blobs):
+            self._blobs[md5] = size
+            self._total += size
+
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self._keys = {k: v for k, v in index.get("keys", {}).items() if v in self._blobs}
+            self._uploads = index.get("uploads", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("读取媒体缓存索引失败，将重建: {}", e)
+        logger.debug("媒体缓存已加载: {} 个文件, {:.1f} MB", len(self._blobs), self._total / 1024 / 1024)
+
+    def _schedule_save(self):
+        """索引变化后稍后保存，短时间内的多次修改只写一次"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save_index()
+            return
+        if self._save_handle is not None and self._save_loop is loop:
+            return
+        self._save_loop = loop
+        self._save_handle = loop.call_later(2, self._save_soon)
+
+    def _save_soon(self):
+        self._save_handle = None
+        self._save_loop = None
+        data = self._index_snapshot()
+        asyncio.get_running_loop().run_in_executor(None, self._write_index, data)
+
+    def _index_snapshot(self) -> str:
+        now = time.time()
+        uploads = {k: v for k, v in self._uploads.items() if now - v.get("time", 0) < self.upload_ttl}
+        self._uploads = uploads
+        return json.dumps({"keys": self._keys, "uploads": uploads}, ensure_ascii=False)
+
+    def _write_index(self, data: str):
+        tmp_path = self._index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self._index_path)
+        except Exception as e:
+            logger.warning("保存媒体缓存索引失败: {}", e)
+
+    def save_index(self):
+        """立即保存索引"""
+        if self._loaded:
+            self._write_index(self._index_snapshot())
+
+    # 读写
+
+    def path(self, key: str) -> Optional[str]:
+        """返回键对应的缓存文件路径，未缓存时返回 None"""
+        self._load()
+        md5 = self._keys.get(key)
+        if md5 is None or md5 not in self._blobs:
+            return None
+        self._blobs.move_to_end(md5)
+        return self._blob_path(md5)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """读取键对应的内容，未缓存时返回 None"""
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            return await asyncio.to_thread(_read_file, path)
+        except OSError:
+            # 文件被外部删除
+            self._drop_blob(self._keys.get(key, ""))
+            return None
+
+    async def get_base64(self, key: str) -> Optional[str]:
+        """读取键对应的内容并编码为 base64，未缓存时返回 None"""
+        data = await self.get(key)
+        return base64.b64encode(data).decode() if data is not None else None
+
+    async def put(self, data: bytes, *keys: str) -> str:
+        """保存内容并把各个键指向它
+
+        Returns:
+            str: 内容的 MD5
+        """
+        self._load()
+        md5 = hashlib.md5(data).hexdigest()
+        if md5 not in self._blobs:
+            path = self._blob_path(md5)
+            await asyncio.to_thread(_write_file, path, data)
+            self._blobs[md5] = len(data)
+            self._total += len(data)
+            self._evict()
+        self._blobs.move_to_end(md5)
+        for key in keys:
+            self._keys[key] = md5
+        self._schedule_save()
+        return md5
+
+    def alias(self, key: str, md5: str) -> bool:
+        """让 key 指向已缓存的内容，内容不在缓存中时返回 False"""
+        self._load()
+        if md5 not in self._blobs:
+            return False
+        self._keys[key] = md5
+        self._schedule_save()
+        return True
+
+    async def fetch(self, key: str, fetcher: Callable[[], Awaitable[Optional[bytes]]], *aliases: str) -> Optional[bytes]:
+        """读取缓存，未命中时调用 fetcher 获取并缓存，同一个键同时只获取一次
+
+        Args:
+            key (str): 查找键
+            fetcher: 返回内容的协程函数，返回空值时不缓存
+            *aliases (str): 同时指向该内容的其他键
+
+        Returns:
+            Optional[bytes]: 内容
+        """
+        data = await self.get(key)
+        if data is not None:
+            return data
+
+        async def fetch_and_put():
+            data = await fetcher()
+            if data:
+                await self.put(data, key, *aliases)
+            return data
+
+        return await self._single_flight(key, fetch_and_put)
+
+    async def fetch_base64(self, key: str, fetcher: Callable[[], Awaitable[Any]], *aliases: str) -> Any:
+        """同 fetch，但 fetcher 返回 base64 字符串，本方法也返回 base64 字符串
+
+        未命中时原样返回 fetcher 的结果，不是有效 base64 的结果不缓存。
+        """
+        cached = await self.get_base64(key)
+        if cached is not None:
+            return cached
+
+        async def fetch_and_put():
+            encoded = await fetcher()
+            if isinstance(encoded, str) and encoded:
+                try:
+                    data = base64.b64decode(encoded, validate=True)
+                except (binascii.Error, ValueError):
+                    return encoded
+                await self.put(data, key, *aliases)
+            return encoded
+
+        return await self._single_flight(key, fetch_and_put)
+
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """同一个键同时只运行一次 factory，其他调用方等待同一个结果"""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+        # 某个调用方被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    # 上传记录
+
+    def record_upload(self, kind: str, md5: str, ref: dict):
+        """记录内容上传后服务器返回的引用，例如附件的 mediaId 或图片的 CDN 地址"""
+        self._load()
+        self._uploads[f"{kind}:{md5}"] = {"ref": ref, "time": time.time()}
+        self._schedule_save()
+
+    def get_upload(self, kind: str, md5: str) -> Optional[dict]:
+        """获取未过期的上传引用"""
+        self._load()
+        entry = self._uploads.get(f"{kind}:{md5}")
+        if entry is None:
+            return None
+        if time.time() - entry.get("time", 0) >= self.upload_ttl:
+            del self._uploads[f"{kind}:{md5}"]
+            return None
+        return entry["ref"]
+
+    def forget_upload(self, kind: str, md5: str):
+        """引用失效（例如转发失败）时删除"""
+        self._load()
+        if self._uploads.pop(f"{kind}:{md5}", None) is not None:
+            self._schedule_save()
+
+    def forget_upload_by(self, kind: str, field: str, value: Any):
+        """删除引用中 field 等于 value 的上传记录，用于只知道服务器引用而不知道内容时"""
+        self._load()
+        stale = [k for k, v in self._uploads.items() if k.startswith(kind + ":") and v["ref"].get(field) == value]
+        for k in stale:
+            del self._uploads[k]
+        if stale:
+            self._schedule_save()
+
+    # 淘汰
+
+    def _drop_blob(self, md5: str):
+        size = self._blobs.pop(md5, None)
+        if size is None:
+            return
+        self._total -= size
+        try:
+            os.remove(self._blob_path(md5))
+        except OSError:
+            pass
+        self._keys = {k: v for k, v in self._keys.items() if v != md5}
+        self._schedule_save()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._blobs) > 1:
+            md5 = next(iter(self._blobs))
+            self._drop_blob(md5)
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        self._load()
+        return {"files": len(self._blobs), "bytes": self._total, "keys": len(self._keys),
+                "uploads": len(self._uploads), "inflight": len(self._inflight)}
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+async def file_md5(data: Union[str, bytes, os.PathLike]) -> Optional[str]:
+    """计算待上传内容的 MD5，str 视为 base64"""
+    if isinstance(data, os.PathLike):
+        def digest():
+            md5 = hashlib.md5()
+            with open(data, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(chunk)
+            return md5.hexdigest()
+
+        return await asyncio.to_thread(digest)
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return hashlib.md5(data).hexdigest()
+    return None
+
+
+def cdn_image_ref(upload_data: Any) -> Optional[dict]:
+    """从上传图片接口的返回数据中取出 CDN 引用，没有 AES 密钥或文件ID时返回 None"""
+    if not isinstance(upload_data, dict):
+        return None
+    fields = {k.lower(): v for k, v in upload_data.items()}
+    aeskey = fields.get("aeskey")
+    fileid = fields.get("fileid") or fields.get("cdnmidimgurl")
+    if isinstance(aeskey, dict):
+        aeskey = aeskey.get("string")
+    if isinstance(fileid, dict):
+        fileid = fileid.get("string")
+    if not aeskey or not fileid:
+        return None
+    return {"aeskey": aeskey, "fileid": fileid, "length": fields.get("totallen") or fields.get("datalen") or 0}
+
+
+def cdn_image_xml(ref: dict, md5: str) -> str:
+    """用 CDN 引用构造转发图片用的 xml"""
+    return (f'<msg><img aeskey="{ref["aeskey"]}" cdnthumbaeskey="{ref["aeskey"]}" '
+            f'cdnthumburl="{ref["fileid"]}" cdnmidimgurl="{ref["fileid"]}" '
+            f'length="{ref["length"]}" md5="{md5}" /></msg>')
+
+
+# 全局媒体缓存
+media_cache = MediaCache()
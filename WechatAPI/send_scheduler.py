@@ -0,0 +1,316 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from loguru import logger
+
+# 各发送方法的优先级，数字越小越先发送；未列出的方法使用 DEFAULT_PRIORITY
+SEND_PRIORITIES = {
+    "_send_text_message": 0,
+    "_send_at_message": 0,
+    "_send_emoji_message": 1,
+    "_send_card_message": 1,
+    "_send_link_message": 1,
+    "_send_app_message": 1,
+    "_send_cdn_img_msg": 2,
+    "_send_cdn_file_msg": 2,
+    "_send_image_message": 2,
+    "_send_voice_message": 2,
+    "_send_cdn_video_msg": 3,
+    "_send_video_message": 3,
+}
+DEFAULT_PRIORITY = 1
+
+
+class RateLimiter:
+    """按经过时间补充令牌的令牌桶，用于全局发送速率上限
+
+    令牌可以预约透支，调用方按预约顺序等待，先到先得。
+
+    Args:
+        rate (float): 每秒补充的令牌数，小于等于0表示不限速
+        burst (int): 令牌桶容量，空闲后允许连续发送的数量
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    async def acquire(self):
+        """等待获取一个令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class _SendJob:
+    func: Callable
+    args: tuple
+    kwargs: dict
+    future: asyncio.Future
+    priority: int
+    seq: int
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class _Lane:
+    """一个会话的发送队列，队列内严格按先后顺序发送"""
+    __slots__ = ("jobs", "busy", "ready_at", "scheduled")
+
+    def __init__(self):
+        self.jobs: Deque[_SendJob] = deque()
+        self.busy = False  # 是否有消息正在发送
+        self.ready_at = 0.0  # 下一条消息最早的发送时间
+        self.scheduled = False  # 是否已在就绪堆或定时堆中
+
+
+class SendScheduler:
+    """消息发送调度器
+
+    每个接收人一个先进先出的队列，同一接收人两次发送之间至少间隔 recipient_interval 秒，
+    不同接收人之间并行发送，并受全局速率上限 global_rate 限制；默认全局每秒1条、不允许突发，
+    与原来每条消息间隔1秒的防风控节奏一致。多个接收人同时可发送时，文字优先于图片、视频。
+    开启 coalesce_text 时，同一接收人排队中连续的、不带@的文字消息会合并为一条发送，
+    被合并的调用方拿到同一组消息ID，撤回其中一条会撤回合并后的整条消息，因此默认关闭。
+
+    需要在事件循环中创建，只能在该事件循环中使用。
+
+    Args:
+        recipient_interval (float): 同一接收人两次发送的最小间隔（秒）
+        global_rate (float): 全局每秒最多发送的消息数，小于等于0表示不限速
+        global_burst (int): 全局空闲后允许连续发送的消息数
+        max_concurrency (int): 同时进行中的发送请求数上限
+        coalesce_text (bool): 是否合并排队中的连续文字消息
+        coalesce_max_chars (int): 合并后文字的最大长度
+    """
+
+    def __init__(self, recipient_interval: float = 1.0, global_rate: float = 1.0, global_burst: int = 1,
+                 max_concurrency: int = 4, coalesce_text: bool = False, coalesce_max_chars: int = 2000):
+        self.loop = asyncio.get_running_loop()
+        self.recipient_interval = recipient_interval
+        self.limiter = RateLimiter(global_rate, global_burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.coalesce_text = coalesce_text
+        self.coalesce_max_chars = coalesce_max_chars
+
+        self._lanes: Dict[str, _Lane] = {}
+        # (优先级, 序号, 接收人)，队首消息已可发送的会话
+        self._ready: List[tuple] = []
+        # (最早发送时间, 序号, 接收人)，还在间隔期内的会话
+        self._timers: List[tuple] = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # 统计
+        self._queued = 0
+        self._sent = 0
+        self._coalesced = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._send_total = 0.0
+
+    async def submit(self, func: Callable, *args, **kwargs) -> Any:
+        """把一次发送加入接收人的队列并等待发送结果
+
+        Args:
+            func: 实际发送消息的协程函数，第一个参数为接收人wxid
+            *args: 传给 func 的位置参数
+            **kwargs: 传给 func 的关键字参数
+
+        Returns:
+            Any: func 的返回值
+        """
+        wxid = args[0] if args else kwargs.get("wxid", "")
+        job = _SendJob(func, args, kwargs, self.loop.create_future(),
+                       SEND_PRIORITIES.get(getattr(func, "__name__", ""), DEFAULT_PRIORITY), next(self._seq))
+
+        lane = self._lanes.get(wxid)
+        if lane is None:
+            lane = self._lanes[wxid] = _Lane()
+        lane.jobs.append(job)
+        self._queued += 1
+        self._schedule(wxid, lane)
+        self._ensure_dispatcher()
+        return await job.future
+
+    def stats(self) -> dict:
+        """队列深度与延迟统计
+
+        Returns:
+            dict: queued 排队中的消息数，lanes 有消息排队的会话数，max_lane_depth 最长队列，
+                inflight 发送中的请求数，sent 已发送次数，coalesced 被合并的消息数，failed 失败次数，
+                avg_wait/max_wait 排队等待时间（秒），avg_send 单次发送耗时（秒）
+        """
+        depths = [len(lane.jobs) for lane in self._lanes.values() if lane.jobs]
+        return {
+            "queued": self._queued,
+            "lanes": len(depths),
+            "max_lane_depth": max(depths, default=0),
+            "inflight": self._inflight,
+            "sent": self._sent,
+            "coalesced": self._coalesced,
+            "failed": self._failed,
+            "avg_wait": self._wait_total / self._sent if self._sent else 0.0,
+            "max_wait": self._wait_max,
+            "avg_send": self._send_total / self._sent if self._sent else 0.0,
+        }
+
+    # 调度
+
+    def _schedule(self, wxid: str, lane: _Lane):
+        """会话空闲且有消息排队时，放入就绪堆或定时堆"""
+        if lane.busy or lane.scheduled or not lane.jobs:
+            return
+        lane.scheduled = True
+        if lane.ready_at <= time.monotonic():
+            head = lane.jobs[0]
+            heapq.heappush(self._ready, (head.priority, head.seq, wxid))
+        else:
+            heapq.heappush(self._timers, (lane.ready_at, next(self._seq), wxid))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        """调度循环：取出优先级最高的就绪会话，按全局速率发送它的队首消息"""
+        while True:
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, wxid = heapq.heappop(self._timers)
+                lane = self._lanes.get(wxid)
+                if lane is None:
+                    continue
+                if not lane.jobs:  # 间隔期已过且没有新消息，删除会话
+                    del self._lanes[wxid]
+                    continue
+                head = lane.jobs[0]
+                heapq.heappush(self._ready, (head.priority, head.seq, wxid))
+
+            if self._ready and self._inflight < self.max_concurrency:
+                _, _, wxid = heapq.heappop(self._ready)
+                await self.limiter.acquire()
+                lane = self._lanes[wxid]
+                lane.scheduled = False
+                jobs = self._take(lane)
+                if not jobs:
+                    self._release(wxid, lane)
+                    continue
+                lane.busy = True
+                self._inflight += 1
+                asyncio.create_task(self._run(wxid, lane, jobs))
+                continue
+
+            self._wakeup.clear()
+            timeout = None
+            if self._timers and self._inflight < self.max_concurrency:
+                timeout = max(0.0, self._timers[0][0] - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take(self, lane: _Lane) -> List[_SendJob]:
+        """取出会话的队首消息；开启合并时带上紧随其后的可合并文字消息"""
+        while lane.jobs and lane.jobs[0].future.done():  # 调用方已取消
+            lane.jobs.popleft()
+            self._queued -= 1
+        if not lane.jobs:
+            return []
+
+        jobs = [lane.jobs.popleft()]
+        self._queued -= 1
+        if self.coalesce_text and self._can_coalesce(jobs[0]):
+            length = len(jobs[0].args[1])
+            while lane.jobs and self._can_coalesce(lane.jobs[0]):
+                job = lane.jobs[0]
+                if job.future.done():
+                    lane.jobs.popleft()
+                    self._queued -= 1
+                    continue
+                length += len(job.args[1]) + 1
+                if length > self.coalesce_max_chars:
+                    break
+                jobs.append(lane.jobs.popleft())
+                self._queued -= 1
+        return jobs
+
+    @staticmethod
+    def _can_coalesce(job: _SendJob) -> bool:
+        """不带@、只有位置参数的文字消息可以合并"""
+        return (getattr(job.func, "__name__", "") == "_send_text_message" and not job.kwargs
+                and len(job.args) >= 2 and isinstance(job.args[1], str)
+                and not (job.args[2] if len(job.args) > 2 else None))
+
+    async def _run(self, wxid: str, lane: _Lane, jobs: List[_SendJob]):
+        started = time.monotonic()
+        for job in jobs:
+            wait = started - job.queued_at
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+        head = jobs[0]
+        args = head.args
+        if len(jobs) > 1:
+            args = (args[0], "\n".join(job.args[1] for job in jobs)) + args[2:]
+            self._coalesced += len(jobs) - 1
+            logger.debug("合并 {} 条发给 {} 的文字消息", len(jobs), wxid)
+
+        try:
+            result = await head.func(*args, **head.kwargs)
+        except asyncio.CancelledError:
+            for job in jobs:
+                job.future.cancel()
+            raise
+        except Exception as e:
+            self._failed += 1
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_result(result)
+        finally:
+            self._sent += 1
+            self._send_total += time.monotonic() - started
+            self._inflight -= 1
+            lane.busy = False
+            lane.ready_at = time.monotonic() + self.recipient_interval
+            self._release(wxid, lane)
+
+    def _release(self, wxid: str, lane: _Lane):
+        """会话发送结束后重新调度，没有排队消息时删除会话"""
+        if lane.jobs:
+            self._schedule(wxid, lane)
+        elif not lane.busy and lane.ready_at <= time.monotonic():
+            self._lanes.pop(wxid, None)
+        elif not lane.busy:
+            # 间隔期内保留会话，保证下一条消息仍遵守间隔；到期后由定时堆清理
+            lane.scheduled = True
+            heapq.heappush(self._timers, (lane.ready_at, next(self._seq), wxid))
+        if self._wakeup is not None:
+            self._wakeup.set()
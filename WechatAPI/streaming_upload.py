@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import inspect
+import json
+import os
+from typing import Awaitable, Callable, Optional, Union
+
+from aiohttp.payload import Payload
+
+# 每次读取并编码的原始数据大小，取3的倍数，使各块的 base64 可以直接拼接
+CHUNK_SIZE = 3 * 64 * 1024
+
+# 上传进度回调，参数为(已发送字节数, 总字节数)，可以是普通函数或协程函数
+ProgressCallback = Callable[[int, int], Union[None, Awaitable[None]]]
+
+
+class Base64Source:
+    """以 base64 形式上传的数据，按块编码，不在内存中生成完整的 base64 字符串
+
+    Args:
+        data (str, bytes, bytearray, memoryview, os.PathLike): 数据。str 视为已编码的 base64，
+            原样发送；bytes 类数据通过 memoryview 分块编码，不复制；路径则边读边编码
+        prefix (str, optional): 放在 base64 前面的内容，例如 ``data:video/mp4;base64,``
+    """
+
+    def __init__(self, data: Union[str, bytes, bytearray, memoryview, os.PathLike], prefix: str = ""):
+        self.prefix = prefix.encode()
+        if isinstance(data, str):
+            # 按 JSON 字符串转义，已编码的 base64 中一般没有需要转义的字符
+            self._encoded = json.dumps(data, ensure_ascii=False)[1:-1].encode()
+            self._view = None
+            self._path = None
+            self.raw_size = None
+            self.size = len(self.prefix) + len(self._encoded)
+            return
+
+        self._encoded = None
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self._view = memoryview(data).cast("B")
+            self._path = None
+            self.raw_size = self._view.nbytes
+        elif isinstance(data, os.PathLike):
+            self._view = None
+            self._path = os.fspath(data)
+            self.raw_size = os.path.getsize(self._path)
+        else:
+            raise ValueError("data should be str, bytes, or path")
+        self.size = len(self.prefix) + (self.raw_size + 2) // 3 * 4
+
+    def read_all(self) -> bytes:
+        """一次性返回全部编码后的数据，会把全部数据载入内存"""
+        if self._encoded is not None:
+            return self.prefix + self._encoded
+        if self._view is not None:
+            return self.prefix + base64.b64encode(self._view)
+        with open(self._path, "rb") as f:
+            return self.prefix + base64.b64encode(f.read())
+
+    async def chunks(self):
+        """依次产出 base64 编码后的数据块"""
+        if self.prefix:
+            yield self.prefix
+        if self._encoded is not None:
+            encoded = memoryview(self._encoded)
+            for start in range(0, len(encoded), CHUNK_SIZE):
+                yield encoded[start:start + CHUNK_SIZE]
+        elif self._view is not None:
+            for start in range(0, self._view.nbytes, CHUNK_SIZE):
+                yield base64.b64encode(self._view[start:start + CHUNK_SIZE])
+        else:
+            with open(self._path, "rb") as f:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield base64.b64encode(chunk)
+
+
+class StreamingJsonPayload(Payload):
+    """把包含 Base64Source 字段的字典作为 JSON 请求体流式发送
+
+    普通字段按 json.dumps 序列化，Base64Source 字段作为 JSON 字符串边编码边发送，
+    内存占用与文件大小无关。请求体长度预先算好，以 Content-Length 发送。
+
+    Args:
+        fields (dict): 请求参数
+        progress (ProgressCallback, optional): 上传进度回调
+    """
+
+    def __init__(self, fields: dict, progress: Optional[ProgressCallback] = None):
+        parts = []
+        literal = "{"
+        for index, (key, value) in enumerate(fields.items()):
+            if index:
+                literal += ", "
+            literal += json.dumps(key) + ": "
+            if isinstance(value, Base64Source):
+                parts.append((literal + '"').encode())
+                parts.append(value)
+                literal = '"'
+            else:
+                literal += json.dumps(value, ensure_ascii=False)
+        parts.append((literal + "}").encode())
+
+        self._parts = parts
+        self._progress = progress
+        super().__init__(fields, content_type="application/json")
+        self._size = sum(len(part) if isinstance(part, bytes) else part.size for part in parts)
+
+    async def _iter_chunks(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                async for chunk in part.chunks():
+                    yield chunk
+
+    async def write(self, writer) -> None:
+        sent = 0
+        async for chunk in self._iter_chunks():
+            await writer.write(chunk)
+            sent += len(chunk)
+            if self._progress is not None:
+                result = self._progress(sent, self._size)
+                if inspect.isawaitable(result):
+                    await result
+
+    def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        """返回完整的请求体文本，会把全部数据载入内存，仅用于调试"""
+        return b"".join(part if isinstance(part, bytes) else part.read_all() for part in self._parts) \
+            .decode(encoding, errors)
@@ -456,6 +456,26 @@ def get_system_info():
             "processor": platform.processor()
         }
 
+def get_dispatcher_stats():
+    """获取消息分发器的队列与耗时指标，分发器未启动时返回 None"""
+    try:
+        from utils.message_dispatcher import get_instance
+        dispatcher = get_instance()
+        return dispatcher.get_stats() if dispatcher else None
+    except Exception as e:
+        logger.error(f"获取消息分发器指标失败: {e}")
+        return None
+
+def get_message_sync_stats():
+    """获取消息同步轮询指标（含拉取到分发的延迟直方图），未启动时返回 None"""
+    try:
+        from utils.poll_scheduler import get_instance
+        poll_scheduler = get_instance()
+        return poll_scheduler.get_stats() if poll_scheduler else None
+    except Exception as e:
+        logger.error(f"获取消息同步指标失败: {e}")
+        return None
+
 def get_system_status():
     """获取系统运行状态信息"""
     try:
@@ -541,7 +561,9 @@ def get_system_status():
             'bytes_sent': bytes_sent,
             'bytes_recv': bytes_recv,
             'uptime': uptime_str,
-            'start_time': login_time.strftime("%Y-%m-%d %H:%M:%S")
+            'start_time': login_time.strftime("%Y-%m-%d %H:%M:%S"),
+            'dispatcher': get_dispatcher_stats(),
+            'message_sync': get_message_sync_stats()
         }
     except Exception as e:
         logger.error(f"获取系统状态信息失败: {str(e)}")
@@ -1560,6 +1582,22 @@ def setup_routes():
         # 调用system_stats_api模块中的处理函数
         return await handle_system_stats(request, type, time_range)
 
+    # API: 事件处理函数统计 (需要认证)
+    @app.get("/api/system/handlers", response_class=JSONResponse)
+    async def api_system_handlers(request: Request, event_type: str = None):
+        """事件处理函数的调用次数与累计耗时，用于定位拖慢消息处理的插件"""
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        try:
+            from utils.event_manager import EventManager
+            return {"success": True, "data": EventManager.get_handler_stats(event_type)}
+        except Exception as e:
+            logger.error(f"获取事件处理函数统计失败: {e}")
+            return {"success": False, "error": str(e)}
+
     # API: 系统信息 (需要认证)
     @app.get("/api/system/info", response_class=JSONResponse)
     async def api_system_info(request: Request):
@@ -1904,6 +1942,13 @@ def setup_routes():
             await asyncio.sleep(1)
             logger.warning("正在重启容器...")
 
+            # os._exit 不会执行 finally 和 atexit，先在机器人的事件循环里写完缓冲、关闭连接
+            try:
+                from utils.shutdown_hooks import run_shutdown_hooks
+                await run_shutdown_hooks()
+            except Exception as e:
+                logger.error(f"执行退出清理失败: {e}")
+
             # 检测是否在Docker容器中运行
             in_docker = os.path.exists('/.dockerenv') or os.path.exists('/app/.dockerenv')
             logger.info(f"是否在Docker环境中: {in_docker}")
@@ -58,6 +58,13 @@ async def api_switch_account(request: Request):
                     await asyncio.sleep(1)
                     logger.warning("正在重启系统以切换账号...")
 
+                    # os._exit 不会执行 finally 和 atexit，先在机器人的事件循环里写完缓冲、关闭连接
+                    try:
+                        from utils.shutdown_hooks import run_shutdown_hooks
+                        await run_shutdown_hooks()
+                    except Exception as e:
+                        logger.error(f"执行退出清理失败: {e}")
+
                     # 检测是否在Docker容器中运行
                     in_docker = os.path.exists('/.dockerenv') or os.path.exists('/app/.dockerenv')
                     logger.info(f"是否在Docker环境中: {in_docker}")
@@ -0,0 +1,143 @@
+"""ChatChannel 消息调度基准
+
+1000 个会话，每个会话 5 条消息，每 5 毫秒放入 10 条（低于线程池处理能力），处理函数阻塞 1 毫秒，
+对比旧的 consume（每 200 毫秒遍历全部会话）与基于条件变量的 consume（produce 放入消息或
+任务结束时唤醒）从 produce 到开始处理的延迟、消费者线程占用的 CPU 时间，
+以及同一会话同时处理的消息数是否超过 concurrency_in_session。
+
+用法: python benchmarks/bench_chat_channel_consume.py
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dow"))
+
+from bridge.context import Context, ContextType  # noqa: E402
+from channel import chat_channel  # noqa: E402
+from channel.chat_channel import ChatChannel  # noqa: E402
+from common.log import logger  # noqa: E402
+from config import conf  # noqa: E402
+
+SESSIONS = 1000
+MESSAGES_PER_SESSION = 5
+HANDLE_TIME = 0.001
+CONCURRENCY = 2
+BATCH = 10
+BATCH_INTERVAL = 0.005
+
+
+class BenchChannel(ChatChannel):
+    def __init__(self):
+        # 每个基准使用独立的会话表，避免两种实现共用 ChatChannel 的类属性
+        self.sessions = {}
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.ready_sessions = {}
+        self.stats_lock = threading.Lock()
+        self.latencies = []
+        self.running = {}
+        self.max_running = 0
+        self.done = threading.Semaphore(0)
+        self.thread = threading.Thread(target=self.consume, daemon=True)
+        self.thread.start()
+
+    def _handle(self, context):
+        started = time.perf_counter()
+        session_id = context["session_id"]
+        with self.stats_lock:
+            self.latencies.append(started - context["produced_at"])
+            self.running[session_id] = self.running.get(session_id, 0) + 1
+            self.max_running = max(self.max_running, self.running[session_id])
+        time.sleep(HANDLE_TIME)
+        with self.stats_lock:
+            self.running[session_id] -= 1
+
+    def _success_callback(self, session_id, **kwargs):
+        self.done.release()
+
+    def _fail_callback(self, session_id, **kwargs):
+        self.done.release()
+
+    def consumer_cpu(self):
+        return time.clock_gettime(time.pthread_getcpuclockid(self.thread.ident))
+
+
+class LegacyChannel(BenchChannel):
+    """旧实现，consume 与原 ChatChannel.consume 相同"""
+
+    def consume(self):
+        while True:
+            with self.lock:
+                session_ids = list(self.sessions.keys())
+            for session_id in session_ids:
+                with self.lock:
+                    context_queue, semaphore = self.sessions[session_id]
+                if semaphore.acquire(blocking=False):
+                    if not context_queue.empty():
+                        context = context_queue.get()
+                        future: Future = chat_channel.handler_pool.submit(self._handle, context)
+                        future.add_done_callback(self._thread_pool_callback(session_id, context=context))
+                        with self.lock:
+                            if session_id not in self.futures:
+                                self.futures[session_id] = []
+                            self.futures[session_id].append(future)
+                    elif semaphore._initial_value == semaphore._value + 1:
+                        with self.lock:
+                            self.futures[session_id] = [t for t in self.futures[session_id] if not t.done()]
+                            assert len(self.futures[session_id]) == 0, "thread pool error"
+                            del self.sessions[session_id]
+                    else:
+                        semaphore.release()
+            time.sleep(0.2)
+
+
+def run(channel_cls):
+    channel = channel_cls()
+    total = SESSIONS * MESSAGES_PER_SESSION
+    cpu_start = channel.consumer_cpu()
+    start = time.perf_counter()
+    for i in range(MESSAGES_PER_SESSION):
+        for s in range(SESSIONS):
+            seq = i * SESSIONS + s
+            if seq and seq % BATCH == 0:
+                time.sleep(max(0.0, start + seq // BATCH * BATCH_INTERVAL - time.perf_counter()))
+            context = Context(ContextType.TEXT, f"msg{i}", kwargs={"session_id": f"s{s}", "produced_at": time.perf_counter()})
+            channel.produce(context)
+    for _ in range(total):
+        channel.done.acquire()
+    elapsed = time.perf_counter() - start
+    # 再空闲 1 秒，统计没有消息时消费者线程的 CPU 占用
+    busy_cpu = channel.consumer_cpu() - cpu_start
+    time.sleep(1)
+    idle_cpu = channel.consumer_cpu() - cpu_start - busy_cpu
+    latencies = sorted(channel.latencies)
+    return {
+        "elapsed": elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "busy_cpu": busy_cpu,
+        "idle_cpu": idle_cpu,
+        "max_running": channel.max_running,
+        "left": len(channel.sessions),
+    }
+
+
+def main():
+    logger.disabled = True
+    conf()["concurrency_in_session"] = CONCURRENCY
+    print(f"会话 {SESSIONS} 个，每个会话 {MESSAGES_PER_SESSION} 条消息，处理耗时 {HANDLE_TIME * 1000:.0f} ms，"
+          f"每 {BATCH_INTERVAL * 1000:.0f} ms 放入 {BATCH} 条，"
+          f"concurrency_in_session={CONCURRENCY}")
+    for label, channel_cls in (("条件变量调度", BenchChannel), ("200ms 轮询", LegacyChannel)):
+        r = run(channel_cls)
+        print(f"{label:<10} 总耗时 {r['elapsed']:5.2f} s  延迟 p50 {r['p50'] * 1000:7.1f} ms  p99 {r['p99'] * 1000:7.1f} ms  "
+              f"消费者CPU {r['busy_cpu']:5.3f} s  空闲1秒CPU {r['idle_cpu'] * 1000:6.2f} ms  "
+              f"会话最大并发 {r['max_running']}  剩余会话 {r['left']}")
+
+
+if __name__ == "__main__":
+    main()
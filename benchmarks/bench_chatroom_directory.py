@@ -0,0 +1,117 @@
+"""群聊目录基准
+
+200 个群、每群 300 个成员，模拟 200 条群消息查询群名和发送者群昵称，对比旧的方式
+（每次 json.load 整个 wx849_rooms.json 再遍历成员列表）与 ChatroomDirectory（内存索引）的每条消息耗时，
+以及更新一个群的成员时旧方式重写整个 JSON 文件与 SQLite 只写一行的耗时。
+
+用法: python benchmarks/bench_chatroom_directory.py
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dow"))
+
+from channel.wx849.chatroom_directory import ChatroomDirectory, member_display_name  # noqa: E402
+from common.log import logger  # noqa: E402
+
+GROUPS = 200
+MEMBERS = 300
+MESSAGES = 200
+UPDATES = 20
+
+
+def make_rooms():
+    rooms = {}
+    for g in range(GROUPS):
+        group_id = f"{10000 + g}@chatroom"
+        rooms[group_id] = {
+            "chatroomId": group_id,
+            "nickName": f"群{g}",
+            "chatRoomOwner": f"wxid_{g}_0",
+            "members": [
+                {"UserName": f"wxid_{g}_{m}", "NickName": f"昵称{m}", "DisplayName": f"群昵称{m}" if m % 2 else "",
+                 "BigHeadImgUrl": "http://wx.qlogo.cn/mmhead/" + "x" * 80}
+                for m in range(MEMBERS)
+            ],
+            "memberCount": MEMBERS,
+            "last_update": int(time.time()),
+        }
+    return rooms
+
+
+def legacy_lookup(path, group_id, wxid):
+    with open(path, "r", encoding="utf-8") as f:
+        rooms = json.load(f)
+    group_name = rooms[group_id].get("nickName")
+    for member in rooms[group_id]["members"]:
+        if member.get("UserName") == wxid:
+            return group_name, member.get("DisplayName") or member.get("NickName")
+    return group_name, wxid
+
+
+def legacy_update(path, group_id, members):
+    with open(path, "r", encoding="utf-8") as f:
+        rooms = json.load(f)
+    rooms[group_id]["members"] = members
+    rooms[group_id]["last_update"] = int(time.time())
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rooms, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    logger.disabled = True
+    random.seed(0)
+    rooms = make_rooms()
+    messages = []
+    for _ in range(MESSAGES):
+        g = random.randrange(GROUPS)
+        messages.append((f"{10000 + g}@chatroom", f"wxid_{g}_{random.randrange(MEMBERS)}"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_json = os.path.join(tmp, "wx849_rooms.json")
+        with open(legacy_json, "w", encoding="utf-8") as f:
+            json.dump(rooms, f, ensure_ascii=False, indent=2)
+        print(f"群 {GROUPS} 个，每群 {MEMBERS} 人，wx849_rooms.json {os.path.getsize(legacy_json) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        for group_id, wxid in messages:
+            legacy_lookup(legacy_json, group_id, wxid)
+        legacy_time = (time.perf_counter() - start) / MESSAGES
+
+        start = time.perf_counter()
+        directory = ChatroomDirectory(db_path=os.path.join(tmp, "wx849_rooms.db"), legacy_json=legacy_json)
+        directory.group_ids()
+        load_time = time.perf_counter() - start
+
+        for group_id, wxid in messages[:50]:
+            expected = legacy_lookup(legacy_json, group_id, wxid)
+            assert (directory.name(group_id), member_display_name(directory.member(group_id, wxid))) == expected
+
+        start = time.perf_counter()
+        for group_id, wxid in messages:
+            directory.name(group_id)
+            member_display_name(directory.member(group_id, wxid))
+        directory_time = (time.perf_counter() - start) / MESSAGES
+
+        print(f"{'每条消息查询':<10} json.load {legacy_time * 1e3:8.2f} ms   ChatroomDirectory {directory_time * 1e6:6.2f} µs"
+              f"   （首次加载/导入 {load_time * 1e3:.0f} ms）")
+
+        updated = [dict(member, DisplayName="新群昵称") for member in rooms[f"{10000}@chatroom"]["members"]]
+        start = time.perf_counter()
+        for _ in range(UPDATES):
+            legacy_update(legacy_json, f"{10000}@chatroom", updated)
+        legacy_update_time = (time.perf_counter() - start) / UPDATES
+
+        start = time.perf_counter()
+        for _ in range(UPDATES):
+            directory.update(f"{10000}@chatroom", members=updated)
+        directory_update_time = (time.perf_counter() - start) / UPDATES
+        print(f"{'更新一个群':<10} 重写JSON  {legacy_update_time * 1e3:8.2f} ms   SQLite 写一行      {directory_update_time * 1e3:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""消息去重基准
+
+1. WX849Channel 旧的去重集合：超过 1000 条后用 set(list(s)[-500:]) 截断，集合无序，保留下来的是任意一半，
+   模拟每条消息在 300 条以内重复投递一次，统计漏掉的重复消息数；与 DedupeWindow(1000) 对比。
+2. Dify 旧的 is_message_processed：每次检查都遍历全部记录清理过期项，窗口内有 5000 条记录时
+   对比每次检查 + 标记的耗时。
+
+用法: python benchmarks/bench_dedupe_window.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dedupe_window import DedupeWindow  # noqa: E402
+
+MESSAGES = 20000
+REPLAY_DISTANCE = 300
+DIFY_WINDOW = 5000
+DIFY_CHECKS = 20000
+
+
+class LegacyTrimmedSet:
+    def __init__(self):
+        self.ids = set()
+
+    def check_and_add(self, msg_id):
+        if msg_id in self.ids:
+            return True
+        self.ids.add(msg_id)
+        if len(self.ids) > 1000:
+            self.ids = set(list(self.ids)[-500:])
+        return False
+
+
+class LegacyDify:
+    def __init__(self, expiry):
+        self.processed_messages = {}
+        self.message_expiry = expiry
+
+    def check_and_add(self, msg_id):
+        current_time = time.time()
+        expired_keys = []
+        for key, timestamp in self.processed_messages.items():
+            if current_time - timestamp > self.message_expiry:
+                expired_keys.append(key)
+        for key in expired_keys:
+            del self.processed_messages[key]
+        if msg_id in self.processed_messages:
+            return True
+        self.processed_messages[msg_id] = time.time()
+        return False
+
+
+def missed_duplicates(window):
+    random.seed(0)
+    stream = []
+    for i in range(MESSAGES):
+        msg_id = str(7_000_000_000 + i * 7919)
+        stream.append(msg_id)
+        # 每条消息在之后 REPLAY_DISTANCE 条以内再投递一次
+        stream.insert(len(stream) - random.randint(0, min(REPLAY_DISTANCE, len(stream) - 1)), msg_id)
+    seen_count = 0
+    for msg_id in stream:
+        if window.check_and_add(msg_id):
+            seen_count += 1
+    return MESSAGES - seen_count
+
+
+def per_check(window):
+    for i in range(DIFY_WINDOW):
+        window.check_and_add(f"warm{i}")
+    start = time.perf_counter()
+    for i in range(DIFY_CHECKS):
+        window.check_and_add(f"msg{i}")
+    return (time.perf_counter() - start) / DIFY_CHECKS
+
+
+def main():
+    print(f"{MESSAGES} 条消息，每条在 {REPLAY_DISTANCE} 条以内重复投递一次")
+    for label, window in (("set 截断一半", LegacyTrimmedSet()), ("DedupeWindow", DedupeWindow(1000))):
+        print(f"{label:<14} 漏掉的重复消息 {missed_duplicates(window):6d} 条")
+
+    print(f"窗口内 {DIFY_WINDOW} 条记录，检查 + 标记 {DIFY_CHECKS} 次")
+    for label, window in (("Dify 遍历清理", LegacyDify(60)), ("DedupeWindow", DedupeWindow(100000, ttl=60))):
+        print(f"{label:<14} 每次 {per_check(window) * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""EventManager.emit 微基准
+
+向 50 个 text_message 处理函数分发一条较大的引用消息，对比
+旧实现（每个处理函数 deepcopy 一次）与写时复制视图的耗时和内存分配。
+
+用法: python benchmarks/bench_event_emit.py
+"""
+import asyncio
+import copy
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.decorators import on_text_message  # noqa: E402
+from utils.event_manager import EventManager  # noqa: E402
+
+HANDLER_COUNT = 50
+ROUNDS = 200
+
+
+def build_message() -> dict:
+    quote_xml = "<msg><appmsg><title>引用</title><refermsg>" + "<content>" + "测试内容" * 2000 + "</content></refermsg></appmsg></msg>"
+    return {
+        "MsgId": 1234567890,
+        "FromWxid": "12345678@chatroom",
+        "SenderWxid": "wxid_sender",
+        "ToWxid": "wxid_bot",
+        "MsgType": 49,
+        "Content": quote_xml,
+        "MsgSource": "<msgsource><atuserlist>wxid_a,wxid_b</atuserlist></msgsource>",
+        "IsGroup": True,
+        "Ats": ["wxid_a", "wxid_b"],
+        "Quote": {
+            "MsgType": 1,
+            "Nickname": "某人",
+            "Content": "被引用的内容" * 200,
+            "Elements": [{"tag": f"node{i}", "attrib": {"index": str(i)}, "text": "x" * 64} for i in range(200)],
+        },
+    }
+
+
+# 处理函数收到的消息在一轮事件内保持存活，模拟插件把消息交给后台任务的情况，
+# 这样 tracemalloc 的峰值就等于单次事件内的总分配量
+RETAINED = []
+
+
+class ReadOnlyPlugin:
+    """只读取消息的插件，绝大多数插件属于此类"""
+
+    @on_text_message
+    async def handle_text(self, bot, message):
+        _ = message["Content"], message.get("FromWxid"), message.get("SenderWxid")
+        RETAINED.append(message)
+        return True
+
+
+async def legacy_emit(handlers, api_client, message):
+    """旧实现：每个处理函数都 deepcopy 一次消息"""
+    for handler in handlers:
+        await handler(api_client, copy.deepcopy(message))
+
+
+def measure(label, coro_factory):
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            loop.run_until_complete(coro_factory())
+            RETAINED.clear()
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        loop.run_until_complete(coro_factory())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        RETAINED.clear()
+    finally:
+        loop.close()
+    print(f"{label:<14} 每次事件 {elapsed / ROUNDS * 1000:8.3f} ms  单次事件分配 {peak / 1024:10.1f} KiB")
+
+
+def main():
+    message = build_message()
+    plugins = [ReadOnlyPlugin() for _ in range(HANDLER_COUNT)]
+    for plugin in plugins:
+        EventManager.bind_instance(plugin)
+    handlers = [handler for handler, _, _ in EventManager.get_handlers("text_message")]
+
+    print(f"处理函数数量: {len(handlers)}，轮数: {ROUNDS}")
+    measure("deepcopy", lambda: legacy_emit(handlers, None, message))
+    measure("copy-on-write", lambda: EventManager.emit("text_message", None, message))
+
+    for plugin in plugins:
+        EventManager.unbind_instance(plugin)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""ExpiredDict 基准
+
+模拟 10 万个会话：写入、随机读取、成员判断和遍历 keys()，
+对比旧实现（datetime.now() + 每次读取重写条目 + 逐键判断的 keys()）
+与按最近读写排序的新实现的耗时。
+
+用法: python benchmarks/bench_expired_dict.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dow"))
+
+from common.expired_dict import ExpiredDict  # noqa: E402
+
+SESSIONS = 100000
+READS = 300000
+KEYS_CALLS = 20
+
+
+class LegacyExpiredDict(dict):
+    """旧实现"""
+
+    def __init__(self, expires_in_seconds):
+        super().__init__()
+        self.expires_in_seconds = expires_in_seconds if expires_in_seconds else 3600
+
+    def __getitem__(self, key):
+        value, expiry_time = super().__getitem__(key)
+        if datetime.now() > expiry_time:
+            del self[key]
+            raise KeyError("expired {}".format(key))
+        self.__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        expiry_time = datetime.now() + timedelta(seconds=self.expires_in_seconds)
+        super().__setitem__(key, (value, expiry_time))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def keys(self):
+        keys = list(super().keys())
+        return [key for key in keys if key in self]
+
+
+def run(cls):
+    sessions = cls(3600)
+    ids = [f"session_{i}" for i in range(SESSIONS)]
+    reads = [random.choice(ids) for _ in range(READS)]
+    result = {}
+
+    start = time.perf_counter()
+    for session_id in ids:
+        sessions[session_id] = {"messages": []}
+    result["写入"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for session_id in reads:
+        if session_id in sessions:
+            sessions[session_id]
+    result["读取"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(KEYS_CALLS):
+        sessions.keys()
+    result["keys()"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    print(f"会话数: {SESSIONS}，读取次数: {READS}（每次先 in 再取值），keys() 调用: {KEYS_CALLS} 次")
+    for label, cls in (("旧实现", LegacyExpiredDict), ("新实现", ExpiredDict)):
+        result = run(cls)
+        print(f"{label}  " + "  ".join(f"{name} {seconds * 1000:8.1f} ms" for name, seconds in result.items()))
+
+
+if __name__ == "__main__":
+    main()
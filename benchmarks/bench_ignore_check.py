@@ -0,0 +1,103 @@
+"""消息来源过滤基准
+
+白名单模式，白名单中有 2000 个 wxid，模拟 200 个群/私聊来源的 20 万条消息，
+对比旧的 XYBot.ignore_check（每次重建系统账号列表、多次 lower()、列表线性查找）
+与 AccountFilter（集合 + 预编译正则 + 结果 LRU）的每次调用耗时。
+
+用法: python benchmarks/bench_ignore_check.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger  # noqa: E402
+
+from utils.account_filter import AccountFilter  # noqa: E402
+
+WHITELIST_SIZE = 2000
+SOURCES = 200
+MESSAGES = 200_000
+
+
+class LegacyFilter:
+    """旧实现，逻辑与原 XYBot.ignore_check 相同"""
+
+    def __init__(self, ignore_mode, whitelist, blacklist):
+        self.ignore_mode = ignore_mode
+        self.whitelist = whitelist
+        self.blacklist = blacklist
+
+    def ignore_check(self, FromWxid: str, SenderWxid: str):
+        if SenderWxid and isinstance(SenderWxid, str) and SenderWxid.startswith('gh_'):
+            logger.debug(f"忽略公众号消息: {SenderWxid}")
+            return False
+        if FromWxid and isinstance(FromWxid, str) and FromWxid.startswith('gh_'):
+            logger.debug(f"忽略公众号消息: {FromWxid}")
+            return False
+        system_accounts = [
+            'weixin', 'filehelper', 'fmessage', 'medianote', 'floatbottle', 'qmessage', 'qqmail', 'tmessage',
+            'weibo', 'newsapp', 'notification_messages', 'helper_entry', 'mphelper', 'brandsessionholder',
+            'weixinreminder', 'officialaccounts',
+        ]
+        for account in system_accounts:
+            if (SenderWxid and isinstance(SenderWxid, str) and SenderWxid == account) or \
+               (FromWxid and isinstance(FromWxid, str) and FromWxid == account):
+                logger.debug(f"忽略系统账号消息: {SenderWxid or FromWxid}")
+                return False
+        if (SenderWxid and isinstance(SenderWxid, str) and 'wxpay' in SenderWxid) or \
+           (FromWxid and isinstance(FromWxid, str) and 'wxpay' in FromWxid):
+            return False
+        if (SenderWxid and isinstance(SenderWxid, str) and ('tencent' in SenderWxid.lower() or 'game' in SenderWxid.lower())) or \
+           (FromWxid and isinstance(FromWxid, str) and ('tencent' in FromWxid.lower() or 'game' in FromWxid.lower())):
+            return False
+        if (SenderWxid and isinstance(SenderWxid, str) and ('service' in SenderWxid.lower() or 'official' in SenderWxid.lower())) or \
+           (FromWxid and isinstance(FromWxid, str) and ('service' in FromWxid.lower() or 'official' in FromWxid.lower())):
+            return False
+        is_group = FromWxid and isinstance(FromWxid, str) and FromWxid.endswith("@chatroom")
+        if self.ignore_mode == "Whitelist":
+            if is_group:
+                logger.debug(f"白名单检查: 群聊ID={FromWxid}, 发送者ID={SenderWxid}, "
+                             f"群聊ID在白名单中={FromWxid in self.whitelist}, 发送者ID在白名单中={SenderWxid in self.whitelist}")
+                return SenderWxid in self.whitelist or FromWxid in self.whitelist
+            return SenderWxid in self.whitelist
+        elif self.ignore_mode == "Blacklist":
+            if is_group:
+                return (FromWxid not in self.blacklist) and (SenderWxid not in self.blacklist)
+            return SenderWxid not in self.blacklist
+        return True
+
+
+def main():
+    logger.remove()
+    random.seed(0)
+    whitelist = [f"wxid_white{i}" for i in range(WHITELIST_SIZE)]
+    sources = []
+    for i in range(SOURCES):
+        if i % 2:
+            sources.append((f"{1000 + i}@chatroom", f"wxid_member{i}"))
+        else:
+            sources.append((f"wxid_user{i}", f"wxid_user{i}"))
+    # 一部分来源在白名单末尾，最坏情况下列表查找要遍历整个列表
+    for i in range(0, SOURCES, 10):
+        whitelist.append(sources[i][0])
+    messages = [random.choice(sources) for _ in range(MESSAGES)]
+
+    legacy = LegacyFilter("Whitelist", whitelist, [])
+    compiled = AccountFilter("Whitelist", whitelist, [])
+    for pair in sources:
+        assert legacy.ignore_check(*pair) == compiled.check(*pair)
+
+    print(f"白名单 {len(whitelist)} 个，来源 {SOURCES} 个，消息 {MESSAGES} 条")
+    for label, check in (("旧 ignore_check", legacy.ignore_check), ("AccountFilter", compiled.check)):
+        start = time.perf_counter()
+        for from_wxid, sender_wxid in messages:
+            check(from_wxid, sender_wxid)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} 总耗时 {elapsed:6.3f} s  每次 {elapsed / MESSAGES * 1e6:7.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
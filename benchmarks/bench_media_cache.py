@@ -0,0 +1,61 @@
+"""媒体缓存基准
+
+模拟同一张图片在几个群里被多次引用：每轮有若干个处理同时请求下载同一张图片，
+下载接口耗时 200 毫秒，对比不带缓存时的下载次数和耗时与经过 MediaCache
+（磁盘缓存 + 同一键只下载一次）时的情况。缓存目录使用临时目录。
+
+用法: python benchmarks/bench_media_cache.py
+"""
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from WechatAPI.media_cache import MediaCache  # noqa: E402
+
+IMAGE_SIZE = 300 * 1024
+DOWNLOAD_LATENCY = 0.2
+ROUNDS = 3  # 同一张图片被引用的次数
+CONCURRENT = 4  # 每次引用同时请求下载的处理数
+
+
+async def run(cache) -> tuple:
+    image = base64.b64encode(os.urandom(IMAGE_SIZE)).decode()
+    downloads = 0
+
+    async def download():
+        nonlocal downloads
+        downloads += 1
+        await asyncio.sleep(DOWNLOAD_LATENCY)
+        return image
+
+    async def get():
+        if cache is None:
+            return await download()
+        return await cache.fetch_base64(cache.key("cdnimg", "url"), download, cache.key("aeskey", "key"))
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        results = await asyncio.gather(*(get() for _ in range(CONCURRENT)))
+        assert all(result == image for result in results)
+    return time.perf_counter() - start, downloads
+
+
+async def main():
+    from loguru import logger
+    logger.remove()
+
+    print(f"图片 {IMAGE_SIZE // 1024} KB，被引用 {ROUNDS} 次，每次 {CONCURRENT} 个处理同时下载，"
+          f"下载耗时 {DOWNLOAD_LATENCY * 1000:.0f} ms")
+    with tempfile.TemporaryDirectory() as root:
+        for label, cache in (("无缓存", None), ("MediaCache", MediaCache(root))):
+            elapsed, downloads = await run(cache)
+            print(f"{label:<10} 耗时 {elapsed:6.2f} s  实际下载 {downloads} 次")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
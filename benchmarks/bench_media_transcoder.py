@@ -0,0 +1,119 @@
+"""媒体转码基准
+
+在一个事件循环里同时处理 JOBS 条语音转换（wav -> mp3），每 10 ms 记录一次心跳，对比：
+1. 旧的方式：在协程里直接调用 subprocess.run，转换期间整个事件循环被阻塞；
+2. MediaTranscoder：asyncio.create_subprocess_exec 进程池，输入输出经管道传递。
+统计全部完成的耗时和心跳的最大间隔（即其他消息最长要等多久），
+以及同样内容再转换一次时命中缓存的耗时。
+没有安装 ffmpeg 时用一个睡眠 FAKE_SECONDS 秒、原样输出输入的脚本代替 ffmpeg。
+
+用法: python benchmarks/bench_media_transcoder.py
+"""
+import asyncio
+import io
+import math
+import os
+import shutil
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.media_transcoder import MediaTranscoder  # noqa: E402
+
+JOBS = 8
+FAKE_SECONDS = 0.3
+
+FAKE_FFMPEG = f"""#!{sys.executable}
+import sys, time
+args = sys.argv[1:]
+source = args[args.index("-i") + 1]
+data = sys.stdin.buffer.read() if source == "pipe:0" else open(source, "rb").read()
+time.sleep({FAKE_SECONDS})
+if args[-1] == "pipe:1":
+    sys.stdout.buffer.write(data)
+else:
+    open(args[-1], "wb").write(data)
+"""
+
+
+def make_wav(seconds, frequency):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / 16000))) for i in range(16000 * seconds)
+        ))
+    return buffer.getvalue()
+
+
+async def heartbeat(stop, gaps):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def measure(convert, inputs):
+    stop = asyncio.Event()
+    gaps = []
+    beat = asyncio.create_task(heartbeat(stop, gaps))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(convert(data) for data in inputs))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, max(gaps)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            ffmpeg = os.path.join(tmp, "ffmpeg")
+            with open(ffmpeg, "w") as f:
+                f.write(FAKE_FFMPEG)
+            os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IEXEC)
+            os.environ["PATH"] = tmp + os.pathsep + os.environ.get("PATH", "")
+            print(f"未找到 ffmpeg，使用每次睡眠 {FAKE_SECONDS} 秒的模拟脚本")
+
+        inputs = [make_wav(5, 220 + 40 * i) for i in range(JOBS)]
+        paths = []
+        for i, data in enumerate(inputs):
+            path = os.path.join(tmp, f"voice_{i}.wav")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+
+        async def legacy(path):
+            output = path + ".mp3"
+            subprocess.run([ffmpeg, "-y", "-i", path, "-acodec", "libmp3lame", "-ar", "44100", "-ab", "192k",
+                            "-ac", "2", output], capture_output=True)
+            with open(output, "rb") as f:
+                return f.read()
+
+        transcoder = MediaTranscoder()
+
+        print(f"{JOBS} 条语音同时转换，CPU {os.cpu_count()} 核")
+        elapsed, stall = asyncio.run(measure(legacy, paths))
+        print(f"{'subprocess.run':<16} 总耗时 {elapsed:6.2f} s   事件循环最长停顿 {stall * 1e3:8.1f} ms")
+        elapsed, stall = asyncio.run(measure(transcoder.to_mp3, inputs))
+        print(f"{'MediaTranscoder':<16} 总耗时 {elapsed:6.2f} s   事件循环最长停顿 {stall * 1e3:8.1f} ms")
+
+        start = time.perf_counter()
+        asyncio.run(transcoder.to_mp3(inputs[0]))
+        print(f"{'再次转换相同内容':<16} {(time.perf_counter() - start) * 1e3:.2f} ms（命中缓存）   {transcoder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
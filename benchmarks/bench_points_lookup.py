@@ -0,0 +1,90 @@
+"""群积分排行榜查询基准
+
+在临时目录中建立一个 10000 个用户的 xybot.db，模拟 500 人的群：
+对比逐个 get_points 后在 Python 中排序（旧实现）与 get_points_many、
+get_leaderboard_in 单次 IN 查询的耗时。
+
+用法: python benchmarks/bench_points_lookup.py
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 10000
+GROUP_SIZE = 500
+TOP = 30
+ROUNDS = 5
+
+
+def prepare_workdir() -> str:
+    """AsyncXYBotDB 从当前目录读取 main_config.toml，在临时目录中准备配置和数据"""
+    workdir = tempfile.mkdtemp(prefix="bench_points_")
+    os.makedirs(os.path.join(workdir, "database"))
+    with open(os.path.join(workdir, "main_config.toml"), "w", encoding="utf-8") as f:
+        f.write('[XYBot]\nXYBotDB-url = "sqlite:///database/xybot.db"\n')
+    os.chdir(workdir)
+    return workdir
+
+
+async def main():
+    from loguru import logger
+    logger.remove()
+
+    workdir = prepare_workdir()
+    from database.XYBotDB import AsyncXYBotDB  # noqa: E402
+    db = AsyncXYBotDB()
+
+    # 直接批量写入测试数据
+    conn = sqlite3.connect(os.path.join(workdir, "database", "xybot.db"))
+    conn.executemany(
+        "INSERT INTO user (wxid, points, signin_stat, signin_streak, whitelist, llm_thread_id) "
+        "VALUES (?, ?, '1970-01-01 00:00:00', 0, 0, '{}')",
+        [(f"wxid_{i:05d}", random.choice([0, random.randint(1, 5000)])) for i in range(USERS)],
+    )
+    conn.commit()
+    conn.close()
+
+    members = random.sample([f"wxid_{i:05d}" for i in range(USERS)], GROUP_SIZE)
+    print(f"用户数: {USERS}，群成员: {GROUP_SIZE}，取前 {TOP} 名，轮数: {ROUNDS}")
+
+    async def legacy():
+        data = []
+        for wxid in members:
+            points = await db.get_points(wxid)
+            if points:
+                data.append((wxid, points))
+        data.sort(key=lambda x: x[1], reverse=True)
+        return data[:TOP]
+
+    async def bulk_points():
+        points = await db.get_points_many(members)
+        data = sorted(((w, p) for w, p in points.items() if p), key=lambda x: x[1], reverse=True)
+        return data[:TOP]
+
+    async def leaderboard_in():
+        return await db.get_leaderboard_in(members, TOP, skip_zero=True)
+
+    expected = None
+    for label, func in (("逐个 get_points", legacy), ("get_points_many", bulk_points),
+                        ("get_leaderboard_in", leaderboard_in)):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            result = await func()
+        elapsed = (time.perf_counter() - start) / ROUNDS
+        scores = [p for _, p in result]
+        expected = expected or scores
+        assert scores == expected, f"{label} 结果不一致"
+        print(f"{label:<20} 每次 {elapsed * 1000:9.2f} ms")
+
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
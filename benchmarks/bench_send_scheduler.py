@@ -0,0 +1,87 @@
+"""消息发送调度基准
+
+模拟 10 个群各自收到一条回复（其中一个群连续收到 5 条文字），发送接口耗时 50 毫秒，
+对比旧实现（全局单队列 + 每条消息后固定等待1秒）与按接收人分队列的 SendScheduler
+从提交到全部发送完成的耗时，以及每个群收到回复的平均等待时间。
+SendScheduler 使用默认的防风控节奏（全局每秒1条、不允许突发），另测开启文字合并时的效果。
+
+用法: python benchmarks/bench_send_scheduler.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from WechatAPI.send_scheduler import SendScheduler  # noqa: E402
+
+GROUPS = 10
+BURST_TEXTS = 5
+SEND_LATENCY = 0.05
+
+
+class LegacyQueue:
+    """旧实现：所有消息进入同一个队列，每条发送后等待1秒"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.processing = False
+
+    async def _process(self):
+        if self.processing:
+            return
+        self.processing = True
+        while not self.queue.empty():
+            func, args, future = await self.queue.get()
+            try:
+                future.set_result(await func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.queue.task_done()
+                await asyncio.sleep(1)
+        self.processing = False
+
+    async def submit(self, func, *args):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((func, args, future))
+        if not self.processing:
+            asyncio.create_task(self._process())
+        return await future
+
+
+async def run(queue) -> tuple:
+    sent = []
+
+    async def _send_text_message(wxid, content, at=None):
+        await asyncio.sleep(SEND_LATENCY)
+        sent.append((wxid, content))
+        return len(sent)
+
+    start = time.perf_counter()
+    waits = []
+
+    async def reply(wxid, content):
+        await queue.submit(_send_text_message, wxid, content, "")
+        waits.append(time.perf_counter() - start)
+
+    tasks = [reply(f"group_{i}@chatroom", "回复") for i in range(GROUPS)]
+    tasks += [reply("group_0@chatroom", f"第{i}段") for i in range(BURST_TEXTS)]
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start, sum(waits) / len(waits), len(sent)
+
+
+async def main():
+    from loguru import logger
+    logger.remove()
+
+    print(f"群数: {GROUPS}，其中一个群额外连续 {BURST_TEXTS} 条文字，发送耗时 {SEND_LATENCY * 1000:.0f} ms")
+    for label, factory in (("全局队列+1秒间隔", LegacyQueue), ("按接收人调度", SendScheduler),
+                           ("按接收人调度+合并文字", lambda: SendScheduler(coalesce_text=True))):
+        total, avg_wait, requests = await run(factory())
+        print(f"{label:<10} 全部完成 {total:6.2f} s  平均等待 {avg_wait:6.2f} s  实际请求 {requests} 次")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""消息分发基准
+
+模拟 50 个会话共 2000 条消息，处理函数耗时 0~1 毫秒（阻塞、随机），对比 WX849Channel 旧的分发方式
+（每条消息一个线程 + 新事件循环，内部再开一个线程 + 新事件循环并 join）与 SessionExecutor
+（8 个常驻线程，同一会话按顺序）从提交到全部处理完的耗时、线程创建数，以及同一会话内是否保持顺序。
+
+用法: python benchmarks/bench_session_executor.py
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dow"))
+
+from common.session_executor import SessionExecutor  # noqa: E402
+
+SESSIONS = 50
+MESSAGES = 2000
+HANDLE_TIME = 0.001
+
+
+def make_handler(results):
+    lock = threading.Lock()
+
+    def handle(session_id, seq):
+        time.sleep(random.random() * HANDLE_TIME)
+        with lock:
+            results.setdefault(session_id, []).append(seq)
+
+    return handle
+
+
+def legacy(messages):
+    results = {}
+    handle = make_handler(results)
+    threads = []
+
+    def process(session_id, seq):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            def inner():
+                msg_loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(msg_loop)
+                try:
+                    handle(session_id, seq)
+                finally:
+                    msg_loop.close()
+
+            thread = threading.Thread(target=inner, daemon=True)
+            thread.start()
+            thread.join()
+        finally:
+            loop.close()
+
+    for session_id, seq in messages:
+        thread = threading.Thread(target=process, args=(session_id, seq), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results, len(messages) * 2
+
+
+def pooled(messages):
+    results = {}
+    handle = make_handler(results)
+    executor = SessionExecutor(max_workers=8, name="bench")
+    futures = [executor.submit(session_id, handle, session_id, seq) for session_id, seq in messages]
+    for future in futures:
+        future.result()
+    stats = executor.stats()
+    executor.shutdown()
+    return results, stats["workers"]
+
+
+def main():
+    messages = [(f"session_{i % SESSIONS}", i) for i in range(MESSAGES)]
+    print(f"会话 {SESSIONS} 个，消息 {MESSAGES} 条，处理耗时 0~{HANDLE_TIME * 1000:.0f} ms")
+    for label, run in (("线程+新事件循环", legacy), ("SessionExecutor", pooled)):
+        start = time.perf_counter()
+        results, threads = run(messages)
+        elapsed = time.perf_counter() - start
+        ordered = all(seqs == sorted(seqs) for seqs in results.values())
+        print(f"{label:<16} 耗时 {elapsed:6.2f} s  创建线程 {threads:5d} 个  会话内有序: {ordered}")
+
+
+if __name__ == "__main__":
+    main()
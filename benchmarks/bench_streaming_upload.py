@@ -0,0 +1,100 @@
+"""媒体上传内存基准
+
+生成一个 50 MB 的临时文件，在本机启动一个只统计请求体字节数的 HTTP 服务，
+分别用旧实现（读入整个文件、base64 编码成字符串、json= 序列化）和
+StreamingJsonPayload 流式上传，各在独立子进程中运行，对比耗时和峰值内存增量。
+
+用法: python benchmarks/bench_streaming_upload.py
+"""
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FILE_SIZE = 50 * 1024 * 1024
+PORT = 18917
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serve():
+    from aiohttp import web
+
+    async def handle(request: web.Request) -> web.Response:
+        total = 0
+        async for chunk in request.content.iter_chunked(1 << 20):
+            total += len(chunk)
+        return web.json_response({"Success": True, "Data": {"Received": total}})
+
+    app = web.Application(client_max_size=1 << 30)
+    app.router.add_post("/VXAPI/Tools/UploadFile", handle)
+    web.run_app(app, host="127.0.0.1", port=PORT, print=None)
+
+
+async def upload(mode: str, path: str) -> int:
+    import aiohttp
+
+    url = f"http://127.0.0.1:{PORT}/VXAPI/Tools/UploadFile"
+    async with aiohttp.ClientSession() as session:
+        if mode == "legacy":
+            with open(path, "rb") as f:
+                file_base64 = base64.b64encode(f.read()).decode()
+            response = await session.post(url, json={"Wxid": "wxid_bench", "Base64": file_base64})
+        else:
+            from WechatAPI.streaming_upload import Base64Source, StreamingJsonPayload
+            payload = StreamingJsonPayload({"Wxid": "wxid_bench", "Base64": Base64Source(Path(path))})
+            response = await session.post(url, data=payload)
+        json_resp = await response.json()
+        return json_resp["Data"]["Received"]
+
+
+def child(mode: str, path: str):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    received = asyncio.run(upload(mode, path))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"elapsed": elapsed, "peak": peak_rss_mb() - baseline, "received": received}))
+
+
+def main():
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        f.write(os.urandom(FILE_SIZE))
+        path = f.name
+
+    server = multiprocessing.Process(target=serve, daemon=True)
+    server.start()
+    time.sleep(1)
+    try:
+        print(f"文件大小: {FILE_SIZE / 1024 / 1024:.0f} MB，base64 后 {(FILE_SIZE + 2) // 3 * 4 / 1024 / 1024:.0f} MB")
+        for label, mode in (("整体编码+json=", "legacy"), ("流式上传", "stream")):
+            output = subprocess.run([sys.executable, __file__, mode, path], capture_output=True, text=True,
+                                    env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))})
+            if output.returncode != 0:
+                print(output.stderr)
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{label:<12} 耗时 {result['elapsed']:6.2f} s  峰值内存增量 {result['peak']:8.1f} MB  "
+                  f"服务端收到 {result['received'] / 1024 / 1024:.1f} MB")
+    finally:
+        server.terminate()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        child(sys.argv[1], sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,99 @@
+"""WechatAPIClient 发送吞吐基准
+
+在本机启动一个模拟 VXAPI 的 HTTP 服务，分别用旧实现（每次请求新建
+aiohttp.ClientSession）和共享连接池会话调用 _send_text_message，
+对比串行和并发两种情况下每秒能发送的消息数。
+
+用法: python benchmarks/bench_wechatapi_session.py
+"""
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from WechatAPI.Client import WechatAPIClient  # noqa: E402
+
+MESSAGES = 1000
+CONCURRENCY = 16
+
+
+class LegacyClient(WechatAPIClient):
+    """旧实现：每次请求新建并关闭一个会话"""
+
+    @asynccontextmanager
+    async def _http(self):
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+
+async def handle_send_text(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({
+        "Success": True,
+        "Data": {"List": [{"ClientMsgid": 1, "Createtime": int(time.time()), "NewMsgId": 1}]},
+    })
+
+
+async def start_server():
+    app = web.Application()
+    app.router.add_post("/VXAPI/Msg/SendTxt", handle_send_text)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+def make_client(cls, port: int):
+    client = cls("127.0.0.1", port)
+    client.wxid = "wxid_bench"
+    client.ignore_protect = True
+    return client
+
+
+async def run_serial(client) -> float:
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        await client._send_text_message("wxid_target", f"消息 {i}", [])
+    return time.perf_counter() - start
+
+
+async def run_concurrent(client) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def send(i):
+        async with semaphore:
+            await client._send_text_message("wxid_target", f"消息 {i}", [])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(MESSAGES)))
+    return time.perf_counter() - start
+
+
+async def main():
+    # 压低日志输出，避免打印本身影响结果
+    from loguru import logger
+    logger.remove()
+
+    runner, port = await start_server()
+    try:
+        print(f"消息数: {MESSAGES}，并发: {CONCURRENCY}")
+        for label, cls in (("每次新建会话", LegacyClient), ("共享连接池", WechatAPIClient)):
+            client = make_client(cls, port)
+            serial = await run_serial(client)
+            concurrent = await run_concurrent(client)
+            await client.close_http_session()
+            print(f"{label:<8} 串行 {MESSAGES / serial:8.1f} 条/秒  并发 {MESSAGES / concurrent:8.1f} 条/秒")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -14,8 +14,13 @@ import WechatAPI
 from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from database.message_counter import get_instance as get_message_counter
 from utils.decorators import scheduler
+from utils.event_manager import EventManager
+from utils.message_dispatcher import MessageDispatcher
+from utils.poll_scheduler import AdaptivePollScheduler, set_instance as set_poll_scheduler
 from utils.plugin_manager import plugin_manager
+from utils.shutdown_hooks import register_shutdown_hook
 from utils.xybot import XYBot
 from utils.notification_service import init_notification_service, get_notification_service
 
@@ -209,6 +214,17 @@ async def bot_core():
 
     # 设置客户端属性
     bot.ignore_protect = config.get("XYBot", {}).get("ignore-protection", False)
+    # 发送调度：同一接收人的发送间隔和全局发送速率，防风控
+    send_config = config.get("SendScheduler", {})
+    bot.configure_send_scheduler(
+        recipient_interval=send_config.get("recipient-interval", 1.0),
+        global_rate=send_config.get("global-rate", 1.0),
+        global_burst=send_config.get("global-burst", 1),
+        max_concurrency=send_config.get("max-concurrency", 4),
+        coalesce_text=send_config.get("coalesce-text", False),
+    )
+    # 最先注册、最后执行：其他组件收尾时可能还要发送请求
+    register_shutdown_hook("WechatAPI HTTP", bot.close_http_session)
 
     # 等待WechatAPI服务启动
     # time_out = 30  # 增加超时时间
@@ -535,9 +551,15 @@ async def bot_core():
 
     message_db = MessageDB()
     await message_db.initialize()
+    register_shutdown_hook("MessageDB", message_db.close)
 
     keyval_db = KeyvalDB()
     await keyval_db.initialize()
+    register_shutdown_hook("KeyvalDB", keyval_db.close)
+    # 消息计数器在后台线程中写入，atexit 在 os.execv / os._exit 重启时不会执行
+    register_shutdown_hook("MessageCounter", lambda: asyncio.to_thread(get_message_counter().close))
+    # 后台执行的旁观者可能还要写数据库，在关闭数据库之前等待它们完成
+    register_shutdown_hook("EventManager observers", EventManager.wait_observers)
 
     # 通知服务已在前面初始化完成
 
@@ -604,6 +626,29 @@ async def bot_core():
     except Exception as e:
         logger.error(f"启动自动重启监控器失败: {e}")
 
+    # 启动消息分发器：同一会话内按顺序处理，不同会话并行处理，排队总量有上限
+    dispatcher_config = config.get("Dispatcher", {})
+    dispatcher = MessageDispatcher(
+        xybot.process_message,
+        workers=dispatcher_config.get("workers", 8),
+        queue_size=dispatcher_config.get("queue-size", 1000),
+        shed_policy=dispatcher_config.get("shed-policy", "block"),
+    )
+    dispatcher.start()
+    # 最后注册、最先执行：先处理完已接收的消息，再关闭它们用到的数据库和 HTTP 会话
+    register_shutdown_hook("MessageDispatcher", dispatcher.stop, timeout=15)
+
+    # 自适应同步间隔：有消息时立即再次同步，空闲或失败时指数退避
+    sync_config = config.get("MessageSync", {})
+    poll_scheduler = AdaptivePollScheduler(
+        idle_interval=sync_config.get("idle-interval", 0.5),
+        max_idle_interval=sync_config.get("max-idle-interval", 2.0),
+        failure_interval=sync_config.get("failure-interval", 5.0),
+        max_failure_interval=sync_config.get("max-failure-interval", 60.0),
+        jitter=sync_config.get("jitter", 0.2),
+    )
+    set_poll_scheduler(poll_scheduler)
+
     logger.success("开始处理消息")
 
     # 添加重连检测变量
@@ -616,6 +661,7 @@ async def bot_core():
 
         try:
             ok,data = await bot.sync_message()
+            polled_at = time.monotonic()
 
             # 如果成功获取消息，重置失败计数
             if ok:
@@ -647,9 +693,10 @@ async def bot_core():
                 is_offline = True
                 logger.warning(f"连续 {message_failure_count} 次获取消息失败，微信可能已离线")
 
-            # 等待一段时间后重试
-            await asyncio.sleep(5)
-            logger.info("5秒后继续尝试获取消息")
+            # 等待一段时间后重试，连续失败时逐步拉长等待时间
+            delay = poll_scheduler.on_failure()
+            logger.info(f"{delay:.1f}秒后继续尝试获取消息")
+            await asyncio.sleep(delay)
             continue
 
             # 以下代码已注释，不再自动重新登录
@@ -667,7 +714,11 @@ async def bot_core():
             messages = data.get("AddMsgs")
             if messages:
                 for message in messages:
-                    asyncio.create_task(xybot.process_message(message))
+                    await dispatcher.submit(message)
+                poll_scheduler.record_dispatch(polled_at, messages)
+                delay = poll_scheduler.on_messages(len(messages))
+            else:
+                delay = poll_scheduler.on_idle(more=bool(data.get("ContinueFlag")))
         elif data:  # 如果data不是字典但有值，记录日志
             logger.warning(f"Unexpected data type: {type(data)}, value: {data}")
 
@@ -692,8 +743,13 @@ async def bot_core():
 
                     # 更新状态为离线
                     update_bot_status("offline", "微信已离线")
-        # 使用异步睡眠替代忙等待循环
-        await asyncio.sleep(0.5)
+            delay = poll_scheduler.on_idle() if ok else poll_scheduler.on_failure()
+        else:
+            delay = poll_scheduler.on_idle() if ok else poll_scheduler.on_failure()
+
+        # 有新消息时立即同步，否则按调度器给出的间隔等待
+        if delay > 0:
+            await asyncio.sleep(delay)
 
     # 返回机器人实例（此处不会执行到，因为上面的无限循环）
     return xybot
\ No newline at end of file
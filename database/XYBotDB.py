@@ -1,14 +1,17 @@
+import asyncio
 import datetime
+import functools
+import threading
 import tomllib
-from concurrent.futures import ThreadPoolExecutor
-from typing import Union
+from contextlib import asynccontextmanager
+from typing import Dict, List, Union
 
 from loguru import logger
-from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean
-from sqlalchemy import update
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Boolean, Index, event
+from sqlalchemy import select, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
 
 from utils.singleton import Singleton
 
@@ -26,6 +29,9 @@ class User(Base):
     whitelist = Column(Boolean, nullable=False, default=False, comment='whitelist')
     llm_thread_id = Column(JSON, nullable=False, default=lambda: {}, comment='llm_thread_id')
 
+    # 排行榜按积分排序并取 wxid，覆盖索引避免回表
+    __table_args__ = (Index("ix_user_points_wxid", "points", "wxid"),)
+
 
 class Chatroom(Base):
     __tablename__ = 'chatroom'
@@ -36,405 +42,584 @@ class Chatroom(Base):
     llm_thread_id = Column(JSON, nullable=False, default=lambda: {}, comment='llm_thread_id')
 
 
-class XYBotDB(metaclass=Singleton):
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把 XYBotDB-url 中的同步驱动换成对应的异步驱动"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+# 单条 IN (...) 查询最多携带的参数数量，低于 SQLite 旧版本 999 个变量的上限
+IN_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite 使用 WAL 日志，读写互不阻塞；写冲突时等待而不是立即报错"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def _on_db_loop(func):
+    """让协程方法总是在数据库事件循环中执行，可以从任意事件循环 await"""
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        return await self._submit(func(self, *args, **kwargs))
+
+    return wrapper
+
+
+class _KeyedLocks:
+    """按 wxid 加锁，同一 wxid 的写操作按调用顺序依次执行，不同 wxid 之间并行"""
+
+    def __init__(self):
+        self._locks: Dict[str, List] = {}  # key -> [锁, 引用数]
+
+    @asynccontextmanager
+    async def hold(self, *keys: str):
+        # 固定加锁顺序，避免两个转账互相等待
+        keys = sorted(set(keys))
+        entries = []
+        for key in keys:
+            entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            entries.append((key, entry))
+        acquired = []
+        try:
+            for _, entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key, entry in entries:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+
+class AsyncXYBotDB(metaclass=Singleton):
+    """XYBotDB 的异步接口
+
+    使用异步 SQLAlchemy 引擎和连接池，所有数据库操作都在一个专用的事件循环线程中执行，
+    因此可以从主事件循环、插件或管理后台线程中调用。不同用户的操作并发执行，
+    同一 wxid 的写操作（包括转账双方）按顺序执行。
+    """
+
     def __init__(self):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
 
-        self.database_url = main_config["XYBot"]["XYBotDB-url"]
-        self.engine = create_engine(self.database_url)
-        self.DBSession = sessionmaker(bind=self.engine)
+        xybot_config = main_config["XYBot"]
+        self.database_url = to_async_url(xybot_config["XYBotDB-url"])
+
+        engine_options = {"pool_pre_ping": True}
+        if not self.database_url.endswith(":memory:"):
+            engine_options["pool_size"] = xybot_config.get("XYBotDB-pool-size", 5)
+            engine_options["max_overflow"] = xybot_config.get("XYBotDB-max-overflow", 10)
+        self.engine = create_async_engine(self.database_url, **engine_options)
+        if self.database_url.startswith("sqlite"):
+            event.listen(self.engine.sync_engine, "connect", _sqlite_pragmas)
+        self.DBSession = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._locks = _KeyedLocks()
+
+        # 数据库专用事件循环
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="database", daemon=True)
+        self._thread.start()
 
         # 创建表
-        Base.metadata.create_all(self.engine)
+        self.run_sync(self._create_tables())
         logger.success("数据库初始化成功")
 
-        # 创建线程池执行器
-        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+    async def _create_tables(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # 已存在的表不会被 create_all 补建索引
+            for index in User.__table__.indexes:
+                await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
 
-    def _execute_in_queue(self, method, *args, **kwargs):
-        """在队列中执行数据库操作"""
-        future = self.executor.submit(method, *args, **kwargs)
+    async def _submit(self, coro):
+        """在数据库事件循环中执行协程并等待结果"""
         try:
-            return future.result(timeout=20)  # 20秒超时
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def run_sync(self, coro, timeout: float = 20):
+        """从同步代码调用：在数据库事件循环中执行协程，阻塞等待结果"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在数据库线程中同步等待数据库操作")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=timeout)
         except Exception as e:
-            logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
+            future.cancel()
+            logger.error(f"数据库操作失败: {getattr(coro, '__qualname__', coro)} - {str(e)}")
             raise
 
+    async def close(self):
+        """关闭连接池"""
+        await self._submit(self.engine.dispose())
+
     # USER
 
-    def add_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point addition"""
-        return self._execute_in_queue(self._add_points, wxid, num)
+    @_on_db_loop
+    async def add_points(self, wxid: str, num: int) -> bool:
+        """增加用户积分，num 为负数时扣除"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                result = await session.execute(
+                    update(User)
+                    .where(User.wxid == wxid)
+                    .values(points=User.points + num)
+                )
+                if result.rowcount == 0:
+                    # 用户不存在，创建新用户
+                    session.add(User(wxid=wxid, points=num))
+                logger.info(f"数据库: 用户{wxid}积分增加{num}")
+                await session.commit()
+                return True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"数据库: 用户{wxid}积分增加失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def set_points(self, wxid: str, num: int) -> bool:
+        """设置用户积分"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                result = await session.execute(
+                    update(User)
+                    .where(User.wxid == wxid)
+                    .values(points=num)
+                )
+                if result.rowcount == 0:
+                    session.add(User(wxid=wxid, points=num))
+                logger.info(f"数据库: 用户{wxid}积分设置为{num}")
+                await session.commit()
+                return True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"数据库: 用户{wxid}积分设置失败, 错误: {e}")
+                return False
+
+    async def _get_user(self, session, wxid: str):
+        result = await session.execute(select(User).filter_by(wxid=wxid))
+        return result.scalars().first()
+
+    @_on_db_loop
+    async def get_points(self, wxid: str) -> int:
+        """获取用户积分"""
+        async with self.DBSession() as session:
+            user = await self._get_user(session, wxid)
+            return user.points if user else 0
+
+    @_on_db_loop
+    async def get_signin_stat(self, wxid: str) -> datetime.datetime:
+        """获取用户签到状态"""
+        async with self.DBSession() as session:
+            user = await self._get_user(session, wxid)
+            return user.signin_stat if user else datetime.datetime.fromtimestamp(0)
 
-    def _add_points(self, wxid: str, num: int) -> bool:
+    @_on_db_loop
+    async def set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
+        """设置用户签到时间"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                result = await session.execute(
+                    update(User)
+                    .where(User.wxid == wxid)
+                    .values(
+                        signin_stat=signin_time,
+                        signin_streak=User.signin_streak
+                    )
+                )
+                if result.rowcount == 0:
+                    session.add(User(
+                        wxid=wxid,
+                        signin_stat=signin_time,
+                        signin_streak=0
+                    ))
+                logger.info(f"数据库: 用户{wxid}登录时间设置为{signin_time}")
+                await session.commit()
+                return True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"数据库: 用户{wxid}登录时间设置失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def reset_all_signin_stat(self) -> bool:
+        """重置所有用户的签到状态"""
+        async with self.DBSession() as session:
+            try:
+                await session.execute(update(User).values(signin_stat=datetime.datetime.fromtimestamp(0)))
+                await session.commit()
+                return True
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"数据库: 重置所有用户登录时间失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def get_leaderboard(self, count: int) -> list:
+        """获取积分排行榜"""
+        async with self.DBSession() as session:
+            result = await session.execute(select(User.wxid, User.points).order_by(User.points.desc()).limit(count))
+            return [(wxid, points) for wxid, points in result.all()]
+
+    @_on_db_loop
+    async def get_points_many(self, wxids) -> Dict[str, int]:
+        """批量获取用户积分，不存在的用户积分为 0
+
+        Returns:
+            dict: wxid -> 积分
+        """
+        wxids = list(dict.fromkeys(wxids))
+        points = dict.fromkeys(wxids, 0)
+        async with self.DBSession() as session:
+            for chunk in _chunks(wxids):
+                result = await session.execute(select(User.wxid, User.points).where(User.wxid.in_(chunk)))
+                points.update(result.all())
+        return points
+
+    @_on_db_loop
+    async def get_leaderboard_in(self, wxids, limit: int, skip_zero: bool = False) -> list:
+        """获取指定用户范围内的积分排行榜，例如某个群的成员
+
+        Args:
+            wxids: 参与排名的用户
+            limit: 返回的最大条数
+            skip_zero: 是否跳过积分为 0 的用户
+
+        Returns:
+            list: 按积分从高到低排列的 (wxid, 积分)
+        """
+        wxids = list(dict.fromkeys(wxids))
+        rows = []
+        async with self.DBSession() as session:
+            for chunk in _chunks(wxids):
+                query = select(User.wxid, User.points).where(User.wxid.in_(chunk))
+                if skip_zero:
+                    query = query.where(User.points != 0)
+                result = await session.execute(query.order_by(User.points.desc()).limit(limit))
+                rows.extend(result.all())
+        # 分批查询时每批各取前 limit 名，再合并
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return [(wxid, points) for wxid, points in rows[:limit]]
+
+    @_on_db_loop
+    async def set_whitelist(self, wxid: str, stat: bool) -> bool:
+        """设置用户白名单状态"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                user = await self._get_user(session, wxid)
+                if not user:
+                    user = User(wxid=wxid)
+                    session.add(user)
+                user.whitelist = stat
+                await session.commit()
+                logger.info(f"数据库: 用户{wxid}白名单状态设置为{stat}")
+                return True
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"数据库: 用户{wxid}白名单状态设置失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def get_whitelist(self, wxid: str) -> bool:
+        """获取用户白名单状态"""
+        async with self.DBSession() as session:
+            user = await self._get_user(session, wxid)
+            return user.whitelist if user else False
+
+    @_on_db_loop
+    async def get_whitelist_list(self) -> list:
+        """获取所有白名单用户"""
+        async with self.DBSession() as session:
+            result = await session.execute(select(User.wxid).filter_by(whitelist=True))
+            return list(result.scalars().all())
+
+    @_on_db_loop
+    async def safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
+        """用户之间转账积分，转账双方的其他写操作会等待转账完成"""
+        async with self._locks.hold(trader_wxid, target_wxid), self.DBSession() as session:
+            try:
+                trader = await self._get_user(session, trader_wxid)
+                target = await self._get_user(session, target_wxid)
+
+                if not trader:
+                    trader = User(wxid=trader_wxid, points=0)
+                    session.add(trader)
+                if not target:
+                    target = User(wxid=target_wxid, points=0)
+                    session.add(target)
+
+                if trader.points >= num:
+                    trader.points -= num
+                    target.points += num
+                    await session.commit()
+                    logger.info(f"数据库: 用户{trader_wxid}给用户{target_wxid}转账{num}积分")
+                    return True
+                logger.info(f"数据库: 转账失败, 用户{trader_wxid}积分不足")
+                await session.rollback()
+                return False
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"数据库: 转账失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def get_user_list(self) -> list:
+        """获取所有用户"""
+        async with self.DBSession() as session:
+            result = await session.execute(select(User.wxid))
+            return list(result.scalars().all())
+
+    @_on_db_loop
+    async def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
+        """获取用户或群聊的 LLM thread id"""
+        async with self.DBSession() as session:
+            # Check if it's a chatroom ID
+            if wxid.endswith("@chatroom"):
+                result = await session.execute(select(Chatroom).filter_by(chatroom_id=wxid))
+                owner = result.scalars().first()
+            else:
+                owner = await self._get_user(session, wxid)
+            if namespace:
+                return owner.llm_thread_id.get(namespace, "") if owner else ""
+            else:
+                return owner.llm_thread_id if owner else {}
+
+    @_on_db_loop
+    async def save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
+        """保存用户或群聊的 LLM thread id"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                if wxid.endswith("@chatroom"):
+                    result = await session.execute(select(Chatroom).filter_by(chatroom_id=wxid))
+                    owner = result.scalars().first()
+                    if not owner:
+                        owner = Chatroom(chatroom_id=wxid, llm_thread_id={})
+                        session.add(owner)
+                else:
+                    owner = await self._get_user(session, wxid)
+                    if not owner:
+                        owner = User(wxid=wxid, llm_thread_id={})
+                        session.add(owner)
+                # 创建新字典并更新
+                new_thread_ids = dict(owner.llm_thread_id or {})
+                new_thread_ids[namespace] = data
+                owner.llm_thread_id = new_thread_ids
+
+                await session.commit()
+                logger.info(f"数据库: 成功保存 {wxid} 的 llm thread id")
+                return True
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"数据库: 保存用户llm thread id失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def delete_all_llm_thread_id(self) -> bool:
+        """清除所有用户和群聊的 LLM thread id"""
+        async with self.DBSession() as session:
+            try:
+                await session.execute(update(User).values(llm_thread_id={}))
+                await session.execute(update(Chatroom).values(llm_thread_id={}))
+                await session.commit()
+                return True
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"数据库: 清除所有用户llm thread id失败, 错误: {e}")
+                return False
+
+    @_on_db_loop
+    async def get_signin_streak(self, wxid: str) -> int:
+        """获取用户连续签到天数"""
+        async with self.DBSession() as session:
+            user = await self._get_user(session, wxid)
+            return user.signin_streak if user else 0
+
+    @_on_db_loop
+    async def set_signin_streak(self, wxid: str, streak: int) -> bool:
+        """设置用户连续签到天数"""
+        async with self._locks.hold(wxid), self.DBSession() as session:
+            try:
+                result = await session.execute(
+                    update(User)
+                    .where(User.wxid == wxid)
+                    .values(signin_streak=streak)
+                )
+                if result.rowcount == 0:
+                    session.add(User(wxid=wxid, signin_streak=streak))
+                logger.info(f"数据库: 用户{wxid}连续签到天数设置为{streak}")
+                await session.commit()
+                return True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"数据库: 用户{wxid}连续签到天数设置失败, 错误: {e}")
+                return False
+
+    # CHATROOM
+
+    @_on_db_loop
+    async def get_chatroom_list(self) -> list:
+        """获取所有群聊"""
+        async with self.DBSession() as session:
+            result = await session.execute(select(Chatroom.chatroom_id))
+            return list(result.scalars().all())
+
+    @_on_db_loop
+    async def get_chatroom_members(self, chatroom_id: str) -> set:
+        """获取群聊成员"""
+        async with self.DBSession() as session:
+            result = await session.execute(select(Chatroom.members).filter_by(chatroom_id=chatroom_id))
+            members = result.scalars().first()
+            return set(members) if members else set()
+
+    @_on_db_loop
+    async def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
+        """设置群聊成员"""
+        async with self._locks.hold(chatroom_id), self.DBSession() as session:
+            try:
+                result = await session.execute(select(Chatroom).filter_by(chatroom_id=chatroom_id))
+                chatroom = result.scalars().first()
+                if not chatroom:
+                    chatroom = Chatroom(chatroom_id=chatroom_id)
+                    session.add(chatroom)
+                chatroom.members = list(members)  # Convert set to list for JSON storage
+                logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
+                await session.commit()
+                return True
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Database: Set chatroom {chatroom_id} members failed, error: {e}")
+                return False
+
+
+class XYBotDB(metaclass=Singleton):
+    """XYBotDB 的同步接口，每个方法都转发给 AsyncXYBotDB 并阻塞等待结果
+
+    在异步代码中请使用 AsyncXYBotDB，避免阻塞事件循环。
+    """
+
+    def __init__(self):
+        self.async_db = AsyncXYBotDB()
+        self.database_url = self.async_db.database_url
+
+    # USER
+
+    def add_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point addition"""
-        session = self.DBSession()
-        try:
-            # Use UPDATE with atomic operation
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(points=User.points + num)
-            )
-            if result.rowcount == 0:
-                # User doesn't exist, create new
-                user = User(wxid=wxid, points=num)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}积分增加{num}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}积分增加失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.add_points(wxid, num))
 
     def set_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point setting"""
-        return self._execute_in_queue(self._set_points, wxid, num)
-
-    def _set_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point setting"""
-        session = self.DBSession()
-        try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(points=num)
-            )
-            if result.rowcount == 0:
-                user = User(wxid=wxid, points=num)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}积分设置为{num}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}积分设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.set_points(wxid, num))
 
     def get_points(self, wxid: str) -> int:
         """Get user points"""
-        return self._execute_in_queue(self._get_points, wxid)
-
-    def _get_points(self, wxid: str) -> int:
-        """Get user points"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.points if user else 0
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_points(wxid))
 
     def get_signin_stat(self, wxid: str) -> datetime.datetime:
         """获取用户签到状态"""
-        return self._execute_in_queue(self._get_signin_stat, wxid)
-
-    def _get_signin_stat(self, wxid: str) -> datetime.datetime:
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.signin_stat if user else datetime.datetime.fromtimestamp(0)
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_signin_stat(wxid))
 
     def set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
         """Thread-safe set user's signin time"""
-        return self._execute_in_queue(self._set_signin_stat, wxid, signin_time)
-
-    def _set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
-        session = self.DBSession()
-        try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(
-                    signin_stat=signin_time,
-                    signin_streak=User.signin_streak
-                )
-            )
-            if result.rowcount == 0:
-                user = User(
-                    wxid=wxid,
-                    signin_stat=signin_time,
-                    signin_streak=0
-                )
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}登录时间设置为{signin_time}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}登录时间设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.set_signin_stat(wxid, signin_time))
 
     def reset_all_signin_stat(self) -> bool:
         """Reset all users' signin status"""
-        session = self.DBSession()
-        try:
-            session.query(User).update({User.signin_stat: datetime.datetime.fromtimestamp(0)})
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 重置所有用户登录时间失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.reset_all_signin_stat())
 
     def get_leaderboard(self, count: int) -> list:
         """Get points leaderboard"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).order_by(User.points.desc()).limit(count).all()
-            return [(user.wxid, user.points) for user in users]
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_leaderboard(count))
+
+    def get_points_many(self, wxids) -> Dict[str, int]:
+        """Get points of many users in one query"""
+        return self.async_db.run_sync(self.async_db.get_points_many(wxids))
+
+    def get_leaderboard_in(self, wxids, limit: int, skip_zero: bool = False) -> list:
+        """Get points leaderboard among the given users"""
+        return self.async_db.run_sync(self.async_db.get_leaderboard_in(wxids, limit, skip_zero))
 
     def set_whitelist(self, wxid: str, stat: bool) -> bool:
         """Set user's whitelist status"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            if not user:
-                user = User(wxid=wxid)
-                session.add(user)
-            user.whitelist = stat
-            session.commit()
-            logger.info(f"数据库: 用户{wxid}白名单状态设置为{stat}")
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}白名单状态设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.set_whitelist(wxid, stat))
 
     def get_whitelist(self, wxid: str) -> bool:
         """Get user's whitelist status"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.whitelist if user else False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_whitelist(wxid))
 
     def get_whitelist_list(self) -> list:
         """Get list of all whitelisted users"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).filter_by(whitelist=True).all()
-            return [user.wxid for user in users]
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_whitelist_list())
 
     def safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
         """Thread-safe points trading between users"""
-        return self._execute_in_queue(self._safe_trade_points, trader_wxid, target_wxid, num)
-
-    def _safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
-        """Thread-safe points trading between users"""
-        session = self.DBSession()
-        try:
-            # Start transaction with row-level locking
-            trader = session.query(User).filter_by(wxid=trader_wxid) \
-                .with_for_update().first()  # Acquire row lock
-            target = session.query(User).filter_by(wxid=target_wxid) \
-                .with_for_update().first()  # Acquire row lock
-
-            if not trader:
-                trader = User(wxid=trader_wxid)
-                session.add(trader)
-            if not target:
-                target = User(wxid=target_wxid)
-                session.add(target)
-                session.flush()  # Ensure IDs are generated
-
-            if trader.points >= num:
-                trader.points -= num
-                target.points += num
-                session.commit()
-                logger.info(f"数据库: 用户{trader_wxid}给用户{target_wxid}转账{num}积分")
-                return True
-            logger.info(f"数据库: 转账失败, 用户{trader_wxid}积分不足")
-            session.rollback()
-            return False
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 转账失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.safe_trade_points(trader_wxid, target_wxid, num))
 
     def get_user_list(self) -> list:
         """Get list of all users"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).all()
-            return [user.wxid for user in users]
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_user_list())
 
     def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
         """Get LLM thread id for user or chatroom"""
-        session = self.DBSession()
-        try:
-            # Check if it's a chatroom ID
-            if wxid.endswith("@chatroom"):
-                chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
-                if namespace:
-                    return chatroom.llm_thread_id.get(namespace, "") if chatroom else ""
-                else:
-                    return chatroom.llm_thread_id if chatroom else {}
-            else:
-                # Regular user
-                user = session.query(User).filter_by(wxid=wxid).first()
-                if namespace:
-                    return user.llm_thread_id.get(namespace, "") if user else ""
-                else:
-                    return user.llm_thread_id if user else {}
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_llm_thread_id(wxid, namespace))
 
     def save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
         """Save LLM thread id for user or chatroom"""
-        session = self.DBSession()
-        try:
-            if wxid.endswith("@chatroom"):
-                chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
-                if not chatroom:
-                    chatroom = Chatroom(
-                        chatroom_id=wxid,
-                        llm_thread_id={}
-                    )
-                    session.add(chatroom)
-                # 创建新字典并更新
-                new_thread_ids = dict(chatroom.llm_thread_id or {})
-                new_thread_ids[namespace] = data
-                chatroom.llm_thread_id = new_thread_ids
-            else:
-                user = session.query(User).filter_by(wxid=wxid).first()
-                if not user:
-                    user = User(
-                        wxid=wxid,
-                        llm_thread_id={}
-                    )
-                    session.add(user)
-                # 创建新字典并更新
-                new_thread_ids = dict(user.llm_thread_id or {})
-                new_thread_ids[namespace] = data
-                user.llm_thread_id = new_thread_ids
-
-            session.commit()
-            logger.info(f"数据库: 成功保存 {wxid} 的 llm thread id")
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 保存用户llm thread id失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.save_llm_thread_id(wxid, data, namespace))
 
     def delete_all_llm_thread_id(self):
         """Clear llm thread id for everyone"""
-        session = self.DBSession()
-        try:
-            session.query(User).update({User.llm_thread_id: {}})
-            session.query(Chatroom).update({Chatroom.llm_thread_id: {}})
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 清除所有用户llm thread id失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.delete_all_llm_thread_id())
 
     def get_signin_streak(self, wxid: str) -> int:
         """Thread-safe get user's signin streak"""
-        return self._execute_in_queue(self._get_signin_streak, wxid)
-
-    def _get_signin_streak(self, wxid: str) -> int:
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.signin_streak if user else 0
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_signin_streak(wxid))
 
     def set_signin_streak(self, wxid: str, streak: int) -> bool:
         """Thread-safe set user's signin streak"""
-        return self._execute_in_queue(self._set_signin_streak, wxid, streak)
-
-    def _set_signin_streak(self, wxid: str, streak: int) -> bool:
-        session = self.DBSession()
-        try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(signin_streak=streak)
-            )
-            if result.rowcount == 0:
-                user = User(wxid=wxid, signin_streak=streak)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}连续签到天数设置为{streak}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}连续签到天数设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.set_signin_streak(wxid, streak))
 
     # CHATROOM
 
     def get_chatroom_list(self) -> list:
         """Get list of all chatrooms"""
-        session = self.DBSession()
-        try:
-            chatrooms = session.query(Chatroom).all()
-            return [chatroom.chatroom_id for chatroom in chatrooms]
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_chatroom_list())
 
     def get_chatroom_members(self, chatroom_id: str) -> set:
         """Get members of a chatroom"""
-        session = self.DBSession()
-        try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            return set(chatroom.members) if chatroom else set()
-        finally:
-            session.close()
+        return self.async_db.run_sync(self.async_db.get_chatroom_members(chatroom_id))
 
     def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
         """Set members of a chatroom"""
-        session = self.DBSession()
-        try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            if not chatroom:
-                chatroom = Chatroom(chatroom_id=chatroom_id)
-                session.add(chatroom)
-            chatroom.members = list(members)  # Convert set to list for JSON storage
-            logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Database: Set chatroom {chatroom_id} members failed, error: {e}")
-            return False
-        finally:
-            session.close()
-
-    def __del__(self):
-        """确保关闭时清理资源"""
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=True)
-        if hasattr(self, 'engine'):
-            self.engine.dispose()
+        return self.async_db.run_sync(self.async_db.set_chatroom_members(chatroom_id, members))
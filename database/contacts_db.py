@@ -1,40 +1,260 @@
+import asyncio
 import os
 import json
-import time
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from loguru import logger
 
 # 数据库文件路径
 DB_PATH = os.path.join("database", "contacts.db")
 
+# 基本字段，其余字段以JSON存入extra_data
+BASE_FIELDS = ["wxid", "nickname", "remark", "avatar", "alias", "type", "region"]
+
+# 插入或更新联系人，语句文本固定，sqlite3 会复用已编译的语句
+UPSERT_CONTACT_SQL = '''
+INSERT INTO contacts
+(wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(wxid) DO UPDATE SET
+    nickname = excluded.nickname,
+    remark = excluded.remark,
+    avatar = excluded.avatar,
+    alias = excluded.alias,
+    type = excluded.type,
+    region = excluded.region,
+    last_updated = excluded.last_updated,
+    extra_data = excluded.extra_data
+'''
+
 def ensure_db_dir():
     """确保数据库目录存在"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+def _row_to_contact(row):
+    """把数据库行转换为联系人字典"""
+    contact = {
+        "wxid": row[0],
+        "nickname": row[1],
+        "remark": row[2],
+        "avatar": row[3],
+        "alias": row[4],
+        "type": row[5],
+        "region": row[6],
+        "last_updated": row[7]
+    }
+
+    # 解析额外数据
+    if row[8]:
+        try:
+            extra_data = json.loads(row[8])
+            contact.update(extra_data)
+        except:
+            pass
+
+    return contact
+
+def _contact_to_params(contact, current_time):
+    """把联系人字典转换为 UPSERT_CONTACT_SQL 的参数"""
+    wxid = contact.get("wxid", "")
+
+    # 确定联系人类型
+    contact_type = contact.get("type", "")
+    if not contact_type:
+        if wxid.endswith("@chatroom"):
+            contact_type = "group"
+        elif wxid.startswith("gh_"):
+            contact_type = "official"
+        else:
+            contact_type = "friend"
+
+    # 将其他字段存储为JSON
+    extra_data = {}
+    for key, value in contact.items():
+        if key not in BASE_FIELDS:
+            extra_data[key] = value
+
+    return (
+        wxid,
+        contact.get("nickname", ""),
+        contact.get("remark", ""),
+        contact.get("avatar", ""),
+        contact.get("alias", ""),
+        contact_type,
+        contact.get("region", ""),
+        current_time,
+        json.dumps(extra_data, ensure_ascii=False)
+    )
+
+
+class ContactsStore:
+    """联系人存储
+
+    所有读写都在同一个数据库线程里通过一个常驻的 WAL 连接完成：
+    同步函数提交到该线程并等待结果，异步方法则在等待期间不阻塞事件循环。
+    前面有一个最近使用联系人的 LRU，用于不访问磁盘就判断联系人是否已有资料。
+    """
+
+    def __init__(self, db_path=DB_PATH, known_cache_size=5000):
+        self.db_path = db_path
+        self.known_cache_size = known_cache_size
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contacts_db")
+        self._thread_id = None
+        # 已有昵称的联系人 wxid，按最近使用排序
+        self._known = OrderedDict()
+        self._known_lock = threading.Lock()
+
+    # 连接与执行
+
+    def _connection(self):
+        """获取常驻连接，只在数据库线程中调用"""
+        if self._conn is None:
+            self._thread_id = threading.get_ident()
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    def run(self, method, *args):
+        """在数据库线程中执行 method(conn, *args) 并等待结果"""
+        if self._thread_id == threading.get_ident():
+            return method(self._connection(), *args)
+        future = self._executor.submit(lambda: method(self._connection(), *args))
+        return future.result(timeout=20)  # 20秒超时
+
+    async def run_async(self, method, *args):
+        """在数据库线程中执行 method(conn, *args)，等待期间不阻塞事件循环"""
+        future = self._executor.submit(lambda: method(self._connection(), *args))
+        return await asyncio.wrap_future(future)
+
+    # 已知联系人 LRU
+
+    def _remember(self, contact):
+        if not contact or not contact.get("nickname"):
+            return
+        with self._known_lock:
+            self._known[contact["wxid"]] = True
+            self._known.move_to_end(contact["wxid"])
+            while len(self._known) > self.known_cache_size:
+                self._known.popitem(last=False)
+
+    def _forget(self, wxid=None):
+        with self._known_lock:
+            if wxid is None:
+                self._known.clear()
+            else:
+                self._known.pop(wxid, None)
+
+    def is_known_cached(self, wxid):
+        """只查内存，联系人最近被确认已有昵称时返回 True"""
+        with self._known_lock:
+            if wxid in self._known:
+                self._known.move_to_end(wxid)
+                return True
+        return False
+
+    # 数据库操作，只在数据库线程中执行
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS contacts (
+            wxid TEXT PRIMARY KEY,
+            nickname TEXT,
+            remark TEXT,
+            avatar TEXT,
+            alias TEXT,
+            type TEXT,
+            region TEXT,
+            last_updated INTEGER,
+            extra_data TEXT
+        )
+        ''')
+        conn.commit()
+
+    def _get(self, conn, wxid):
+        row = conn.execute("SELECT * FROM contacts WHERE wxid = ?", (wxid,)).fetchone()
+        contact = _row_to_contact(row) if row else None
+        self._remember(contact)
+        return contact
+
+    def _known_many(self, conn, wxids):
+        known = set()
+        for start in range(0, len(wxids), 500):
+            chunk = wxids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT wxid, nickname FROM contacts WHERE wxid IN ({placeholders})", chunk).fetchall()
+            for wxid, nickname in rows:
+                if nickname:
+                    known.add(wxid)
+                    self._remember({"wxid": wxid, "nickname": nickname})
+        return known
+
+    def _upsert_many(self, conn, contacts):
+        current_time = int(time.time())
+        params = [_contact_to_params(contact, current_time) for contact in contacts if contact.get("wxid")]
+        try:
+            conn.executemany(UPSERT_CONTACT_SQL, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for contact in contacts:
+            if contact.get("wxid"):
+                if contact.get("nickname"):
+                    self._remember(contact)
+                else:
+                    self._forget(contact["wxid"])
+        return len(params)
+
+    def _delete(self, conn, wxid):
+        conn.execute("DELETE FROM contacts WHERE wxid = ?", (wxid,))
+        conn.commit()
+        self._forget(wxid)
+
+    # 异步接口
+
+    async def get(self, wxid):
+        """获取单个联系人，不存在时返回 None"""
+        return await self.run_async(self._get, wxid)
+
+    async def upsert(self, contact):
+        """插入或更新单个联系人"""
+        return await self.run_async(self._upsert_many, [contact]) > 0
+
+    async def upsert_many(self, contacts):
+        """在一个事务里批量插入或更新联系人，返回写入的数量"""
+        return await self.run_async(self._upsert_many, list(contacts))
+
+    async def is_known(self, wxid):
+        """联系人是否已有昵称，先查内存中的 LRU，未命中时再查数据库"""
+        if self.is_known_cached(wxid):
+            return True
+        contact = await self.get(wxid)
+        return bool(contact and contact.get("nickname"))
+
+    async def known_many(self, wxids):
+        """批量判断联系人是否已有昵称，返回已有昵称的 wxid 集合，未命中内存的用一次查询检查"""
+        known = {wxid for wxid in wxids if self.is_known_cached(wxid)}
+        rest = [wxid for wxid in wxids if wxid not in known]
+        if rest:
+            known |= await self.run_async(self._known_many, rest)
+        return known
+
+
+# 全局联系人存储实例
+contacts_store = ContactsStore()
+
 def create_contacts_table():
     """创建联系人表"""
     ensure_db_dir()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # 创建联系人表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS contacts (
-        wxid TEXT PRIMARY KEY,
-        nickname TEXT,
-        remark TEXT,
-        avatar TEXT,
-        alias TEXT,
-        type TEXT,
-        region TEXT,
-        last_updated INTEGER,
-        extra_data TEXT
-    )
-    ''')
-
-    conn.commit()
-    conn.close()
+    contacts_store.run(ContactsStore._create_table)
     logger.info("联系人数据表创建完成")
 
 def get_contacts_from_db(offset=None, limit=None):
@@ -49,9 +269,6 @@ def get_contacts_from_db(offset=None, limit=None):
     """
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
         # 构建查询语句，支持分页
         query = "SELECT * FROM contacts"
         params = []
@@ -69,33 +286,8 @@ def get_contacts_from_db(offset=None, limit=None):
                 params.append(offset)
 
         # 执行查询
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        contacts = []
-        for row in rows:
-            contact = {
-                "wxid": row[0],
-                "nickname": row[1],
-                "remark": row[2],
-                "avatar": row[3],
-                "alias": row[4],
-                "type": row[5],
-                "region": row[6],
-                "last_updated": row[7]
-            }
-
-            # 解析额外数据
-            if row[8]:
-                try:
-                    extra_data = json.loads(row[8])
-                    contact.update(extra_data)
-                except:
-                    pass
-
-            contacts.append(contact)
-
-        conn.close()
+        rows = contacts_store.run(lambda conn: conn.execute(query, params).fetchall())
+        contacts = [_row_to_contact(row) for row in rows]
 
         # 记录日志，区分是否分页
         if offset is not None or limit is not None:
@@ -112,62 +304,7 @@ def save_contacts_to_db(contacts):
     """保存联系人列表到数据库"""
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 创建表（如果不存在）
-        create_contacts_table()
-
-        # 准备批量插入
-        current_time = int(time.time())
-        for contact in contacts:
-            # 提取基本字段
-            wxid = contact.get("wxid", "")
-            nickname = contact.get("nickname", "")
-            remark = contact.get("remark", "")
-            avatar = contact.get("avatar", "")
-            alias = contact.get("alias", "")
-
-            # 确定联系人类型
-            contact_type = contact.get("type", "")
-            if not contact_type:
-                if wxid.endswith("@chatroom"):
-                    contact_type = "group"
-                elif wxid.startswith("gh_"):
-                    contact_type = "official"
-                else:
-                    contact_type = "friend"
-
-            # 其他字段
-            region = contact.get("region", "")
-
-            # 将其他字段存储为JSON
-            extra_data = {}
-            for key, value in contact.items():
-                if key not in ["wxid", "nickname", "remark", "avatar", "alias", "type", "region"]:
-                    extra_data[key] = value
-
-            extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-
-            # 插入或更新联系人
-            cursor.execute('''
-            INSERT OR REPLACE INTO contacts
-            (wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                wxid,
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json
-            ))
-
-        conn.commit()
-        conn.close()
+        contacts_store.run(contacts_store._upsert_many, list(contacts))
         logger.success(f"成功保存 {len(contacts)} 个联系人到数据库")
         return True
     except Exception as e:
@@ -178,97 +315,13 @@ def update_contact_in_db(contact):
     """更新单个联系人信息"""
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 创建表（如果不存在）
-        create_contacts_table()
-
-        # 提取基本字段
         wxid = contact.get("wxid", "")
         if not wxid:
             logger.error("更新联系人失败: 缺少wxid")
             return False
 
-        nickname = contact.get("nickname", "")
-        remark = contact.get("remark", "")
-        avatar = contact.get("avatar", "")
-        alias = contact.get("alias", "")
-
-        # 确定联系人类型
-        contact_type = contact.get("type", "")
-        if not contact_type:
-            if wxid.endswith("@chatroom"):
-                contact_type = "group"
-            elif wxid.startswith("gh_"):
-                contact_type = "official"
-            else:
-                contact_type = "friend"
-
-        # 其他字段
-        region = contact.get("region", "")
-        current_time = int(time.time())
-
-        # 将其他字段存储为JSON
-        extra_data = {}
-        for key, value in contact.items():
-            if key not in ["wxid", "nickname", "remark", "avatar", "alias", "type", "region"]:
-                extra_data[key] = value
-
-        extra_data_json = json.dumps(extra_data, ensure_ascii=False)
-
-        logger.info(f"保存联系人 extra_data_json : {extra_data_json}")
-
-        # 检查联系人是否存在
-        cursor.execute("SELECT wxid FROM contacts WHERE wxid = ?", (wxid,))
-        exists = cursor.fetchone()
-
-        if exists:
-            # 更新现有联系人
-            cursor.execute('''
-            UPDATE contacts SET
-                nickname = ?,
-                remark = ?,
-                avatar = ?,
-                alias = ?,
-                type = ?,
-                region = ?,
-                last_updated = ?,
-                extra_data = ?
-            WHERE wxid = ?
-            ''', (
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json,
-                wxid
-            ))
-            logger.info(f"更新联系人: {wxid}")
-        else:
-            # 插入新联系人
-            cursor.execute('''
-            INSERT INTO contacts
-            (wxid, nickname, remark, avatar, alias, type, region, last_updated, extra_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                wxid,
-                nickname,
-                remark,
-                avatar,
-                alias,
-                contact_type,
-                region,
-                current_time,
-                extra_data_json
-            ))
-            logger.info(f"新增联系人: {wxid}")
-
-        conn.commit()
-        conn.close()
+        contacts_store.run(contacts_store._upsert_many, [contact])
+        logger.info(f"更新联系人: {wxid}")
         return True
     except Exception as e:
         logger.error(f"更新联系人 {contact.get('wxid', 'unknown')} 失败: {str(e)}")
@@ -278,39 +331,7 @@ def get_contact_from_db(wxid):
     """从数据库获取单个联系人信息"""
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 查询联系人
-        cursor.execute("SELECT * FROM contacts WHERE wxid = ?", (wxid,))
-        row = cursor.fetchone()
-
-        if row:
-            # 解析联系人数据
-            contact = {
-                "wxid": row[0],
-                "nickname": row[1],
-                "remark": row[2],
-                "avatar": row[3],
-                "alias": row[4],
-                "type": row[5],
-                "region": row[6],
-                "last_updated": row[7]
-            }
-
-            # 解析额外数据
-            if row[8]:
-                try:
-                    extra_data = json.loads(row[8])
-                    contact.update(extra_data)
-                except:
-                    pass
-
-            conn.close()
-            return contact
-        else:
-            conn.close()
-            return None
+        return contacts_store.run(contacts_store._get, wxid)
     except Exception as e:
         logger.error(f"从数据库获取联系人 {wxid} 失败: {str(e)}")
         return None
@@ -319,14 +340,7 @@ def delete_contact_from_db(wxid):
     """从数据库删除联系人"""
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # 删除联系人
-        cursor.execute("DELETE FROM contacts WHERE wxid = ?", (wxid,))
-
-        conn.commit()
-        conn.close()
+        contacts_store.run(contacts_store._delete, wxid)
         logger.info(f"从数据库删除联系人: {wxid}")
         return True
     except Exception as e:
@@ -337,14 +351,7 @@ def get_contacts_count():
     """获取数据库中联系人数量"""
     ensure_db_dir()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT COUNT(*) FROM contacts")
-        count = cursor.fetchone()[0]
-
-        conn.close()
-        return count
+        return contacts_store.run(lambda conn: conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0])
     except Exception as e:
         logger.error(f"获取联系人数量失败: {str(e)}")
         return 0
@@ -371,6 +378,7 @@ def clear_contacts_cache():
     """清除联系人缓存"""
     global _contacts_cache
     _contacts_cache = {}
+    contacts_store._forget()
     logger.info("联系人缓存已清除")
 
 # 当模块被导入时自动初始化数据库
@@ -1,11 +1,15 @@
 import asyncio
+import heapq
 import logging
+import time
 import tomllib
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union, List
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Text, DateTime, delete, select
+from sqlalchemy import Column, String, Text, DateTime, delete, event, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -13,6 +17,14 @@ from utils.singleton import Singleton
 
 DeclarativeBase = declarative_base()
 
+# 单条 IN 查询最多包含的键数，避免超出 SQLite 的参数数量限制
+IN_CHUNK_SIZE = 500
+
+# 内存缓存中表示“数据库里没有这个键”的标记
+_ABSENT = object()
+# 写入缓冲中表示“删除这个键”的标记
+_DELETE = object()
+
 
 class KeyValue(DeclarativeBase):
     __tablename__ = 'key_value_store'
@@ -22,7 +34,43 @@ class KeyValue(DeclarativeBase):
     expire_time = Column(DateTime, index=True, comment='过期时间')
 
 
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """SQLite 使用 WAL 日志，写入时不阻塞读取"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _expire_at(ex: Optional[Union[int, timedelta]]) -> Optional[float]:
+    """把过期时间（秒或timedelta）转换为时间戳"""
+    if not ex:
+        return None
+    if isinstance(ex, timedelta):
+        ex = ex.total_seconds()
+    return time.time() + ex
+
+
+def _to_datetime(expire_at: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(expire_at) if expire_at is not None else None
+
+
+def _to_timestamp(expire_time: Optional[datetime]) -> Optional[float]:
+    return expire_time.timestamp() if expire_time is not None else None
+
+
+def _chunks(items: list, size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 class KeyvalDB(metaclass=Singleton):
+    """键值存储
+
+    数据库前面有一层有界 LRU 内存缓存：读取先查内存，未命中再读数据库并缓存结果
+    （包括“键不存在”）；写入先更新内存，再由后台任务批量写入数据库。
+    带过期时间的键放在一个按过期时间排序的堆里，到期时由后台任务从内存和数据库中删除。
+    """
     _instance = None
 
     def __new__(cls):
@@ -37,6 +85,30 @@ class KeyvalDB(metaclass=Singleton):
                 echo=False,
                 future=True
             )
+            cls._instance.is_sqlite = db_url.startswith("sqlite")
+            if cls._instance.is_sqlite:
+                event.listen(cls._instance.engine.sync_engine, "connect", _enable_sqlite_wal)
+
+            cls._instance.cache_size = max(1, main_config["XYBot"].get("keyvalDB-cache-size", 10000))
+            cls._instance.flush_interval = main_config["XYBot"].get("keyvalDB-flush-interval", 200) / 1000
+            # 键 -> (值, 过期时间戳)，值为 _ABSENT 表示数据库中没有这个键；按最近使用排序
+            cls._instance._cache = OrderedDict()
+            # 键 -> (值, 过期时间戳) 或 _DELETE，尚未写入数据库的修改，同一个键只保留最后一次
+            cls._instance._pending = OrderedDict()
+            # 正在写入数据库的修改，提交成功前仍需可读，否则已被挤出缓存的键会读到数据库里的旧值
+            cls._instance._flushing = {}
+            # 键 -> 过期时间戳，数据库中所有带过期时间的键
+            cls._instance._expiry = {}
+            # (过期时间戳, 键) 的最小堆，键被重新设置后旧的条目留在堆里，弹出时跳过
+            cls._instance._expiry_heap = []
+            # 正在从数据库读取的键，同一个键同时只读一次
+            cls._instance._loading = {}
+            cls._instance._flush_event = None
+            cls._instance._flush_lock = None
+            cls._instance._writer_task = None
+            cls._instance._closing = False
+            cls._instance._expiry_event = None
+            cls._instance._expiry_task = None
             cls._async_session_factory = async_scoped_session(
                 sessionmaker(
                     cls._instance.engine,
@@ -48,11 +120,237 @@ class KeyvalDB(metaclass=Singleton):
         return cls._instance
 
     async def initialize(self):
-        """异步初始化数据库"""
+        """异步初始化数据库，删除已过期的数据并加载其余键的过期时间"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
-        # 启动后台清理任务
-        asyncio.create_task(self._cleanup_expired())
+        async with self._async_session_factory() as session:
+            await session.execute(delete(KeyValue).where(KeyValue.expire_time < datetime.now()))
+            await session.commit()
+            result = await session.execute(
+                select(KeyValue.key, KeyValue.expire_time).where(KeyValue.expire_time.is_not(None))
+            )
+            for key, expire_time in result.all():
+                self._schedule_expiry(key, _to_timestamp(expire_time))
+        self._ensure_tasks()
+
+    # 后台任务
+
+    def _ensure_tasks(self):
+        """在当前事件循环中启动后台写入任务和过期清理任务"""
+        if self._writer_task is None or self._writer_task.done():
+            self._flush_event = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._writer_task = asyncio.create_task(self._writer())
+        if self._expiry_task is None or self._expiry_task.done():
+            self._expiry_event = asyncio.Event()
+            self._expiry_task = asyncio.create_task(self._expire_loop())
+
+    async def _writer(self):
+        """后台写入任务，close() 设置 _closing 后写入剩余的修改并退出"""
+        while not self._closing:
+            await self._flush_event.wait()
+            if not self._closing:
+                await asyncio.sleep(self.flush_interval)
+            self._flush_event.clear()
+            await self.flush()
+
+    async def _expire_loop(self):
+        """按过期时间堆删除到期的键，睡眠到最近的过期时间或有更早的键加入"""
+        while True:
+            now = time.time()
+            expired = []
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                expire_at, key = heapq.heappop(heap)
+                if self._expiry.get(key) == expire_at:
+                    del self._expiry[key]
+                    expired.append(key)
+            for key in expired:
+                self._cache_put(key, _ABSENT, None)
+                self._queue_write(key, _DELETE)
+
+            self._expiry_event.clear()
+            timeout = heap[0][0] - time.time() if heap else None
+            try:
+                await asyncio.wait_for(self._expiry_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _schedule_expiry(self, key: str, expire_at: Optional[float]):
+        if expire_at is None:
+            self._expiry.pop(key, None)
+            return
+        self._expiry[key] = expire_at
+        heap = self._expiry_heap
+        wake = not heap or expire_at < heap[0][0]
+        heapq.heappush(heap, (expire_at, key))
+        # 重复设置同一个键会留下失效条目，过多时重建堆
+        if len(heap) > 2 * len(self._expiry) + 1024:
+            self._expiry_heap = [(t, k) for k, t in self._expiry.items()]
+            heapq.heapify(self._expiry_heap)
+        if wake and self._expiry_event is not None:
+            self._expiry_event.set()
+
+    # 内存缓存
+
+    def _cache_get(self, key: str):
+        """返回 (值, 过期时间戳)，不在缓存中时返回 None；已过期的键按不存在处理"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        self._cache.move_to_end(key)
+        value, expire_at = entry
+        if expire_at is not None and expire_at <= time.time():
+            return _ABSENT, None
+        return entry
+
+    def _cache_put(self, key: str, value, expire_at: Optional[float]):
+        self._cache[key] = (value, expire_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _queue_write(self, key: str, op):
+        self._pending.pop(key, None)
+        self._pending[key] = op
+        self._ensure_tasks()
+        self._flush_event.set()
+
+    def _write(self, key: str, value: str, expire_at: Optional[float]):
+        """更新内存并排队写入数据库"""
+        self._cache_put(key, value, expire_at)
+        self._schedule_expiry(key, expire_at)
+        self._queue_write(key, (value, expire_at))
+
+    def _remove(self, key: str):
+        """从内存中删除并排队从数据库删除"""
+        self._cache_put(key, _ABSENT, None)
+        self._expiry.pop(key, None)
+        self._queue_write(key, _DELETE)
+
+    async def _lookup(self, key: str) -> Tuple[object, Optional[float]]:
+        """读取键，依次查内存缓存、写入缓冲和数据库"""
+        entry = self._cache_get(key)
+        if entry is not None:
+            return entry
+        return (await self._load_many([key]))[key]
+
+    async def _load_many(self, keys: List[str]) -> Dict[str, Tuple[object, Optional[float]]]:
+        """从写入缓冲或数据库读取不在缓存中的键并放入缓存，同一个键同时只读一次"""
+        found = {}
+        waiting = {}
+        to_load = []
+        for key in keys:
+            op = self._pending.get(key)
+            if op is None:
+                op = self._flushing.get(key)
+            if op is not None:
+                found[key] = (_ABSENT, None) if op is _DELETE else op
+            elif key in self._loading:
+                waiting[key] = self._loading[key]
+            elif key not in found:
+                to_load.append(key)
+
+        if to_load:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_load}
+            self._loading.update(futures)
+            try:
+                rows = {}
+                async with self._async_session_factory() as session:
+                    for chunk in _chunks(to_load):
+                        result = await session.execute(
+                            select(KeyValue.key, KeyValue.value, KeyValue.expire_time)
+                            .where(KeyValue.key.in_(chunk))
+                        )
+                        for key, value, expire_time in result.all():
+                            rows[key] = (value, _to_timestamp(expire_time))
+                for key, future in futures.items():
+                    entry = rows.get(key, (_ABSENT, None))
+                    # 读取期间键可能已被修改，以内存中的新值为准
+                    if key not in self._pending and key not in self._flushing and key not in self._cache:
+                        self._cache_put(key, *entry)
+                    entry = self._cache_get(key) or entry
+                    found[key] = entry
+                    future.set_result(entry)
+            except BaseException as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        # 没有其他等待者时避免“异常未被获取”的警告
+                        future.exception()
+                raise
+            finally:
+                for key, future in futures.items():
+                    if self._loading.get(key) is future:
+                        del self._loading[key]
+
+        for key, future in waiting.items():
+            found[key] = await asyncio.shield(future)
+
+        result = {}
+        for key, (value, expire_at) in found.items():
+            if value is not _ABSENT and expire_at is not None and expire_at <= time.time():
+                value, expire_at = _ABSENT, None
+            result[key] = (value, expire_at)
+        return result
+
+    # 写入数据库
+
+    async def flush(self) -> int:
+        """立即把写入缓冲中的修改写入数据库
+
+        Returns:
+            int: 本次写入（包括删除）的键数
+        """
+        if not self._pending:
+            return 0
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            pending = self._pending
+            if not pending:
+                return 0
+            self._pending = OrderedDict()
+            self._flushing = pending
+
+            rows = [
+                {"key": key, "value": op[0], "expire_time": _to_datetime(op[1])}
+                for key, op in pending.items() if op is not _DELETE
+            ]
+            deleted = [key for key, op in pending.items() if op is _DELETE]
+
+            async with self._async_session_factory() as session:
+                try:
+                    if rows:
+                        if self.is_sqlite:
+                            stmt = sqlite_insert(KeyValue)
+                            stmt = stmt.on_conflict_do_update(
+                                index_elements=[KeyValue.key],
+                                set_={"value": stmt.excluded.value, "expire_time": stmt.excluded.expire_time}
+                            )
+                            await session.execute(stmt, rows)
+                        else:
+                            for row in rows:
+                                await session.merge(KeyValue(**row))
+                    for chunk in _chunks(deleted):
+                        await session.execute(delete(KeyValue).where(KeyValue.key.in_(chunk)))
+                    await session.commit()
+                except BaseException as e:
+                    # 放回缓冲，下次再试；期间新的修改优先
+                    pending.update(self._pending)
+                    self._pending = pending
+                    self._flushing = {}
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    logging.error(f"写入键值失败: {str(e)}")
+                    await session.rollback()
+                    return 0
+            self._flushing = {}
+            return len(pending)
+
+    # 公共接口
 
     @validate_arguments
     async def set(
@@ -62,103 +360,94 @@ class KeyvalDB(metaclass=Singleton):
             ex: Optional[Union[int, timedelta]] = None
     ) -> bool:
         """设置键值对，支持过期时间（秒或timedelta）"""
-        async with self._async_session_factory() as session:
-            try:
-                expire_time = None
-                if ex:
-                    # 统一处理时间类型转换
-                    if isinstance(ex, int):
-                        expire_time = datetime.now() + timedelta(seconds=ex)
-                    else:
-                        expire_time = datetime.now() + ex
-
-                kv = KeyValue(
-                    key=key,
-                    value=str(value),
-                    expire_time=expire_time
-                )
-                await session.merge(kv)
-                await session.commit()
-                return True
-            except Exception as e:
-                logging.error(f"设置键值失败: {str(e)}")
-                await session.rollback()
-                return False
+        self._write(key, str(value), _expire_at(ex))
+        return True
+
+    async def mset(
+            self,
+            mapping: Dict[str, Union[str, dict, list]],
+            ex: Optional[Union[int, timedelta]] = None
+    ) -> bool:
+        """批量设置键值对，所有键使用相同的过期时间"""
+        expire_at = _expire_at(ex)
+        for key, value in mapping.items():
+            self._write(str(key), str(value), expire_at)
+        return True
 
     async def get(self, key: str) -> Optional[str]:
         """获取键值，自动处理过期数据"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return None
+        value, _ = await self._lookup(key)
+        return None if value is _ABSENT else value
 
-            if result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return None
-
-            return result.value
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """批量获取键值，按传入顺序返回，不存在的键为 None"""
+        keys = list(keys)
+        entries = {}
+        missing = []
+        for key in keys:
+            entry = self._cache_get(key)
+            if entry is None:
+                missing.append(key)
+            else:
+                entries[key] = entry
+        if missing:
+            entries.update(await self._load_many(missing))
+        return [None if entries[key][0] is _ABSENT else entries[key][0] for key in keys]
 
     async def delete(self, key: str) -> bool:
         """删除键值"""
-        async with self._async_session_factory() as session:
-            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
-            await session.commit()
-            return result.rowcount > 0
+        value, _ = await self._lookup(key)
+        self._remove(key)
+        return value is not _ABSENT
 
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if result and result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return False
-            return result is not None
+        value, _ = await self._lookup(key)
+        return value is not _ABSENT
 
     async def ttl(self, key: str) -> int:
         """获取剩余生存时间（秒）"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result or not result.expire_time:
-                return -1
+        value, expire_at = await self._lookup(key)
+        if value is _ABSENT or expire_at is None:
+            return -1
 
-            remaining = (result.expire_time - datetime.now()).total_seconds()
-            # 明确返回类型处理
-            return int(remaining) if remaining > 0 else -2
+        remaining = expire_at - time.time()
+        # 明确返回类型处理
+        return int(remaining) if remaining > 0 else -2
 
     async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
         """设置过期时间"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return False
+        value, _ = await self._lookup(key)
+        if value is _ABSENT:
+            return False
 
-            expire_time = datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
-            result.expire_time = expire_time
-            await session.commit()
-            return True
+        self._write(key, value, _expire_at(ex))
+        return True
 
     async def keys(self, pattern: str = "*") -> List[str]:
         """查找匹配模式的键"""
+        await self.flush()
         async with self._async_session_factory() as session:
-            # 显式指定查询列类型
-            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
+            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%"))).where(
+                or_(KeyValue.expire_time.is_(None), KeyValue.expire_time > datetime.now())
+            )
             result = await session.execute(query)
             return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
 
-    async def _cleanup_expired(self, interval: int = 3600):
-        """后台定时清理过期数据"""
-        while True:
-            async with self._async_session_factory() as session:
-                await session.execute(
-                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
-                )
-                await session.commit()
-            await asyncio.sleep(interval)
-
     async def close(self):
-        """关闭数据库连接"""
+        """写入剩余的修改并关闭数据库连接"""
+        if self._expiry_task is not None and not self._expiry_task.done():
+            self._expiry_task.cancel()
+            try:
+                await self._expiry_task
+            except asyncio.CancelledError:
+                pass
+        # 不取消后台写入任务，避免写入进行到一半时被中断；通知它写完剩余的修改后退出
+        self._closing = True
+        if self._writer_task is not None and not self._writer_task.done():
+            self._flush_event.set()
+            await self._writer_task
+        await self.flush()
         await self.engine.dispose()
 
     async def __aenter__(self):
@@ -1,11 +1,16 @@
 """
 消息计数器模块
 用于统计消息数量和相关指标
+
+计数先累加在内存中按小时和按天分桶的增量里，由后台线程定期（或程序退出时）
+批量写入 SQLite，查询时再把尚未写入的增量合并到结果中。
 """
 
+import atexit
 import os
 import json
 import sqlite3
+import threading
 import time
 from datetime import datetime, timedelta
 from loguru import logger
@@ -13,12 +18,24 @@ from loguru import logger
 class MessageCounter:
     """消息计数器类，用于统计消息数量"""
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, flush_interval=5.0):
         """初始化消息计数器
 
         参数:
             db_path: 数据库路径，如果为None则使用默认路径
+            flush_interval: 后台线程把内存中的计数写入数据库的间隔（秒）
         """
+        # 尚未写入数据库的计数增量
+        self._lock = threading.Lock()
+        self._hourly_deltas = {}  # (date, hour) -> count
+        self._daily_deltas = {}  # date -> count
+        # 数据库连接由后台线程和查询共用，访问时需要加锁；
+        # 查询时在同一把锁内合并内存中的计数，避免与写入交错导致重复或遗漏
+        self._db_lock = threading.RLock()
+        self.flush_interval = flush_interval
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+
         try:
             # 如果未指定数据库路径，使用默认路径
             if db_path is None:
@@ -58,6 +75,11 @@ class MessageCounter:
             logger.error(f"初始化消息计数器失败: {str(e)}")
             raise
 
+        # 启动后台写入线程，程序退出时写入剩余的计数
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="MessageCounterFlush", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
+
     def __del__(self):
         """析构函数，关闭数据库连接"""
         try:
@@ -66,8 +88,91 @@ class MessageCounter:
         except Exception as e:
             logger.error(f"关闭消息计数器数据库连接失败: {str(e)}")
 
+    def _flush_loop(self):
+        """后台线程：定期把内存中的计数写入数据库"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把内存中尚未写入的计数写入数据库
+
+        返回:
+            bool: 是否成功，失败时计数会保留到下次写入
+        """
+        # 写入期间持有数据库锁，查询不会看到计数既不在内存也不在数据库里的中间状态
+        with self._db_lock:
+            with self._lock:
+                if not self._daily_deltas:
+                    return True
+                hourly, self._hourly_deltas = self._hourly_deltas, {}
+                daily, self._daily_deltas = self._daily_deltas, {}
+
+            try:
+                # 更新小时统计
+                self.cursor.executemany('''
+                    INSERT INTO message_stats (date, hour, count)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(date, hour) DO UPDATE SET
+                    count = count + excluded.count
+                ''', [(date, hour, count) for (date, hour), count in hourly.items()])
+
+                # 更新日统计
+                self.cursor.executemany('''
+                    INSERT INTO daily_stats (date, count)
+                    VALUES (?, ?)
+                    ON CONFLICT(date) DO UPDATE SET
+                    count = count + excluded.count
+                ''', list(daily.items()))
+
+                self.conn.commit()
+                return True
+            except Exception as e:
+                logger.error(f"写入消息计数失败: {str(e)}")
+                try:
+                    self.conn.rollback()
+                except Exception:
+                    pass
+                # 放回内存，下次再写
+                with self._lock:
+                    for key, count in hourly.items():
+                        self._hourly_deltas[key] = self._hourly_deltas.get(key, 0) + count
+                    for key, count in daily.items():
+                        self._daily_deltas[key] = self._daily_deltas.get(key, 0) + count
+                return False
+
+    def close(self):
+        """停止后台线程并写入剩余的计数"""
+        self._stop_event.set()
+        if self._flush_thread is not None and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def pending_hourly(self, date):
+        """获取指定日期尚未写入数据库的每小时计数
+
+        返回:
+            dict: 键为小时(int)，值为消息数量
+        """
+        with self._lock:
+            return {hour: count for (day, hour), count in self._hourly_deltas.items() if day == date}
+
+    def pending_daily(self):
+        """获取尚未写入数据库的每日计数
+
+        返回:
+            dict: 键为日期(YYYY-MM-DD)，值为消息数量
+        """
+        with self._lock:
+            return dict(self._daily_deltas)
+
+    def query(self, sql, params=()):
+        """在数据库锁内执行查询并返回所有结果"""
+        with self._db_lock:
+            self.cursor.execute(sql, params)
+            return self.cursor.fetchall()
+
     def increment(self, count=1, date=None, hour=None):
-        """增加消息计数
+        """增加消息计数，只更新内存中的分桶，由后台线程写入数据库
 
         参数:
             count: 增加的数量，默认为1
@@ -84,23 +189,10 @@ class MessageCounter:
                 date = now.strftime("%Y-%m-%d")
                 hour = now.hour
 
-            # 更新小时统计
-            self.cursor.execute('''
-                INSERT INTO message_stats (date, hour, count)
-                VALUES (?, ?, ?)
-                ON CONFLICT(date, hour) DO UPDATE SET
-                count = count + ?
-            ''', (date, hour, count, count))
-
-            # 更新日统计
-            self.cursor.execute('''
-                INSERT INTO daily_stats (date, count)
-                VALUES (?, ?)
-                ON CONFLICT(date) DO UPDATE SET
-                count = count + ?
-            ''', (date, count, count))
-
-            self.conn.commit()
+            key = (date, int(hour))
+            with self._lock:
+                self._hourly_deltas[key] = self._hourly_deltas.get(key, 0) + count
+                self._daily_deltas[date] = self._daily_deltas.get(date, 0) + count
             return True
         except Exception as e:
             logger.error(f"增加消息计数失败: {str(e)}")
@@ -117,36 +209,40 @@ class MessageCounter:
             today = datetime.now().strftime("%Y-%m-%d")
             yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
 
-            # 获取总消息数
-            self.cursor.execute("SELECT SUM(count) FROM daily_stats")
-            total_messages = self.cursor.fetchone()[0] or 0
-
-            # 获取今日消息数
-            self.cursor.execute("SELECT count FROM daily_stats WHERE date = ?", (today,))
-            result = self.cursor.fetchone()
-            today_messages = result[0] if result else 0
-
-            # 获取昨日消息数
-            self.cursor.execute("SELECT count FROM daily_stats WHERE date = ?", (yesterday,))
-            result = self.cursor.fetchone()
-            yesterday_messages = result[0] if result else 0
-
-            # 计算增长率
-            growth_rate = 0
-            if yesterday_messages > 0:
-                growth_rate = (today_messages - yesterday_messages) / yesterday_messages * 100
-            elif yesterday_messages == 0 and today_messages > 0:
-                # 如果昨天没有消息，今天有消息，增长率为100%
-                growth_rate = 100
-
-            # 获取过去7天的平均每日消息数
-            seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-            self.cursor.execute(
-                "SELECT AVG(count) FROM daily_stats WHERE date >= ? AND date <= ?",
-                (seven_days_ago, today)
-            )
-            result = self.cursor.fetchone()
-            avg_daily = result[0] if result and result[0] else 0
+            # 在数据库锁内读取，避免与后台写入交错
+            with self._db_lock:
+                # 尚未写入数据库的计数
+                pending = self.pending_daily()
+
+                # 获取总消息数
+                total_messages = (self.query("SELECT SUM(count) FROM daily_stats")[0][0] or 0) + sum(pending.values())
+
+                # 获取今日消息数
+                result = self.query("SELECT count FROM daily_stats WHERE date = ?", (today,))
+                today_messages = (result[0][0] if result else 0) + pending.get(today, 0)
+
+                # 获取昨日消息数
+                result = self.query("SELECT count FROM daily_stats WHERE date = ?", (yesterday,))
+                yesterday_messages = (result[0][0] if result else 0) + pending.get(yesterday, 0)
+
+                # 计算增长率
+                growth_rate = 0
+                if yesterday_messages > 0:
+                    growth_rate = (today_messages - yesterday_messages) / yesterday_messages * 100
+                elif yesterday_messages == 0 and today_messages > 0:
+                    # 如果昨天没有消息，今天有消息，增长率为100%
+                    growth_rate = 100
+
+                # 获取过去7天的平均每日消息数
+                seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+                daily = dict(self.query(
+                    "SELECT date, count FROM daily_stats WHERE date >= ? AND date <= ?",
+                    (seven_days_ago, today)
+                ))
+                for date_str, count in pending.items():
+                    if seven_days_ago <= date_str <= today:
+                        daily[date_str] = daily.get(date_str, 0) + count
+                avg_daily = sum(daily.values()) / len(daily) if daily else 0
 
             return {
                 'total_messages': total_messages,
@@ -180,12 +276,17 @@ class MessageCounter:
             start_date_str = start_date.strftime("%Y-%m-%d")
             end_date_str = end_date.strftime("%Y-%m-%d")
 
-            # 查询数据库
-            self.cursor.execute(
-                "SELECT date, count FROM daily_stats WHERE date >= ? AND date <= ? ORDER BY date",
-                (start_date_str, end_date_str)
-            )
-            results = self.cursor.fetchall()
+            # 查询数据库，并合并尚未写入的计数
+            with self._db_lock:
+                daily = dict(self.query(
+                    "SELECT date, count FROM daily_stats WHERE date >= ? AND date <= ?",
+                    (start_date_str, end_date_str)
+                ))
+                pending = self.pending_daily()
+            for date_str, count in pending.items():
+                if start_date_str <= date_str <= end_date_str:
+                    daily[date_str] = daily.get(date_str, 0) + count
+            results = sorted(daily.items())
 
             # 构建结果列表
             stats = []
@@ -238,16 +339,19 @@ def get_hourly_stats():
         counter = get_instance()
         today = datetime.now().strftime("%Y-%m-%d")
 
-        # 查询今天每小时的消息数量
-        counter.cursor.execute(
-            "SELECT hour, count FROM message_stats WHERE date = ? ORDER BY hour",
-            (today,)
-        )
-        results = counter.cursor.fetchall()
+        # 查询今天每小时的消息数量，并合并尚未写入的计数
+        with counter._db_lock:
+            hourly = dict(counter.query(
+                "SELECT hour, count FROM message_stats WHERE date = ?",
+                (today,)
+            ))
+            pending = counter.pending_hourly(today)
+        for hour, count in pending.items():
+            hourly[hour] = hourly.get(hour, 0) + count
 
         # 构建结果字典
         hourly_stats = {}
-        for hour, count in results:
+        for hour, count in sorted(hourly.items()):
             hourly_stats[str(hour)] = count
 
         return hourly_stats
@@ -272,16 +376,20 @@ def get_daily_stats(days=7):
         start_date_str = start_date.strftime("%Y-%m-%d")
         end_date_str = end_date.strftime("%Y-%m-%d")
 
-        # 查询指定日期范围内的每日消息数量
-        counter.cursor.execute(
-            "SELECT date, count FROM daily_stats WHERE date >= ? AND date <= ? ORDER BY date",
-            (start_date_str, end_date_str)
-        )
-        results = counter.cursor.fetchall()
+        # 查询指定日期范围内的每日消息数量，并合并尚未写入的计数
+        with counter._db_lock:
+            daily = dict(counter.query(
+                "SELECT date, count FROM daily_stats WHERE date >= ? AND date <= ?",
+                (start_date_str, end_date_str)
+            ))
+            pending = counter.pending_daily()
+        for date_str, count in pending.items():
+            if start_date_str <= date_str <= end_date_str:
+                daily[date_str] = daily.get(date_str, 0) + count
 
         # 构建结果字典
         daily_stats = {}
-        for date_str, count in results:
+        for date_str, count in sorted(daily.items()):
             daily_stats[date_str] = count
 
         return daily_stats
@@ -1,11 +1,12 @@
 import asyncio
 import logging
 import tomllib
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, List
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, delete
+from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, bindparam, delete, event, insert
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
@@ -29,6 +30,28 @@ class Message(DeclarativeBase):
     is_group = Column(Boolean, default=False, comment='是否群消息')
 
 
+# 已写入的消息再次保存时按 msg_id 更新原来的行，保留第一次保存的时间
+_messages = Message.__table__
+_UPDATE_BY_MSG_ID = _messages.update().where(_messages.c.msg_id == bindparam("b_msg_id")).values(
+    sender_wxid=bindparam("b_sender_wxid"),
+    from_wxid=bindparam("b_from_wxid"),
+    msg_type=bindparam("b_msg_type"),
+    content=bindparam("b_content"),
+    is_group=bindparam("b_is_group"),
+)
+
+# 查询已存在的 msg_id 时每条 IN 语句最多包含的数量
+_IN_CHUNK_SIZE = 500
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """SQLite 使用 WAL 日志，写入时不阻塞读取，且每次提交不必同步整个数据库文件"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 class MessageDB(metaclass=Singleton):
     _instance = None
 
@@ -44,6 +67,26 @@ class MessageDB(metaclass=Singleton):
                 echo=False,
                 future=True
             )
+            if db_url.startswith("sqlite"):
+                event.listen(cls._instance.engine.sync_engine, "connect", _enable_sqlite_wal)
+
+            # 写入缓冲：攒够 batch_size 条或等待 flush_interval 毫秒后在一个事务里批量写入
+            cls._instance.flush_interval = main_config["XYBot"].get("msgDB-flush-interval", 500) / 1000
+            cls._instance.batch_size = max(1, main_config["XYBot"].get("msgDB-batch-size", 200))
+            # 数据库不可用时缓冲最多保留的消息数，以及一批消息最多重试的次数
+            cls._instance.max_pending = max(cls._instance.batch_size, main_config["XYBot"].get("msgDB-max-pending", 10000))
+            cls._instance.max_retries = max(1, main_config["XYBot"].get("msgDB-max-retries", 5))
+            # msg_id -> 待写入的行，同一条消息重复保存时只保留最后一次的内容
+            cls._instance._pending = OrderedDict()
+            # 没有 msg_id 的消息无法去重，单独排队
+            cls._instance._pending_anonymous = []
+            # 连续写入失败的次数，以及缓冲满或重试次数用完后丢弃的消息数
+            cls._instance._failed_attempts = 0
+            cls._instance._dropped = 0
+            cls._instance._flush_event = None
+            cls._instance._flush_lock = None
+            cls._instance._writer_task = None
+            cls._instance._closing = False
             cls._async_session_factory = async_scoped_session(
                 sessionmaker(
                     cls._instance.engine,
@@ -67,31 +110,142 @@ class MessageDB(metaclass=Singleton):
                            msg_type: int = 0,
                            content: str = "",
                            is_group: bool = False) -> bool:
-        """异步保存消息到数据库"""
+        """保存消息到写入缓冲，由后台任务批量写入数据库
+
+        同一个 msg_id 在写入前重复保存时只保留最后一次的内容，已写入的按 msg_id 更新原来的行。
+        """
         # 确保content是字符串类型
         if isinstance(content, dict) and "string" in content:
             content = content["string"]
         elif not isinstance(content, str):
             content = str(content)
-            
+
+        row = {
+            "msg_id": msg_id,
+            "sender_wxid": sender_wxid,
+            "from_wxid": from_wxid,
+            "msg_type": msg_type,
+            "content": content,
+            "is_group": is_group,
+            "timestamp": datetime.now()
+        }
+        if msg_id:
+            previous = self._pending.pop(msg_id, None)
+            if previous is not None:
+                row["timestamp"] = previous["timestamp"]
+            self._pending[msg_id] = row
+        else:
+            self._pending_anonymous.append(row)
+        self._trim_buffer()
+
+        self._ensure_writer()
+        if self.pending_count >= self.batch_size:
+            self._flush_event.set()
+        return True
+
+    @property
+    def pending_count(self) -> int:
+        """写入缓冲中尚未写入数据库的消息数"""
+        return len(self._pending) + len(self._pending_anonymous)
+
+    def _ensure_writer(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self._writer_task is not None and not self._writer_task.done():
+            return
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def _writer(self):
+        """后台写入任务，close() 设置 _closing 后写入剩余的消息并退出"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """立即把写入缓冲中的消息写入数据库
+
+        写入失败的消息放回缓冲，连续失败 max_retries 次后丢弃这一批并记录日志。
+
+        Returns:
+            int: 本次写入的消息数
+        """
+        if not self.pending_count:
+            return 0
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self.pending_count:
+                return 0
+            pending, anonymous = self._pending, self._pending_anonymous
+            self._pending = OrderedDict()
+            self._pending_anonymous = []
+            count = len(pending) + len(anonymous)
+
+            try:
+                await self._write(list(pending.values()), anonymous)
+            except BaseException as e:
+                cancelled = isinstance(e, asyncio.CancelledError)
+                if not cancelled:
+                    self._failed_attempts += 1
+                if cancelled or self._failed_attempts < self.max_retries:
+                    # 放回缓冲，下次再试；期间新保存的同一条消息优先
+                    pending.update(self._pending)
+                    self._pending = pending
+                    self._pending_anonymous = anonymous + self._pending_anonymous
+                    self._trim_buffer()
+                    if cancelled:
+                        raise
+                    logging.error(f"批量保存消息失败（连续第 {self._failed_attempts} 次）: {str(e)}")
+                else:
+                    self._dropped += count
+                    self._failed_attempts = 0
+                    logging.error(f"批量保存消息连续失败 {self.max_retries} 次，丢弃 {count} 条消息"
+                                  f"（累计丢弃 {self._dropped} 条）: {str(e)}")
+                return 0
+
+            self._failed_attempts = 0
+            return count
+
+    async def _write(self, rows: List[dict], anonymous: List[dict]):
+        """在一个事务里写入一批消息：已存在的 msg_id 更新原来的行，其余插入新行"""
         async with self._async_session_factory() as session:
             try:
-                message = Message(
-                    msg_id=msg_id,
-                    sender_wxid=sender_wxid,
-                    from_wxid=from_wxid,
-                    msg_type=msg_type,
-                    content=content,
-                    is_group=is_group,
-                    timestamp=datetime.now()
-                )
-                session.add(message)
+                msg_ids = [row["msg_id"] for row in rows]
+                existing = set()
+                for start in range(0, len(msg_ids), _IN_CHUNK_SIZE):
+                    result = await session.execute(
+                        select(Message.msg_id).where(Message.msg_id.in_(msg_ids[start:start + _IN_CHUNK_SIZE]))
+                    )
+                    existing.update(result.scalars())
+
+                inserts = [row for row in rows if row["msg_id"] not in existing] + anonymous
+                updates = [{f"b_{key}": value for key, value in row.items()}
+                           for row in rows if row["msg_id"] in existing]
+                if inserts:
+                    await session.execute(insert(Message), inserts)
+                if updates:
+                    await session.execute(_UPDATE_BY_MSG_ID, updates)
                 await session.commit()
-                return True
-            except Exception as e:
-                logging.error(f"保存消息失败: {str(e)}")
+            except BaseException:
                 await session.rollback()
-                return False
+                raise
+
+    def _trim_buffer(self):
+        """缓冲超过 max_pending 时丢弃最早的消息，数据库长时间不可用时内存不会无限增长"""
+        overflow = self.pending_count - self.max_pending
+        if overflow <= 0:
+            return
+        self._dropped += overflow
+        while overflow and self._pending:
+            self._pending.popitem(last=False)
+            overflow -= 1
+        del self._pending_anonymous[:overflow]
 
     async def get_messages(self,
                            start_time: Optional[datetime] = None,
@@ -102,6 +256,7 @@ class MessageDB(metaclass=Singleton):
                            is_group: Optional[bool] = None,
                            limit: int = 100) -> List[Message]:
         """异步查询消息记录"""
+        await self.flush()
         async with self._async_session_factory() as session:
             try:
                 query = select(Message).order_by(Message.timestamp.desc()).limit(limit)
@@ -126,7 +281,13 @@ class MessageDB(metaclass=Singleton):
                 return []
 
     async def close(self):
-        """关闭数据库连接"""
+        """写入缓冲中剩余的消息并关闭数据库连接"""
+        # 不取消后台任务，避免写入进行到一半时被中断；通知它写完这一批后退出
+        self._closing = True
+        if self._writer_task is not None and not self._writer_task.done():
+            self._flush_event.set()
+            await self._writer_task
+        await self.flush()
         await self.engine.dispose()
 
     async def cleanup_messages(self):
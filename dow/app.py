@@ -17,6 +17,12 @@ if os.path.exists(lib_dir) and lib_dir not in sys.path:
         sys.path.append(wx849_dir)
         print(f"已添加wx849目录到Python路径: {wx849_dir}")
 
+# 添加主框架根目录到Python路径，媒体转码、消息去重等模块与主框架共用 utils 下的实现
+# 追加在最后，DOW 自己的同名包（plugins 等）优先
+root_dir = os.path.dirname(current_dir)
+if os.path.exists(os.path.join(root_dir, "utils")) and root_dir not in sys.path:
+    sys.path.append(root_dir)
+
 from channel import channel_factory
 from common import const
 from config import load_config
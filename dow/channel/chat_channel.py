@@ -29,6 +29,8 @@ class ChatChannel(Channel):
     futures = {}  # 记录每个session_id提交到线程池的future对象, 用于重置会话时把没执行的future取消掉，正在执行的不会被取消
     sessions = {}  # 用于控制并发，每个session_id同时只能有一个context在处理
     lock = threading.Lock()  # 用于控制对sessions的访问
+    cond = threading.Condition(lock)  # 有新消息或有任务处理完时唤醒消费者线程
+    ready_sessions = {}  # 需要调度的session_id，按唤醒先后排列（只用键，当作有序集合）
 
     def __init__(self):
         _thread = threading.Thread(target=self.consume)
@@ -793,71 +795,92 @@ class ChatChannel(Channel):
                 logger.info("Worker cancelled, session_id = {}".format(session_id))
             except Exception as e:
                 logger.exception("Worker raise exception: {}".format(e))
-            with self.lock:
+            with self.cond:
                 self.sessions[session_id][1].release()
+                # 任务结束后该会话可以处理下一条消息，或者已经没有消息可以清理
+                self.ready_sessions[session_id] = None
+                self.cond.notify()
 
         return func
 
     def produce(self, context: Context):
         session_id = context.get("session_id", 0)
-        with self.lock:
+        with self.cond:
             if session_id not in self.sessions:
                 self.sessions[session_id] = [
                     Dequeue(),
                     threading.BoundedSemaphore(conf().get("concurrency_in_session", 4)),
                 ]
+                self.futures.setdefault(session_id, [])
             if context.type == ContextType.TEXT and context.content.startswith("#"):
                 self.sessions[session_id][0].putleft(context)  # 优先处理管理命令
             else:
                 self.sessions[session_id][0].put(context)
+            self.ready_sessions[session_id] = None
+            self.cond.notify()
 
     # 消费者函数，单独线程，用于从消息队列中取出消息并处理
+    # 没有消息时在条件变量上等待，produce()放入消息或线程池中的任务结束时才被唤醒，只处理被唤醒的会话
     def consume(self):
         while True:
-            with self.lock:
-                session_ids = list(self.sessions.keys())
+            with self.cond:
+                while not self.ready_sessions:
+                    self.cond.wait()
+                session_ids = list(self.ready_sessions)
+                self.ready_sessions.clear()
             for session_id in session_ids:
-                with self.lock:
-                    context_queue, semaphore = self.sessions[session_id]
-                if semaphore.acquire(blocking=False):  # 等线程处理完毕才能删除
-                    if not context_queue.empty():
-                        context = context_queue.get()
-                        logger.debug("[chat_channel] consume context: {}".format(context))
-                        future: Future = handler_pool.submit(self._handle, context)
-                        future.add_done_callback(self._thread_pool_callback(session_id, context=context))
-                        with self.lock:
-                            if session_id not in self.futures:
-                                self.futures[session_id] = []
-                            self.futures[session_id].append(future)
-                    elif semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
-                        with self.lock:
-                            self.futures[session_id] = [t for t in self.futures[session_id] if not t.done()]
-                            assert len(self.futures[session_id]) == 0, "thread pool error"
-                            del self.sessions[session_id]
+                self._dispatch_session(session_id)
+
+    # 在会话的并发上限内把排队的消息提交到线程池，会话中没有消息也没有任务在处理时删除会话
+    def _dispatch_session(self, session_id):
+        while True:
+            with self.lock:
+                if session_id not in self.sessions:
+                    return
+                context_queue, semaphore = self.sessions[session_id]
+                if not semaphore.acquire(blocking=False):  # 并发已满，任务结束时会再次唤醒
+                    return
+                if context_queue.empty():
+                    if semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
+                        futures = [t for t in self.futures.pop(session_id, []) if not t.done()]
+                        assert len(futures) == 0, "thread pool error"
+                        del self.sessions[session_id]
                     else:
                         semaphore.release()
-            time.sleep(0.2)
+                    return
+                context = context_queue.get()
+            logger.debug("[chat_channel] consume context: {}".format(context))
+            # 在锁外提交：future已结束时add_done_callback会立即在当前线程执行回调，回调中需要获取锁
+            future: Future = handler_pool.submit(self._handle, context)
+            with self.lock:
+                self.futures.setdefault(session_id, []).append(future)
+            future.add_done_callback(self._thread_pool_callback(session_id, context=context))
 
     # 取消session_id对应的所有任务，只能取消排队的消息和已提交线程池但未执行的任务
     def cancel_session(self, session_id):
-        with self.lock:
-            if session_id in self.sessions:
-                for future in self.futures[session_id]:
-                    future.cancel()
-                cnt = self.sessions[session_id][0].qsize()
-                if cnt > 0:
-                    logger.info("Cancel {} messages in session {}".format(cnt, session_id))
-                self.sessions[session_id][0] = Dequeue()
+        self._cancel_sessions([session_id])
 
     def cancel_all_session(self):
         with self.lock:
-            for session_id in self.sessions:
-                for future in self.futures[session_id]:
-                    future.cancel()
+            session_ids = list(self.sessions)
+        self._cancel_sessions(session_ids)
+
+    def _cancel_sessions(self, session_ids):
+        futures = []
+        with self.cond:
+            for session_id in session_ids:
+                if session_id not in self.sessions:
+                    continue
+                futures.extend(self.futures.get(session_id, []))
                 cnt = self.sessions[session_id][0].qsize()
                 if cnt > 0:
                     logger.info("Cancel {} messages in session {}".format(cnt, session_id))
                 self.sessions[session_id][0] = Dequeue()
+                self.ready_sessions[session_id] = None  # 没有任务在处理时清理会话
+            self.cond.notify()
+        # 取消成功时回调会在当前线程立即执行并获取锁，所以在锁外取消
+        for future in futures:
+            future.cancel()
 
 
 def check_prefix(content, prefix_list):
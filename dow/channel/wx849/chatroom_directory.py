@@ -0,0 +1,292 @@
+"""
+WX849 群聊目录
+
+进程内保存群聊的名称、群主、成员和更新时间，群名、群成员昵称等查询直接读内存索引。
+每个群一行保存在 SQLite 中，更新一个群只写这一行，不再重写整个 wx849_rooms.json；
+首次启动时导入旧的 wx849_rooms.json。
+刷新在一个后台线程的事件循环中逐个执行，同一个群同一时刻只刷新一次，
+刚刷新过（无论成功与否）的群在一段时间内不再重复请求接口。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional
+
+from common.log import logger
+
+TMP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
+
+# 群主在成员列表中的标志
+OWNER_MEMBER_FLAG = 2049
+
+
+def member_wxid(member: dict) -> str:
+    """群成员的wxid，兼容接口原始字段和简化后的字段"""
+    return member.get("UserName") or member.get("wxid") or ""
+
+
+def member_display_name(member: Optional[dict]) -> str:
+    """群成员的显示名称，优先使用群昵称，其次使用个人昵称"""
+    if not member:
+        return ""
+    return member.get("DisplayName") or member.get("NickName") or member.get("nickname") or ""
+
+
+class ChatroomDirectory:
+    """群聊目录"""
+
+    def __init__(self, db_path=None, legacy_json=None, ttl=86400, min_refresh_interval=60):
+        """
+        参数:
+            db_path: SQLite 数据库路径，默认 tmp/wx849_rooms.db
+            legacy_json: 首次启动时导入的旧群聊信息文件，默认 tmp/wx849_rooms.json
+            ttl: 群成员信息的有效期（秒），与原来的缓存有效期相同
+            min_refresh_interval: 同一个群两次刷新的最小间隔（秒）
+        """
+        self.db_path = db_path or os.path.join(TMP_DIR, "wx849_rooms.db")
+        self.legacy_json = legacy_json or os.path.join(TMP_DIR, "wx849_rooms.json")
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._fetcher: Optional[Callable[[str], Awaitable[Optional[dict]]]] = None
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._conn: Optional[sqlite3.Connection] = None
+        # 群ID -> 群聊信息，字段与原 wx849_rooms.json 相同
+        self._rooms: Dict[str, dict] = {}
+        # 群ID -> {成员wxid -> 成员信息}
+        self._members: Dict[str, Dict[str, dict]] = {}
+        # 成员wxid -> 在任一群中的显示名称
+        self._nicknames: Dict[str, str] = {}
+
+        # 后台刷新
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, Future] = {}
+        self._attempted: Dict[str, float] = {}
+
+        # 统计
+        self._refreshes = 0
+        self._coalesced = 0
+        self._throttled = 0
+        self._failed = 0
+
+    def set_fetcher(self, fetcher: Callable[[str], Awaitable[Optional[dict]]]):
+        """设置刷新群聊信息的协程函数
+
+        fetcher(group_id) 返回要更新的字段（nickName、chatRoomOwner、members、memberCount），
+        获取失败时返回 None。它在目录的后台事件循环中执行。
+        """
+        self._fetcher = fetcher
+
+    def get(self, group_id: str) -> Optional[dict]:
+        """群聊信息的副本，不存在时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            room = self._rooms.get(group_id)
+            return dict(room) if room is not None else None
+
+    def group_ids(self) -> list:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._rooms)
+
+    def name(self, group_id: str) -> Optional[str]:
+        """群名称，未知（或只知道群ID）时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            room = self._rooms.get(group_id)
+        name = room.get("nickName") if room else None
+        return name if name and name != group_id else None
+
+    def is_fresh(self, group_id: str) -> bool:
+        """群聊信息存在、已有成员且未过期"""
+        with self._lock:
+            self._ensure_loaded()
+            room = self._rooms.get(group_id)
+        return bool(room and room.get("members") and time.time() - room.get("last_update", 0) < self.ttl)
+
+    def member(self, group_id: str, wxid: str) -> Optional[dict]:
+        """群成员信息，不存在时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._members.get(group_id, {}).get(wxid)
+
+    def nickname(self, wxid: str) -> Optional[str]:
+        """成员在任一群中的显示名称，用于不知道群ID时的昵称查询"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._nicknames.get(wxid)
+
+    def update(self, group_id: str, **fields) -> dict:
+        """更新群聊信息并保存这一个群，返回更新后的群聊信息副本"""
+        with self._lock:
+            self._ensure_loaded()
+            room = self._rooms.get(group_id)
+            if room is None:
+                room = self._rooms[group_id] = {
+                    "chatroomId": group_id,
+                    "nickName": group_id,
+                    "chatRoomOwner": "",
+                    "members": [],
+                }
+            for key, value in fields.items():
+                if value is not None:
+                    room[key] = value
+            room["last_update"] = int(time.time())
+            if "members" in fields and fields["members"] is not None:
+                self._index_members(group_id, room["members"])
+            self._save(group_id, room)
+            return dict(room)
+
+    def request_refresh(self, group_id: str, force=False) -> Optional[Future]:
+        """请求在后台刷新群聊信息，不等待结果
+
+        返回:
+            Optional[concurrent.futures.Future]: 刷新完成的 Future，结果为刷新后的群聊信息；
+                没有设置 fetcher 或最近刚刷新过（force 为 False 时）返回 None
+        """
+        if not group_id or self._fetcher is None:
+            return None
+        with self._lock:
+            future = self._pending.get(group_id)
+            if future is not None:
+                self._coalesced += 1
+                return future
+            attempted = self._attempted.get(group_id)
+            if not force and attempted is not None and time.monotonic() - attempted < self.min_refresh_interval:
+                self._throttled += 1
+                return None
+            future = self._pending[group_id] = Future()
+            self._ensure_worker()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, group_id)
+        return future
+
+    async def refresh(self, group_id: str, force=False) -> Optional[dict]:
+        """刷新群聊信息并等待完成，可以在任意线程的事件循环中调用"""
+        future = self.request_refresh(group_id, force=force)
+        if future is None:
+            return self.get(group_id)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rooms": len(self._rooms),
+                "members": sum(len(members) for members in self._members.values()),
+                "pending": len(self._pending),
+                "refreshes": self._refreshes,
+                "coalesced": self._coalesced,
+                "throttled": self._throttled,
+                "failed": self._failed,
+            }
+
+    def _index_members(self, group_id: str, members: list):
+        index = {}
+        for member in members:
+            if not isinstance(member, dict):
+                continue
+            wxid = member_wxid(member)
+            if not wxid:
+                continue
+            index[wxid] = member
+            name = member_display_name(member)
+            if name:
+                self._nicknames[wxid] = name
+        self._members[group_id] = index
+
+    def _ensure_loaded(self):
+        """首次访问时从数据库加载，数据库为空时导入旧的 JSON 文件（调用方持有锁）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chatrooms (chatroom_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_update INTEGER)"
+            )
+            for group_id, data in self._conn.execute("SELECT chatroom_id, data FROM chatrooms"):
+                try:
+                    self._rooms[group_id] = json.loads(data)
+                except ValueError:
+                    logger.warning(f"[WX849] 群聊目录中 {group_id} 的数据无法解析，已忽略")
+            if not self._rooms:
+                self._import_legacy_json()
+        except Exception as e:
+            logger.error(f"[WX849] 加载群聊目录失败，仅使用内存: {e}")
+            self._conn = None
+        for group_id, room in self._rooms.items():
+            self._index_members(group_id, room.get("members") or [])
+        logger.debug(f"[WX849] 群聊目录已加载 {len(self._rooms)} 个群聊")
+
+    def _import_legacy_json(self):
+        if not os.path.exists(self.legacy_json):
+            return
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                rooms = json.load(f)
+        except Exception as e:
+            logger.error(f"[WX849] 读取旧的群聊信息文件失败: {e}")
+            return
+        rooms = {group_id: room for group_id, room in rooms.items() if isinstance(room, dict)}
+        self._rooms.update(rooms)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chatrooms (chatroom_id, data, last_update) VALUES (?, ?, ?)",
+                [(group_id, json.dumps(room, ensure_ascii=False), room.get("last_update", 0))
+                 for group_id, room in rooms.items()],
+            )
+        logger.info(f"[WX849] 已从 {self.legacy_json} 导入 {len(rooms)} 个群聊信息")
+
+    def _save(self, group_id: str, room: dict):
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chatrooms (chatroom_id, data, last_update) VALUES (?, ?, ?)",
+                    (group_id, json.dumps(room, ensure_ascii=False), room.get("last_update", 0)),
+                )
+        except Exception as e:
+            logger.error(f"[WX849] 保存群聊 {group_id} 信息失败: {e}")
+
+    def _ensure_worker(self):
+        """启动后台刷新线程（调用方持有锁）"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._queue = asyncio.Queue()
+        threading.Thread(target=self._loop.run_forever, name="wx849-chatroom-refresh", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    async def _run(self):
+        while True:
+            group_id = await self._queue.get()
+            room = None
+            try:
+                self._refreshes += 1
+                fields = await self._fetcher(group_id)
+                if fields:
+                    room = self.update(group_id, **fields)
+                    logger.debug(f"[WX849] 已刷新群聊 {group_id}，成员数: {len(room.get('members') or [])}")
+                else:
+                    self._failed += 1
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"[WX849] 刷新群聊 {group_id} 信息失败: {e}")
+            with self._lock:
+                self._attempted[group_id] = time.monotonic()
+                future = self._pending.pop(group_id, None)
+            if room is None:
+                room = self.get(group_id)
+            if future is not None:
+                future.set_result(room)
+
+
+chatroom_directory = ChatroomDirectory()
@@ -17,8 +17,12 @@ from bridge.reply import Reply, ReplyType
 from channel.chat_channel import ChatChannel
 from channel.chat_message import ChatMessage
 from channel.wx849.wx849_message import WX849Message  # 改为从wx849_message导入WX849Message
+from channel.wx849.chatroom_directory import OWNER_MEMBER_FLAG, chatroom_directory, member_display_name
+from common.dedupe_window import DedupeWindow
 from common.expired_dict import ExpiredDict
 from common.log import logger
+from common.media_transcoder import TranscodeError, media_transcoder
+from common.session_executor import SessionExecutor
 from common.singleton import singleton
 from common.time_check import time_checker
 from common.utils import remove_markdown_symbol
@@ -28,7 +32,6 @@ from aiohttp import web
 import uuid
 import re
 import base64
-import subprocess
 import math
 from io import BytesIO
 from PIL import Image
@@ -185,7 +188,7 @@ def _check(func):
             return
 
         # 直接调用原始处理函数，不再使用独立线程
-        # 因为消息已经在独立线程中处理了
+        # 因为消息已经在消息线程池中处理了
         return func(self, cmsg)
     return wrapper
 
@@ -199,89 +202,66 @@ class WX849Channel(ChatChannel):
     # 创建一个全局锁，用于线程安全的消息去重
     _message_lock = threading.Lock()
 
-    # 创建一个全局集合，用于记录已处理的消息ID
-    _processed_message_ids = set()
+    # 全局去重窗口，记录最近处理过的1000条消息ID
+    _processed_message_ids = DedupeWindow(1000)
 
     # 不再使用单独的图片消息ID集合，所有消息ID都记录在_processed_message_ids中
 
     def _process_single_message_independently(self, msg_id: str, msg: dict):
-        """在独立线程中处理单条消息"""
-        try:
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # 记录处理信息
-            thread_id = threading.get_ident()
-            logger.debug(f"[WX849] 独立消息处理线程 {thread_id} 开始处理 - 消息ID: {msg_id}")
+        """预处理单条消息（解析@列表、去重、构建独立的消息对象），再交给消息线程池处理
 
-            try:
-                # 构建标准的消息对象
-                is_group = False
-
-                # 判断是否是群消息
-                from_user_id = msg.get("fromUserName", msg.get("FromUserName", ""))
-                to_user_id = msg.get("toUserName", msg.get("ToUserName", ""))
-
-                if isinstance(from_user_id, dict) and "string" in from_user_id:
-                    from_user_id = from_user_id["string"]
-                if isinstance(to_user_id, dict) and "string" in to_user_id:
-                    to_user_id = to_user_id["string"]
-
-                if from_user_id and from_user_id.endswith("@chatroom"):
-                    is_group = True
-                elif to_user_id and to_user_id.endswith("@chatroom"):
-                    is_group = True
-                    # 交换发送者和接收者，确保from_user_id是群ID
-                    from_user_id, to_user_id = to_user_id, from_user_id
-
-                # 创建消息对象
-                cmsg = WX849Message(msg, is_group)
-
-                # 注释掉从回调消息中获取发送者昵称的部分，改用API接口获取
-                # if "SenderNickName" in msg and msg["SenderNickName"]:
-                #     cmsg.sender_nickname = msg["SenderNickName"]
-                #     logger.debug(f"[WX849] 使用回调中的发送者昵称: {cmsg.sender_nickname}")
-
-                # 处理被@消息
-                if is_group and "@" in str(msg.get("Content", "")):
-                    # 检查是否有@列表
-                    at_list = []
-
-                    # 方法1: 从RawLogLine中提取@列表
-                    raw_log_line = msg.get("RawLogLine", "")
-
-                    # 检查是否是被@消息
-                    if raw_log_line and "收到被@消息" in raw_log_line:
-                        logger.debug(f"[WX849] 检测到被@消息: {raw_log_line}")
-                        # 设置is_at标志
-                        cmsg.is_at = True
-                    # 检查是否有IsAtMessage标志
-                    elif "IsAtMessage" in msg and msg["IsAtMessage"]:
-                        logger.debug(f"[WX849] 检测到IsAtMessage标志")
-                        # 设置is_at标志
-                        cmsg.is_at = True
+        在通道的事件循环中调用，处理函数在线程池中执行，同一会话的消息按收到的顺序处理。
+        """
+        try:
+            # 构建标准的消息对象
+            is_group = False
+
+            # 判断是否是群消息
+            from_user_id = msg.get("fromUserName", msg.get("FromUserName", ""))
+            to_user_id = msg.get("toUserName", msg.get("ToUserName", ""))
+
+            if isinstance(from_user_id, dict) and "string" in from_user_id:
+                from_user_id = from_user_id["string"]
+            if isinstance(to_user_id, dict) and "string" in to_user_id:
+                to_user_id = to_user_id["string"]
+
+            if from_user_id and from_user_id.endswith("@chatroom"):
+                is_group = True
+            elif to_user_id and to_user_id.endswith("@chatroom"):
+                is_group = True
+                # 交换发送者和接收者，确保from_user_id是群ID
+                from_user_id, to_user_id = to_user_id, from_user_id
+
+            # 创建消息对象
+            cmsg = WX849Message(msg, is_group)
+
+            # 注释掉从回调消息中获取发送者昵称的部分，改用API接口获取
+            # if "SenderNickName" in msg and msg["SenderNickName"]:
+            #     cmsg.sender_nickname = msg["SenderNickName"]
+            #     logger.debug(f"[WX849] 使用回调中的发送者昵称: {cmsg.sender_nickname}")
+
+            # 处理被@消息
+            if is_group and "@" in str(msg.get("Content", "")):
+                # 检查是否有@列表
+                at_list = []
+
+                # 方法1: 从RawLogLine中提取@列表
+                raw_log_line = msg.get("RawLogLine", "")
+
+                # 检查是否是被@消息
+                if raw_log_line and "收到被@消息" in raw_log_line:
+                    logger.debug(f"[WX849] 检测到被@消息: {raw_log_line}")
+                    # 设置is_at标志
+                    cmsg.is_at = True
+                # 检查是否有IsAtMessage标志
+                elif "IsAtMessage" in msg and msg["IsAtMessage"]:
+                    logger.debug(f"[WX849] 检测到IsAtMessage标志")
+                    # 设置is_at标志
+                    cmsg.is_at = True
 
-                        # 尝试从日志行中提取@列表
-                        if "@:" in raw_log_line:
-                            try:
-                                at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
-                                if at_part.startswith("[") and at_part.endswith("]"):
-                                    # 解析@列表
-                                    at_list_str = at_part[1:-1]  # 去除[]
-                                    if at_list_str:
-                                        at_items = at_list_str.split(",")
-                                        for item in at_items:
-                                            item = item.strip().strip("'\"")
-                                            if item:
-                                                at_list.append(item)
-                                        logger.debug(f"[WX849] 从被@消息中提取到@列表: {at_list}")
-                            except Exception as e:
-                                logger.debug(f"[WX849] 从被@消息中提取@列表失败: {e}")
-                    # 普通消息中的@列表提取
-                    elif raw_log_line and "@:" in raw_log_line:
+                    # 尝试从日志行中提取@列表
+                    if "@:" in raw_log_line:
                         try:
-                            # 尝试从日志行中提取@列表
                             at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
                             if at_part.startswith("[") and at_part.endswith("]"):
                                 # 解析@列表
@@ -292,167 +272,168 @@ class WX849Channel(ChatChannel):
                                         item = item.strip().strip("'\"")
                                         if item:
                                             at_list.append(item)
-                                    logger.debug(f"[WX849] 从RawLogLine提取到@列表: {at_list}")
+                                    logger.debug(f"[WX849] 从被@消息中提取到@列表: {at_list}")
                         except Exception as e:
-                            logger.debug(f"[WX849] 从RawLogLine提取@列表失败: {e}")
-
-                    # 方法2: 从MsgSource中提取@列表
-                    if not at_list and "MsgSource" in msg:
-                        try:
-                            msg_source = msg.get("MsgSource", "")
-                            if msg_source:
-                                root = ET.fromstring(msg_source)
-                                atuserlist_elem = root.find('atuserlist')
-                                if atuserlist_elem is not None and atuserlist_elem.text:
-                                    at_users = atuserlist_elem.text.split(",")
-                                    for user in at_users:
-                                        if user.strip():
-                                            at_list.append(user.strip())
-                                    logger.debug(f"[WX849] 从MsgSource提取到@列表: {at_list}")
-                        except Exception as e:
-                            logger.debug(f"[WX849] 从MsgSource提取@列表失败: {e}")
+                            logger.debug(f"[WX849] 从被@消息中提取@列表失败: {e}")
+                # 普通消息中的@列表提取
+                elif raw_log_line and "@:" in raw_log_line:
+                    try:
+                        # 尝试从日志行中提取@列表
+                        at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
+                        if at_part.startswith("[") and at_part.endswith("]"):
+                            # 解析@列表
+                            at_list_str = at_part[1:-1]  # 去除[]
+                            if at_list_str:
+                                at_items = at_list_str.split(",")
+                                for item in at_items:
+                                    item = item.strip().strip("'\"")
+                                    if item:
+                                        at_list.append(item)
+                                logger.debug(f"[WX849] 从RawLogLine提取到@列表: {at_list}")
+                    except Exception as e:
+                        logger.debug(f"[WX849] 从RawLogLine提取@列表失败: {e}")
 
-                    # 设置@列表到消息对象
-                    if at_list:
-                        cmsg.at_list = at_list
-                        # 设置is_at标志
-                        cmsg.is_at = self.wxid in at_list
-                        logger.debug(f"[WX849] 设置@列表: {at_list}, is_at: {cmsg.is_at}")
+                # 方法2: 从MsgSource中提取@列表
+                if not at_list and "MsgSource" in msg:
+                    try:
+                        msg_source = msg.get("MsgSource", "")
+                        if msg_source:
+                            root = ET.fromstring(msg_source)
+                            atuserlist_elem = root.find('atuserlist')
+                            if atuserlist_elem is not None and atuserlist_elem.text:
+                                at_users = atuserlist_elem.text.split(",")
+                                for user in at_users:
+                                    if user.strip():
+                                        at_list.append(user.strip())
+                                logger.debug(f"[WX849] 从MsgSource提取到@列表: {at_list}")
+                    except Exception as e:
+                        logger.debug(f"[WX849] 从MsgSource提取@列表失败: {e}")
 
-                # 处理消息
-                logger.debug(f"[WX849] 处理回调消息: ID:{cmsg.msg_id} 类型:{cmsg.msg_type}")
+                # 设置@列表到消息对象
+                if at_list:
+                    cmsg.at_list = at_list
+                    # 设置is_at标志
+                    cmsg.is_at = self.wxid in at_list
+                    logger.debug(f"[WX849] 设置@列表: {at_list}, is_at: {cmsg.is_at}")
 
-                # 使用线程安全的方式检查和标记消息
-                with self.__class__._message_lock:
-                    # 检查消息是否已经处理过 - 使用全局集合
-                    if cmsg.msg_id in self.__class__._processed_message_ids:
-                        logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已在全局集合中标记为处理过，忽略")
-                        return
+            # 处理消息
+            logger.debug(f"[WX849] 处理回调消息: ID:{cmsg.msg_id} 类型:{cmsg.msg_type}")
 
-                    # 检查本地字典中是否有这个消息ID（兼容旧代码）
-                    if cmsg.msg_id in self.received_msgs:
-                        logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已在本地字典中标记为处理过，忽略")
-                        return
+            # 使用线程安全的方式检查和标记消息
+            with self.__class__._message_lock:
+                # 检查消息是否已经处理过 - 使用全局去重窗口
+                if cmsg.msg_id in self.__class__._processed_message_ids:
+                    logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已在全局集合中标记为处理过，忽略")
+                    return
 
-                    # 标记消息为已处理 - 在全局集合和本地字典中标记
-                    # 所有消息都在这里标记，包括图片消息
-                    self.__class__._processed_message_ids.add(cmsg.msg_id)
-                    self.received_msgs[cmsg.msg_id] = True
+                # 检查本地字典中是否有这个消息ID（兼容旧代码）
+                if cmsg.msg_id in self.received_msgs:
+                    logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已在本地字典中标记为处理过，忽略")
+                    return
 
-                    # 如果集合太大，清理一下
-                    if len(self.__class__._processed_message_ids) > 1000:
-                        # 只保留最近的500条
-                        self.__class__._processed_message_ids = set(list(self.__class__._processed_message_ids)[-500:])
+                # 标记消息为已处理 - 在全局集合和本地字典中标记
+                # 所有消息都在这里标记，包括图片消息
+                self.__class__._processed_message_ids.add(cmsg.msg_id)
+                self.received_msgs[cmsg.msg_id] = True
 
-                    # 不再使用_processed_image_ids集合
+                # 不再使用_processed_image_ids集合
 
-                # 检查消息时间是否过期
-                create_time = cmsg.create_time  # 消息时间戳
-                current_time = int(time.time())
+            # 检查消息时间是否过期
+            create_time = cmsg.create_time  # 消息时间戳
+            current_time = int(time.time())
 
-                # 设置超时时间为60秒
-                timeout = 60
-                if int(create_time) < current_time - timeout:
-                    logger.debug(f"[WX849] 历史消息 {cmsg.msg_id} 已跳过，时间差: {current_time - int(create_time)}秒")
-                    return
+            # 设置超时时间为60秒
+            timeout = 60
+            if int(create_time) < current_time - timeout:
+                logger.debug(f"[WX849] 历史消息 {cmsg.msg_id} 已跳过，时间差: {current_time - int(create_time)}秒")
+                return
 
-                # 创建一个全新的消息对象，避免共享引用
-                new_msg = WX849Message(msg, is_group)
+            # 创建一个全新的消息对象，避免共享引用
+            new_msg = WX849Message(msg, is_group)
 
-                # 复制原始消息对象的属性
-                for attr_name in dir(cmsg):
-                    if not attr_name.startswith('_') and not callable(getattr(cmsg, attr_name)):
-                        try:
-                            setattr(new_msg, attr_name, getattr(cmsg, attr_name))
-                        except Exception:
-                            pass
-
-                # 设置正确的接收者和会话ID
-                if is_group:
-                    # 如果是群聊，接收者应该是群ID
-                    new_msg.to_user_id = from_user_id  # 群ID
-                    new_msg.session_id = from_user_id  # 使用群ID作为会话ID
-                    new_msg.other_user_id = from_user_id  # 群ID
-                    new_msg.is_group = True
-
-                    # 确保群聊消息的其他字段也是正确的
-                    new_msg.group_id = from_user_id
-
-                    # 清除可能从其他消息继承的私聊相关字段
-                    if hasattr(new_msg, 'other_user_nickname'):
-                        delattr(new_msg, 'other_user_nickname')
-                else:
-                    # 如果是私聊，接收者应该是发送者ID
-                    sender_wxid = msg.get("SenderWxid", "")
-                    if not sender_wxid:
-                        sender_wxid = from_user_id
-
-                    new_msg.to_user_id = sender_wxid
-                    new_msg.session_id = sender_wxid  # 使用发送者ID作为会话ID
-                    new_msg.other_user_id = sender_wxid
-                    new_msg.is_group = False
-
-                    # 清除可能从其他消息继承的群聊相关字段
-                    if hasattr(new_msg, 'group_name'):
-                        delattr(new_msg, 'group_name')
-                    if hasattr(new_msg, 'group_id'):
-                        delattr(new_msg, 'group_id')
-                    if hasattr(new_msg, 'is_at'):
-                        new_msg.is_at = False
-                    if hasattr(new_msg, 'at_list'):
-                        new_msg.at_list = []
-
-                # 使用新的消息对象替换原始消息对象
-                cmsg = new_msg
-
-                # 创建一个新的线程来处理消息，确保每个消息都有完全独立的处理环境
-                def process_message_in_new_thread():
+            # 复制原始消息对象的属性
+            for attr_name in dir(cmsg):
+                if not attr_name.startswith('_') and not callable(getattr(cmsg, attr_name)):
                     try:
-                        # 创建新的事件循环
-                        msg_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(msg_loop)
+                        setattr(new_msg, attr_name, getattr(cmsg, attr_name))
+                    except Exception:
+                        pass
 
-                        try:
-                            # 调用原有的消息处理逻辑
-                            if is_group:
-                                self.handle_group(cmsg)
-                            else:
-                                self.handle_single(cmsg)
-                        finally:
-                            # 关闭事件循环
-                            msg_loop.close()
-                    except Exception as e:
-                        logger.error(f"[WX849] 消息处理线程执行异常: {e}")
-                        logger.error(traceback.format_exc())
+            # 设置正确的接收者和会话ID
+            if is_group:
+                # 如果是群聊，接收者应该是群ID
+                new_msg.to_user_id = from_user_id  # 群ID
+                new_msg.session_id = from_user_id  # 使用群ID作为会话ID
+                new_msg.other_user_id = from_user_id  # 群ID
+                new_msg.is_group = True
 
-                # 启动新线程处理消息
-                msg_thread = threading.Thread(target=process_message_in_new_thread)
-                msg_thread.daemon = True
-                msg_thread.start()
+                # 确保群聊消息的其他字段也是正确的
+                new_msg.group_id = from_user_id
+
+                # 清除可能从其他消息继承的私聊相关字段
+                if hasattr(new_msg, 'other_user_nickname'):
+                    delattr(new_msg, 'other_user_nickname')
+            else:
+                # 如果是私聊，接收者应该是发送者ID
+                sender_wxid = msg.get("SenderWxid", "")
+                if not sender_wxid:
+                    sender_wxid = from_user_id
 
-                # 等待消息处理线程完成
-                msg_thread.join()
-            finally:
-                # 关闭事件循环
-                loop.close()
+                new_msg.to_user_id = sender_wxid
+                new_msg.session_id = sender_wxid  # 使用发送者ID作为会话ID
+                new_msg.other_user_id = sender_wxid
+                new_msg.is_group = False
 
-            logger.debug(f"[WX849] 独立消息处理线程 {thread_id} 处理完成 - 消息ID: {msg_id}")
+                # 清除可能从其他消息继承的群聊相关字段
+                if hasattr(new_msg, 'group_name'):
+                    delattr(new_msg, 'group_name')
+                if hasattr(new_msg, 'group_id'):
+                    delattr(new_msg, 'group_id')
+                if hasattr(new_msg, 'is_at'):
+                    new_msg.is_at = False
+                if hasattr(new_msg, 'at_list'):
+                    new_msg.at_list = []
+
+            # 使用新的消息对象替换原始消息对象
+            cmsg = new_msg
+
+            # 交给消息线程池，不同会话并行处理
+            self._submit_message(cmsg, is_group)
         except Exception as e:
-            logger.error(f"[WX849] 独立消息处理线程 {thread_id} 执行异常: {e}")
+            logger.error(f"[WX849] 预处理消息 {msg_id} 异常: {e}")
             logger.error(traceback.format_exc())
 
+    def _submit_message(self, cmsg, is_group):
+        """把消息交给线程池中的 handle_group/handle_single 处理
+
+        同一会话（群聊为群ID，私聊为对方wxid）的消息按顺序处理，不同会话并行；
+        工作线程各有常驻的事件循环，单条消息处理异常不影响其他消息。
+        """
+        session_id = getattr(cmsg, "session_id", None) or cmsg.from_user_id
+        handler = self.handle_group if is_group else self.handle_single
+        self._message_executor.submit(session_id, handler, cmsg)
+        logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已提交到会话 {session_id} 的处理队列")
 
+    def get_message_queue_stats(self):
+        """消息处理线程池的排队和耗时统计，见 SessionExecutor.stats"""
+        return self._message_executor.stats()
 
     def __init__(self):
         super().__init__()
         self.received_msgs = ExpiredDict(conf().get("expires_in_seconds", 3600))
+        # 最近处理过的1000条图片消息ID
+        self._processed_image_msgs = DedupeWindow(1000)
+        # 消息处理线程池，同一会话的消息按顺序处理
+        self._message_executor = SessionExecutor(conf().get("wx849_message_workers", 8), name="wx849-msg")
         self.bot = None
         self.user_id = None
         self.name = None
         self.wxid = None
         self.is_running = False
         self.is_logged_in = False
-        self.group_name_cache = {}
+        # 群聊目录，群名称、群成员昵称从这里查询
+        self.chatroom_directory = chatroom_directory
+        self.chatroom_directory.set_fetcher(self._fetch_chatroom)
         # 新增属性，用于标记是否使用原始框架的会话
         self.using_original_session = True  # 默认使用原始框架会话
         # 新增属性，用于保存Synckey
@@ -784,7 +765,8 @@ class WX849Channel(ChatChannel):
             "wxid": self.wxid,
             "nickname": self.name,
             "is_logged_in": self.is_logged_in,
-            "version": "DOW-WX849-1.0"
+            "version": "DOW-WX849-1.0",
+            "message_queue": self.get_message_queue_stats()
         })
 
     # 添加回调消息处理方法
@@ -822,23 +804,11 @@ class WX849Channel(ChatChannel):
                             if msg_id_match:
                                 msg_id = msg_id_match.group(1)
 
-                        # 检查是否已经处理过这条图片消息
-                        # 使用一个简单的缓存来跟踪已处理的图片消息ID
-                        if not hasattr(self, '_processed_image_msgs'):
-                            self._processed_image_msgs = set()
-
-                        if msg_id in self._processed_image_msgs:
+                        # 检查是否已经处理过这条图片消息，没有处理过时标记为已处理
+                        if self._processed_image_msgs.check_and_add(msg_id):
                             logger.info(f"[WX849] 图片消息 {msg_id} 已经处理过，跳过重复处理")
                             continue
 
-                        # 标记为已处理
-                        self._processed_image_msgs.add(msg_id)
-
-                        # 如果缓存太大，清理一下
-                        if len(self._processed_image_msgs) > 1000:
-                            # 只保留最近的500条
-                            self._processed_image_msgs = set(list(self._processed_image_msgs)[-500:])
-
                         logger.info(f"[WX849] 检测到图片消息: MsgType={msg_type}, RawLogLine={raw_log_line[:100] if raw_log_line else 'None'}")
 
                         # 尝试解析图片消息
@@ -1006,17 +976,11 @@ class WX849Channel(ChatChannel):
                     msg_type = msg.get('MsgType', 0)
                     # 让图片消息正常处理
 
-                    # 创建独立的处理线程
-                    process = threading.Thread(
-                        target=self._process_single_message_independently,
-                        args=(msg_id, msg),
-                        daemon=True  # 设置为守护线程，主线程退出时自动结束
-                    )
-                    process.start()
-                    logger.debug(f"[WX849] 已启动独立处理流程 - 消息ID: {msg_id}")
+                    # 预处理后交给消息线程池
+                    self._process_single_message_independently(msg_id, msg)
 
                 except Exception as e:
-                    logger.error(f"[WX849] 创建消息处理线程失败: {e}")
+                    logger.error(f"[WX849] 提交消息处理失败: {e}")
                     logger.error(traceback.format_exc())
 
             return True
@@ -1046,6 +1010,11 @@ class WX849Channel(ChatChannel):
                 # 保持服务器运行
                 while self.is_running:
                     await asyncio.sleep(60)
+                    stats = self.get_message_queue_stats()
+                    logger.debug(f"[WX849] 消息处理队列: 排队 {stats['queued']}（最多 {stats['max_queued']}），"
+                                 f"执行中 {stats['running']}/{stats['workers']}，完成 {stats['completed']}，"
+                                 f"异常 {stats['failed']}，平均等待 {stats['avg_wait']:.3f}s，"
+                                 f"最长等待 {stats['max_wait']:.3f}s")
                     # 定期发送心跳检测原始框架状态
                     if not await self._check_original_framework_status():
                         logger.error("[WX849] 检测到原始框架会话已失效，DOW框架将停止运行")
@@ -1078,6 +1047,7 @@ class WX849Channel(ChatChannel):
         """关闭HTTP服务器和清理资源"""
         logger.info("[WX849] 正在关闭HTTP服务器...")
         self.is_running = False
+        self._message_executor.shutdown(wait=False)
 
         # 关闭HTTP服务器
         if self.http_site:
@@ -1168,33 +1138,9 @@ class WX849Channel(ChatChannel):
                 group_white_list = conf().get("group_name_white_list", ["ALL_GROUP"])
                 # 检查是否启用了白名单
                 if "ALL_GROUP" not in group_white_list:
-                    # 获取群名
-                    group_name = None
-                    try:
-                        # 使用同步方式获取群名，避免事件循环嵌套
-                        chatrooms_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp", 'wx849_rooms.json')
-
-                        if os.path.exists(chatrooms_file):
-                            try:
-                                with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                                    chatrooms_info = json.load(f)
-
-                                if cmsg.from_user_id in chatrooms_info:
-                                    group_name = chatrooms_info[cmsg.from_user_id].get("nickName")
-                                    if group_name:
-                                        logger.debug(f"[WX849] 从缓存获取到群名: {group_name}")
-                            except Exception as e:
-                                logger.error(f"[WX849] 读取群聊缓存失败: {e}")
-
-                        # 如果没有从缓存获取到群名，使用群ID作为备用
-                        if not group_name:
-                            group_name = cmsg.from_user_id
-                            logger.debug(f"[WX849] 没有找到群名，使用群ID: {group_name}")
-
-                        logger.debug(f"[WX849] 群聊白名单检查 - 群名: {group_name}")
-                    except Exception as e:
-                        logger.error(f"[WX849] 获取群名称失败: {e}")
-                        group_name = cmsg.from_user_id
+                    # 从群聊目录获取群名，没有时使用群ID
+                    group_name = self.chatroom_directory.name(cmsg.from_user_id) or cmsg.from_user_id
+                    logger.debug(f"[WX849] 群聊白名单检查 - 群名: {group_name}")
 
                     # 检查群名是否在白名单中
                     if group_name and group_name not in group_white_list:
@@ -1348,34 +1294,11 @@ class WX849Channel(ChatChannel):
         # 尝试获取机器人在群内的昵称
         if cmsg.is_group and not cmsg.self_display_name:
             try:
-                # 从缓存中查询群成员详情
-                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-                chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-                if os.path.exists(chatrooms_file):
-                    try:
-                        with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                            chatrooms_info = json.load(f)
-
-                        if cmsg.from_user_id in chatrooms_info:
-                            room_info = chatrooms_info[cmsg.from_user_id]
-
-                            # 在成员中查找机器人的信息
-                            if "members" in room_info and isinstance(room_info["members"], list):
-                                for member in room_info["members"]:
-                                    if member.get("UserName") == self.wxid:
-                                        # 优先使用群内显示名称
-                                        if member.get("DisplayName"):
-                                            cmsg.self_display_name = member.get("DisplayName")
-                                            logger.debug(f"[WX849] 从群成员缓存中获取到机器人群内昵称: {cmsg.self_display_name}")
-                                            break
-                                        # 其次使用昵称
-                                        elif member.get("NickName"):
-                                            cmsg.self_display_name = member.get("NickName")
-                                            logger.debug(f"[WX849] 从群成员缓存中获取到机器人昵称: {cmsg.self_display_name}")
-                                            break
-                    except Exception as e:
-                        logger.error(f"[WX849] 读取群成员缓存失败: {e}")
+                # 从群聊目录查询机器人的群成员信息，优先使用群内显示名称，其次使用昵称
+                member = self.chatroom_directory.member(cmsg.from_user_id, self.wxid)
+                if member_display_name(member):
+                    cmsg.self_display_name = member_display_name(member)
+                    logger.debug(f"[WX849] 从群聊目录获取到机器人群内昵称: {cmsg.self_display_name}")
 
                 # 如果缓存中没有找到，使用机器人名称
                 if not cmsg.self_display_name:
@@ -1494,19 +1417,22 @@ class WX849Channel(ChatChannel):
                 # 设置actual_user_id为发送者wxid
                 cmsg.actual_user_id = cmsg.sender_wxid
 
-                # 异步获取发送者昵称并设置actual_user_nickname
-                # 但现在我们无法在同步方法中直接调用异步方法，所以先使用wxid
-                cmsg.actual_user_nickname = cmsg.sender_wxid
-
-                # 启动异步任务获取昵称并更新actual_user_nickname
-                threading.Thread(target=lambda: asyncio.run(self._update_nickname_async(cmsg))).start()
+                # 从群聊目录获取发送者昵称，目录中没有该成员时在后台刷新群成员，本条消息先使用wxid
+                member = self.chatroom_directory.member(cmsg.from_user_id, cmsg.sender_wxid)
+                if member is None:
+                    self.chatroom_directory.request_refresh(cmsg.from_user_id)
+                cmsg.actual_user_nickname = member_display_name(member) or cmsg.sender_wxid
 
             # 确保other_user_id设置为群ID
             cmsg.other_user_id = cmsg.from_user_id
 
             # 设置other_user_nickname为群名称，与gewechat保持一致
-            # 启动异步任务获取群名称并更新other_user_nickname
-            threading.Thread(target=lambda: asyncio.run(self._update_group_nickname_async(cmsg))).start()
+            # 从群聊目录获取群名称，群聊信息不存在或已过期时在后台刷新
+            group_name = self.chatroom_directory.name(cmsg.from_user_id)
+            if group_name:
+                cmsg.other_user_nickname = group_name
+            if not self.chatroom_directory.is_fresh(cmsg.from_user_id):
+                self.chatroom_directory.request_refresh(cmsg.from_user_id)
 
             # 处理@消息，与gewechat保持一致
             # 优先从MsgSource的XML中解析是否被at
@@ -1551,22 +1477,6 @@ class WX849Channel(ChatChannel):
 
             logger.debug(f"[WX849] 设置私聊发送者信息: actual_user_id={cmsg.actual_user_id}, actual_user_nickname={cmsg.actual_user_nickname}")
 
-    async def _update_nickname_async(self, cmsg):
-        """异步更新消息中的昵称信息"""
-        if cmsg.is_group and cmsg.from_user_id.endswith("@chatroom"):
-            nickname = await self._get_chatroom_member_nickname(cmsg.from_user_id, cmsg.sender_wxid)
-            if nickname and nickname != cmsg.actual_user_nickname:
-                cmsg.actual_user_nickname = nickname
-                logger.debug(f"[WX849] 异步更新了发送者昵称: {nickname}")
-
-    async def _update_group_nickname_async(self, cmsg):
-        """异步更新群名称信息，与gewechat保持一致"""
-        if cmsg.is_group and cmsg.from_user_id.endswith("@chatroom"):
-            group_name = await self._get_group_name(cmsg.from_user_id)
-            if group_name and group_name != cmsg.other_user_nickname:
-                cmsg.other_user_nickname = group_name
-                logger.debug(f"[WX849] 异步更新了群名称: {group_name}")
-
     async def _update_contact_nickname_async(self, cmsg):
         """异步更新联系人昵称信息，与gewechat保持一致"""
         if not cmsg.is_group:
@@ -3351,89 +3261,66 @@ class WX849Channel(ChatChannel):
             return None
 
     def _process_message_independently(self, message_id: str, msg: dict):
-        """在独立线程中处理单条消息"""
-        try:
-            # 创建新的事件循环
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # 记录处理信息
-            thread_id = threading.get_ident()
-            logger.debug(f"[WX849] 独立消息处理线程 {thread_id} 开始处理 - 消息ID: {message_id}")
-
-            try:
-                # 构建标准的消息对象
-                is_group = False
-
-                # 判断是否是群消息
-                from_user_id = msg.get("fromUserName", msg.get("FromUserName", ""))
-                to_user_id = msg.get("toUserName", msg.get("ToUserName", ""))
-
-                if isinstance(from_user_id, dict) and "string" in from_user_id:
-                    from_user_id = from_user_id["string"]
-                if isinstance(to_user_id, dict) and "string" in to_user_id:
-                    to_user_id = to_user_id["string"]
-
-                if from_user_id and from_user_id.endswith("@chatroom"):
-                    is_group = True
-                elif to_user_id and to_user_id.endswith("@chatroom"):
-                    is_group = True
-                    # 交换发送者和接收者，确保from_user_id是群ID
-                    from_user_id, to_user_id = to_user_id, from_user_id
-
-                # 创建消息对象
-                cmsg = WX849Message(msg, is_group)
-
-                # 检查是否有发送者昵称信息，优先使用这个
-                if "SenderNickName" in msg and msg["SenderNickName"]:
-                    cmsg.sender_nickname = msg["SenderNickName"]
-                    logger.debug(f"[WX849] 使用回调中的发送者昵称: {cmsg.sender_nickname}")
-
-                # 处理被@消息
-                if is_group and "@" in str(msg.get("Content", "")):
-                    # 检查是否有@列表
-                    at_list = []
-
-                    # 方法1: 从RawLogLine中提取@列表
-                    raw_log_line = msg.get("RawLogLine", "")
+        """预处理单条消息（解析@列表、去重、构建独立的消息对象），再交给消息线程池处理
 
-                    # 检查是否是被@消息
-                    if raw_log_line and "收到被@消息" in raw_log_line:
-                        logger.debug(f"[WX849] 检测到被@消息: {raw_log_line}")
-                        # 设置is_at标志
-                        cmsg.is_at = True
-                    # 检查是否有IsAtMessage标志
-                    elif "IsAtMessage" in msg and msg["IsAtMessage"]:
-                        logger.debug(f"[WX849] 检测到IsAtMessage标志")
-                        # 设置is_at标志
-                        cmsg.is_at = True
+        在通道的事件循环中调用，处理函数在线程池中执行，同一会话的消息按收到的顺序处理。
+        """
+        try:
+            # 构建标准的消息对象
+            is_group = False
+
+            # 判断是否是群消息
+            from_user_id = msg.get("fromUserName", msg.get("FromUserName", ""))
+            to_user_id = msg.get("toUserName", msg.get("ToUserName", ""))
+
+            if isinstance(from_user_id, dict) and "string" in from_user_id:
+                from_user_id = from_user_id["string"]
+            if isinstance(to_user_id, dict) and "string" in to_user_id:
+                to_user_id = to_user_id["string"]
+
+            if from_user_id and from_user_id.endswith("@chatroom"):
+                is_group = True
+            elif to_user_id and to_user_id.endswith("@chatroom"):
+                is_group = True
+                # 交换发送者和接收者，确保from_user_id是群ID
+                from_user_id, to_user_id = to_user_id, from_user_id
+
+            # 创建消息对象
+            cmsg = WX849Message(msg, is_group)
+
+            # 检查是否有发送者昵称信息，优先使用这个
+            if "SenderNickName" in msg and msg["SenderNickName"]:
+                cmsg.sender_nickname = msg["SenderNickName"]
+                logger.debug(f"[WX849] 使用回调中的发送者昵称: {cmsg.sender_nickname}")
+
+            # 处理被@消息
+            if is_group and "@" in str(msg.get("Content", "")):
+                # 检查是否有@列表
+                at_list = []
+
+                # 方法1: 从RawLogLine中提取@列表
+                raw_log_line = msg.get("RawLogLine", "")
+
+                # 检查是否是被@消息
+                if raw_log_line and "收到被@消息" in raw_log_line:
+                    logger.debug(f"[WX849] 检测到被@消息: {raw_log_line}")
+                    # 设置is_at标志
+                    cmsg.is_at = True
+                # 检查是否有IsAtMessage标志
+                elif "IsAtMessage" in msg and msg["IsAtMessage"]:
+                    logger.debug(f"[WX849] 检测到IsAtMessage标志")
+                    # 设置is_at标志
+                    cmsg.is_at = True
 
-                        # 确保at_list中包含机器人wxid
-                        if not hasattr(cmsg, 'at_list'):
-                            cmsg.at_list = []
-                        if self.wxid not in cmsg.at_list:
-                            cmsg.at_list.append(self.wxid)
+                    # 确保at_list中包含机器人wxid
+                    if not hasattr(cmsg, 'at_list'):
+                        cmsg.at_list = []
+                    if self.wxid not in cmsg.at_list:
+                        cmsg.at_list.append(self.wxid)
 
-                        # 尝试从日志行中提取@列表
-                        if "@:" in raw_log_line:
-                            try:
-                                at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
-                                if at_part.startswith("[") and at_part.endswith("]"):
-                                    # 解析@列表
-                                    at_list_str = at_part[1:-1]  # 去除[]
-                                    if at_list_str:
-                                        at_items = at_list_str.split(",")
-                                        for item in at_items:
-                                            item = item.strip().strip("'\"")
-                                            if item:
-                                                at_list.append(item)
-                                        logger.debug(f"[WX849] 从被@消息中提取到@列表: {at_list}")
-                            except Exception as e:
-                                logger.debug(f"[WX849] 从被@消息中提取@列表失败: {e}")
-                    # 普通消息中的@列表提取
-                    elif raw_log_line and "@:" in raw_log_line:
+                    # 尝试从日志行中提取@列表
+                    if "@:" in raw_log_line:
                         try:
-                            # 尝试从日志行中提取@列表
                             at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
                             if at_part.startswith("[") and at_part.endswith("]"):
                                 # 解析@列表
@@ -3444,147 +3331,134 @@ class WX849Channel(ChatChannel):
                                         item = item.strip().strip("'\"")
                                         if item:
                                             at_list.append(item)
-                                    logger.debug(f"[WX849] 从RawLogLine提取到@列表: {at_list}")
+                                    logger.debug(f"[WX849] 从被@消息中提取到@列表: {at_list}")
                         except Exception as e:
-                            logger.debug(f"[WX849] 从RawLogLine提取@列表失败: {e}")
+                            logger.debug(f"[WX849] 从被@消息中提取@列表失败: {e}")
+                # 普通消息中的@列表提取
+                elif raw_log_line and "@:" in raw_log_line:
+                    try:
+                        # 尝试从日志行中提取@列表
+                        at_part = raw_log_line.split("@:", 1)[1].split(" ", 1)[0]
+                        if at_part.startswith("[") and at_part.endswith("]"):
+                            # 解析@列表
+                            at_list_str = at_part[1:-1]  # 去除[]
+                            if at_list_str:
+                                at_items = at_list_str.split(",")
+                                for item in at_items:
+                                    item = item.strip().strip("'\"")
+                                    if item:
+                                        at_list.append(item)
+                                logger.debug(f"[WX849] 从RawLogLine提取到@列表: {at_list}")
+                    except Exception as e:
+                        logger.debug(f"[WX849] 从RawLogLine提取@列表失败: {e}")
 
-                    # 方法2: 从MsgSource中提取@列表
-                    if not at_list and "MsgSource" in msg:
-                        try:
-                            msg_source = msg.get("MsgSource", "")
-                            if msg_source:
-                                root = ET.fromstring(msg_source)
-                                atuserlist_elem = root.find('atuserlist')
-                                if atuserlist_elem is not None and atuserlist_elem.text:
-                                    at_users = atuserlist_elem.text.split(",")
-                                    for user in at_users:
-                                        if user.strip():
-                                            at_list.append(user.strip())
-                                    logger.debug(f"[WX849] 从MsgSource提取到@列表: {at_list}")
-                        except Exception as e:
-                            logger.debug(f"[WX849] 从MsgSource提取@列表失败: {e}")
+                # 方法2: 从MsgSource中提取@列表
+                if not at_list and "MsgSource" in msg:
+                    try:
+                        msg_source = msg.get("MsgSource", "")
+                        if msg_source:
+                            root = ET.fromstring(msg_source)
+                            atuserlist_elem = root.find('atuserlist')
+                            if atuserlist_elem is not None and atuserlist_elem.text:
+                                at_users = atuserlist_elem.text.split(",")
+                                for user in at_users:
+                                    if user.strip():
+                                        at_list.append(user.strip())
+                                logger.debug(f"[WX849] 从MsgSource提取到@列表: {at_list}")
+                    except Exception as e:
+                        logger.debug(f"[WX849] 从MsgSource提取@列表失败: {e}")
 
-                    # 设置@列表到消息对象
-                    if at_list:
-                        cmsg.at_list = at_list
-                        # 设置is_at标志
-                        cmsg.is_at = self.wxid in at_list
-                        logger.debug(f"[WX849] 设置@列表: {at_list}, is_at: {cmsg.is_at}")
+                # 设置@列表到消息对象
+                if at_list:
+                    cmsg.at_list = at_list
+                    # 设置is_at标志
+                    cmsg.is_at = self.wxid in at_list
+                    logger.debug(f"[WX849] 设置@列表: {at_list}, is_at: {cmsg.is_at}")
 
-                # 处理消息
-                logger.debug(f"[WX849] 处理回调消息: ID:{cmsg.msg_id} 类型:{cmsg.msg_type}")
+            # 处理消息
+            logger.debug(f"[WX849] 处理回调消息: ID:{cmsg.msg_id} 类型:{cmsg.msg_type}")
 
-                # 使用线程安全的方式检查和标记消息
-                with self.__class__._message_lock:
-                    # 检查消息是否已经处理过
-                    if cmsg.msg_id in self.received_msgs:
-                        logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已处理过，忽略")
-                        return
+            # 使用线程安全的方式检查和标记消息
+            with self.__class__._message_lock:
+                # 检查消息是否已经处理过
+                if cmsg.msg_id in self.received_msgs:
+                    logger.debug(f"[WX849] 消息 {cmsg.msg_id} 已处理过，忽略")
+                    return
 
-                    # 标记消息为已处理
-                    self.received_msgs[cmsg.msg_id] = True
+                # 标记消息为已处理
+                self.received_msgs[cmsg.msg_id] = True
 
-                # 检查消息时间是否过期
-                create_time = cmsg.create_time  # 消息时间戳
-                current_time = int(time.time())
+            # 检查消息时间是否过期
+            create_time = cmsg.create_time  # 消息时间戳
+            current_time = int(time.time())
 
-                # 设置超时时间为60秒
-                timeout = 60
-                if int(create_time) < current_time - timeout:
-                    logger.debug(f"[WX849] 历史消息 {cmsg.msg_id} 已跳过，时间差: {current_time - int(create_time)}秒")
-                    return
+            # 设置超时时间为60秒
+            timeout = 60
+            if int(create_time) < current_time - timeout:
+                logger.debug(f"[WX849] 历史消息 {cmsg.msg_id} 已跳过，时间差: {current_time - int(create_time)}秒")
+                return
 
-                # 创建一个全新的消息对象，避免共享引用
-                new_msg = WX849Message(msg, is_group)
+            # 创建一个全新的消息对象，避免共享引用
+            new_msg = WX849Message(msg, is_group)
 
-                # 复制原始消息对象的属性
-                for attr_name in dir(cmsg):
-                    if not attr_name.startswith('_') and not callable(getattr(cmsg, attr_name)):
-                        try:
-                            setattr(new_msg, attr_name, getattr(cmsg, attr_name))
-                        except Exception:
-                            pass
-
-                # 设置正确的接收者和会话ID
-                if is_group:
-                    # 如果是群聊，接收者应该是群ID
-                    new_msg.to_user_id = from_user_id  # 群ID
-                    new_msg.session_id = from_user_id  # 使用群ID作为会话ID
-                    new_msg.other_user_id = from_user_id  # 群ID
-                    new_msg.is_group = True
-
-                    # 确保群聊消息的其他字段也是正确的
-                    new_msg.group_id = from_user_id
-
-                    # 清除可能从其他消息继承的私聊相关字段
-                    if hasattr(new_msg, 'other_user_nickname'):
-                        delattr(new_msg, 'other_user_nickname')
-                else:
-                    # 如果是私聊，接收者应该是发送者ID
-                    sender_wxid = msg.get("SenderWxid", "")
-                    if not sender_wxid:
-                        sender_wxid = from_user_id
-
-                    new_msg.to_user_id = sender_wxid
-                    new_msg.session_id = sender_wxid  # 使用发送者ID作为会话ID
-                    new_msg.other_user_id = sender_wxid
-                    new_msg.is_group = False
-
-                    # 清除可能从其他消息继承的群聊相关字段
-                    if hasattr(new_msg, 'group_name'):
-                        delattr(new_msg, 'group_name')
-                    if hasattr(new_msg, 'group_id'):
-                        delattr(new_msg, 'group_id')
-                    if hasattr(new_msg, 'is_at'):
-                        new_msg.is_at = False
-                    if hasattr(new_msg, 'at_list'):
-                        new_msg.at_list = []
-                    # 确保没有任何群聊相关的属性
-                    for attr_name in dir(new_msg):
-                        if not attr_name.startswith('_') and not callable(getattr(new_msg, attr_name)):
-                            if 'group' in attr_name.lower() or 'at' in attr_name.lower():
-                                try:
-                                    delattr(new_msg, attr_name)
-                                except Exception:
-                                    pass
+            # 复制原始消息对象的属性
+            for attr_name in dir(cmsg):
+                if not attr_name.startswith('_') and not callable(getattr(cmsg, attr_name)):
+                    try:
+                        setattr(new_msg, attr_name, getattr(cmsg, attr_name))
+                    except Exception:
+                        pass
 
-                # 使用新的消息对象替换原始消息对象
-                cmsg = new_msg
+            # 设置正确的接收者和会话ID
+            if is_group:
+                # 如果是群聊，接收者应该是群ID
+                new_msg.to_user_id = from_user_id  # 群ID
+                new_msg.session_id = from_user_id  # 使用群ID作为会话ID
+                new_msg.other_user_id = from_user_id  # 群ID
+                new_msg.is_group = True
 
-                # 创建一个新的线程来处理消息，确保每个消息都有完全独立的处理环境
-                def process_message_in_new_thread():
-                    try:
-                        # 创建新的事件循环
-                        msg_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(msg_loop)
+                # 确保群聊消息的其他字段也是正确的
+                new_msg.group_id = from_user_id
 
-                        try:
-                            # 调用原有的消息处理逻辑
-                            if is_group:
-                                self.handle_group(cmsg)
-                            else:
-                                self.handle_single(cmsg)
-                        finally:
-                            # 关闭事件循环
-                            msg_loop.close()
-                    except Exception as e:
-                        logger.error(f"[WX849] 消息处理线程执行异常: {e}")
-                        logger.error(traceback.format_exc())
+                # 清除可能从其他消息继承的私聊相关字段
+                if hasattr(new_msg, 'other_user_nickname'):
+                    delattr(new_msg, 'other_user_nickname')
+            else:
+                # 如果是私聊，接收者应该是发送者ID
+                sender_wxid = msg.get("SenderWxid", "")
+                if not sender_wxid:
+                    sender_wxid = from_user_id
+
+                new_msg.to_user_id = sender_wxid
+                new_msg.session_id = sender_wxid  # 使用发送者ID作为会话ID
+                new_msg.other_user_id = sender_wxid
+                new_msg.is_group = False
 
-                # 启动新线程处理消息
-                msg_thread = threading.Thread(target=process_message_in_new_thread)
-                msg_thread.daemon = True
-                msg_thread.start()
+                # 清除可能从其他消息继承的群聊相关字段
+                if hasattr(new_msg, 'group_name'):
+                    delattr(new_msg, 'group_name')
+                if hasattr(new_msg, 'group_id'):
+                    delattr(new_msg, 'group_id')
+                if hasattr(new_msg, 'is_at'):
+                    new_msg.is_at = False
+                if hasattr(new_msg, 'at_list'):
+                    new_msg.at_list = []
+                # 确保没有任何群聊相关的属性
+                for attr_name in dir(new_msg):
+                    if not attr_name.startswith('_') and not callable(getattr(new_msg, attr_name)):
+                        if 'group' in attr_name.lower() or 'at' in attr_name.lower():
+                            try:
+                                delattr(new_msg, attr_name)
+                            except Exception:
+                                pass
 
-                # 等待消息处理线程完成
-                msg_thread.join()
-            finally:
-                # 关闭事件循环
-                loop.close()
+            # 使用新的消息对象替换原始消息对象
+            cmsg = new_msg
 
-            logger.debug(f"[WX849] 独立消息处理线程 {thread_id} 处理完成 - 消息ID: {message_id}")
+            # 交给消息线程池，不同会话并行处理
+            self._submit_message(cmsg, is_group)
         except Exception as e:
-            logger.error(f"[WX849] 独立消息处理线程 {thread_id} 执行异常: {e}")
+            logger.error(f"[WX849] 预处理消息 {message_id} 异常: {e}")
             logger.error(traceback.format_exc())
 
     async def _process_message_async(self, message_id: str, reply: Reply, context: Context, receiver: str, session_id: str):
@@ -4127,100 +4001,6 @@ class WX849Channel(ChatChannel):
                 except Exception as e:
                     logger.debug(f"[WX849] 删除临时视频文件失败: {e}")
 
-    async def _encode_video(self, video_path):
-        """将视频编码为base64"""
-        try:
-            with open(video_path, 'rb') as f:
-                video_data = f.read()
-
-            # 使用Base64编码
-            import base64
-            video_base64 = base64.b64encode(video_data).decode('utf-8')
-            return video_base64
-        except Exception as e:
-            logger.error(f"[WX849] 视频Base64编码失败: {e}")
-            return None
-
-    async def _extract_first_frame(self, video_path):
-        """从视频中提取第一帧并编码为Base64"""
-        try:
-            # 创建临时目录
-            tmp_dir = os.path.join(get_appdata_dir(), "video_frames")
-            os.makedirs(tmp_dir, exist_ok=True)
-
-            # 临时图片文件路径
-            thumbnail_path = os.path.join(tmp_dir, f"frame_{int(time.time())}.jpg")
-
-            # 查找ffmpeg可执行文件
-            ffmpeg_cmd = "ffmpeg"
-            # 在Windows上检查常见安装路径
-            if os.name == 'nt':
-                possible_paths = [
-                    r"C:\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe"
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        ffmpeg_cmd = path
-                        break
-
-            logger.debug(f"[WX849] 使用ffmpeg命令: {ffmpeg_cmd}")
-
-            # 使用ffmpeg提取第一帧，尝试多个时间点
-            success = False
-            for timestamp in ["00:00:01", "00:00:00.5", "00:00:00"]:
-                try:
-                    # 使用subprocess.run来执行ffmpeg命令
-                    process = subprocess.run([
-                        ffmpeg_cmd,
-                        "-i", video_path,
-                        "-ss", timestamp,
-                        "-vframes", "1",
-                        "-q:v", "2",  # 设置高质量输出
-                        thumbnail_path,
-                        "-y"
-                    ], check=False, capture_output=True)
-
-                    if process.returncode == 0 and os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
-                        logger.debug(f"[WX849] 成功提取视频帧，使用时间点: {timestamp}")
-                        success = True
-                        break
-                    else:
-                        logger.debug(f"[WX849] 提取视频帧失败，时间点: {timestamp}, 返回码: {process.returncode}")
-                        if process.stderr:
-                            logger.debug(f"[WX849] ffmpeg错误: {process.stderr.decode()[:200]}")
-                except Exception as e:
-                    logger.debug(f"[WX849] 使用时间点 {timestamp} 提取帧时出错: {e}")
-
-            # 如果所有尝试都失败，则返回空
-            if not success:
-                logger.warning("[WX849] 所有提取视频帧的尝试都失败，将发送无封面视频")
-                return None
-
-            # 读取并编码图片
-            if os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
-                with open(thumbnail_path, "rb") as f:
-                    image_data = f.read()
-
-                import base64
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-
-                # 删除临时图片文件
-                try:
-                    os.remove(thumbnail_path)
-                except Exception:
-                    pass
-
-                return image_base64
-
-            logger.warning("[WX849] 未能生成有效的封面图片")
-            return None
-        except Exception as e:
-            logger.error(f"[WX849] 提取视频帧失败: {e}")
-            logger.error(traceback.format_exc())
-            return None
-
     async def _send_voice(self, to_user_id, voice_path):
         """发送语音消息，如果语音时长超过30秒，会自动分割成多个片段发送"""
         # 参数检查
@@ -4232,288 +4012,178 @@ class WX849Channel(ChatChannel):
             logger.error(f"[WX849] 发送语音失败: 语音文件不存在 - {voice_path}")
             return None
 
-        # 创建临时目录和处理后的文件路径
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-        os.makedirs(tmp_dir, exist_ok=True)
-        processed_file = os.path.join(tmp_dir, f"voice_processed_{int(time.time())}.mp3")
-
         result = None
         try:
-            # 导入base64模块
-            import base64
-
-            # 查找ffmpeg可执行文件
-            ffmpeg_cmd = "ffmpeg"
-            if os.name == 'nt':
-                possible_paths = [
-                    r"C:\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe"
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        ffmpeg_cmd = path
-                        break
+            import pysilk
 
-            # 使用ffmpeg处理音频文件
-            cmd = [
-                ffmpeg_cmd, "-y", "-i", voice_path,
-                "-acodec", "libmp3lame", "-ar", "44100", "-ab", "192k",
-                "-ac", "2", processed_file
-            ]
+            # 转换为单声道PCM，采样率取SILK支持的最高值，转换结果从管道读回，不写中间文件
+            sample_rate = 24000
+            try:
+                pcm_data = await media_transcoder.to_pcm(voice_path, sample_rate=sample_rate, channels=1)
+            except TranscodeError as e:
+                logger.error(f"[WX849] 处理音频文件失败: {e}")
+                return None
 
-            # 执行ffmpeg命令
-            logger.debug(f"[WX849] 处理音频文件: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            # 16位单声道PCM每毫秒的字节数
+            bytes_per_ms = sample_rate * 2 // 1000
 
-            # 如果处理成功，使用处理后的文件；否则使用原始文件
-            voice_file = processed_file if result.returncode == 0 and os.path.exists(processed_file) else voice_path
-            logger.debug(f"[WX849] 使用音频文件: {voice_file}")
+            # 获取音频时长（毫秒）
+            total_duration = len(pcm_data) // bytes_per_ms
+            logger.debug(f"[WX849] 总音频时长: {total_duration}毫秒, 采样率: {sample_rate}Hz")
 
-            try:
-                # 使用pydub和pysilk处理音频
-                from pydub import AudioSegment
-                import pysilk
-                from io import BytesIO
+            # 最大语音片段时长（毫秒）
+            max_segment_duration = 20 * 1000  # 20秒，确保更可靠的发送
 
-                # 读取音频文件
-                with open(voice_file, 'rb') as f:
-                    voice_data = f.read()
+            # 获取API配置
+            api_host = conf().get("wx849_api_host", "127.0.0.1")
+            api_port = conf().get("wx849_api_port", 9011)
+            protocol_version = conf().get("wx849_protocol_version", "849")
 
-                # 转换为AudioSegment
-                audio = AudioSegment.from_file(BytesIO(voice_data), format="mp3").set_channels(1)
+            # 确定API路径前缀
+            if protocol_version == "855" or protocol_version == "ipad":
+                api_path_prefix = "/api"
+            else:
+                api_path_prefix = "/VXAPI"
 
-                # 获取最接近的支持的采样率
-                supported_rates = [8000, 12000, 16000, 24000]
-                closest_rate = min(supported_rates, key=lambda x: abs(x - audio.frame_rate))
-                audio = audio.set_frame_rate(closest_rate)
+            # 注意：之前这里强制使用/VXAPI前缀，现在根据协议版本动态选择
+            logger.debug(f"[WX849] 语音消息使用API路径前缀: {api_path_prefix} (适用于{protocol_version}协议)")
 
-                # 获取音频时长（毫秒）
-                total_duration = len(audio)
-                logger.debug(f"[WX849] 总音频时长: {total_duration}毫秒, 采样率: {audio.frame_rate}Hz")
+            # 如果语音时长超过最大片段时长，将其分割成多个片段发送
+            if total_duration > max_segment_duration:
+                logger.info(f"[WX849] 语音时长超过20秒 ({total_duration/1000:.1f}秒)，将分割成多个片段发送")
 
-                # 最大语音片段时长（毫秒）
-                max_segment_duration = 20 * 1000  # 20秒，确保更可靠的发送
+                # 计算需要分割的片段数
+                segments_count = (total_duration + max_segment_duration - 1) // max_segment_duration
+                logger.info(f"[WX849] 将分割成 {segments_count} 个片段")
 
-                # 获取API配置
-                api_host = conf().get("wx849_api_host", "127.0.0.1")
-                api_port = conf().get("wx849_api_port", 9011)
-                protocol_version = conf().get("wx849_protocol_version", "849")
+                # 按时长切分PCM数据
+                segments = []
+                for i in range(segments_count):
+                    start_time = i * max_segment_duration
+                    end_time = min((i + 1) * max_segment_duration, total_duration)
+                    segments.append((pcm_data[start_time * bytes_per_ms:end_time * bytes_per_ms], end_time - start_time))
 
-                # 确定API路径前缀
-                if protocol_version == "855" or protocol_version == "ipad":
-                    api_path_prefix = "/api"
-                else:
-                    api_path_prefix = "/VXAPI"
+                # 发送文本消息通知语音长度
+                try:
+                    async with aiohttp.ClientSession() as session:
+                        text_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendTxt"
+                        text_params = {
+                            "Wxid": self.wxid,
+                            "ToWxid": to_user_id,
+                            "Content": f"长语音消息 (总长{total_duration/1000:.1f}秒)，将分 {segments_count} 段发送..."
+                        }
 
-                # 注意：之前这里强制使用/VXAPI前缀，现在根据协议版本动态选择
-                logger.debug(f"[WX849] 语音消息使用API路径前缀: {api_path_prefix} (适用于{protocol_version}协议)")
+                        # 发送文本提示
+                        async with session.post(text_url, json=text_params, timeout=60) as text_response:
+                            text_json_resp = await text_response.json()
+                            if text_json_resp and text_json_resp.get("Success", False):
+                                logger.info(f"[WX849] 发送语音分段通知成功")
+                except Exception as e:
+                    logger.error(f"[WX849] 发送语音分段通知失败: {e}")
 
-                # 如果语音时长超过最大片段时长，将其分割成多个片段发送
-                if total_duration > max_segment_duration:
-                    logger.info(f"[WX849] 语音时长超过20秒 ({total_duration/1000:.1f}秒)，将分割成多个片段发送")
+                # 依次发送所有片段
+                success_count = 0
+                for i, (segment_pcm, segment_duration) in enumerate(segments):
+                    try:
+                        # 编码为SILK
+                        segment_silk_data = await pysilk.async_encode(segment_pcm, sample_rate=sample_rate)
+                        segment_base64 = base64.b64encode(segment_silk_data).decode('utf-8')
+
+                        # 准备API请求
+                        api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendVoice"
+                        params = {
+                            "Wxid": self.wxid,
+                            "ToWxid": to_user_id,
+                            "Base64": segment_base64,
+                            "Type": 4,  # SILK格式
+                            "VoiceTime": segment_duration
+                        }
 
-                    # 计算需要分割的片段数
-                    segments_count = (total_duration + max_segment_duration - 1) // max_segment_duration
-                    logger.info(f"[WX849] 将分割成 {segments_count} 个片段")
+                        # 记录日志，隐藏base64数据
+                        debug_params = params.copy()
+                        debug_params["Base64"] = f"[Base64 data, length: {len(segment_base64)}]"
+                        logger.debug(f"[WX849] 语音片段 {i+1}/{segments_count} API参数: {json.dumps(debug_params, ensure_ascii=False)}")
 
-                    # 创建存放临时分段文件的目录
-                    segment_dir = os.path.join(tmp_dir, f"voice_segments_{int(time.time())}")
-                    os.makedirs(segment_dir, exist_ok=True)
+                        # 发送语音片段
+                        async with aiohttp.ClientSession() as session:
+                            async with session.post(api_url, json=params, timeout=60) as response:
+                                json_resp = await response.json()
 
-                    # 保存所有临时分段文件路径
-                    segment_files = []
+                                # 检查响应
+                                if json_resp and json_resp.get("Success", False):
+                                    logger.info(f"[WX849] 语音片段 {i+1}/{segments_count} 发送成功")
+                                    success_count += 1
 
-                    # 第一阶段：分割并保存所有片段
-                    logger.info(f"[WX849] 开始分割并保存所有语音片段")
-                    for i in range(segments_count):
-                        start_time = i * max_segment_duration
-                        end_time = min((i + 1) * max_segment_duration, total_duration)
+                                    # 添加延迟，避免发送过快导致的问题
+                                    await asyncio.sleep(1.0)  # 增加延迟到1秒
+                                else:
+                                    error_msg = json_resp.get("Message", "未知错误")
+                                    logger.error(f"[WX849] 语音片段 {i+1}/{segments_count} API返回错误: {error_msg}")
+                    except Exception as e:
+                        logger.error(f"[WX849] 发送语音片段 {i+1}/{segments_count} 失败: {e}")
+                        logger.error(traceback.format_exc())
 
-                        # 截取片段
-                        segment = audio[start_time:end_time]
-                        segment_duration = len(segment)
+                # 发送完成通知
+                try:
+                    async with aiohttp.ClientSession() as session:
+                        text_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendTxt"
+                        text_params = {
+                            "Wxid": self.wxid,
+                            "ToWxid": to_user_id,
+                            "Content": f"长语音发送完成，成功 {success_count}/{segments_count} 段"
+                        }
 
-                        # 保存片段到临时文件
-                        segment_file = os.path.join(segment_dir, f"segment_{i+1}.mp3")
-                        segment_files.append((segment_file, segment_duration))
-                        segment.export(segment_file, format="mp3")
+                        # 发送文本提示
+                        async with session.post(text_url, json=text_params, timeout=60) as text_response:
+                            text_json_resp = await text_response.json()
+                            if text_json_resp and text_json_resp.get("Success", False):
+                                logger.info(f"[WX849] 发送语音完成通知成功")
+                except Exception as e:
+                    logger.error(f"[WX849] 发送语音完成通知失败: {e}")
 
-                        logger.debug(f"[WX849] 保存语音片段 {i+1}/{segments_count} 到: {segment_file}, 时长: {segment_duration/1000:.1f}秒")
+                # 设置结果状态
+                if success_count > 0:
+                    result = {"Success": True}
+                else:
+                    result = None
+            else:
+                # 语音时长不超过最大片段时长，直接发送
+                logger.info(f"[WX849] 语音时长不超过20秒 ({total_duration/1000:.1f}秒)，直接发送")
+                silk_data = await pysilk.async_encode(pcm_data, sample_rate=sample_rate)
+                voice_base64 = base64.b64encode(silk_data).decode('utf-8')
 
-                    # 检查所有分段文件是否都已成功创建
-                    all_segments_exist = True
-                    for segment_file, _ in segment_files:
-                        if not os.path.exists(segment_file):
-                            logger.error(f"[WX849] 语音片段文件不存在: {segment_file}")
-                            all_segments_exist = False
-                            break
+                api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendVoice"
+                params = {
+                    "Wxid": self.wxid,
+                    "ToWxid": to_user_id,
+                    "Base64": voice_base64,
+                    "Type": 4,  # SILK格式
+                    "VoiceTime": total_duration
+                }
 
-                    if not all_segments_exist:
-                        logger.error(f"[WX849] 部分语音片段未能成功保存，取消发送")
-                        return None
+                # 记录日志，隐藏base64数据
+                debug_params = params.copy()
+                debug_params["Base64"] = f"[Base64 data, length: {len(voice_base64)}]"
+                logger.debug(f"[WX849] 语音API参数: {json.dumps(debug_params, ensure_ascii=False)}")
 
-                    logger.info(f"[WX849] 所有 {len(segment_files)} 个语音片段已成功保存，开始发送")
+                # 发送请求
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(api_url, json=params, timeout=60) as response:
+                        json_resp = await response.json()
 
-                    # 发送文本消息通知语音长度
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            text_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendTxt"
-                            text_params = {
-                                "Wxid": self.wxid,
-                                "ToWxid": to_user_id,
-                                "Content": f"长语音消息 (总长{total_duration/1000:.1f}秒)，将分 {segments_count} 段发送..."
-                            }
-
-                            # 发送文本提示
-                            async with session.post(text_url, json=text_params, timeout=60) as text_response:
-                                text_json_resp = await text_response.json()
-                                if text_json_resp and text_json_resp.get("Success", False):
-                                    logger.info(f"[WX849] 发送语音分段通知成功")
-                    except Exception as e:
-                        logger.error(f"[WX849] 发送语音分段通知失败: {e}")
-
-                    # 第二阶段：发送所有已保存的片段
-                    success_count = 0
-                    for i, (segment_file, segment_duration) in enumerate(segment_files):
-                        try:
-                            # 按短语音方式处理分段文件
-                            # 读取文件数据
-                            with open(segment_file, 'rb') as f:
-                                segment_data = f.read()
-
-                            # 处理为音频对象
-                            segment_audio = AudioSegment.from_file(BytesIO(segment_data), format="mp3").set_channels(1)
-                            segment_audio = segment_audio.set_frame_rate(closest_rate)
-
-                            # 编码为SILK
-                            segment_silk_data = await pysilk.async_encode(segment_audio.raw_data, sample_rate=segment_audio.frame_rate)
-                            segment_base64 = base64.b64encode(segment_silk_data).decode('utf-8')
-
-                            # 准备API请求
-                            api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendVoice"
-                            params = {
-                                "Wxid": self.wxid,
-                                "ToWxid": to_user_id,
-                                "Base64": segment_base64,
-                                "Type": 4,  # SILK格式
-                                "VoiceTime": segment_duration
-                            }
-
-                            # 记录日志，隐藏base64数据
-                            debug_params = params.copy()
-                            debug_params["Base64"] = f"[Base64 data, length: {len(segment_base64)}]"
-                            logger.debug(f"[WX849] 语音片段 {i+1}/{segments_count} API参数: {json.dumps(debug_params, ensure_ascii=False)}")
-
-                            # 发送语音片段
-                            async with aiohttp.ClientSession() as session:
-                                async with session.post(api_url, json=params, timeout=60) as response:
-                                    json_resp = await response.json()
-
-                                    # 检查响应
-                                    if json_resp and json_resp.get("Success", False):
-                                        logger.info(f"[WX849] 语音片段 {i+1}/{segments_count} 发送成功")
-                                        success_count += 1
-
-                                        # 添加延迟，避免发送过快导致的问题
-                                        await asyncio.sleep(1.0)  # 增加延迟到1秒
-                                    else:
-                                        error_msg = json_resp.get("Message", "未知错误")
-                                        logger.error(f"[WX849] 语音片段 {i+1}/{segments_count} API返回错误: {error_msg}")
-                        except Exception as e:
-                            logger.error(f"[WX849] 发送语音片段 {i+1}/{segments_count} 失败: {e}")
-                            logger.error(traceback.format_exc())
-
-                    # 发送完成通知
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            text_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendTxt"
-                            text_params = {
-                                "Wxid": self.wxid,
-                                "ToWxid": to_user_id,
-                                "Content": f"长语音发送完成，成功 {success_count}/{segments_count} 段"
-                            }
-
-                            # 发送文本提示
-                            async with session.post(text_url, json=text_params, timeout=60) as text_response:
-                                text_json_resp = await text_response.json()
-                                if text_json_resp and text_json_resp.get("Success", False):
-                                    logger.info(f"[WX849] 发送语音完成通知成功")
-                    except Exception as e:
-                        logger.error(f"[WX849] 发送语音完成通知失败: {e}")
-
-                    # 清理临时分段文件
-                    for segment_file, _ in segment_files:
-                        try:
-                            if os.path.exists(segment_file):
-                                os.remove(segment_file)
-                                logger.debug(f"[WX849] 已删除临时分段文件: {segment_file}")
-                        except Exception as e:
-                            logger.debug(f"[WX849] 删除临时分段文件失败: {e}")
-
-                    # 尝试删除分段目录
-                    try:
-                        if os.path.exists(segment_dir):
-                            os.rmdir(segment_dir)
-                            logger.debug(f"[WX849] 已删除临时分段目录: {segment_dir}")
-                    except Exception as e:
-                        logger.debug(f"[WX849] 删除临时分段目录失败: {e}")
-
-                    # 设置结果状态
-                    if success_count > 0:
-                        result = {"Success": True}
-                    else:
-                        result = None
-                else:
-                    # 语音时长不超过最大片段时长，直接发送
-                    logger.info(f"[WX849] 语音时长不超过20秒 ({total_duration/1000:.1f}秒)，直接发送")
-                    silk_data = await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)
-                    voice_base64 = base64.b64encode(silk_data).decode('utf-8')
-
-                    api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Msg/SendVoice"
-                    params = {
-                        "Wxid": self.wxid,
-                        "ToWxid": to_user_id,
-                        "Base64": voice_base64,
-                        "Type": 4,  # SILK格式
-                        "VoiceTime": total_duration
-                    }
-
-                    # 记录日志，隐藏base64数据
-                    debug_params = params.copy()
-                    debug_params["Base64"] = f"[Base64 data, length: {len(voice_base64)}]"
-                    logger.debug(f"[WX849] 语音API参数: {json.dumps(debug_params, ensure_ascii=False)}")
-
-                    # 发送请求
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(api_url, json=params, timeout=60) as response:
-                            json_resp = await response.json()
-
-                            # 检查响应
-                            if json_resp and json_resp.get("Success", False):
-                                logger.info(f"[WX849] 语音发送成功")
-                                result = {"Success": True}
-                            else:
-                                error_msg = json_resp.get("Message", "未知错误")
-                                logger.error(f"[WX849] 语音API返回错误: {error_msg}")
-                                logger.error(f"[WX849] 响应详情: {json.dumps(json_resp, ensure_ascii=False)}")
-                                result = None
-            except Exception as e:
-                logger.error(f"[WX849] 处理音频数据失败: {e}")
-                logger.error(traceback.format_exc())
-                result = None
+                        # 检查响应
+                        if json_resp and json_resp.get("Success", False):
+                            logger.info(f"[WX849] 语音发送成功")
+                            result = {"Success": True}
+                        else:
+                            error_msg = json_resp.get("Message", "未知错误")
+                            logger.error(f"[WX849] 语音API返回错误: {error_msg}")
+                            logger.error(f"[WX849] 响应详情: {json.dumps(json_resp, ensure_ascii=False)}")
+                            result = None
         except Exception as e:
             logger.error(f"[WX849] 发送语音失败: {e}")
             logger.error(traceback.format_exc())
             result = None
-        finally:
-            # 删除处理后的临时文件
-            try:
-                if os.path.exists(processed_file):
-                    os.remove(processed_file)
-                    logger.debug(f"[WX849] 已删除临时文件: {processed_file}")
-            except Exception as e:
-                logger.debug(f"[WX849] 删除临时文件失败: {e}")
 
         return result
 
@@ -4623,435 +4293,6 @@ class WX849Channel(ChatChannel):
             logger.error(traceback.format_exc())
             return None
 
-    async def _get_group_member_details(self, group_id):
-        """获取群成员详情"""
-        try:
-            logger.debug(f"[WX849] 尝试获取群 {group_id} 的成员详情")
-
-            # 检查是否已存在群成员信息，并检查是否需要更新
-            # 定义群聊信息文件路径
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            # 读取现有的群聊信息（如果存在）
-            chatrooms_info = {}
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-                    logger.debug(f"[WX849] 已加载 {len(chatrooms_info)} 个现有群聊信息")
-                except Exception as e:
-                    logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
-            # 检查该群聊是否已存在且成员信息是否已更新
-            # 设定缓存有效期为24小时(86400秒)
-            cache_expiry = 86400
-            current_time = int(time.time())
-
-            if (group_id in chatrooms_info and
-                "members" in chatrooms_info[group_id] and
-                len(chatrooms_info[group_id]["members"]) > 0 and
-                "last_update" in chatrooms_info[group_id] and
-                current_time - chatrooms_info[group_id]["last_update"] < cache_expiry):
-                logger.debug(f"[WX849] 群 {group_id} 成员信息已存在且未过期，跳过更新")
-                return chatrooms_info[group_id]
-
-            logger.debug(f"[WX849] 群 {group_id} 成员信息不存在或已过期，开始更新")
-
-            # 调用API获取群成员详情
-            params = {
-                "QID": group_id,  # 群ID参数
-                "Wxid": self.wxid  # 自己的wxid参数
-            }
-
-            try:
-                # 获取API配置
-                api_host = conf().get("wx849_api_host", "127.0.0.1")
-                api_port = conf().get("wx849_api_port", 9011)
-                protocol_version = conf().get("wx849_protocol_version", "849")
-
-                # 确定API路径前缀
-                if protocol_version == "855" or protocol_version == "ipad":
-                    api_path_prefix = "/api"
-                else:
-                    api_path_prefix = "/VXAPI"
-
-                # 构建完整的API URL用于日志
-                api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Group/GetChatRoomMemberDetail"
-                logger.debug(f"[WX849] 正在请求群成员详情API: {api_url}")
-                logger.debug(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
-
-                # 调用API获取群成员详情
-                response = await self._call_api("/Group/GetChatRoomMemberDetail", params)
-
-                if not response or not isinstance(response, dict):
-                    logger.error(f"[WX849] 获取群成员详情失败: 无效响应")
-                    return None
-
-                # 检查响应是否成功
-                if not response.get("Success", False):
-                    logger.error(f"[WX849] 获取群成员详情失败: {response.get('Message', '未知错误')}")
-                    return None
-
-                # 提取NewChatroomData
-                data = response.get("Data", {})
-                new_chatroom_data = data.get("NewChatroomData", {})
-
-                if not new_chatroom_data:
-                    logger.error(f"[WX849] 获取群成员详情失败: 响应中无NewChatroomData")
-                    return None
-
-                # 检查当前群聊是否已存在
-                if group_id not in chatrooms_info:
-                    chatrooms_info[group_id] = {
-                        "chatroomId": group_id,
-                        "nickName": group_id,
-                        "chatRoomOwner": "",
-                        "members": [],
-                        "last_update": int(time.time())
-                    }
-
-                # 提取成员信息
-                member_count = new_chatroom_data.get("MemberCount", 0)
-                chat_room_members = new_chatroom_data.get("ChatRoomMember", [])
-
-                # 确保是有效的成员列表
-                if not isinstance(chat_room_members, list):
-                    logger.error(f"[WX849] 获取群成员详情失败: ChatRoomMember不是有效的列表")
-                    return None
-
-                # 更新群聊成员信息
-                members = []
-                for member in chat_room_members:
-                    if not isinstance(member, dict):
-                        continue
-
-                    # 提取成员必要信息
-                    member_info = {
-                        "UserName": member.get("UserName", ""),
-                        "NickName": member.get("NickName", ""),
-                        "DisplayName": member.get("DisplayName", ""),
-                        "ChatroomMemberFlag": member.get("ChatroomMemberFlag", 0),
-                        "InviterUserName": member.get("InviterUserName", ""),
-                        "BigHeadImgUrl": member.get("BigHeadImgUrl", ""),
-                        "SmallHeadImgUrl": member.get("SmallHeadImgUrl", "")
-                    }
-
-                    members.append(member_info)
-
-                # 更新群聊信息
-                chatrooms_info[group_id]["members"] = members
-                chatrooms_info[group_id]["last_update"] = int(time.time())
-                chatrooms_info[group_id]["memberCount"] = member_count
-
-                # 同时更新群主信息
-                for member in members:
-                    if member.get("ChatroomMemberFlag") == 2049:  # 群主标志
-                        chatrooms_info[group_id]["chatRoomOwner"] = member.get("UserName", "")
-                        break
-
-                # 保存到文件
-                with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                    json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
-                logger.info(f"[WX849] 已更新群聊 {group_id} 成员信息，成员数: {len(members)}")
-
-                # 返回成员信息
-                return new_chatroom_data
-            except Exception as e:
-                logger.error(f"[WX849] 获取群成员详情失败: {e}")
-                logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-                return None
-        except Exception as e:
-            logger.error(f"[WX849] 获取群成员详情过程中出错: {e}")
-            logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-            return None
-
-    async def _get_group_name(self, group_id):
-        """获取群名称"""
-        try:
-            logger.debug(f"[WX849] 尝试获取群 {group_id} 的名称")
-
-            # 检查缓存中是否有群名
-            cache_key = f"group_name_{group_id}"
-            if hasattr(self, "group_name_cache") and cache_key in self.group_name_cache:
-                cached_name = self.group_name_cache[cache_key]
-                logger.debug(f"[WX849] 从缓存中获取群名: {cached_name}")
-
-                # 检查是否需要更新群成员详情
-                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-                chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-                need_update = True
-                # 设定缓存有效期为24小时(86400秒)
-                cache_expiry = 86400
-                current_time = int(time.time())
-
-                if os.path.exists(chatrooms_file):
-                    try:
-                        with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                            chatrooms_info = json.load(f)
-
-                        # 检查群信息是否存在且未过期
-                        if (group_id in chatrooms_info and
-                            "last_update" in chatrooms_info[group_id] and
-                            current_time - chatrooms_info[group_id]["last_update"] < cache_expiry and
-                            "members" in chatrooms_info[group_id] and
-                            len(chatrooms_info[group_id]["members"]) > 0):
-                            logger.debug(f"[WX849] 群 {group_id} 信息已存在且未过期，跳过更新")
-                            need_update = False
-                    except Exception as e:
-                        logger.error(f"[WX849] 检查群信息缓存时出错: {e}")
-
-                # 只有需要更新时才启动线程获取群成员详情
-                if need_update:
-                    logger.debug(f"[WX849] 群 {group_id} 信息需要更新，启动更新线程")
-                    threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                return cached_name
-
-            # 检查文件中是否已经有群信息，且未过期
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            # 设定缓存有效期为24小时(86400秒)
-            cache_expiry = 86400
-            current_time = int(time.time())
-
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-
-                    # 检查群信息是否存在且未过期
-                    if (group_id in chatrooms_info and
-                        "nickName" in chatrooms_info[group_id] and
-                        chatrooms_info[group_id]["nickName"] and
-                        chatrooms_info[group_id]["nickName"] != group_id and
-                        "last_update" in chatrooms_info[group_id] and
-                        current_time - chatrooms_info[group_id]["last_update"] < cache_expiry):
-
-                        # 从文件中获取群名
-                        group_name = chatrooms_info[group_id]["nickName"]
-                        logger.debug(f"[WX849] 从文件缓存中获取群名: {group_name}")
-
-                        # 缓存群名
-                        if not hasattr(self, "group_name_cache"):
-                            self.group_name_cache = {}
-                        self.group_name_cache[cache_key] = group_name
-
-                        # 检查是否需要更新群成员详情
-                        need_update_members = not ("members" in chatrooms_info[group_id] and
-                                                len(chatrooms_info[group_id]["members"]) > 0)
-
-                        if need_update_members:
-                            logger.debug(f"[WX849] 群 {group_id} 名称已缓存，但需要更新成员信息")
-                            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-                        else:
-                            logger.debug(f"[WX849] 群 {group_id} 信息已完整且未过期，无需更新")
-
-                        return group_name
-                except Exception as e:
-                    logger.error(f"[WX849] 从文件获取群名出错: {e}")
-
-            logger.debug(f"[WX849] 群 {group_id} 信息不存在或已过期，需要从API获取")
-
-            # 调用API获取群信息 - 使用群聊API
-            params = {
-                "QID": group_id,  # 群ID参数，正确的参数名是QID
-                "Wxid": self.wxid  # 自己的wxid参数
-            }
-
-            try:
-                # 获取API配置
-                api_host = conf().get("wx849_api_host", "127.0.0.1")
-                api_port = conf().get("wx849_api_port", 9011)
-                protocol_version = conf().get("wx849_protocol_version", "849")
-
-                # 确定API路径前缀
-                if protocol_version == "855" or protocol_version == "ipad":
-                    api_path_prefix = "/api"
-                else:
-                    api_path_prefix = "/VXAPI"
-
-                # 构建完整的API URL用于日志
-                api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Group/GetChatRoomInfo"
-                logger.debug(f"[WX849] 正在请求群信息API: {api_url}")
-                logger.debug(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")  # 记录请求参数
-
-                # 尝试使用群聊专用API
-                group_info = await self._call_api("/Group/GetChatRoomInfo", params)
-
-                # 保存群聊详情到统一的JSON文件
-                try:
-                    # 读取现有的群聊信息（如果存在）
-                    chatrooms_info = {}
-                    if os.path.exists(chatrooms_file):
-                        try:
-                            with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                                chatrooms_info = json.load(f)
-                            logger.debug(f"[WX849] 已加载 {len(chatrooms_info)} 个现有群聊信息")
-                        except Exception as e:
-                            logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
-                    # 提取必要的群聊信息
-                    if group_info and isinstance(group_info, dict):
-                        # 递归函数用于查找特定key的值
-                        def find_value(obj, key):
-                            # 如果是字典
-                            if isinstance(obj, dict):
-                                # 直接检查当前字典
-                                if key in obj:
-                                    return obj[key]
-                                # 检查带有"string"嵌套的字典
-                                if key in obj and isinstance(obj[key], dict) and "string" in obj[key]:
-                                    return obj[key]["string"]
-                                # 递归检查字典的所有值
-                                for k, v in obj.items():
-                                    result = find_value(v, key)
-                                    if result is not None:
-                                        return result
-                            # 如果是列表
-                            elif isinstance(obj, list):
-                                # 递归检查列表的所有项
-                                for item in obj:
-                                    result = find_value(item, key)
-                                    if result is not None:
-                                        return result
-                            return None
-
-                        # 尝试提取群名称及其他信息
-                        group_name = None
-
-                        # 首先尝试从NickName中获取
-                        nickname_obj = find_value(group_info, "NickName")
-                        if isinstance(nickname_obj, dict) and "string" in nickname_obj:
-                            group_name = nickname_obj["string"]
-                        elif isinstance(nickname_obj, str):
-                            group_name = nickname_obj
-
-                        # 如果没找到，尝试其他可能的字段
-                        if not group_name:
-                            for name_key in ["ChatRoomName", "nickname", "name", "DisplayName"]:
-                                name_value = find_value(group_info, name_key)
-                                if name_value:
-                                    if isinstance(name_value, dict) and "string" in name_value:
-                                        group_name = name_value["string"]
-                                    elif isinstance(name_value, str):
-                                        group_name = name_value
-                                    if group_name:
-                                        break
-
-                        # 提取群主ID
-                        owner_id = None
-                        for owner_key in ["ChatRoomOwner", "chatroomowner", "Owner"]:
-                            owner_value = find_value(group_info, owner_key)
-                            if owner_value:
-                                if isinstance(owner_value, dict) and "string" in owner_value:
-                                    owner_id = owner_value["string"]
-                                elif isinstance(owner_value, str):
-                                    owner_id = owner_value
-                                if owner_id:
-                                    break
-
-                        # 检查群聊信息是否已存在
-                        if group_id in chatrooms_info:
-                            # 更新已有群聊信息
-                            if group_name:
-                                chatrooms_info[group_id]["nickName"] = group_name
-                            if owner_id:
-                                chatrooms_info[group_id]["chatRoomOwner"] = owner_id
-                            chatrooms_info[group_id]["last_update"] = int(time.time())
-                        else:
-                            # 创建新群聊信息
-                            chatrooms_info[group_id] = {
-                                "chatroomId": group_id,
-                                "nickName": group_name or group_id,
-                                "chatRoomOwner": owner_id or "",
-                                "members": [],
-                                "last_update": int(time.time())
-                            }
-
-                        # 保存到文件
-                        with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                            json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
-                        logger.info(f"[WX849] 已更新群聊 {group_id} 基础信息")
-
-                        # 缓存群名
-                        if group_name:
-                            if not hasattr(self, "group_name_cache"):
-                                self.group_name_cache = {}
-                            self.group_name_cache[cache_key] = group_name
-
-                            # 异步获取群成员详情（不阻塞当前方法）
-                            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                            return group_name
-
-                except Exception as save_err:
-                    logger.error(f"[WX849] 保存群聊信息到文件失败: {save_err}")
-                    import traceback
-                    logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-
-                # 如果上面的处理没有返回群名称，再次尝试从原始数据中提取
-                if group_info and isinstance(group_info, dict):
-                    # 尝试从API返回中获取群名称
-                    group_name = None
-
-                    # 尝试多种可能的字段名
-                    possible_fields = ["NickName", "nickname", "ChatRoomName", "chatroomname", "DisplayName", "displayname"]
-                    for field in possible_fields:
-                        if field in group_info and group_info[field]:
-                            group_name = group_info[field]
-                            if isinstance(group_name, dict) and "string" in group_name:
-                                group_name = group_name["string"]
-                            break
-
-                    if group_name:
-                        logger.debug(f"[WX849] 获取到群名称: {group_name}")
-
-                        # 缓存群名
-                        if not hasattr(self, "group_name_cache"):
-                            self.group_name_cache = {}
-                        self.group_name_cache[cache_key] = group_name
-
-                        # 异步获取群成员详情
-                        threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                        return group_name
-                    else:
-                        logger.warning(f"[WX849] API返回成功但未找到群名称字段: {json.dumps(group_info, ensure_ascii=False)}")
-                else:
-                    logger.warning(f"[WX849] API返回无效数据: {group_info}")
-            except Exception as e:
-                # 详细记录API请求失败的错误信息
-                logger.error(f"[WX849] 使用群聊API获取群名称失败: {e}")
-                logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-                logger.error(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
-
-            # 如果无法获取群名，使用群ID作为名称
-            logger.debug(f"[WX849] 无法获取群名称，使用群ID代替: {group_id}")
-            # 缓存结果
-            if not hasattr(self, "group_name_cache"):
-                self.group_name_cache = {}
-            self.group_name_cache[cache_key] = group_id
-
-            # 尽管获取群名失败，仍然尝试获取群成员详情
-            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-            return group_id
-        except Exception as e:
-            logger.error(f"[WX849] 获取群名称失败: {e}")
-            logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-            return group_id
-
     def _compose_context(self, ctype: ContextType, content, **kwargs):
         """重写父类方法，构建消息上下文"""
         try:
@@ -5157,43 +4398,6 @@ class WX849Channel(ChatChannel):
             logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
             return None
 
-    async def _get_chatroom_member_nickname(self, group_id, member_wxid):
-        """获取群成员的昵称"""
-        if not group_id or not member_wxid:
-            return member_wxid
-
-        try:
-            # 优先从缓存获取群成员信息
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            if os.path.exists(chatrooms_file):
-                with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                    chatrooms_info = json.load(f)
-
-                if group_id in chatrooms_info and "members" in chatrooms_info[group_id]:
-                    for member in chatrooms_info[group_id]["members"]:
-                        if member.get("UserName") == member_wxid:
-                            # 优先使用群内显示名称(群昵称)
-                            if member.get("DisplayName"):
-                                logger.debug(f"[WX849] 获取到成员 {member_wxid} 的群昵称: {member.get('DisplayName')}")
-                                return member.get("DisplayName")
-                            # 次选使用个人昵称
-                            elif member.get("NickName"):
-                                logger.debug(f"[WX849] 获取到成员 {member_wxid} 的昵称: {member.get('NickName')}")
-                                return member.get("NickName")
-                            else:
-                                return member_wxid
-
-            # 如果缓存中没有，启动一个后台任务获取群成员，但本次先返回wxid
-            logger.debug(f"[WX849] 未找到成员 {member_wxid} 的昵称信息，启动更新任务")
-            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-            return member_wxid
-        except Exception as e:
-            logger.error(f"[WX849] 获取群成员昵称失败: {e}")
-            logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-            return member_wxid
-
     async def _get_contact_name(self, contact_id):
         """获取联系人昵称，与gewechat保持一致"""
         if not contact_id or contact_id.endswith("@chatroom"):
@@ -5475,45 +4679,11 @@ class WX849Channel(ChatChannel):
             int: 视频时长（秒），如果提取失败则返回默认值10
         """
         try:
-            # 查找ffmpeg可执行文件
-            ffmpeg_cmd = "ffmpeg"
-            ffprobe_cmd = "ffprobe"
-            # 在Windows上检查常见安装路径
-            if os.name == 'nt':
-                possible_paths = [
-                    r"C:\ffmpeg\bin",
-                    r"C:\Program Files\ffmpeg\bin",
-                    r"C:\Program Files (x86)\ffmpeg\bin"
-                ]
-                for path in possible_paths:
-                    if os.path.exists(os.path.join(path, "ffprobe.exe")):
-                        ffprobe_cmd = os.path.join(path, "ffprobe.exe")
-                        break
-
-            logger.debug(f"[WX849] 使用ffprobe命令: {ffprobe_cmd}")
-
-            # 使用ffprobe提取视频时长
-            process = subprocess.run([
-                ffprobe_cmd,
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                video_path
-            ], check=False, capture_output=True)
-
-            if process.returncode == 0:
-                stdout = process.stdout.decode().strip()
-                try:
-                    duration = float(stdout)
-                    logger.debug(f"[WX849] 提取到视频时长: {duration}秒")
-
-                    # 确保时长为整数秒
-                    return int(duration)
-                except (ValueError, TypeError) as e:
-                    logger.error(f"[WX849] 解析视频时长失败: {e}, stdout: {stdout}")
-            else:
-                stderr = process.stderr.decode() if process.stderr else "无stderr输出"
-                logger.error(f"[WX849] 运行ffprobe失败，返回码: {process.returncode}, 错误: {stderr}")
+            duration = await media_transcoder.probe_duration(video_path)
+            if duration is not None:
+                logger.debug(f"[WX849] 提取到视频时长: {duration}秒")
+                # 确保时长为整数秒
+                return int(duration)
 
             # 如果提取失败，返回默认值
             logger.warning("[WX849] 未能提取视频时长，使用默认值10秒")
@@ -5635,82 +4805,16 @@ class WX849Channel(ChatChannel):
     async def _extract_first_frame(self, video_path):
         """从视频中提取第一帧并编码为Base64"""
         try:
-            # 创建临时目录
-            tmp_dir = os.path.join(get_appdata_dir(), "video_frames")
-            os.makedirs(tmp_dir, exist_ok=True)
-
-            # 临时图片文件路径
-            thumbnail_path = os.path.join(tmp_dir, f"frame_{int(time.time())}.jpg")
-
-            # 查找ffmpeg可执行文件
-            ffmpeg_cmd = "ffmpeg"
-            # 在Windows上检查常见安装路径
-            if os.name == 'nt':
-                possible_paths = [
-                    r"C:\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-                    r"C:\Program Files (x86)\ffmpeg\bin\ffmpeg.exe"
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        ffmpeg_cmd = path
-                        break
-
-            logger.debug(f"[WX849] 使用ffmpeg命令: {ffmpeg_cmd}")
-
-            # 使用ffmpeg提取第一帧，尝试多个时间点
-            success = False
-            for timestamp in ["00:00:01", "00:00:00.5", "00:00:00"]:
-                try:
-                    # 使用subprocess.run来执行ffmpeg命令
-                    process = subprocess.run([
-                        ffmpeg_cmd,
-                        "-i", video_path,
-                        "-ss", timestamp,
-                        "-vframes", "1",
-                        "-q:v", "2",  # 设置高质量输出
-                        thumbnail_path,
-                        "-y"
-                    ], check=False, capture_output=True)
-
-                    if process.returncode == 0 and os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
-                        logger.debug(f"[WX849] 成功提取视频帧，使用时间点: {timestamp}")
-                        success = True
-                        break
-                    else:
-                        logger.debug(f"[WX849] 提取视频帧失败，时间点: {timestamp}, 返回码: {process.returncode}")
-                        if process.stderr:
-                            logger.debug(f"[WX849] ffmpeg错误: {process.stderr.decode()[:200]}")
-                except Exception as e:
-                    logger.debug(f"[WX849] 使用时间点 {timestamp} 提取帧时出错: {e}")
-
-            # 如果所有尝试都失败，则返回空
-            if not success:
-                logger.warning("[WX849] 所有提取视频帧的尝试都失败，将发送无封面视频")
-                return None
-
-            # 读取并编码图片
-            if os.path.exists(thumbnail_path) and os.path.getsize(thumbnail_path) > 0:
-                with open(thumbnail_path, "rb") as f:
-                    image_data = f.read()
-
-                import base64
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-
-                # 删除临时图片文件
-                try:
-                    os.remove(thumbnail_path)
-                except Exception:
-                    pass
-
-                return image_base64
-
-            logger.warning("[WX849] 未能生成有效的封面图片")
-            return None
-        except Exception as e:
-            logger.error(f"[WX849] 提取视频帧失败: {e}")
-            logger.error(traceback.format_exc())
-            return None
+            # 依次尝试多个时间点，截图直接从管道读回
+            image_data = await media_transcoder.extract_frame(video_path)
+            if not image_data:
+                logger.warning("[WX849] 所有提取视频帧的尝试都失败，将发送无封面视频")
+                return None
+            return base64.b64encode(image_data).decode('utf-8')
+        except Exception as e:
+            logger.error(f"[WX849] 提取视频帧失败: {e}")
+            logger.error(traceback.format_exc())
+            return None
 
     async def _send_video(self, to_user_id, video_base64, cover_base64=None, video_duration=10):
         """发送视频消息"""
@@ -5846,50 +4950,17 @@ class WX849Channel(ChatChannel):
         try:
             # 检查是否是群ID
             if wxid.endswith("@chatroom"):
-                # 尝试从群聊缓存中获取群名称
-                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-                chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-                if os.path.exists(chatrooms_file):
-                    try:
-                        with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                            chatrooms_info = json.load(f)
-
-                        if wxid in chatrooms_info and "nickName" in chatrooms_info[wxid]:
-                            return chatrooms_info[wxid]["nickName"]
-                    except Exception as e:
-                        logger.debug(f"[WX849] 从缓存获取群名称失败: {e}")
-
-                # 如果没有找到，返回默认值
-                return "群聊"
+                # 从群聊目录获取群名称，没有找到时返回默认值
+                return self.chatroom_directory.name(wxid) or "群聊"
 
             # 检查是否是个人ID
-            # 首先尝试从群成员列表中获取昵称
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-
-                    # 遍历所有群聊
-                    for group_id, group_info in chatrooms_info.items():
-                        if "members" in group_info:
-                            # 遍历群成员
-                            for member in group_info["members"]:
-                                if member.get("UserName") == wxid:
-                                    # 优先使用群内显示名称(群昵称)
-                                    if member.get("DisplayName"):
-                                        logger.debug(f"[WX849] 从群成员列表获取到用户 {wxid} 的群昵称: {member.get('DisplayName')}")
-                                        return member.get("DisplayName")
-                                    # 次选使用个人昵称
-                                    elif member.get("NickName"):
-                                        logger.debug(f"[WX849] 从群成员列表获取到用户 {wxid} 的昵称: {member.get('NickName')}")
-                                        return member.get("NickName")
-                except Exception as e:
-                    logger.debug(f"[WX849] 从群成员列表获取昵称失败: {e}")
+            # 首先从群聊目录中查找该用户在群内的昵称
+            nickname = self.chatroom_directory.nickname(wxid)
+            if nickname:
+                logger.debug(f"[WX849] 从群成员列表获取到用户 {wxid} 的昵称: {nickname}")
+                return nickname
 
+            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
             # 如果在群成员列表中没有找到，尝试从联系人缓存中获取昵称
             contacts_file = os.path.join(tmp_dir, 'wx849_contacts.json')
 
@@ -6017,135 +5088,57 @@ class WX849Channel(ChatChannel):
             return None
 
     async def _get_group_member_details(self, group_id):
-        """获取群成员详情"""
-        try:
-            logger.debug(f"[WX849] 尝试获取群 {group_id} 的成员详情")
-
-            # 检查是否已存在群成员信息，并检查是否需要更新
-            # 定义群聊信息文件路径
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            # 读取现有的群聊信息（如果存在）
-            chatrooms_info = {}
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-                    logger.debug(f"[WX849] 已加载 {len(chatrooms_info)} 个现有群聊信息")
-                except Exception as e:
-                    logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
-            # 检查该群聊是否已存在且成员信息是否已更新
-            # 设定缓存有效期为24小时(86400秒)
-            cache_expiry = 86400
-            current_time = int(time.time())
-
-            if (group_id in chatrooms_info and
-                "members" in chatrooms_info[group_id] and
-                len(chatrooms_info[group_id]["members"]) > 0 and
-                "last_update" in chatrooms_info[group_id] and
-                current_time - chatrooms_info[group_id]["last_update"] < cache_expiry):
-                logger.debug(f"[WX849] 群 {group_id} 成员信息已存在且未过期，跳过更新")
-                return chatrooms_info[group_id]
-
-            logger.debug(f"[WX849] 群 {group_id} 成员信息不存在或已过期，开始更新")
-
-            # 调用API获取群成员详情
-            params = {
-                "QID": group_id,  # 群ID参数
-                "Wxid": self.wxid  # 自己的wxid参数
-            }
-
-            try:
-                # 获取API配置
-                api_host = conf().get("wx849_api_host", "127.0.0.1")
-                api_port = conf().get("wx849_api_port", 9011)
-                protocol_version = conf().get("wx849_protocol_version", "849")
-
-                # 确定API路径前缀
-                if protocol_version == "855" or protocol_version == "ipad":
-                    api_path_prefix = "/api"
-                else:
-                    api_path_prefix = "/VXAPI"
+        """获取群成员详情，群聊目录中的信息不存在或已过期时刷新"""
+        if self.chatroom_directory.is_fresh(group_id):
+            logger.debug(f"[WX849] 群 {group_id} 成员信息已存在且未过期，跳过更新")
+            return self.chatroom_directory.get(group_id)
 
-                # 构建完整的API URL用于日志
-                api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Group/GetChatRoomMemberDetail"
-                logger.debug(f"[WX849] 正在请求群成员详情API: {api_url}")
-                logger.debug(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
+        logger.debug(f"[WX849] 群 {group_id} 成员信息不存在或已过期，开始更新")
+        return await self.chatroom_directory.refresh(group_id)
 
-                # 使用新的_get_group_members方法获取群成员
-                members_data = await self._get_group_members(group_id)
+    async def _fetch_chatroom(self, group_id):
+        """从API获取群名称、群主和群成员，由群聊目录在后台刷新时调用
 
-                if not members_data:
-                    logger.error(f"[WX849] 获取群成员详情失败: 无法获取成员列表")
-                    return None
-
-                # 构建新的chatroom_data结构
-                new_chatroom_data = {
-                    "ChatRoomName": group_id,
-                    "MemberCount": len(members_data),
-                    "ChatRoomMember": members_data
-                }
-
-                # 检查当前群聊是否已存在
-                if group_id not in chatrooms_info:
-                    chatrooms_info[group_id] = {
-                        "chatroomId": group_id,
-                        "nickName": group_id,
-                        "chatRoomOwner": "",
-                        "members": [],
-                        "last_update": int(time.time())
-                    }
-
-                # 提取成员信息
-                member_count = new_chatroom_data.get("MemberCount", 0)
-                chat_room_members = new_chatroom_data.get("ChatRoomMember", [])
-
-                # 确保是有效的成员列表
-                if not isinstance(chat_room_members, list):
-                    logger.error(f"[WX849] 获取群成员详情失败: ChatRoomMember不是有效的列表")
-                    return None
-
-                # 更新群聊成员信息
-                members = []
-                for member in chat_room_members:
-                    if not isinstance(member, dict):
-                        continue
-
-                    # 提取成员必要信息，直接使用原始成员信息
-                    members.append(member)
+        返回要更新的字段，群名称和群成员都没有获取到时返回None
+        """
+        fields = {}
+
+        # 首先尝试使用GetContractDetail API获取群名称，失败时使用群聊API
+        group_details = await self._get_group_details_by_contract_detail(group_id)
+        if not group_details:
+            group_details = await self._get_group_info_by_room_info(group_id)
+        if group_details:
+            fields.update(group_details)
+
+        # 调用API获取群成员详情
+        params = {
+            "QID": group_id,  # 群ID参数
+            "Wxid": self.wxid  # 自己的wxid参数
+        }
+        response = await self._call_api("/Group/GetChatRoomMemberDetail", params)
 
-                # 更新群聊信息
-                chatrooms_info[group_id]["members"] = members
-                chatrooms_info[group_id]["last_update"] = int(time.time())
-                chatrooms_info[group_id]["memberCount"] = member_count
+        if not response or not isinstance(response, dict):
+            logger.error(f"[WX849] 获取群 {group_id} 成员详情失败: 无效响应")
+        elif not response.get("Success", False):
+            logger.error(f"[WX849] 获取群 {group_id} 成员详情失败: {response.get('Message', '未知错误')}")
+        else:
+            new_chatroom_data = (response.get("Data") or {}).get("NewChatroomData") or {}
+            chat_room_members = new_chatroom_data.get("ChatRoomMember", [])
+            if isinstance(chat_room_members, list):
+                # 保存原始成员信息
+                members = [member for member in chat_room_members if isinstance(member, dict)]
+                fields["members"] = members
+                fields["memberCount"] = new_chatroom_data.get("MemberCount", len(members))
 
                 # 同时更新群主信息
                 for member in members:
-                    if member.get("ChatroomMemberFlag") == 2049:  # 群主标志
-                        chatrooms_info[group_id]["chatRoomOwner"] = member.get("UserName", "")
+                    if member.get("ChatroomMemberFlag") == OWNER_MEMBER_FLAG:
+                        fields["chatRoomOwner"] = member.get("UserName", "")
                         break
+            else:
+                logger.error(f"[WX849] 获取群 {group_id} 成员详情失败: ChatRoomMember不是有效的列表")
 
-                # 保存到文件
-                with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                    json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
-                logger.info(f"[WX849] 已更新群聊 {group_id} 成员信息，成员数: {len(members)}")
-
-                # 返回成员信息
-                return new_chatroom_data
-            except Exception as e:
-                logger.error(f"[WX849] 获取群成员详情失败: {e}")
-                logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-                return None
-        except Exception as e:
-            logger.error(f"[WX849] 获取群成员详情过程中出错: {e}")
-            logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-            return None
+        return fields or None
 
     async def _get_group_details_by_contract_detail(self, group_id):
         """使用GetContractDetail API获取群组详细信息"""
@@ -6255,324 +5248,112 @@ class WX849Channel(ChatChannel):
             return None
 
     async def _get_group_name(self, group_id):
-        """获取群名称"""
+        """获取群名称，优先从群聊目录获取，目录中没有群名称时等待刷新"""
         try:
-            logger.debug(f"[WX849] 尝试获取群 {group_id} 的名称")
-
-            # 检查缓存中是否有群名
-            cache_key = f"group_name_{group_id}"
-            if hasattr(self, "group_name_cache") and cache_key in self.group_name_cache:
-                cached_name = self.group_name_cache[cache_key]
-                logger.debug(f"[WX849] 从缓存中获取群名: {cached_name}")
-
-                # 检查是否需要更新群成员详情
-                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-                chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-                need_update = True
-                # 设定缓存有效期为24小时(86400秒)
-                cache_expiry = 86400
-                current_time = int(time.time())
-
-                if os.path.exists(chatrooms_file):
-                    try:
-                        with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                            chatrooms_info = json.load(f)
-
-                        # 检查群信息是否存在且未过期
-                        if (group_id in chatrooms_info and
-                            "last_update" in chatrooms_info[group_id] and
-                            current_time - chatrooms_info[group_id]["last_update"] < cache_expiry and
-                            "members" in chatrooms_info[group_id] and
-                            len(chatrooms_info[group_id]["members"]) > 0):
-                            logger.debug(f"[WX849] 群 {group_id} 信息已存在且未过期，跳过更新")
-                            need_update = False
-                    except Exception as e:
-                        logger.error(f"[WX849] 检查群信息缓存时出错: {e}")
-
-                # 只有需要更新时才启动线程获取群成员详情
-                if need_update:
-                    logger.debug(f"[WX849] 群 {group_id} 信息需要更新，启动更新线程")
-                    threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                return cached_name
-
-            # 检查文件中是否已经有群信息，且未过期
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            # 设定缓存有效期为24小时(86400秒)
-            cache_expiry = 86400
-            current_time = int(time.time())
-
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-
-                    # 检查群信息是否存在且未过期
-                    if (group_id in chatrooms_info and
-                        "nickName" in chatrooms_info[group_id] and
-                        chatrooms_info[group_id]["nickName"] and
-                        chatrooms_info[group_id]["nickName"] != group_id and
-                        "last_update" in chatrooms_info[group_id] and
-                        current_time - chatrooms_info[group_id]["last_update"] < cache_expiry):
-
-                        # 从文件中获取群名
-                        group_name = chatrooms_info[group_id]["nickName"]
-                        logger.debug(f"[WX849] 从文件缓存中获取群名: {group_name}")
-
-                        # 缓存群名
-                        if not hasattr(self, "group_name_cache"):
-                            self.group_name_cache = {}
-                        self.group_name_cache[cache_key] = group_name
-
-                        # 检查是否需要更新群成员详情
-                        need_update_members = not ("members" in chatrooms_info[group_id] and
-                                                len(chatrooms_info[group_id]["members"]) > 0)
-
-                        if need_update_members:
-                            logger.debug(f"[WX849] 群 {group_id} 名称已缓存，但需要更新成员信息")
-                            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-                        else:
-                            logger.debug(f"[WX849] 群 {group_id} 信息已完整且未过期，无需更新")
-
-                        return group_name
-                except Exception as e:
-                    logger.error(f"[WX849] 从文件获取群名出错: {e}")
-
-            logger.debug(f"[WX849] 群 {group_id} 信息不存在或已过期，需要从API获取")
-
-            # 首先尝试使用GetContractDetail API获取群组信息
-            group_details = await self._get_group_details_by_contract_detail(group_id)
-            if group_details and "nickName" in group_details:
-                group_name = group_details["nickName"]
-
-                # 保存到缓存
-                if not os.path.exists(tmp_dir):
-                    os.makedirs(tmp_dir)
-
-                chatrooms_info = {}
-                if os.path.exists(chatrooms_file):
-                    try:
-                        with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                            chatrooms_info = json.load(f)
-                    except Exception as e:
-                        logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
-                if group_id not in chatrooms_info:
-                    chatrooms_info[group_id] = {}
-
-                chatrooms_info[group_id]["nickName"] = group_name
-                chatrooms_info[group_id]["last_update"] = int(time.time())
-
-                with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                    json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
-                # 缓存群名
-                if not hasattr(self, "group_name_cache"):
-                    self.group_name_cache = {}
-                self.group_name_cache[cache_key] = group_name
-
-                logger.debug(f"[WX849] 已更新群组 {group_id} 名称: {group_name}")
-
-                # 异步获取群成员详情
-                threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
+            group_name = self.chatroom_directory.name(group_id)
+            if group_name:
+                logger.debug(f"[WX849] 从群聊目录获取群名: {group_name}")
+                # 群成员信息不存在或已过期时在后台刷新，不阻塞当前方法
+                if not self.chatroom_directory.is_fresh(group_id):
+                    self.chatroom_directory.request_refresh(group_id)
                 return group_name
 
-            # 调用API获取群信息 - 使用群聊API
-            params = {
-                "QID": group_id,  # 群ID参数，正确的参数名是QID
-                "Wxid": self.wxid  # 自己的wxid参数
-            }
-
-            try:
-                # 获取API配置
-                api_host = conf().get("wx849_api_host", "127.0.0.1")
-                api_port = conf().get("wx849_api_port", 9011)
-                protocol_version = conf().get("wx849_protocol_version", "849")
-
-                # 确定API路径前缀
-                if protocol_version == "855" or protocol_version == "ipad":
-                    api_path_prefix = "/api"
-                else:
-                    api_path_prefix = "/VXAPI"
-
-                # 构建完整的API URL用于日志
-                api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Group/GetChatRoomInfo"
-                logger.debug(f"[WX849] 正在请求群信息API: {api_url}")
-                logger.debug(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")  # 记录请求参数
-
-                # 尝试使用群聊专用API
-                group_info = await self._call_api("/Group/GetChatRoomInfo", params)
-
-                # 保存群聊详情到统一的JSON文件
-                try:
-                    # 读取现有的群聊信息（如果存在）
-                    chatrooms_info = {}
-                    if os.path.exists(chatrooms_file):
-                        try:
-                            with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                                chatrooms_info = json.load(f)
-                            logger.debug(f"[WX849] 已加载 {len(chatrooms_info)} 个现有群聊信息")
-                        except Exception as e:
-                            logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
-                    # 提取必要的群聊信息
-                    if group_info and isinstance(group_info, dict):
-                        # 递归函数用于查找特定key的值
-                        def find_value(obj, key):
-                            # 如果是字典
-                            if isinstance(obj, dict):
-                                # 直接检查当前字典
-                                if key in obj:
-                                    return obj[key]
-                                # 检查带有"string"嵌套的字典
-                                if key in obj and isinstance(obj[key], dict) and "string" in obj[key]:
-                                    return obj[key]["string"]
-                                # 递归检查字典的所有值
-                                for k, v in obj.items():
-                                    result = find_value(v, key)
-                                    if result is not None:
-                                        return result
-                            # 如果是列表
-                            elif isinstance(obj, list):
-                                # 递归检查列表的所有项
-                                for item in obj:
-                                    result = find_value(item, key)
-                                    if result is not None:
-                                        return result
-                            return None
-
-                        # 尝试提取群名称及其他信息
-                        group_name = None
-
-                        # 首先尝试从NickName中获取
-                        nickname_obj = find_value(group_info, "NickName")
-                        if isinstance(nickname_obj, dict) and "string" in nickname_obj:
-                            group_name = nickname_obj["string"]
-                        elif isinstance(nickname_obj, str):
-                            group_name = nickname_obj
+            logger.debug(f"[WX849] 群 {group_id} 信息不存在，需要从API获取")
+            await self.chatroom_directory.refresh(group_id)
+            group_name = self.chatroom_directory.name(group_id)
+            if not group_name:
+                logger.debug(f"[WX849] 无法获取群名称，使用群ID代替: {group_id}")
+            return group_name or group_id
+        except Exception as e:
+            logger.error(f"[WX849] 获取群名称失败: {e}")
+            logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
+            return group_id
 
-                        # 如果没找到，尝试其他可能的字段
-                        if not group_name:
-                            for name_key in ["ChatRoomName", "nickname", "name", "DisplayName"]:
-                                name_value = find_value(group_info, name_key)
-                                if name_value:
-                                    if isinstance(name_value, dict) and "string" in name_value:
-                                        group_name = name_value["string"]
-                                    elif isinstance(name_value, str):
-                                        group_name = name_value
-                                    if group_name:
-                                        break
+    async def _get_group_info_by_room_info(self, group_id):
+        """使用GetChatRoomInfo API获取群名称和群主"""
+        params = {
+            "QID": group_id,  # 群ID参数，正确的参数名是QID
+            "Wxid": self.wxid  # 自己的wxid参数
+        }
 
-                        # 提取群主ID
-                        owner_id = None
-                        for owner_key in ["ChatRoomOwner", "chatroomowner", "Owner"]:
-                            owner_value = find_value(group_info, owner_key)
-                            if owner_value:
-                                if isinstance(owner_value, dict) and "string" in owner_value:
-                                    owner_id = owner_value["string"]
-                                elif isinstance(owner_value, str):
-                                    owner_id = owner_value
-                                if owner_id:
-                                    break
+        try:
+            group_info = await self._call_api("/Group/GetChatRoomInfo", params)
+            if not group_info or not isinstance(group_info, dict):
+                logger.warning(f"[WX849] API返回无效数据: {group_info}")
+                return None
 
-                        # 检查群聊信息是否已存在
-                        if group_id in chatrooms_info:
-                            # 更新已有群聊信息
-                            if group_name:
-                                chatrooms_info[group_id]["nickName"] = group_name
-                            if owner_id:
-                                chatrooms_info[group_id]["chatRoomOwner"] = owner_id
-                            chatrooms_info[group_id]["last_update"] = int(time.time())
-                        else:
-                            # 创建新群聊信息
-                            chatrooms_info[group_id] = {
-                                "chatroomId": group_id,
-                                "nickName": group_name or group_id,
-                                "chatRoomOwner": owner_id or "",
-                                "members": [],
-                                "last_update": int(time.time())
-                            }
+            # 递归函数用于查找特定key的值
+            def find_value(obj, key):
+                # 如果是字典
+                if isinstance(obj, dict):
+                    # 直接检查当前字典
+                    if key in obj:
+                        return obj[key]
+                    # 检查带有"string"嵌套的字典
+                    if key in obj and isinstance(obj[key], dict) and "string" in obj[key]:
+                        return obj[key]["string"]
+                    # 递归检查字典的所有值
+                    for k, v in obj.items():
+                        result = find_value(v, key)
+                        if result is not None:
+                            return result
+                # 如果是列表
+                elif isinstance(obj, list):
+                    # 递归检查列表的所有项
+                    for item in obj:
+                        result = find_value(item, key)
+                        if result is not None:
+                            return result
+                return None
 
-                        # 保存到文件
-                        with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                            json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
+            # 尝试提取群名称及其他信息
+            group_name = None
 
-                        logger.info(f"[WX849] 已更新群聊 {group_id} 基础信息")
+            # 首先尝试从NickName中获取
+            nickname_obj = find_value(group_info, "NickName")
+            if isinstance(nickname_obj, dict) and "string" in nickname_obj:
+                group_name = nickname_obj["string"]
+            elif isinstance(nickname_obj, str):
+                group_name = nickname_obj
 
-                        # 缓存群名
+            # 如果没找到，尝试其他可能的字段
+            if not group_name:
+                for name_key in ["ChatRoomName", "nickname", "name", "DisplayName"]:
+                    name_value = find_value(group_info, name_key)
+                    if name_value:
+                        if isinstance(name_value, dict) and "string" in name_value:
+                            group_name = name_value["string"]
+                        elif isinstance(name_value, str):
+                            group_name = name_value
                         if group_name:
-                            if not hasattr(self, "group_name_cache"):
-                                self.group_name_cache = {}
-                            self.group_name_cache[cache_key] = group_name
-
-                            # 异步获取群成员详情（不阻塞当前方法）
-                            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                            return group_name
-
-                except Exception as save_err:
-                    logger.error(f"[WX849] 保存群聊信息到文件失败: {save_err}")
-                    import traceback
-                    logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-
-                # 如果上面的处理没有返回群名称，再次尝试从原始数据中提取
-                if group_info and isinstance(group_info, dict):
-                    # 尝试从API返回中获取群名称
-                    group_name = None
-
-                    # 尝试多种可能的字段名
-                    possible_fields = ["NickName", "nickname", "ChatRoomName", "chatroomname", "DisplayName", "displayname"]
-                    for field in possible_fields:
-                        if field in group_info and group_info[field]:
-                            group_name = group_info[field]
-                            if isinstance(group_name, dict) and "string" in group_name:
-                                group_name = group_name["string"]
                             break
 
-                    if group_name:
-                        logger.debug(f"[WX849] 获取到群名称: {group_name}")
-
-                        # 缓存群名
-                        if not hasattr(self, "group_name_cache"):
-                            self.group_name_cache = {}
-                        self.group_name_cache[cache_key] = group_name
-
-                        # 异步获取群成员详情
-                        threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
-
-                        return group_name
-                    else:
-                        logger.warning(f"[WX849] API返回成功但未找到群名称字段: {json.dumps(group_info, ensure_ascii=False)}")
-                else:
-                    logger.warning(f"[WX849] API返回无效数据: {group_info}")
-            except Exception as e:
-                # 详细记录API请求失败的错误信息
-                logger.error(f"[WX849] 使用群聊API获取群名称失败: {e}")
-                logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-                logger.error(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
-
-            # 如果无法获取群名，使用群ID作为名称
-            logger.debug(f"[WX849] 无法获取群名称，使用群ID代替: {group_id}")
-            # 缓存结果
-            if not hasattr(self, "group_name_cache"):
-                self.group_name_cache = {}
-            self.group_name_cache[cache_key] = group_id
-
-            # 尽管获取群名失败，仍然尝试获取群成员详情
-            threading.Thread(target=lambda: asyncio.run(self._get_group_member_details(group_id))).start()
+            # 提取群主ID
+            owner_id = None
+            for owner_key in ["ChatRoomOwner", "chatroomowner", "Owner"]:
+                owner_value = find_value(group_info, owner_key)
+                if owner_value:
+                    if isinstance(owner_value, dict) and "string" in owner_value:
+                        owner_id = owner_value["string"]
+                    elif isinstance(owner_value, str):
+                        owner_id = owner_value
+                    if owner_id:
+                        break
 
-            return group_id
+            group_details = {}
+            if group_name:
+                group_details["nickName"] = group_name
+            if owner_id:
+                group_details["chatRoomOwner"] = owner_id
+            if not group_name:
+                logger.warning(f"[WX849] API返回成功但未找到群名称字段: {json.dumps(group_info, ensure_ascii=False)}")
+            return group_details or None
         except Exception as e:
-            logger.error(f"[WX849] 获取群名称失败: {e}")
+            # 详细记录API请求失败的错误信息
+            logger.error(f"[WX849] 使用群聊API获取群名称失败: {e}")
             logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
-            return group_id
+            logger.error(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
+            return None
 
     def _compose_context(self, ctype: ContextType, content, **kwargs):
         """重写父类方法，构建消息上下文，与gewechat保持一致"""
@@ -6710,25 +5491,12 @@ class WX849Channel(ChatChannel):
                 # 设置session_id为群ID
                 context["session_id"] = msg.from_user_id
 
-                # 启动异步任务获取群名称并更新
-                try:
-                    # 使用已有事件循环运行更新任务
-                    def run_async_task():
-                        try:
-                            # 创建新的事件循环
-                            task_loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(task_loop)
-                            # 执行异步任务
-                            task_loop.run_until_complete(self._update_group_nickname_async(msg))
-                            # 关闭事件循环
-                            task_loop.close()
-                        except Exception as e:
-                            logger.error(f"[WX849] 异步获取群名称任务失败: {e}")
-
-                    # 启动线程执行异步任务
-                    threading.Thread(target=run_async_task).start()
-                except Exception as e:
-                    logger.error(f"[WX849] 创建获取群名称任务失败: {e}")
+                # 消息处理时还没有群名称的，再从群聊目录查询一次
+                if context["group_name"] == msg.from_user_id:
+                    group_name = self.chatroom_directory.name(msg.from_user_id)
+                    if group_name:
+                        msg.other_user_nickname = group_name
+                        context["group_name"] = group_name
             else:
                 # 私聊消息
                 context["isgroup"] = False
@@ -6825,153 +5593,20 @@ class WX849Channel(ChatChannel):
             return member_wxid
 
         try:
-            # 优先从缓存获取群成员信息
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            if os.path.exists(chatrooms_file):
-                with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                    chatrooms_info = json.load(f)
-
-                if group_id in chatrooms_info and "members" in chatrooms_info[group_id]:
-                    for member in chatrooms_info[group_id]["members"]:
-                        if member.get("UserName") == member_wxid:
-                            # 优先使用群内显示名称(群昵称)
-                            if member.get("DisplayName"):
-                                logger.debug(f"[WX849] 获取到成员 {member_wxid} 的群昵称: {member.get('DisplayName')}")
-                                return member.get("DisplayName")
-                            # 次选使用个人昵称
-                            elif member.get("NickName"):
-                                logger.debug(f"[WX849] 获取到成员 {member_wxid} 的昵称: {member.get('NickName')}")
-                                return member.get("NickName")
-                            else:
-                                return member_wxid
-
-            # 如果缓存中没有，尝试立即获取群成员信息
-            logger.debug(f"[WX849] 未找到成员 {member_wxid} 的昵称信息，尝试立即获取")
-
-            # 获取API配置
-            api_host = conf().get("wx849_api_host", "127.0.0.1")
-            api_port = conf().get("wx849_api_port", 9011)
-            protocol_version = conf().get("wx849_protocol_version", "849")
-
-            # 确定API路径前缀
-            if protocol_version == "855" or protocol_version == "ipad":
-                api_path_prefix = "/api"
-            else:
-                api_path_prefix = "/VXAPI"
-
-            # 构建API请求参数
-            params = {
-                "QID": group_id,
-                "Wxid": self.wxid
-            }
-
-            # 构建完整的API URL用于日志
-            api_url = f"http://{api_host}:{api_port}{api_path_prefix}/Group/GetChatRoomMemberDetail"
-            logger.debug(f"[WX849] 正在请求群成员详情API: {api_url}")
-            logger.debug(f"[WX849] 请求参数: {json.dumps(params, ensure_ascii=False)}")
-
-            # 调用API获取群成员详情
-            response = await self._call_api("/Group/GetChatRoomMemberDetail", params)
-
-            if not response or not isinstance(response, dict):
-                logger.error(f"[WX849] 获取群成员详情失败: 无效响应")
-                return member_wxid
-
-            # 检查响应是否成功
-            if not response.get("Success", False):
-                logger.error(f"[WX849] 获取群成员详情失败: {response.get('Message', '未知错误')}")
-                return member_wxid
-
-            # 提取群成员详情
-            data = response.get("Data", {})
-            if not data:
-                logger.error(f"[WX849] 获取群成员详情失败: 响应中无Data")
-                return member_wxid
-
-            # 提取NewChatroomData
-            new_chatroom_data = data.get("NewChatroomData", {})
-            if not new_chatroom_data:
-                logger.error(f"[WX849] 获取群成员列表失败: 响应中无NewChatroomData")
-                return member_wxid
-
-            # 提取成员列表
-            chat_room_members = new_chatroom_data.get("ChatRoomMember", [])
-
-            # 确保是有效的成员列表
-            if not isinstance(chat_room_members, list):
-                logger.error(f"[WX849] 获取群成员详情失败: ChatRoomMember不是有效的列表")
-                return member_wxid
-
-            # 更新群聊成员信息
-            members = []
-            for member in chat_room_members:
-                if not isinstance(member, dict):
-                    continue
-
-                # 提取成员必要信息，直接使用原始成员信息
-                members.append(member)
-
-                # 检查是否是要查找的成员
-                if member.get("UserName") == member_wxid:
-                    # 优先使用群内显示名称(群昵称)
-                    if member.get("DisplayName"):
-                        logger.debug(f"[WX849] 获取到成员 {member_wxid} 的群昵称: {member.get('DisplayName')}")
-                        nickname = member.get("DisplayName")
-                    # 次选使用个人昵称
-                    elif member.get("NickName"):
-                        logger.debug(f"[WX849] 获取到成员 {member_wxid} 的昵称: {member.get('NickName')}")
-                        nickname = member.get("NickName")
-                    else:
-                        nickname = member_wxid
-
-            # 更新群聊信息
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-                except Exception as e:
-                    logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-                    chatrooms_info = {}
-            else:
-                chatrooms_info = {}
-
-            if group_id not in chatrooms_info:
-                chatrooms_info[group_id] = {
-                    "chatroomId": group_id,
-                    "nickName": group_id,
-                    "chatRoomOwner": "",
-                    "members": [],
-                    "last_update": int(time.time())
-                }
-
-            # 更新群聊成员信息
-            chatrooms_info[group_id]["members"] = members
-            chatrooms_info[group_id]["last_update"] = int(time.time())
-
-            # 保存到文件
-            with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
-            logger.info(f"[WX849] 已更新群聊 {group_id} 成员信息，成员数: {len(members)}")
-
-            # 再次尝试查找成员昵称
-            for member in members:
-                if member.get("UserName") == member_wxid:
-                    # 优先使用群内显示名称(群昵称)
-                    if member.get("DisplayName"):
-                        logger.debug(f"[WX849] 获取到成员 {member_wxid} 的群昵称: {member.get('DisplayName')}")
-                        return member.get("DisplayName")
-                    # 次选使用个人昵称
-                    elif member.get("NickName"):
-                        logger.debug(f"[WX849] 获取到成员 {member_wxid} 的昵称: {member.get('NickName')}")
-                        return member.get("NickName")
-                    else:
-                        return member_wxid
-
-            # 如果仍然找不到，返回wxid
-            return member_wxid
+            member = self.chatroom_directory.member(group_id, member_wxid)
+            if member is None:
+                # 群聊目录中没有该成员（新成员或还没有获取过群成员），等待刷新群成员
+                logger.debug(f"[WX849] 未找到成员 {member_wxid} 的昵称信息，刷新群成员")
+                await self.chatroom_directory.refresh(group_id)
+                member = self.chatroom_directory.member(group_id, member_wxid)
+            elif not self.chatroom_directory.is_fresh(group_id):
+                self.chatroom_directory.request_refresh(group_id)
+
+            # 优先使用群内显示名称(群昵称)，次选使用个人昵称
+            nickname = member_display_name(member)
+            if nickname:
+                logger.debug(f"[WX849] 获取到成员 {member_wxid} 的昵称: {nickname}")
+            return nickname or member_wxid
         except Exception as e:
             logger.error(f"[WX849] 获取群成员昵称失败: {e}")
             logger.error(f"[WX849] 详细错误: {traceback.format_exc()}")
@@ -7025,24 +5660,6 @@ class WX849Channel(ChatChannel):
                 logger.error(f"[WX849] 获取联系人列表失败: 响应中无ContactList或格式不正确")
                 return
 
-            # 创建临时目录
-            tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-
-            # 定义群聊信息文件路径
-            chatrooms_file = os.path.join(tmp_dir, 'wx849_rooms.json')
-
-            # 读取现有的群聊信息（如果存在）
-            chatrooms_info = {}
-            if os.path.exists(chatrooms_file):
-                try:
-                    with open(chatrooms_file, 'r', encoding='utf-8') as f:
-                        chatrooms_info = json.load(f)
-                    logger.debug(f"[WX849] 已加载 {len(chatrooms_info)} 个现有群聊信息")
-                except Exception as e:
-                    logger.error(f"[WX849] 加载现有群聊信息失败: {str(e)}")
-
             # 更新群聊信息
             updated_count = 0
             for contact in contact_list:
@@ -7054,34 +5671,14 @@ class WX849Channel(ChatChannel):
                 if not user_name or not user_name.endswith("@chatroom"):
                     continue
 
-                # 提取群聊信息
-                nick_name = contact.get("NickName", "")
-
-                # 更新群聊信息
-                if user_name not in chatrooms_info:
-                    chatrooms_info[user_name] = {
-                        "chatroomId": user_name,
-                        "nickName": nick_name or user_name,
-                        "chatRoomOwner": "",
-                        "members": [],
-                        "last_update": int(time.time())
-                    }
-                else:
-                    # 只更新昵称和时间戳
-                    if nick_name:
-                        chatrooms_info[user_name]["nickName"] = nick_name
-                    chatrooms_info[user_name]["last_update"] = int(time.time())
-
+                # 只更新昵称和时间戳，每个群只保存这一个群的信息
+                self.chatroom_directory.update(user_name, nickName=contact.get("NickName", "") or None)
                 updated_count += 1
 
-            # 保存到文件
-            with open(chatrooms_file, 'w', encoding='utf-8') as f:
-                json.dump(chatrooms_info, f, ensure_ascii=False, indent=2)
-
             logger.info(f"[WX849] 已更新 {updated_count} 个群聊基础信息")
 
             # 更新群成员信息
-            for group_id in list(chatrooms_info.keys())[:10]:  # 限制一次最多更新10个群
+            for group_id in self.chatroom_directory.group_ids()[:10]:  # 限制一次最多更新10个群
                 try:
                     await self._get_group_member_details(group_id)
                 except Exception as e:
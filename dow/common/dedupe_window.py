@@ -0,0 +1,2 @@
+# 与主框架共用 utils/dedupe_window.py 的实现（主框架根目录由 app.py 加入 Python 路径）
+from utils.dedupe_window import DedupeWindow
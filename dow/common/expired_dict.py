@@ -1,22 +1,59 @@
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
 
 
-class ExpiredDict(dict):
-    def __init__(self, expires_in_seconds):
-        super().__init__()
+class ExpiredDict(MutableMapping):
+    """读写后在 expires_in_seconds 秒内有效的字典
+
+    所有键的有效期相同，且每次读写都会把有效期延长到“现在 + expires_in_seconds”，
+    因此按最近读写顺序排列的 OrderedDict 本身就是按过期时间排好序的队列：
+    最早过期的键总在最前面，清理时只需从头部依次弹出，读写和清理均摊都是 O(1)。
+    设置 max_size 时，超出数量后淘汰最久未使用的键。
+    """
+
+    def __init__(self, expires_in_seconds, max_size=None):
         self.expires_in_seconds = expires_in_seconds if expires_in_seconds else 3600
+        self.max_size = max_size
+        # 键 -> (值, 过期时间)，按最近读写排序
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _purge(self, now):
+        """从头部删除已过期的键，写入和遍历时调用"""
+        data = self._data
+        while data:
+            key = next(iter(data))
+            if data[key][1] > now:
+                break
+            del data[key]
 
     def __getitem__(self, key):
-        value, expiry_time = super().__getitem__(key)
-        if datetime.now() > expiry_time:
-            del self[key]
-            raise KeyError("expired {}".format(key))
-        self.__setitem__(key, value)
-        return value
+        now = time.monotonic()
+        with self._lock:
+            value, expiry_time = self._data[key]
+            if now >= expiry_time:
+                del self._data[key]
+                raise KeyError("expired {}".format(key))
+            # 读取同样延长有效期
+            self._data[key] = (value, now + self.expires_in_seconds)
+            self._data.move_to_end(key)
+            return value
 
     def __setitem__(self, key, value):
-        expiry_time = datetime.now() + timedelta(seconds=self.expires_in_seconds)
-        super().__setitem__(key, (value, expiry_time))
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now + self.expires_in_seconds)
+            self._data.move_to_end(key)
+            self._purge(now)
+            if self.max_size:
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
 
     def get(self, key, default=None):
         try:
@@ -31,12 +68,33 @@ class ExpiredDict(dict):
         except KeyError:
             return False
 
+    def __len__(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            return len(self._data)
+
     def keys(self):
-        keys = list(super().keys())
-        return [key for key in keys if key in self]
+        # 只返回未过期的键，不延长有效期
+        with self._lock:
+            self._purge(time.monotonic())
+            return list(self._data.keys())
 
     def items(self):
-        return [(key, self[key]) for key in self.keys()]
+        with self._lock:
+            self._purge(time.monotonic())
+            return [(key, value) for key, (value, _) in self._data.items()]
+
+    def values(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            return [value for value, _ in self._data.values()]
 
     def __iter__(self):
-        return self.keys().__iter__()
+        return iter(self.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, dict(self.items()))
@@ -0,0 +1,6 @@
+# 与主框架共用 utils/media_transcoder.py 的实现（主框架根目录由 app.py 加入 Python 路径），
+# 日志写入 DOW 的日志
+from common.log import logger
+from utils.media_transcoder import MediaTranscoder, TranscodeError
+
+media_transcoder = MediaTranscoder(logger=logger)
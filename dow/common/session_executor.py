@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from common.log import logger
+
+
+class SessionExecutor:
+    """按会话排序的线程池
+
+    线程数有上限，同一会话的任务按提交顺序逐个执行，不同会话的任务并行执行。
+    有任务可执行的会话按先后轮流取出，一个会话积压很多任务时不会占满所有线程。
+    每个工作线程常驻一个事件循环（set_event_loop），任务中可以像在独立线程中一样
+    使用 asyncio.get_event_loop()；任务关闭了该事件循环时，下一个任务前重新创建。
+    """
+
+    def __init__(self, max_workers=8, name="session"):
+        """
+        参数:
+            max_workers: 工作线程数上限
+            name: 线程名前缀，同时用于日志
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self._cond = threading.Condition()
+        # 会话 -> 排队中的任务
+        self._sessions = {}
+        # 有任务可执行且没有任务正在执行的会话，按就绪先后排列
+        self._ready = deque()
+        # 正在执行任务的会话
+        self._running = set()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+
+        # 统计
+        self._queued = 0
+        self._max_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        """提交任务
+
+        参数:
+            session_id: 会话ID，同一会话的任务按提交顺序执行
+            fn: 在工作线程中执行的函数
+
+        返回:
+            concurrent.futures.Future: 任务结果
+        """
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"[{self.name}] 线程池已关闭")
+            jobs = self._sessions.get(session_id)
+            if jobs is None:
+                jobs = self._sessions[session_id] = deque()
+            jobs.append((fn, args, kwargs, future, time.monotonic()))
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            if len(jobs) == 1 and session_id not in self._running:
+                self._ready.append(session_id)
+                # 可执行的会话多于空闲线程时增加线程
+                if len(self._ready) > self._idle and len(self._threads) < self.max_workers:
+                    self._start_worker()
+                self._cond.notify()
+        return future
+
+    def stats(self):
+        """队列与耗时统计
+
+        返回:
+            dict: queued 排队中的任务数，max_queued 历史最大排队数，sessions 有任务的会话数，
+                max_session_depth 最长的会话队列，running 执行中的任务数，workers 线程数，
+                completed 完成数，failed 异常数，avg_wait/max_wait 排队时间（秒），
+                avg_run/max_run 执行时间（秒）
+        """
+        with self._cond:
+            finished = self._completed + self._failed
+            return {
+                "queued": self._queued,
+                "max_queued": self._max_queued,
+                "sessions": len(self._sessions),
+                "max_session_depth": max((len(jobs) for jobs in self._sessions.values()), default=0),
+                "running": len(self._running),
+                "workers": len(self._threads),
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait": self._wait_total / finished if finished else 0.0,
+                "max_wait": self._wait_max,
+                "avg_run": self._run_total / finished if finished else 0.0,
+                "max_run": self._run_max,
+            }
+
+    def shutdown(self, wait=True):
+        """不再接受新任务；wait 为 True 时等待已提交的任务执行完"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    @staticmethod
+    def _ensure_event_loop():
+        """保证当前线程有一个未关闭的事件循环"""
+        try:
+            loop = asyncio.get_event_loop_policy().get_event_loop()
+            if not loop.is_closed():
+                return
+        except RuntimeError:
+            pass
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._shutdown:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                if not self._ready:  # 已关闭且没有任务
+                    return
+                session_id = self._ready.popleft()
+                jobs = self._sessions[session_id]
+                fn, args, kwargs, future, queued_at = jobs.popleft()
+                self._queued -= 1
+                self._running.add(session_id)
+
+            started = time.monotonic()
+            failed = False
+            if future.set_running_or_notify_cancel():
+                self._ensure_event_loop()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    failed = True
+                    logger.error(f"[{self.name}] 会话 {session_id} 的任务执行异常: {e}")
+                    future.set_exception(e)
+            finished = time.monotonic()
+
+            with self._cond:
+                self._running.discard(session_id)
+                if jobs:
+                    self._ready.append(session_id)
+                    self._cond.notify()
+                else:
+                    del self._sessions[session_id]
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                wait = started - queued_at
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._run_total += finished - started
+                self._run_max = max(self._run_max, finished - started)
@@ -1,39 +1,132 @@
+import asyncio
 import threading
 import time
 
+_DEFAULT = object()
+
 
 class TokenBucket:
-    def __init__(self, tpm, timeout=None):
-        self.capacity = int(tpm)  # 令牌桶容量
-        self.tokens = 0  # 初始令牌数为0
-        self.rate = int(tpm) / 60  # 令牌每秒生成速率
+    """令牌桶
+
+    不使用生成令牌的线程，而是在每次获取时按经过的时间（单调时钟）补充令牌。
+    获取令牌时先预约：令牌可以透支为负数，调用方等待透支部分按速率补足所需的时间。
+    预约按调用顺序进行，先来的调用方总是先拿到令牌（FIFO），且不需要等待队列。
+    """
+
+    def __init__(self, tpm, timeout=None, burst=None):
+        """
+        参数:
+            tpm: 每分钟生成的令牌数
+            timeout: 等待令牌的默认超时时间（秒），None 表示一直等待
+            burst: 令牌桶容量，即空闲后允许的突发数量，默认与 tpm 相同
+        """
         self.timeout = timeout  # 等待令牌超时时间
-        self.cond = threading.Condition()  # 条件变量
-        self.is_running = True
-        # 开启令牌生成线程
-        threading.Thread(target=self._generate_tokens).start()
-
-    def _generate_tokens(self):
-        """生成令牌"""
-        while self.is_running:
-            with self.cond:
-                if self.tokens < self.capacity:
-                    self.tokens += 1
-                self.cond.notify()  # 通知获取令牌的线程
-            time.sleep(1 / self.rate)
+        self._lock = threading.Lock()
+        self.set_rate(tpm, burst)
+        self.tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def set_rate(self, tpm, burst=None):
+        """修改速率和容量，已有的令牌保留（不超过新容量）"""
+        with self._lock:
+            self.rate = int(tpm) / 60  # 令牌每秒生成速率
+            self.capacity = int(burst) if burst else max(1, int(tpm))  # 令牌桶容量
+            if hasattr(self, "tokens"):
+                self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self, n, timeout):
+        """预约 n 个令牌，返回需要等待的秒数；等待时间超过 timeout 时不预约并返回 None"""
+        with self._lock:
+            if self.rate <= 0:  # 速率为 0 表示不限流
+                return 0.0
+            self._refill(time.monotonic())
+            wait = (n - self.tokens) / self.rate if self.tokens < n else 0.0
+            if timeout is not None and wait > timeout:
+                return None
+            self.tokens -= n
+            return wait
+
+    def _release(self, n):
+        """归还预约但未使用的令牌"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def try_acquire(self, n=1):
+        """不等待地获取 n 个令牌，令牌不足时返回 False"""
+        return self._reserve(n, 0) is not None
+
+    def acquire(self, n=1, timeout=_DEFAULT):
+        """获取 n 个令牌，必要时阻塞等待；超时返回 False"""
+        wait = self._reserve(n, self.timeout if timeout is _DEFAULT else timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, n=1, timeout=_DEFAULT):
+        """获取 n 个令牌，等待期间不阻塞事件循环；超时返回 False"""
+        wait = self._reserve(n, self.timeout if timeout is _DEFAULT else timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._release(n)
+                raise
+        return True
 
     def get_token(self):
         """获取令牌"""
-        with self.cond:
-            while self.tokens <= 0:
-                flag = self.cond.wait(self.timeout)
-                if not flag:  # 超时
-                    return False
-            self.tokens -= 1
-        return True
+        return self.acquire(1)
 
     def close(self):
-        self.is_running = False
+        """兼容旧接口，没有需要停止的线程"""
+        pass
+
+
+class AsyncTokenBucket(TokenBucket):
+    """asyncio 版本的令牌桶，acquire 是协程"""
+
+    async def acquire(self, n=1, timeout=_DEFAULT):
+        return await self.acquire_async(n, timeout)
+
+    def acquire_sync(self, n=1, timeout=_DEFAULT):
+        return super().acquire(n, timeout)
+
+    def get_token(self):
+        return self.acquire_sync(1)
+
+
+class TokenBucketRegistry:
+    """按名称共享的令牌桶，同一个名称在进程内只有一个令牌桶"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, tpm, timeout=None, burst=None, bucket_cls=TokenBucket):
+        """获取名为 name 的令牌桶，不存在时创建；速率或容量变化时就地修改"""
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = bucket_cls(tpm, timeout, burst)
+            elif bucket.rate != int(tpm) / 60 or (burst and bucket.capacity != int(burst)):
+                bucket.set_rate(tpm, burst)
+            return bucket
+
+    def remove(self, name):
+        with self._lock:
+            self._buckets.pop(name, None)
+
+
+# 全局令牌桶注册表，各个 bot 通过名称共享同一个限流
+token_buckets = TokenBucketRegistry()
 
 
 if __name__ == "__main__":
@@ -189,6 +189,7 @@ available_setting = {
     "wx849_callback_host": "127.0.0.1",  # 微信849回调服务监听地址
     "wx849_callback_port": 8088,  # 微信849回调服务监听端口
     "wx849_callback_key": "",  # 微信849回调服务API密钥
+    "wx849_message_workers": 8,  # 微信849消息处理线程数，同一会话的消息按顺序处理
     "log_level": "INFO",
     "wx849_wxid": "",
     "wx849_device_name": "DoW微信机器人",
@@ -12,6 +12,8 @@ from loguru import logger
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from utils.shutdown_hooks import run_shutdown_hooks, run_shutdown_hooks_sync
+
 # 修改导入语句，确保导入正确的bot_core模块
 try:
     # 先尝试使用相对导入（当前目录）
@@ -232,6 +234,8 @@ async def main():
                 multiprocessing.resource_tracker._resource_tracker.clear()
             except Exception as e:
                 logger.warning(f"清理资源时出错: {e}")
+            # os.execv 不会执行 finally 和 atexit，先在机器人的事件循环里写完缓冲、关闭连接
+            run_shutdown_hooks_sync()
             # 重启程序
             os.execv(sys.executable, [sys.executable] + sys.argv)
 
@@ -263,6 +267,8 @@ async def main():
 
             while handler.waiting_for_change:
                 await asyncio.sleep(1)
+        finally:
+            await run_shutdown_hooks()
     else:
         # 直接运行主程序，不启用监控
         try:
@@ -280,6 +286,8 @@ async def main():
             logger.error(traceback.format_exc())
             # 调用清理函数
             cleanup()
+        finally:
+            await run_shutdown_hooks()
 
 
 # 定义全局变量来存储linuxService进程
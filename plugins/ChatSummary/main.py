@@ -319,16 +319,27 @@ class ChatSummary(PluginBase):
             logger.warning(f"无法从文本中提取消息数量: {text}")
             return self.default_num_messages # 提取不到时返回默认值
 
-    @on_text_message
-    async def handle_text_message(self, bot: WechatAPIClient, message: Dict) -> bool: # 添加类型提示和返回值
-        """处理文本消息，判断是否需要触发总结。"""
+    @on_text_message(observer=True)
+    async def record_text_message(self, bot: WechatAPIClient, message: Dict):
+        """记录聊天消息。只做记录，与其他插件并发执行，不影响消息继续处理。
+
+        总结命令由 handle_text_message 在读取记录前自己保存，这里跳过，避免重复记录。
+        """
         if not self.enable:
-            return True # 插件未启用，允许其他插件处理
+            return
+
+        if not self._is_summary_command(message["Content"]):
+            self._record_message(message)
 
+    def _is_summary_command(self, content: str) -> bool:
+        """判断消息是否为总结命令"""
+        return any(cmd in content for cmd in self.commands)
+
+    def _record_message(self, message: Dict):
+        """保存一条聊天消息到数据库"""
         chat_id = message["FromWxid"]
         sender_wxid = message["SenderWxid"]
         content = message["Content"]
-        is_group = message["IsGroup"]
         create_time = message["CreateTime"]
 
         # 1.  创建表 (如果不存在)
@@ -340,8 +351,19 @@ class ChatSummary(PluginBase):
         # 3. 记录聊天历史 (可选，如果你还需要在内存中保留一份)
         # self.chat_history[chat_id].append(message)
 
+    @on_text_message
+    async def handle_text_message(self, bot: WechatAPIClient, message: Dict) -> bool: # 添加类型提示和返回值
+        """处理文本消息，判断是否需要触发总结。"""
+        if not self.enable:
+            return True # 插件未启用，允许其他插件处理
+
+        chat_id = message["FromWxid"]
+        content = message["Content"]
+
         # 4. 检查是否为总结命令
-        if any(cmd in content for cmd in self.commands):
+        if self._is_summary_command(content):
+            # 先保存命令本身，总结读取记录时已包含这条消息
+            self._record_message(message)
             # 4.1 提取时间范围
             duration = self._extract_duration(content)
             # 4.2 提取消息数量
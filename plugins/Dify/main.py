@@ -1,7 +1,6 @@
 import io
 import json
 import re
-import subprocess
 import tomllib
 from typing import Optional, Union, Dict, List, Tuple
 import time
@@ -21,12 +20,14 @@ from loguru import logger
 import speech_recognition as sr
 import os
 from WechatAPI import WechatAPIClient
+from WechatAPI.media_cache import media_cache
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
+from utils.dedupe_window import DedupeWindow
+from utils.media_transcoder import TranscodeError, media_transcoder
 from utils.plugin_base import PluginBase
 from gtts import gTTS
 import traceback
-import shutil
 from PIL import Image
 import xml.etree.ElementTree as ET
 
@@ -69,8 +70,9 @@ class Dify(PluginBase):
     def __init__(self):
         super().__init__()
         self.user_models = {}  # 存储用户当前使用的模型
-        self.processed_messages = {}  # 存储已处理的消息ID，避免重复处理
         self.message_expiry = 60  # 消息处理记录的过期时间（秒）
+        # 存储已处理的消息ID，避免重复处理
+        self.processed_messages = DedupeWindow(max_size=10000, ttl=self.message_expiry)
         try:
             with open("main_config.toml", "rb") as f:
                 config = tomllib.load(f)
@@ -181,17 +183,7 @@ class Dify(PluginBase):
             self.user_models[user_id] = model
 
     def is_message_processed(self, message: dict) -> bool:
-        """检查消息是否已经处理过"""
-        # 清理过期的消息记录
-        current_time = time.time()
-        expired_keys = []
-        for msg_id, timestamp in self.processed_messages.items():
-            if current_time - timestamp > self.message_expiry:
-                expired_keys.append(msg_id)
-
-        for key in expired_keys:
-            del self.processed_messages[key]
-
+        """检查消息是否已经处理过，过期的记录由去重窗口自动清理"""
         # 获取消息ID
         msg_id = message.get("MsgId") or message.get("NewMsgId")
         if not msg_id:
@@ -204,7 +196,7 @@ class Dify(PluginBase):
         """标记消息为已处理"""
         msg_id = message.get("MsgId") or message.get("NewMsgId")
         if msg_id:
-            self.processed_messages[msg_id] = time.time()
+            self.processed_messages.add(msg_id)
             logger.debug(f"标记消息 {msg_id} 为已处理")
 
     def get_model_from_message(self, content: str, user_id: str) -> tuple[ModelConfig, str, bool]:
@@ -2126,32 +2118,22 @@ class Dify(PluginBase):
                                     # 对于音频文件，可能需要转换格式
                                     try:
                                         # 检查是否有ffmpeg
-                                        if shutil.which("ffmpeg"):
-                                            # 转换为mp3格式，这是微信支持较好的格式
-                                            mp3_file = f"{temp_filename}.mp3"
-                                            command = f'ffmpeg -y -i "{temp_filename}" -acodec libmp3lame -ar 44100 -ab 192k "{mp3_file}"'
-                                            logger.debug(f"[文件处理] 执行音频转换命令: {command}")
-
-                                            process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-                                            if process.returncode == 0:
-                                                logger.info(f"[文件处理] 音频转换成功: {mp3_file}")
+                                        if media_transcoder.available():
+                                            # 转换为mp3格式，这是微信支持较好的格式，转换结果从管道读回
+                                            logger.debug(f"[文件处理] 转换音频文件为mp3: {temp_filename}")
+                                            try:
+                                                converted_audio = await media_transcoder.to_mp3(temp_filename, channels=None)
+                                            except TranscodeError as convert_error:
+                                                logger.warning(f"[文件处理] 音频转换失败: {convert_error}")
+                                                converted_audio = None
 
-                                                # 读取转换后的文件
-                                                with open(mp3_file, "rb") as f:
-                                                    converted_audio = f.read()
+                                            if converted_audio:
+                                                logger.info(f"[文件处理] 音频转换成功，大小: {len(converted_audio)} 字节")
 
                                                 # 发送转换后的音频
                                                 await bot.send_voice_message(message["FromWxid"], voice=converted_audio, format="mp3")
                                                 logger.info(f"[文件处理] 发送转换后的语音消息成功")
-
-                                                # 删除转换后的文件
-                                                try:
-                                                    os.remove(mp3_file)
-                                                    logger.debug(f"[文件处理] 已删除转换后的音频文件: {mp3_file}")
-                                                except Exception as del_error:
-                                                    logger.debug(f"[文件处理] 删除转换后的音频文件失败: {del_error}")
                                             else:
-                                                logger.warning(f"[文件处理] 音频转换失败: {process.stderr}")
                                                 # 尝试直接发送原始音频
                                                 await bot.send_voice_message(message["FromWxid"], voice=file_content, format=ext or 'mp3')
                                                 logger.info(f"[文件处理] 发送原始语音消息成功")
@@ -2383,22 +2365,14 @@ class Dify(PluginBase):
             return True
 
     async def audio_to_text(self, bot: WechatAPIClient, message: dict) -> str:
-        if not shutil.which("ffmpeg"):
+        if not media_transcoder.available():
             logger.error("未找到ffmpeg，请安装并配置到环境变量")
             await bot.send_text_message(message["FromWxid"], "服务器缺少ffmpeg，无法处理语音")
             return ""
 
-        silk_file = "temp_audio.silk"
-        mp3_file = "temp_audio.mp3"
         try:
-            with open(silk_file, "wb") as f:
-                f.write(message["Content"])
-
-            command = f"ffmpeg -y -i {silk_file} -ar 16000 -ac 1 -f mp3 {mp3_file}"
-            process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-            if process.returncode != 0:
-                logger.error(f"ffmpeg 执行失败: {process.stderr}")
-                return ""
+            # 语音内容经管道交给 ffmpeg 转换，不写临时文件
+            mp3_data = await media_transcoder.to_mp3(message["Content"], sample_rate=16000, channels=1, bitrate=None)
 
             # 使用当前模型的 base-url 构建音频转文本 URL
             model = self.get_user_model(message["SenderWxid"])
@@ -2407,8 +2381,6 @@ class Dify(PluginBase):
 
             headers = {"Authorization": f"Bearer {model.api_key}"}
             formdata = aiohttp.FormData()
-            with open(mp3_file, "rb") as f:
-                mp3_data = f.read()
             formdata.add_field("file", mp3_data, filename="audio.mp3", content_type="audio/mp3")
             # 对于群聊消息，使用群聊ID作为user参数，这样对话会与群聊关联，而不是与个人关联
             user_id = message["FromWxid"] if message.get("IsGroup", False) else message["SenderWxid"]
@@ -2428,25 +2400,16 @@ class Dify(PluginBase):
                     else:
                         logger.error(f"audio-to-text 接口调用失败: {resp.status} - {await resp.text()})")
 
-            command = f"ffmpeg -y -i {mp3_file} {silk_file.replace('.silk', '.wav')}"
-            process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-            if process.returncode != 0:
-                logger.error(f"ffmpeg 转为 WAV 失败: {process.stderr}")
-                return ""
+            pcm_data = await media_transcoder.to_pcm(message["Content"], sample_rate=16000, channels=1)
 
             r = sr.Recognizer()
-            with sr.AudioFile(silk_file.replace('.silk', '.wav')) as source:
-                audio = r.record(source)
+            audio = sr.AudioData(pcm_data, 16000, 2)
             text = r.recognize_google(audio, language="zh-CN")
             logger.info(f"语音转文字结果 (Google): {text}")
             return text
         except Exception as e:
             logger.error(f"语音处理失败: {e}")
             return ""
-        finally:
-            for temp_file in [silk_file, mp3_file, silk_file.replace('.silk', '.wav')]:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
 
     async def text_to_voice_message(self, bot: WechatAPIClient, message: dict, text: str = None, message_id: str = None):
         """
@@ -2720,6 +2683,12 @@ class Dify(PluginBase):
             logger.warning("MD5为空，无法查找图片")
             return None
 
+        # 先查共享媒体缓存，收到图片时已按MD5缓存
+        image_data = await media_cache.get(media_cache.key("md5", md5))
+        if image_data is not None:
+            logger.info(f"根据MD5在媒体缓存中找到图片, 大小: {len(image_data)} 字节")
+            return image_data
+
         # 检查files目录是否存在
         files_dir = os.path.join(os.getcwd(), "files")
         if not os.path.exists(files_dir):
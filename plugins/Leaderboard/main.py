@@ -3,7 +3,7 @@ import tomllib
 from random import choice
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -25,7 +25,7 @@ class Leaderboard(PluginBase):
         self.command = config["command"]
         self.max_count = config["max-count"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
     @on_text_message
     async def handle_text(self, bot: WechatAPIClient, message: dict):
@@ -40,16 +40,10 @@ class Leaderboard(PluginBase):
 
         if "群" in command[0]:
             chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
-            data = []
-            for member in chatroom_members:
-                wxid = member["UserName"]
-                points = self.db.get_points(wxid)
-                if points == 0:
-                    continue
-                data.append((member["NickName"], points))
-
-            data.sort(key=lambda x: x[1], reverse=True)
-            data = data[:self.max_count]
+            nicknames = {member["UserName"]: member["NickName"] for member in chatroom_members}
+            # 一次查询取出群成员中积分最高的若干人
+            leaderboard = await self.db.get_leaderboard_in(nicknames.keys(), self.max_count, skip_zero=True)
+            data = [(nicknames[wxid], points) for wxid, points in leaderboard]
 
             out_message = "-----XXXBot积分群排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
@@ -61,7 +55,7 @@ class Leaderboard(PluginBase):
                 out_message += f"\n{emoji}{'' if emoji else str(rank) + '.'} {nickname}   {points}分  {random_emoji}"
 
         else:
-            data = self.db.get_leaderboard(self.max_count)
+            data = await self.db.get_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
             nicknames = []
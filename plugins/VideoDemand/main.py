@@ -1,4 +1,3 @@
-import json
 import re
 import tomllib
 import traceback
@@ -10,13 +9,13 @@ from pathlib import Path
 import httpx
 from loguru import logger
 from typing import Optional
-import subprocess
 import binascii
 import shutil
 import random
 
 from WechatAPI import WechatAPIClient
 from utils.decorators import *
+from utils.media_transcoder import TranscodeError, media_transcoder
 from utils.plugin_base import PluginBase
 
 class VideoDemand(PluginBase):
@@ -694,116 +693,42 @@ class VideoDemand(PluginBase):
         Args:
             video_path: 视频文件路径
         """
+        # 创建临时文件路径
+        temp_path = f"{video_path}.temp.mp4"
         try:
-            # 创建临时文件路径
-            temp_path = f"{video_path}.temp.mp4"
-
             # 1. 首先尝试最快的方式：直接复制流并优化元数据位置
-            simple_cmd = f'ffmpeg -i "{video_path}" -c copy -movflags +faststart "{temp_path}"'
-            logger.debug(f"执行简单修复命令: {simple_cmd}")
-
-            simple_process = await asyncio.create_subprocess_shell(
-                simple_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-
-            simple_stdout, simple_stderr = await simple_process.communicate()
-
-            if simple_process.returncode == 0:
+            try:
+                await media_transcoder.remux(video_path, temp_path)
                 # 验证新文件是否可以正常打开
-                verify_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=duration -of default=noprint_wrappers=1:nokey=1 "{temp_path}"'
-                logger.debug(f"执行验证命令: {verify_cmd}")
-
-                verify_process = await asyncio.create_subprocess_shell(
-                    verify_cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                verify_stdout, verify_stderr = await verify_process.communicate()
-
-                if verify_process.returncode == 0:
-                    verify_duration = verify_stdout.decode().strip()
-                    # 替换原文件
-                    os.remove(video_path)
-                    os.rename(temp_path, video_path)
-                else:
-                    verify_error = verify_stderr.decode()
-                    logger.warning(f"简单处理后视频验证失败，尝试备用方法。错误: {verify_error}")
-            else:
-                simple_error = simple_stderr.decode()
-                logger.warning(f"简单修复失败，尝试备用方法。错误: {simple_error}")
+                await media_transcoder.probe(temp_path)
+                # 替换原文件
+                os.replace(temp_path, video_path)
+                return
+            except TranscodeError as e:
+                logger.warning(f"简单修复失败，尝试备用方法。错误: {e}")
 
             # 2. 如果简单方法失败，尝试获取视频信息并进行最小必要的处理
-            probe_cmd = f'ffprobe -v quiet -print_format json -show_format -show_streams "{video_path}"'
-            logger.debug(f"执行探测命令: {probe_cmd}")
-
-            probe_process = await asyncio.create_subprocess_shell(
-                probe_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            probe_stdout, probe_stderr = await probe_process.communicate()
-
-            if probe_process.returncode == 0:
-                try:
-                    probe_data = json.loads(probe_stdout.decode())
-                    # 获取视频时长（秒）
-                    duration = float(probe_data['format']['duration'])
-
-                    # 获取视频编解码器信息
-                    codec_info = "未知"
-                    if 'streams' in probe_data:
-                        for stream in probe_data['streams']:
-                            if stream.get('codec_type') == 'video':
-                                codec_info = f"{stream.get('codec_name', '未知')} {stream.get('width', '?')}x{stream.get('height', '?')}"
-                                break
-
-                    # 使用最小必要的处理参数
-                    cmd = (
-                        f'ffmpeg -i "{video_path}" '  # 输入文件
-                        f'-c copy '  # 直接复制流，不重新编码
-                        f'-movflags +faststart '  # 优化元数据位置
-                        f'-metadata duration="{duration}" '  # 设置时长元数据
-                        f'-y '  # 覆盖输出文件
-                        f'"{temp_path}"'  # 输出文件
-                    )
-                    logger.debug(f"执行修复命令: {cmd}")
-
-                    process = await asyncio.create_subprocess_shell(
-                        cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-
-                    stdout, stderr = await process.communicate()
-
-                    if process.returncode == 0:
-                        os.remove(video_path)
-                        os.rename(temp_path, video_path)
-                    else:
-                        stderr_output = stderr.decode()
-                        logger.warning(f"视频处理失败")
-                        logger.debug(f"FFmpeg错误输出: {stderr_output}")
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-
-                except (json.JSONDecodeError, KeyError, ValueError) as e:
-                    logger.warning(f"解析视频信息失败", exception=e)
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-
-            else:
-                probe_stderr_output = probe_stderr.decode()
-                logger.warning(f"获取视频信息失败")
-                logger.debug(f"FFprobe错误输出: {probe_stderr_output}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            try:
+                probe_data = await media_transcoder.probe(video_path)
+                # 获取视频时长（秒）
+                duration = float(probe_data['format']['duration'])
+            except (TranscodeError, KeyError, ValueError, TypeError) as e:
+                logger.warning(f"获取视频信息失败", exception=e)
+                return
+
+            # 使用最小必要的处理参数：直接复制流，优化元数据位置并写入时长
+            try:
+                await media_transcoder.remux(video_path, temp_path, metadata={"duration": str(duration)})
+                os.replace(temp_path, video_path)
+            except TranscodeError as e:
+                logger.warning(f"视频处理失败")
+                logger.debug(f"FFmpeg错误输出: {e}")
 
         except Exception as e:
             logger.error(f"修复视频元数据时出错", exception=e)
+        finally:
             # 确保临时文件被删除
-            if 'temp_path' in locals() and os.path.exists(temp_path):
+            if os.path.exists(temp_path):
                 try:
                     os.remove(temp_path)
                 except Exception as cleanup_error:
@@ -827,51 +752,22 @@ class VideoDemand(PluginBase):
             logger.error(f"视频编码失败: {video_path}", exception=e)
             return None
 
-    def _extract_first_frame(self, video_path: str) -> Optional[str]:
+    async def _extract_first_frame(self, video_path: str) -> Optional[str]:
         """从视频中提取第一帧并转换为base64
         Returns:
             str: base64编码的图片数据,失败返回None
         """
         try:
-            # 使用ffmpeg提取第一帧，与VideoSender保持一致
-            temp_dir = "temp_thumbnails"  # 创建临时文件夹
-            os.makedirs(temp_dir, exist_ok=True)
-            thumbnail_path = os.path.join(temp_dir, f"temp_thumbnail_{int(time.time())}.jpg")
-
-            # 执行ffmpeg命令提取第一帧
-            process = subprocess.run([
-                "ffmpeg",
-                "-i", video_path,
-                "-ss", "00:00:01",  # 从视频的第 1 秒开始提取
-                "-vframes", "1",
-                thumbnail_path,
-                "-y"  # 如果文件存在，覆盖
-            ], check=False, capture_output=True)
-
-            if process.returncode != 0:
-                logger.error(f"ffmpeg 执行失败: {process.stderr.decode()}")
-                return None
-
-            # 读取生成的缩略图
-            if os.path.exists(thumbnail_path):
-                with open(thumbnail_path, "rb") as image_file:
-                    image_data = image_file.read()
-                    image_base64 = base64.b64encode(image_data).decode("utf-8")
-                    return image_base64
-            else:
-                logger.error(f"缩略图文件不存在: {thumbnail_path}")
+            # 使用ffmpeg提取第 1 秒的画面，截图直接从管道读回
+            image_data = await media_transcoder.extract_frame(video_path, timestamps=("00:00:01",))
+            if not image_data:
+                logger.error(f"提取视频首帧失败: {video_path}")
                 return None
+            return base64.b64encode(image_data).decode("utf-8")
 
         except Exception as e:
             logger.error(f"提取视频首帧失败: {video_path}", exception=e)
             return None
-        finally:
-            # 清理临时文件
-            if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)  # 递归删除临时文件夹
-                except Exception as cleanup_error:
-                    logger.error(f"清理缩略图临时文件失败: {cleanup_error}")
 
     async def _download_menu_image(self) -> Optional[bytes]:
         """加载菜单图片,返回图片二进制数据"""
@@ -1007,7 +903,7 @@ class VideoDemand(PluginBase):
                     return
 
                 # 提取视频首帧作为封面
-                cover_base64 = self._extract_first_frame(video_path)
+                cover_base64 = await self._extract_first_frame(video_path)
                 if cover_base64:
                     pass
                 else:
@@ -1016,29 +912,13 @@ class VideoDemand(PluginBase):
                 # 尝试获取视频时长信息
                 video_duration = None
                 try:
-                    probe_cmd = f'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{video_path}"'
-                    logger.debug(f"执行命令: {probe_cmd}")
-
-                    probe_process = await asyncio.create_subprocess_shell(
-                        probe_cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    probe_stdout, probe_stderr = await probe_process.communicate()
-
-                    if probe_process.returncode == 0:
-                        stdout_content = probe_stdout.decode().strip()
-
-                        duration = float(stdout_content)
+                    duration = await media_transcoder.probe_duration(video_path)
+                    if duration is not None:
                         # 确保时长单位为秒
                         if duration > 1000:  # 如果值很大，可能是毫秒
                             video_duration = int(duration / 1000)
                         else:
                             video_duration = int(duration)
-                    else:
-                        stderr_content = probe_stderr.decode()
-                        logger.debug(f"获取视频时长失败，进程返回码: {probe_process.returncode}, 错误: {stderr_content}")
-
                 except Exception as e:
                     logger.warning(f"获取视频时长失败: {video_path}", exception=e)
 
@@ -1151,7 +1031,7 @@ class VideoDemand(PluginBase):
                     return
 
                 # 提取视频首帧作为封面
-                cover_base64 = self._extract_first_frame(video_path)
+                cover_base64 = await self._extract_first_frame(video_path)
                 if cover_base64:
                     pass
                 else:
@@ -1160,15 +1040,8 @@ class VideoDemand(PluginBase):
                 # 尝试获取视频时长信息
                 video_duration = None
                 try:
-                    probe_cmd = f'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{video_path}"'
-                    probe_process = await asyncio.create_subprocess_shell(
-                        probe_cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    probe_stdout, probe_stderr = await probe_process.communicate()
-                    if probe_process.returncode == 0:
-                        duration = float(probe_stdout.decode().strip())
+                    duration = await media_transcoder.probe_duration(video_path)
+                    if duration is not None:
                         # 确保时长单位为秒
                         if duration > 1000:  # 如果值很大，可能是毫秒
                             video_duration = int(duration / 1000)
@@ -1304,7 +1177,7 @@ class VideoDemand(PluginBase):
                     return
 
                 # 提取视频首帧作为封面
-                cover_base64 = self._extract_first_frame(video_path)
+                cover_base64 = await self._extract_first_frame(video_path)
                 if cover_base64:
                     pass
                 else:
@@ -1313,15 +1186,8 @@ class VideoDemand(PluginBase):
                 # 尝试获取视频时长信息
                 video_duration = None
                 try:
-                    probe_cmd = f'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{video_path}"'
-                    probe_process = await asyncio.create_subprocess_shell(
-                        probe_cmd,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    probe_stdout, probe_stderr = await probe_process.communicate()
-                    if probe_process.returncode == 0:
-                        duration = float(probe_stdout.decode().strip())
+                    duration = await media_transcoder.probe_duration(video_path)
+                    if duration is not None:
                         # 确保时长单位为秒
                         if duration > 1000:  # 如果值很大，可能是毫秒
                             video_duration = int(duration / 1000)
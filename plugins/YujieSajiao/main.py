@@ -6,13 +6,13 @@
 
 import os
 import aiohttp
-import subprocess
 import uuid
 import time
 import traceback
 from loguru import logger
 import tomllib
 from utils.decorators import *
+from utils.media_transcoder import TranscodeError, media_transcoder
 from utils.plugin_base import PluginBase
 from WechatAPI import WechatAPIClient
 
@@ -145,7 +145,7 @@ class YujieSajiao(PluginBase):
 
                             # 使用ffmpeg处理文件
                             logger.info(f"[YujieSajiao] 开始处理语音文件: {original_file} -> {processed_file}")
-                            if self._process_audio_with_ffmpeg(original_file, processed_file):
+                            if await self._process_audio_with_ffmpeg(original_file, processed_file):
                                 logger.info(f"[YujieSajiao] 成功处理语音文件: {processed_file}")
                                 return processed_file
                             else:
@@ -171,14 +171,9 @@ class YujieSajiao(PluginBase):
 
     def _check_ffmpeg(self) -> bool:
         """检查ffmpeg是否可用"""
-        try:
-            result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
-            return result.returncode == 0
-        except Exception as e:
-            logger.error(f"[YujieSajiao] 检查ffmpeg异常: {e}")
-            return False
+        return media_transcoder.available()
 
-    def _process_audio_with_ffmpeg(self, input_file: str, output_file: str) -> bool:
+    async def _process_audio_with_ffmpeg(self, input_file: str, output_file: str) -> bool:
         """使用ffmpeg处理音频文件
 
         Args:
@@ -193,42 +188,21 @@ class YujieSajiao(PluginBase):
             input_file_size = os.path.getsize(input_file)
             logger.info(f"[YujieSajiao] 输入文件大小: {input_file_size}字节")
 
-            # 使用ffmpeg将音频转换为标准MP3格式
-            command = [
-                "ffmpeg", "-y", "-i", input_file,
-                "-acodec", "libmp3lame", "-ar", "44100", "-ab", "192k",
-                "-ac", "2", output_file
-            ]
+            # 使用ffmpeg将音频转换为标准MP3格式，相同的语音直接使用缓存的转换结果
+            output_data = await media_transcoder.to_mp3(input_file)
+            with open(output_file, "wb") as f:
+                f.write(output_data)
+            logger.info(f"[YujieSajiao] 输出文件大小: {len(output_data)}字节")
 
-            # 记录命令
-            logger.info(f"[YujieSajiao] ffmpeg命令: {' '.join(command)}")
+            # 获取音频时长
+            duration = await media_transcoder.probe_duration(output_file)
+            if duration is not None:
+                logger.info(f"[YujieSajiao] 音频时长: {duration}秒")
 
-            result = subprocess.run(command, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                # 记录输出文件信息
-                output_file_size = os.path.getsize(output_file)
-                logger.info(f"[YujieSajiao] 输出文件大小: {output_file_size}字节")
-
-                # 获取音频时长
-                try:
-                    duration_command = [
-                        "ffprobe", "-v", "error",
-                        "-show_entries", "format=duration",
-                        "-of", "default=noprint_wrappers=1:nokey=1",
-                        output_file
-                    ]
-                    duration_result = subprocess.run(duration_command, capture_output=True, text=True)
-                    if duration_result.returncode == 0:
-                        duration = float(duration_result.stdout.strip())
-                        logger.info(f"[YujieSajiao] 音频时长: {duration}秒")
-                except Exception as e:
-                    logger.error(f"[YujieSajiao] 获取音频时长失败: {e}")
-
-                return True
-            else:
-                logger.error(f"[YujieSajiao] ffmpeg处理失败: {result.stderr}")
-                return False
+            return True
+        except TranscodeError as e:
+            logger.error(f"[YujieSajiao] ffmpeg处理失败: {e}")
+            return False
         except Exception as e:
             logger.error(f"[YujieSajiao] 处理音频异常: {e}")
             return False
@@ -0,0 +1,33 @@
+import importlib
+import importlib.util
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 各协议客户端依赖的第三方库，没有安装时跳过
+REQUIRED_MODULES = ("aiohttp", "loguru", "pysilk", "pydub", "pymediainfo")
+
+
+@unittest.skipIf(any(importlib.util.find_spec(name) is None for name in REQUIRED_MODULES),
+                 "未安装 WechatAPI 客户端依赖")
+class TestWechatAPIClientImport(unittest.TestCase):
+    """bot_core 按协议版本导入不同的客户端，导入失败会静默回退到 849 客户端"""
+
+    @classmethod
+    def setUpClass(cls):
+        # 协议服务端的二进制包只在启动服务端时使用，导入客户端不需要
+        if importlib.util.find_spec("xywechatpad_binary") is None:
+            sys.modules.setdefault("xywechatpad_binary", types.ModuleType("xywechatpad_binary"))
+
+    def test_import_all_clients(self):
+        for package in ("WechatAPI.Client", "WechatAPI.Client2", "WechatAPI.Client3"):
+            with self.subTest(package=package):
+                module = importlib.import_module(package)
+                self.assertTrue(hasattr(module, "WechatAPIClient"))
+
+
+if __name__ == "__main__":
+    unittest.main()
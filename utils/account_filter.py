@@ -0,0 +1,117 @@
+"""
+消息来源过滤模块
+判断一条消息是否需要处理：过滤公众号、微信团队等系统账号和支付、游戏、官方服务类账号，
+再按配置的白名单/黑名单模式过滤。
+名单在配置加载时转换为集合，特殊账号的关键字合并为一个预编译的正则表达式，
+每对 (FromWxid, SenderWxid) 的结果缓存在 LRU 中，名单或模式修改时清空。
+"""
+
+import re
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from loguru import logger
+
+# 微信团队和系统通知账号
+SYSTEM_ACCOUNTS = frozenset([
+    'weixin',  # 微信团队
+    'filehelper',  # 文件传输助手
+    'fmessage',  # 朋友推荐通知
+    'medianote',  # 语音记事本
+    'floatbottle',  # 漂流瓶
+    'qmessage',  # QQ离线消息
+    'qqmail',  # QQ邮箱提醒
+    'tmessage',  # 腾讯新闻
+    'weibo',  # 微博推送
+    'newsapp',  # 新闻推送
+    'notification_messages',  # 服务通知
+    'helper_entry',  # 新版微信运动
+    'mphelper',  # 公众号助手
+    'brandsessionholder',  # 公众号消息
+    'weixinreminder',  # 微信提醒
+    'officialaccounts',  # 公众平台
+])
+
+# 特殊账号特征：公众号（gh_开头）、微信支付相关通知、腾讯游戏相关通知、
+# 官方服务账号（包含 service 或 official），后三类除 wxpay 外不区分大小写
+SPECIAL_ACCOUNT_PATTERN = re.compile(r"^gh_|wxpay|(?i:tencent|game|service|official)")
+
+
+class AccountFilter:
+    """消息来源过滤器
+
+    Args:
+        ignore_mode (str): 过滤模式，"Whitelist"、"Blacklist" 或 "None"
+        whitelist (Iterable[str]): 白名单
+        blacklist (Iterable[str]): 黑名单
+        cache_size (int): 缓存判断结果的 (FromWxid, SenderWxid) 数量
+    """
+
+    def __init__(self, ignore_mode: str = "None", whitelist: Optional[Iterable[str]] = None,
+                 blacklist: Optional[Iterable[str]] = None, cache_size: int = 4096):
+        self.cache_size = cache_size
+        self._verdicts: "OrderedDict[tuple, bool]" = OrderedDict()
+        self.ignore_mode = ignore_mode
+        self.whitelist = list(whitelist or [])
+        self.blacklist = list(blacklist or [])
+        self._whitelist_set = frozenset(self.whitelist)
+        self._blacklist_set = frozenset(self.blacklist)
+
+    def update(self, ignore_mode: Optional[str] = None, whitelist: Optional[Iterable[str]] = None,
+               blacklist: Optional[Iterable[str]] = None):
+        """修改过滤模式或名单，未传入的保持不变，并清空结果缓存"""
+        if ignore_mode is not None:
+            self.ignore_mode = ignore_mode
+        if whitelist is not None:
+            self.whitelist = list(whitelist)
+            self._whitelist_set = frozenset(self.whitelist)
+        if blacklist is not None:
+            self.blacklist = list(blacklist)
+            self._blacklist_set = frozenset(self.blacklist)
+        self._verdicts.clear()
+
+    def check(self, FromWxid: str, SenderWxid: str) -> bool:
+        """消息是否需要处理"""
+        # 非字符串的 wxid 不会命中任何名单，按空值处理
+        if not isinstance(FromWxid, str):
+            FromWxid = None
+        if not isinstance(SenderWxid, str):
+            SenderWxid = None
+        key = (FromWxid, SenderWxid)
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self._verdicts.move_to_end(key)
+            return verdict
+
+        verdict = self._evaluate(FromWxid, SenderWxid)
+        self._verdicts[key] = verdict
+        if len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+        return verdict
+
+    @staticmethod
+    def is_special_account(wxid: str) -> bool:
+        """是否是系统账号或公众号、支付、游戏、官方服务类账号"""
+        return bool(wxid) and (wxid in SYSTEM_ACCOUNTS or SPECIAL_ACCOUNT_PATTERN.search(wxid) is not None)
+
+    def _evaluate(self, FromWxid: str, SenderWxid: str) -> bool:
+        if self.is_special_account(SenderWxid) or self.is_special_account(FromWxid):
+            logger.debug(f"忽略系统或特殊账号消息: {SenderWxid or FromWxid}")
+            return False
+
+        is_group = bool(FromWxid) and FromWxid.endswith("@chatroom")
+
+        if self.ignore_mode == "Whitelist":
+            if is_group:
+                # 群聊ID在白名单中（处理该群中的所有消息），或发送者ID在白名单中
+                return SenderWxid in self._whitelist_set or FromWxid in self._whitelist_set
+            # 私聊消息：发送者ID在白名单中
+            return SenderWxid in self._whitelist_set
+        elif self.ignore_mode == "Blacklist":
+            if is_group:
+                # 群聊消息：群聊ID不在黑名单中且发送者ID不在黑名单中
+                return FromWxid not in self._blacklist_set and SenderWxid not in self._blacklist_set
+            # 私聊消息：发送者ID不在黑名单中
+            return SenderWxid not in self._blacklist_set
+        # 默认处理所有消息
+        return True
@@ -0,0 +1,210 @@
+"""
+联系人资料刷新模块
+收到消息时需要确认发送者（或群聊）在联系人库中已有资料，没有时从接口获取。
+同一个 wxid 同一时刻只排队一次，未知的 wxid 攒够一小段时间后，
+先用一次查询检查数据库，再按每次最多 20 个合并请求联系人详情，最后在一个事务里写入。
+请求失败的 wxid 在一段时间内不再重试，避免一个获取不到资料的联系人每条消息都请求一次接口。
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from database.contacts_db import contacts_store
+
+# 获取联系人详情接口一次最多查询的数量
+DETAIL_BATCH_SIZE = 20
+
+
+def _string(value: Any) -> str:
+    """接口中的字符串字段可能是 {"string": "..."} 的形式"""
+    if isinstance(value, dict):
+        value = value.get("string", "")
+    return value or ""
+
+
+def detail_wxid(detail: dict) -> str:
+    """取出联系人详情中的 wxid"""
+    return _string(detail.get("UserName") or detail.get("Username") or detail.get("wxid"))
+
+
+def parse_contact_detail(wxid: str, detail: dict) -> dict:
+    """把联系人详情转换为联系人库中的联系人信息"""
+    nickname = _string(detail.get("nickname") or detail.get("NickName"))
+    # 头像优先使用 BigHeadImgUrl，其次 SmallHeadImgUrl
+    avatar = detail.get("BigHeadImgUrl") or detail.get("SmallHeadImgUrl") or _string(detail.get("avatar"))
+    return {
+        "wxid": wxid,
+        "nickname": nickname or wxid,
+        "avatar": avatar,
+        "remark": _string(detail.get("remark") or detail.get("Remark")),
+        "alias": _string(detail.get("alias") or detail.get("Alias")),
+    }
+
+
+def basic_contact(wxid: str) -> dict:
+    """获取不到详情时保存的基本联系人信息"""
+    return {
+        "wxid": wxid,
+        "nickname": wxid,
+        "type": "group" if wxid.endswith("@chatroom") else "friend",
+    }
+
+
+class ContactRefresher:
+    """合并、批量刷新联系人资料"""
+
+    def __init__(self, detail_fetcher: Callable[[List[str]], Awaitable[Any]], store=contacts_store,
+                 batch_interval: float = 0.3, negative_ttl: float = 600):
+        """
+        参数:
+            detail_fetcher: 获取联系人详情的协程函数，参数为 wxid 列表，例如 WechatAPIClient.get_contract_detail
+            store: 联系人存储，默认使用全局 contacts_store
+            batch_interval: 收集待刷新 wxid 的时间（秒），期间的请求合并为一批
+            negative_ttl: 获取详情失败后不再重试的时间（秒）
+        """
+        self.detail_fetcher = detail_fetcher
+        self.store = store
+        self.batch_interval = batch_interval
+        self.negative_ttl = negative_ttl
+
+        # 等待刷新的 wxid -> 刷新完成时设置结果的 Future，保证同一个 wxid 只排队一次
+        self._pending: Dict[str, asyncio.Future] = {}
+        # 下一批要刷新的 wxid，按请求先后排序
+        self._queue: Dict[str, None] = {}
+        # 获取失败的 wxid -> 可以重试的时间
+        self._failed: Dict[str, float] = {}
+        self._worker: Optional[asyncio.Task] = None
+
+        # 统计
+        self._requested = 0
+        self._coalesced = 0
+        self._skipped = 0
+        self._api_calls = 0
+        self._written = 0
+
+    def request(self, wxid: str) -> Optional[asyncio.Future]:
+        """请求刷新联系人资料，不等待结果
+
+        Returns:
+            Optional[asyncio.Future]: 刷新完成的 Future，结果为是否已有资料；
+                已知、最近失败过或不在事件循环中时返回 None
+        """
+        if not wxid:
+            return None
+        self._requested += 1
+        if self.store.is_known_cached(wxid):
+            self._skipped += 1
+            return None
+        retry_at = self._failed.get(wxid)
+        if retry_at is not None:
+            if time.monotonic() < retry_at:
+                self._skipped += 1
+                return None
+            del self._failed[wxid]
+
+        future = self._pending.get(wxid)
+        if future is not None:
+            self._coalesced += 1
+            return future
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        future = self._pending[wxid] = loop.create_future()
+        self._queue[wxid] = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        return future
+
+    async def refresh(self, wxid: str) -> bool:
+        """刷新联系人资料并等待完成，返回是否已有资料"""
+        future = self.request(wxid)
+        if future is None:
+            return self.store.is_known_cached(wxid)
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        """刷新统计"""
+        return {
+            "requested": self._requested,
+            "coalesced": self._coalesced,
+            "skipped": self._skipped,
+            "api_calls": self._api_calls,
+            "written": self._written,
+            "pending": len(self._pending),
+            "negative": len(self._failed),
+        }
+
+    async def _run(self):
+        while self._queue:
+            await asyncio.sleep(self.batch_interval)
+            wxids = list(self._queue)
+            self._queue = {}
+            known = set()
+            try:
+                known = await self._refresh_batch(wxids)
+            except Exception as e:
+                logger.error(f"批量刷新联系人资料失败: {e}")
+            finally:
+                for wxid in wxids:
+                    future = self._pending.pop(wxid, None)
+                    if future is not None and not future.done():
+                        future.set_result(wxid in known)
+
+    async def _refresh_batch(self, wxids: List[str]) -> set:
+        """刷新一批联系人，返回刷新后已有资料的 wxid"""
+        known = await self.store.known_many(wxids)
+        missing = [wxid for wxid in wxids if wxid not in known]
+        if not missing:
+            return known
+
+        # 群聊不获取详情，只保存基本信息
+        contacts = [basic_contact(wxid) for wxid in missing if wxid.endswith("@chatroom")]
+        friends = [wxid for wxid in missing if not wxid.endswith("@chatroom")]
+
+        for start in range(0, len(friends), DETAIL_BATCH_SIZE):
+            chunk = friends[start:start + DETAIL_BATCH_SIZE]
+            self._api_calls += 1
+            try:
+                details = await self.detail_fetcher(chunk)
+            except Exception as e:
+                logger.warning(f"获取联系人详情失败，{self.negative_ttl:.0f}秒内不再重试: {chunk}, {e}")
+                retry_at = time.monotonic() + self.negative_ttl
+                for wxid in chunk:
+                    self._failed[wxid] = retry_at
+                continue
+
+            if isinstance(details, dict):
+                details = [details]
+            by_wxid = {}
+            for detail in details or []:
+                if not isinstance(detail, dict):
+                    continue
+                wxid = detail_wxid(detail)
+                if not wxid and len(chunk) == 1:
+                    wxid = chunk[0]
+                by_wxid[wxid] = detail
+            for wxid in chunk:
+                detail = by_wxid.get(wxid)
+                if detail is None:
+                    logger.warning(f"无法获取联系人 {wxid} 的详细信息，接口未返回")
+                    contacts.append(basic_contact(wxid))
+                else:
+                    contacts.append(parse_contact_detail(wxid, detail))
+
+        if contacts:
+            self._written += await self.store.upsert_many(contacts)
+            logger.debug(f"已批量更新 {len(contacts)} 个联系人的信息")
+            known |= {contact["wxid"] for contact in contacts}
+        self._prune_failed()
+        return known
+
+    def _prune_failed(self):
+        if len(self._failed) < 1000:
+            return
+        now = time.monotonic()
+        self._failed = {wxid: retry_at for wxid, retry_at in self._failed.items() if retry_at > now}
@@ -0,0 +1,128 @@
+import copy
+from types import MappingProxyType
+from typing import Any, Mapping
+
+# 不可变类型无需拷贝，直接共享即可
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, complex, type(None), frozenset)
+
+
+def freeze_message(message: Mapping) -> MappingProxyType:
+    """为一次事件分发冻结消息的顶层结构
+
+    只做一次浅拷贝，嵌套的可变对象由 CopyOnWriteMessage 在被访问时按需深拷贝。
+    """
+    return MappingProxyType(dict(message))
+
+
+class CopyOnWriteMessage(dict):
+    """写时复制的消息视图
+
+    每个事件处理函数拿到一个独立的视图，与原先逐个 deepcopy 的隔离语义一致：
+
+    - 顶层赋值/删除只影响当前视图
+    - 嵌套的 list/dict 等可变对象在第一次被取出时才深拷贝，之后修改只影响当前视图
+    - str/int 等不可变值直接共享，不产生任何拷贝
+
+    它仍然是 dict 的子类，插件里的 isinstance(message, dict)、json.dumps 等用法不受影响。
+    """
+
+    __slots__ = ("_owned",)
+
+    def __init__(self, base: Mapping):
+        dict.__init__(self, base)
+        # 已经属于当前视图的键（被赋值过或已深拷贝过），可以直接返回
+        self._owned = set()
+
+    def _own(self, key, value):
+        if key in self._owned or isinstance(value, _IMMUTABLE_TYPES):
+            return value
+        value = copy.deepcopy(value)
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def _own_all(self):
+        for key, value in dict.items(self):
+            self._own(key, value)
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # 覆盖 __iter__ 使 dict(view)/{**view} 走 keys()+__getitem__ 的慢路径，避免共享嵌套对象
+        return dict.__iter__(self)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        value = self._own(key, value)
+        self._owned.discard(key)
+        return key, value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def copy(self) -> dict:
+        self._own_all()
+        return copy.deepcopy(dict.copy(self))
+
+    def __copy__(self) -> dict:
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> dict:
+        return copy.deepcopy(dict(dict.items(self)), memo)
+
+    def __reduce__(self):
+        return dict, (dict(dict.items(self)),)
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+    def __repr__(self):
+        return dict.__repr__(self)
+
+
+def isolate(value: Any) -> Any:
+    """为单个事件处理函数生成参数的隔离副本
+
+    dict/冻结消息使用写时复制视图，不可变值直接共享，其他对象退回 deepcopy。
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if isinstance(value, (dict, MappingProxyType)):
+        return CopyOnWriteMessage(value)
+    return copy.deepcopy(value)
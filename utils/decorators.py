@@ -56,197 +56,86 @@ def remove_job_safe(scheduler: AsyncIOScheduler, job_id: str):
         pass
 
 
-def on_text_message(priority=50):
-    """文本消息装饰器"""
+def _event_handler(event_type: str, priority, observer: bool, timeout: float) -> Callable:
+    """生成事件处理函数装饰器
+
+    Args:
+        event_type: 事件类型
+        priority: 优先级，0-99，越大越先执行；无参数调用时这里是被装饰的函数
+        observer: 是否为旁观者。旁观者的返回值被忽略，不能阻止其他插件，
+                  会与其他处理函数并发执行，适合只记录消息的插件
+        timeout: 旁观者的超时时间（秒），为 None 时使用 EventManager 的默认值
+    """
     def decorator(func):
-        if callable(priority):  # 无参数调用时
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'text_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        # 有参数调用时
-        setattr(func, '_event_type', 'text_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
+        setattr(func, '_event_type', event_type)
+        setattr(func, '_priority', 50 if callable(priority) else min(max(priority, 0), 99))
+        setattr(func, '_observer', observer)
+        setattr(func, '_observer_timeout', timeout)
         return func
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_image_message(priority=50):
-    """图片消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'image_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'image_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+def on_text_message(priority=50, observer: bool = False, timeout: float = None):
+    """文本消息装饰器"""
+    return _event_handler('text_message', priority, observer, timeout)
 
-    return decorator if not callable(priority) else decorator(priority)
 
+def on_image_message(priority=50, observer: bool = False, timeout: float = None):
+    """图片消息装饰器"""
+    return _event_handler('image_message', priority, observer, timeout)
 
-def on_voice_message(priority=50):
-    """语音消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'voice_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'voice_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
+def on_voice_message(priority=50, observer: bool = False, timeout: float = None):
+    """语音消息装饰器"""
+    return _event_handler('voice_message', priority, observer, timeout)
 
 
-def on_emoji_message(priority=50):
+def on_emoji_message(priority=50, observer: bool = False, timeout: float = None):
     """表情消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'emoji_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'emoji_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('emoji_message', priority, observer, timeout)
 
 
-def on_file_message(priority=50):
+def on_file_message(priority=50, observer: bool = False, timeout: float = None):
     """文件消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'file_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'file_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+    return _event_handler('file_message', priority, observer, timeout)
 
-    return decorator if not callable(priority) else decorator(priority)
 
-
-def on_quote_message(priority=50):
+def on_quote_message(priority=50, observer: bool = False, timeout: float = None):
     """引用消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'quote_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'quote_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('quote_message', priority, observer, timeout)
 
 
-def on_video_message(priority=50):
+def on_video_message(priority=50, observer: bool = False, timeout: float = None):
     """视频消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'video_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'video_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('video_message', priority, observer, timeout)
 
 
-def on_pat_message(priority=50):
+def on_pat_message(priority=50, observer: bool = False, timeout: float = None):
     """拍一拍消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'pat_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'pat_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('pat_message', priority, observer, timeout)
 
 
-def on_at_message(priority=50):
+def on_at_message(priority=50, observer: bool = False, timeout: float = None):
     """被@消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'at_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'at_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('at_message', priority, observer, timeout)
 
 
-def on_system_message(priority=50):
+def on_system_message(priority=50, observer: bool = False, timeout: float = None):
     """系统消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'system_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'system_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('system_message', priority, observer, timeout)
 
 
-def on_other_message(priority=50):
+def on_other_message(priority=50, observer: bool = False, timeout: float = None):
     """其他消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'other_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'other_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('other_message', priority, observer, timeout)
 
 
-def on_article_message(priority=50):
+def on_article_message(priority=50, observer: bool = False, timeout: float = None):
     """公众号文章消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'article_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'article_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_handler('article_message', priority, observer, timeout)
 
 
-def on_xml_message(priority=50):
+def on_xml_message(priority=50, observer: bool = False, timeout: float = None):
     """XML消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'xml_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'xml_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
\ No newline at end of file
+    return _event_handler('xml_message', priority, observer, timeout)
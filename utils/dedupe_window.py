@@ -0,0 +1,76 @@
+"""
+消息去重窗口模块
+记录最近处理过的消息ID，用于丢弃重复投递的消息。
+键按首次加入的顺序保存在 OrderedDict 中（哈希表 + 双向链表），检查和加入都是 O(1)；
+超过数量上限时淘汰最早加入的键，设置有效期时按加入时间过期，都只需从头部弹出。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class DedupeWindow:
+    """有数量上限和有效期的去重窗口
+
+    再次见到已有的键不会延长它的有效期，窗口按首次出现计算。
+
+    Args:
+        max_size (int): 最多记录的键数量
+        ttl (Optional[float]): 键的有效期（秒），为 None 时只按数量淘汰
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        # 键 -> 加入时间，按加入顺序排列
+        self._keys: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        keys = self._keys
+        if self.ttl is not None:
+            deadline = now - self.ttl
+            while keys:
+                key = next(iter(keys))
+                if keys[key] > deadline:
+                    break
+                del keys[key]
+        while len(keys) > self.max_size:
+            keys.popitem(last=False)
+
+    def check_and_add(self, key: Hashable) -> bool:
+        """键已在窗口中时返回 True，否则加入并返回 False"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if key in self._keys:
+                return True
+            self._keys[key] = now
+            self._purge(now)
+            return False
+
+    def add(self, key: Hashable):
+        """加入键，已存在时保持原来的加入时间"""
+        self.check_and_add(key)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            return key in self._keys
+
+    def __len__(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            return len(self._keys)
@@ -1,29 +1,138 @@
-import copy
-from typing import Callable, Dict, List
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+
+from .cow_message import freeze_message, isolate
+
+HandlerEntry = Tuple[Callable, object, int]
+ObserverEntry = Tuple[Callable, object, int, Optional[float]]
+
+
+class HandlerStats:
+    """单个事件处理函数的调用统计"""
+
+    __slots__ = ("calls", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
 
 
 class EventManager:
-    _handlers: Dict[str, List[tuple[Callable, object, int]]] = {}
+    # 事件分发表：事件类型 -> 按优先级排好序的不可变元组
+    # 绑定/解绑时整体替换元组，emit 迭代的永远是某一时刻完整的快照
+    _handlers: Dict[str, Tuple[HandlerEntry, ...]] = {}
+    # 旁观者分发表：事件类型 -> 旁观者元组，旁观者之间以及与上面的优先级链并发执行
+    _observers: Dict[str, Tuple[ObserverEntry, ...]] = {}
+    # 旁观者默认超时时间（秒）
+    observer_timeout: float = 30.0
+    # 正在后台执行的旁观者任务，保存引用避免被垃圾回收
+    _observer_tasks: set = set()
+    # 实例 -> 它绑定过的事件类型，解绑时只重建受影响的事件类型
+    _bindings: Dict[int, set] = {}
+    # 类 -> [(方法名, 事件类型, 优先级, 是否旁观者, 超时)]，同一个类只扫描一次 dir()
+    _class_specs: "WeakKeyDictionary[type, tuple]" = WeakKeyDictionary()
+    # (事件类型, "插件类名.方法名") -> 调用统计
+    _stats: Dict[Tuple[str, str], HandlerStats] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_specs(cls, instance: object) -> tuple:
+        """获取实例所属类的事件处理函数声明，结果按类缓存"""
+        instance_class = type(instance)
+        try:
+            return cls._class_specs[instance_class]
+        except (KeyError, TypeError):
+            pass
+
+        specs = []
+        for method_name in dir(instance):
+            method = getattr(instance, method_name, None)
+            if hasattr(method, '_event_type'):
+                specs.append((method_name, getattr(method, '_event_type'), getattr(method, '_priority', 50),
+                              getattr(method, '_observer', False), getattr(method, '_observer_timeout', None)))
+        specs = tuple(specs)
+
+        try:
+            cls._class_specs[instance_class] = specs
+        except TypeError:
+            pass
+        return specs
+
+    @staticmethod
+    def _rebuild(table: dict, event_type: str, entries: list):
+        """按优先级排序后整体替换某个事件的分发元组，优先级高的在前"""
+        if entries:
+            table[event_type] = tuple(sorted(entries, key=lambda x: x[2], reverse=True))
+        else:
+            table.pop(event_type, None)
 
     @classmethod
     def bind_instance(cls, instance: object):
         """将实例绑定到对应的事件处理函数"""
-        for method_name in dir(instance):
+        new_handlers: Dict[str, List[HandlerEntry]] = {}
+        new_observers: Dict[str, List[ObserverEntry]] = {}
+        for method_name, event_type, priority, observer, timeout in cls._get_specs(instance):
             method = getattr(instance, method_name)
-            if hasattr(method, '_event_type'):
-                event_type = getattr(method, '_event_type')
-                priority = getattr(method, '_priority', 50)
+            if observer:
+                new_observers.setdefault(event_type, []).append((method, instance, priority, timeout))
+            else:
+                new_handlers.setdefault(event_type, []).append((method, instance, priority))
+
+        if not new_handlers and not new_observers:
+            return
+
+        with cls._lock:
+            bindings = cls._bindings.setdefault(id(instance), set())
+            for table, new_entries in ((cls._handlers, new_handlers), (cls._observers, new_observers)):
+                for event_type, entries in new_entries.items():
+                    cls._rebuild(table, event_type, list(table.get(event_type, ())) + entries)
+                    bindings.add(event_type)
+
+    @classmethod
+    def unbind_instance(cls, instance: object):
+        """解绑实例的所有事件处理函数"""
+        with cls._lock:
+            bindings = cls._bindings.pop(id(instance), None)
+            if bindings is None:
+                return
+            for event_type in bindings:
+                for table in (cls._handlers, cls._observers):
+                    if event_type in table:
+                        cls._rebuild(table, event_type, [
+                            entry for entry in table[event_type]
+                            if entry[1] is not instance
+                        ])
+
+    @classmethod
+    def get_handlers(cls, event_type: str) -> Tuple[HandlerEntry, ...]:
+        """获取某个事件当前的处理函数快照（不含旁观者）"""
+        return cls._handlers.get(event_type, ())
 
-                if event_type not in cls._handlers:
-                    cls._handlers[event_type] = []
-                cls._handlers[event_type].append((method, instance, priority))
-                # 按优先级排序，优先级高的在前
-                cls._handlers[event_type].sort(key=lambda x: x[2], reverse=True)
+    @classmethod
+    def get_observers(cls, event_type: str) -> Tuple[ObserverEntry, ...]:
+        """获取某个事件当前的旁观者快照"""
+        return cls._observers.get(event_type, ())
 
     @classmethod
     async def emit(cls, event_type: str, *args, **kwargs):
         """触发事件
 
+        优先级链中的处理函数按优先级依次执行，返回 False 时停止后续处理函数；
+        旁观者（observer=True）作为后台任务与优先级链并发执行，返回值被忽略，
+        优先级链执行完即返回，不等待旁观者。
+
         Args:
             event_type: 事件类型
             *args: 位置参数
@@ -35,21 +144,52 @@ class EventManager:
         # 提取 callback 参数，如果没有则为 None
         callback = kwargs.pop('callback', None)
 
-        if event_type not in cls._handlers:
+        handlers = cls._handlers.get(event_type)
+        observers = cls._observers.get(event_type)
+        if not handlers and not observers:
             # 如果有回调函数，调用它并传递 None
             if callback:
                 callback(None)
             return None
 
         api_client, message = args
+
+        # 整个事件只冻结一次消息，每个处理函数拿到写时复制的视图，api_client 保持不变
+        frozen_message = freeze_message(message) if isinstance(message, dict) else message
+
+        # 旁观者立即在后台启动，不受优先级链中 False 的影响，也不会拖慢优先级链
+        for entry in observers or ():
+            task = asyncio.create_task(cls._run_observer(event_type, entry, api_client, frozen_message, kwargs))
+            cls._observer_tasks.add(task)
+            task.add_done_callback(cls._observer_tasks.discard)
+
+        return await cls._run_chain(event_type, handlers or (), api_client, frozen_message, kwargs, callback)
+
+    @classmethod
+    async def wait_observers(cls, timeout: float = None):
+        """等待正在后台执行的旁观者完成，用于退出前收尾
+
+        Args:
+            timeout: 最长等待时间（秒），为 None 时一直等待
+        """
+        if cls._observer_tasks:
+            await asyncio.wait(set(cls._observer_tasks), timeout=timeout)
+
+    @classmethod
+    async def _run_chain(cls, event_type: str, handlers: Tuple[HandlerEntry, ...], api_client, frozen_message,
+                         kwargs: dict, callback: Optional[Callable]):
+        """按优先级依次执行处理函数，返回 False 时停止后续处理函数"""
         final_result = None
 
-        for handler, instance, priority in cls._handlers[event_type]:
-            # 只对 message 进行深拷贝，api_client 保持不变
-            handler_args = (api_client, copy.deepcopy(message))
-            new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+        for handler, instance, priority in handlers:
+            handler_args = (api_client, isolate(frozen_message))
+            new_kwargs = {k: isolate(v) for k, v in kwargs.items()}
 
-            result = await handler(*handler_args, **new_kwargs)
+            start = time.perf_counter()
+            try:
+                result = await handler(*handler_args, **new_kwargs)
+            finally:
+                cls._record(event_type, handler, instance, time.perf_counter() - start)
 
             # 记录最后一个非 None 的结果
             if result is not None:
@@ -72,11 +212,56 @@ class EventManager:
         return final_result
 
     @classmethod
-    def unbind_instance(cls, instance: object):
-        """解绑实例的所有事件处理函数"""
-        for event_type in cls._handlers:
-            cls._handlers[event_type] = [
-                (handler, inst, priority)
-                for handler, inst, priority in cls._handlers[event_type]
-                if inst is not instance
-            ]
+    async def _run_observer(cls, event_type: str, entry: ObserverEntry, api_client, frozen_message, kwargs: dict):
+        """执行单个旁观者，超时或异常只记录日志，不影响其他处理函数"""
+        handler, instance, priority, timeout = entry
+        timeout = timeout if timeout is not None else cls.observer_timeout
+        handler_args = (api_client, isolate(frozen_message))
+        new_kwargs = {k: isolate(v) for k, v in kwargs.items()}
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(handler(*handler_args, **new_kwargs), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("旁观者 {}.{} 处理 {} 超时 ({}秒)", type(instance).__name__,
+                           getattr(handler, '__name__', handler), event_type, timeout)
+        except Exception as e:
+            logger.error("旁观者 {}.{} 处理 {} 出错: {}", type(instance).__name__,
+                         getattr(handler, '__name__', handler), event_type, e)
+        finally:
+            cls._record(event_type, handler, instance, time.perf_counter() - start)
+
+    @classmethod
+    def _record(cls, event_type: str, handler: Callable, instance: object, elapsed: float):
+        key = (event_type, f"{type(instance).__name__}.{getattr(handler, '__name__', repr(handler))}")
+        stats = cls._stats.get(key)
+        if stats is None:
+            stats = cls._stats[key] = HandlerStats()
+        stats.record(elapsed)
+
+    @classmethod
+    def get_handler_stats(cls, event_type: str = None) -> List[dict]:
+        """获取事件处理函数的调用次数与累计耗时，按累计耗时从高到低排序
+
+        Args:
+            event_type: 只返回该事件类型的统计，为 None 时返回全部
+        """
+        result = []
+        for (stat_event, handler_name), stats in list(cls._stats.items()):
+            if event_type and stat_event != event_type:
+                continue
+            result.append({
+                "event_type": stat_event,
+                "handler": handler_name,
+                "calls": stats.calls,
+                "total_ms": round(stats.total_time * 1000, 3),
+                "avg_ms": round(stats.total_time * 1000 / stats.calls, 3) if stats.calls else 0,
+                "max_ms": round(stats.max_time * 1000, 3),
+            })
+        result.sort(key=lambda x: x["total_ms"], reverse=True)
+        return result
+
+    @classmethod
+    def reset_handler_stats(cls):
+        """清空事件处理函数的调用统计"""
+        cls._stats.clear()
@@ -0,0 +1,380 @@
+"""
+媒体转码模块
+语音、视频的格式转换统一由 ffmpeg / ffprobe 子进程完成：
+子进程用 asyncio.create_subprocess_exec 启动，不阻塞事件循环，也不经过 shell；
+同时运行的进程数不超过 CPU 核数，多出来的请求排队等待，上限在所有线程的事件循环之间共享。
+输入可以是字节或文件路径，字节经 stdin 管道传给 ffmpeg，输出从 stdout 管道读回，不落临时文件；
+mp4 faststart 这类需要回写文件头的输出才写文件。
+转换结果按输入内容的哈希和参数缓存，同时到达的相同请求只运行一次 ffmpeg。
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import wave
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple, Union
+
+try:
+    from loguru import logger as _default_logger
+except ImportError:  # DOW 框架没有安装 loguru，使用标准库日志
+    _default_logger = logging.getLogger(__name__)
+
+Source = Union[bytes, str, os.PathLike]
+
+# Windows 上 ffmpeg 的常见安装目录
+WINDOWS_FFMPEG_DIRS = (
+    r"C:\ffmpeg\bin",
+    r"C:\Program Files\ffmpeg\bin",
+    r"C:\Program Files (x86)\ffmpeg\bin",
+)
+
+# 命令行参数中表示输入的占位符，运行时替换为文件路径或 pipe:0
+INPUT = object()
+
+# 从视频中截取封面时依次尝试的时间点
+FRAME_TIMESTAMPS = ("00:00:01", "00:00:00.5", "00:00:00")
+
+
+class TranscodeError(Exception):
+    """ffmpeg / ffprobe 不可用、执行失败或超时"""
+
+
+def find_executable(name: str) -> Optional[str]:
+    """查找 ffmpeg / ffprobe 可执行文件，先查 PATH，Windows 上再查常见安装目录
+
+    Args:
+        name (str): 可执行文件名，例如 "ffmpeg"
+
+    Returns:
+        Optional[str]: 可执行文件路径，找不到时返回 None
+    """
+    path = shutil.which(name)
+    if path:
+        return path
+    if os.name == "nt":
+        for directory in WINDOWS_FFMPEG_DIRS:
+            candidate = os.path.join(directory, f"{name}.exe")
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def _split_source(source: Source) -> Tuple[Optional[bytes], Optional[str]]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source), None
+    return None, os.fspath(source)
+
+
+def _file_md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaTranscoder:
+    """ffmpeg 转码进程池
+
+    Args:
+        max_workers (Optional[int]): 同时运行的 ffmpeg / ffprobe 进程数上限，默认 CPU 核数
+        timeout (float): 单个进程的最长运行时间（秒），超时后结束进程
+        cache_max_bytes (int): 结果缓存占用的最大字节数，超过其 1/8 的单个结果不缓存
+        logger (Optional[Any]): 日志对象，需要有 debug / warning 方法，默认使用 loguru
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 300,
+                 cache_max_bytes: int = 32 * 1024 * 1024, logger=None):
+        self.logger = logger or _default_logger
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache_max_bytes = cache_max_bytes
+
+        self._lock = threading.Lock()
+        self._executables: Dict[str, Optional[str]] = {}
+        # 正在运行的进程数和等待空位的请求，空位直接交给队头的请求
+        self._running = 0
+        self._waiters: Deque[Future] = deque()
+        # 缓存键 -> 输出内容，按最近使用排序
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        # 缓存键 -> 正在运行的转换，相同的请求等待同一个结果
+        self._pending: Dict[str, Future] = {}
+
+        # 统计
+        self._runs = 0
+        self._cache_hits = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    def executable(self, name: str = "ffmpeg") -> Optional[str]:
+        """可执行文件路径，找不到时返回 None，结果只查找一次"""
+        with self._lock:
+            if name not in self._executables:
+                self._executables[name] = find_executable(name)
+            return self._executables[name]
+
+    def available(self, name: str = "ffmpeg") -> bool:
+        return self.executable(name) is not None
+
+    async def run(self, tool: str, args: Sequence[str], input_data: Optional[bytes] = None) -> bytes:
+        """运行一次 ffmpeg / ffprobe，不经过缓存
+
+        Args:
+            tool (str): "ffmpeg" 或 "ffprobe"
+            args (Sequence[str]): 命令行参数，不含可执行文件
+            input_data (Optional[bytes]): 写入 stdin 的数据
+
+        Returns:
+            bytes: stdout 的内容
+
+        Raises:
+            TranscodeError: 找不到可执行文件、返回码非 0 或超时
+        """
+        executable = self.executable(tool)
+        if executable is None:
+            raise TranscodeError(f"未找到{tool}，请安装并配置到环境变量")
+        async with self._worker_slot():
+            with self._lock:
+                self._runs += 1
+            process = await asyncio.create_subprocess_exec(
+                executable, *args,
+                stdin=asyncio.subprocess.PIPE if input_data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(input_data), self.timeout)
+            except asyncio.TimeoutError:
+                with suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+                with self._lock:
+                    self._failed += 1
+                raise TranscodeError(f"{tool} 运行超过 {self.timeout} 秒，已结束")
+            except asyncio.CancelledError:
+                with suppress(ProcessLookupError):
+                    process.kill()
+                raise
+        if process.returncode != 0:
+            with self._lock:
+                self._failed += 1
+            message = stderr.decode("utf-8", errors="replace").strip()[-500:]
+            raise TranscodeError(f"{tool} 返回码 {process.returncode}: {message}")
+        return stdout
+
+    async def transcode(self, source: Source, output_args: Sequence[str], input_args: Sequence[str] = (),
+                        output_path: Optional[str] = None, cache: bool = True) -> bytes:
+        """用 ffmpeg 转换 source
+
+        Args:
+            source (Source): 输入内容（bytes，经 stdin 传入）或文件路径
+            output_args (Sequence[str]): 输出参数；输出到管道时需要用 -f 指定格式
+            input_args (Sequence[str]): 放在 -i 之前的输入参数，例如 ["-ss", "1"]
+            output_path (Optional[str]): 输出文件路径，为 None 时从 stdout 读回输出
+            cache (bool): 是否使用结果缓存，输出到文件时不缓存
+
+        Returns:
+            bytes: 输出内容，输出到文件时为 b""
+        """
+        args = ["-hide_banner", "-loglevel", "error", "-y", *input_args, "-i", INPUT, *output_args,
+                output_path or "pipe:1"]
+        return await self._run_source("ffmpeg", args, source, cache=cache and output_path is None)
+
+    async def to_mp3(self, source: Source, sample_rate: int = 44100, channels: Optional[int] = 2,
+                     bitrate: Optional[str] = "192k", output_path: Optional[str] = None) -> bytes:
+        """转换为 mp3，channels、bitrate 为 None 时保持 ffmpeg 的默认值"""
+        args = ["-vn", "-acodec", "libmp3lame", "-ar", str(sample_rate)]
+        if bitrate:
+            args += ["-ab", bitrate]
+        if channels:
+            args += ["-ac", str(channels)]
+        return await self.transcode(source, [*args, "-f", "mp3"], output_path=output_path)
+
+    async def to_pcm(self, source: Source, sample_rate: int = 16000, channels: int = 1) -> bytes:
+        """转换为 16 位小端 PCM 裸数据，用于 silk 编码和语音识别"""
+        return await self.transcode(source, [
+            "-vn", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", str(channels), "-f", "s16le",
+        ])
+
+    async def to_wav(self, source: Source, sample_rate: int = 16000, channels: int = 1) -> bytes:
+        """转换为 16 位 PCM 的 wav
+
+        wav 的文件头需要写入数据长度，ffmpeg 输出到管道时无法回写，所以从管道读回 PCM 后再加上文件头。
+        """
+        pcm = await self.to_pcm(source, sample_rate=sample_rate, channels=channels)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm)
+        return buffer.getvalue()
+
+    async def extract_frame(self, source: Source, timestamps: Sequence[str] = FRAME_TIMESTAMPS,
+                            quality: int = 2) -> Optional[bytes]:
+        """截取视频的一帧作为 jpg 封面，依次尝试 timestamps 中的时间点
+
+        Returns:
+            Optional[bytes]: jpg 内容，所有时间点都失败时返回 None
+        """
+        for timestamp in timestamps:
+            try:
+                image = await self.transcode(
+                    source,
+                    ["-vframes", "1", "-q:v", str(quality), "-vcodec", "mjpeg", "-f", "image2pipe"],
+                    input_args=["-ss", timestamp],
+                )
+            except TranscodeError as e:
+                self.logger.debug(f"截取视频帧失败，时间点: {timestamp}, 错误: {e}")
+                continue
+            if image:
+                return image
+        return None
+
+    async def remux(self, source: str, output_path: str, faststart: bool = True,
+                    metadata: Optional[Dict[str, str]] = None):
+        """不重新编码，复制音视频流到 output_path，可以把 moov 移到文件头并写入元数据"""
+        args = ["-c", "copy"]
+        if faststart:
+            args += ["-movflags", "+faststart"]
+        for key, value in (metadata or {}).items():
+            args += ["-metadata", f"{key}={value}"]
+        await self.transcode(source, args, output_path=output_path)
+
+    async def probe(self, source: Source, cache: bool = False) -> dict:
+        """ffprobe 读取的格式和流信息
+
+        探测只读取文件头，通常比对整个文件计算哈希还快，所以默认不缓存。
+        """
+        output = await self._run_source("ffprobe", [
+            "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", INPUT,
+        ], source, cache=cache)
+        try:
+            return json.loads(output.decode("utf-8", errors="replace") or "{}")
+        except ValueError as e:
+            raise TranscodeError(f"解析 ffprobe 输出失败: {e}")
+
+    async def probe_duration(self, source: Source, cache: bool = False) -> Optional[float]:
+        """媒体时长（秒），获取失败时返回 None"""
+        try:
+            output = await self._run_source("ffprobe", [
+                "-v", "error", "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1", INPUT,
+            ], source, cache=cache)
+            return float(output.decode().strip())
+        except (TranscodeError, ValueError) as e:
+            self.logger.warning(f"获取媒体时长失败: {e}")
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": len(self._waiters),
+                "runs": self._runs,
+                "cache_hits": self._cache_hits,
+                "coalesced": self._coalesced,
+                "failed": self._failed,
+                "cached": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+            }
+
+    async def _run_source(self, tool: str, args: list, source: Source, cache: bool) -> bytes:
+        data, path = _split_source(source)
+        command = [(path if path is not None else "pipe:0") if arg is INPUT else arg for arg in args]
+        if not cache:
+            return await self.run(tool, command, data)
+
+        try:
+            if data is not None:
+                content_hash = hashlib.md5(data).hexdigest()
+            else:
+                content_hash = await asyncio.to_thread(_file_md5, path)
+        except OSError as e:
+            raise TranscodeError(f"读取输入文件失败: {e}")
+        key_args = ["<input>" if arg is INPUT else arg for arg in args]
+        key = hashlib.md5("\0".join([tool, content_hash, *key_args]).encode("utf-8")).hexdigest()
+
+        owner = False
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+                return result
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                owner = True
+            else:
+                self._coalesced += 1
+        if not owner:
+            # shield 避免等待方被取消时连带取消共享的 Future
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await self.run(tool, command, data)
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(e if isinstance(e, Exception) else TranscodeError("转码已取消"))
+            raise
+        with self._lock:
+            self._pending.pop(key, None)
+            self._store(key, result)
+        future.set_result(result)
+        return result
+
+    def _store(self, key: str, result: bytes):
+        """加入结果缓存并按字节数淘汰最久未用的结果（调用方持有锁）"""
+        if len(result) > self.cache_max_bytes // 8:
+            return
+        self._cache[key] = result
+        self._cache_bytes += len(result)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    @asynccontextmanager
+    async def _worker_slot(self):
+        with self._lock:
+            if self._running < self.max_workers:
+                self._running += 1
+                waiter = None
+            else:
+                waiter = Future()
+                self._waiters.append(waiter)
+        if waiter is not None:
+            try:
+                await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                # 取消前空位已经交给了这个请求，要还回去
+                if not waiter.cancel():
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._running -= 1
+
+
+media_transcoder = MediaTranscoder()
@@ -0,0 +1,244 @@
+"""
+消息分发器模块
+用固定数量的 worker 处理 sync_message 拉到的消息：
+同一个会话（FromWxid）内的消息按顺序处理，不同会话之间并行处理，
+排队总量有上限，超出上限时按配置的策略丢弃消息。
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+# 排队已满时的处理策略
+SHED_DROP_NEWEST = "drop-newest"  # 丢弃新到的消息
+SHED_DROP_OLDEST = "drop-oldest"  # 丢弃积压最多的会话里最早的消息
+SHED_BLOCK = "block"  # 等待空位，暂停拉取新消息
+SHED_POLICIES = (SHED_DROP_NEWEST, SHED_DROP_OLDEST, SHED_BLOCK)
+
+
+class _Timing:
+    """耗时统计：总计、最大值和最近若干次的平均值"""
+
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self, window: int = 500):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def to_dict(self) -> dict:
+        recent = list(self.recent)
+        return {
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0,
+            "recent_avg_ms": round(sum(recent) * 1000 / len(recent), 3) if recent else 0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+def conversation_key(message: Dict[str, Any]) -> str:
+    """取消息所属会话，用于保证同一会话内的处理顺序"""
+    from_wxid = message.get("FromWxid") or message.get("FromUserName")
+    if isinstance(from_wxid, dict):
+        from_wxid = from_wxid.get("string", "")
+    return str(from_wxid or "")
+
+
+class MessageDispatcher:
+    """有界、按会话保序的消息分发器"""
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]], workers: int = 8,
+                 queue_size: int = 1000, shed_policy: str = SHED_BLOCK,
+                 key_func: Callable[[Dict[str, Any]], str] = conversation_key):
+        """
+        参数:
+            handler: 处理单条消息的协程函数，例如 XYBot.process_message
+            workers: 并发 worker 数量
+            queue_size: 所有会话排队消息的总上限
+            shed_policy: 排队已满时的策略，drop-newest / drop-oldest / block
+            key_func: 从消息中取会话标识的函数
+        """
+        if shed_policy not in SHED_POLICIES:
+            logger.warning(f"未知的消息丢弃策略 {shed_policy}，使用 {SHED_BLOCK}")
+            shed_policy = SHED_BLOCK
+
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.shed_policy = shed_policy
+        self.key_func = key_func
+
+        # 会话 -> 排队中的 (入队时间, 消息)
+        self._lanes: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        # 有待处理消息且当前没有 worker 在处理的会话
+        self._ready: "asyncio.Queue[str]" = asyncio.Queue()
+        # 已在就绪队列中或正在被 worker 处理的会话，同一会话同一时刻只会出现一次
+        self._scheduled: set = set()
+        # 正在被 worker 处理的会话
+        self._busy: set = set()
+        self._pending = 0
+        self._space = asyncio.Condition()
+        self._tasks = []
+        # stop() 开始后不再接受新消息
+        self._stopping = False
+
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_pending = 0
+        self.wait_time = _Timing()
+        self.process_time = _Timing()
+
+    def start(self):
+        """启动 worker"""
+        global _instance
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        _instance = self
+        logger.success(f"消息分发器已启动，worker: {self.workers}，队列上限: {self.queue_size}，策略: {self.shed_policy}")
+
+    async def stop(self, timeout: float = 10):
+        """不再接受新消息，等待排队和正在处理的消息处理完毕后停止 worker
+
+        参数:
+            timeout: 最长等待时间（秒），超时后取消仍在处理的消息
+        """
+        self._stopping = True
+        deadline = time.monotonic() + timeout
+        while (self._pending or self._busy) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._pending or self._busy:
+            logger.warning(f"消息分发器停止超时，放弃 {self._pending} 条排队消息和 {len(self._busy)} 条处理中的消息")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def pending(self) -> int:
+        """排队中（尚未开始处理）的消息数"""
+        return self._pending
+
+    async def submit(self, message: Dict[str, Any]) -> bool:
+        """提交一条消息
+
+        返回:
+            bool: 消息是否被接受，被丢弃时返回 False
+        """
+        self.submitted += 1
+        if self._stopping:
+            self.dropped += 1
+            logger.warning(f"消息分发器正在停止，丢弃新消息: {self.key_func(message)}")
+            return False
+        if self._pending >= self.queue_size:
+            if self.shed_policy == SHED_BLOCK:
+                async with self._space:
+                    await self._space.wait_for(lambda: self._pending < self.queue_size)
+            elif self.shed_policy == SHED_DROP_OLDEST:
+                self._drop_oldest()
+            else:
+                self.dropped += 1
+                logger.warning(f"消息队列已满({self._pending})，丢弃新消息: {self.key_func(message)}")
+                return False
+
+        key = self.key_func(message)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+        lane.append((time.monotonic(), message))
+        self._pending += 1
+        if self._pending > self.max_pending:
+            self.max_pending = self._pending
+
+        # 会话不在就绪队列也没有 worker 在处理时才放进就绪队列，保证同一会话只被一个 worker 处理
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return True
+
+    def _drop_oldest(self):
+        """丢弃积压最多的会话里最早的一条消息"""
+        key, lane = max(self._lanes.items(), key=lambda item: len(item[1]))
+        lane.popleft()
+        self._pending -= 1
+        self.dropped += 1
+        logger.warning(f"消息队列已满，丢弃会话 {key} 中最早的一条消息")
+
+    async def _worker(self, index: int):
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes.get(key)
+            if not lane:
+                # 会话里的消息已被丢弃
+                self._scheduled.discard(key)
+                self._lanes.pop(key, None)
+                continue
+
+            enqueued_at, message = lane.popleft()
+            self._pending -= 1
+            self._busy.add(key)
+            await self._notify_space()
+
+            started = time.monotonic()
+            self.wait_time.add(started - enqueued_at)
+            try:
+                await self.handler(message)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"消息分发器 worker-{index} 处理消息失败: {e}")
+            finally:
+                self.process_time.add(time.monotonic() - started)
+                self._busy.discard(key)
+                # 会话还有消息就重新排到就绪队列末尾，让其他会话也有机会被处理
+                if lane:
+                    self._ready.put_nowait(key)
+                else:
+                    self._scheduled.discard(key)
+                    self._lanes.pop(key, None)
+
+    async def _notify_space(self):
+        if self.shed_policy == SHED_BLOCK:
+            async with self._space:
+                self._space.notify_all()
+
+    def get_stats(self) -> dict:
+        """获取分发器运行指标"""
+        return {
+            "workers": self.workers,
+            "busy_workers": len(self._busy),
+            "queue_size": self.queue_size,
+            "shed_policy": self.shed_policy,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "conversations": len(self._lanes),
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "wait_time": self.wait_time.to_dict(),
+            "process_time": self.process_time.to_dict(),
+        }
+
+
+# 当前正在运行的分发器，供管理后台读取指标
+_instance: Optional[MessageDispatcher] = None
+
+
+def get_instance() -> Optional[MessageDispatcher]:
+    """获取当前正在运行的消息分发器实例，未启动时返回 None"""
+    return _instance
@@ -0,0 +1,171 @@
+"""
+自适应消息同步调度模块
+根据 sync_message 的结果决定下一次同步前的等待时间：
+有新消息时立即再次同步，空闲或失败时按指数退避并加入随机抖动，
+同时统计从拉取到消息到交给分发器之间的延迟。
+"""
+
+import bisect
+import random
+import time
+from typing import Iterable, List, Optional
+
+# 延迟直方图的桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图"""
+
+    def __init__(self, buckets_ms: Iterable[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms: List[float] = sorted(buckets_ms)
+        self.counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = max(seconds, 0) * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """返回第 p 百分位所在桶的上界（毫秒），落在 +Inf 桶时返回 None"""
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets_ms[index] if index < len(self.buckets_ms) else None
+        return None
+
+    def to_dict(self) -> dict:
+        labels = [f"<={b}ms" for b in self.buckets_ms] + ["+Inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class AdaptivePollScheduler:
+    """sync_message 的自适应轮询间隔"""
+
+    def __init__(self, idle_interval: float = 0.5, max_idle_interval: float = 2.0,
+                 failure_interval: float = 5.0, max_failure_interval: float = 60.0,
+                 jitter: float = 0.2):
+        """
+        参数:
+            idle_interval: 第一次空轮询后的等待时间（秒）
+            max_idle_interval: 持续空闲时的最长等待时间（秒）
+            failure_interval: 第一次失败后的等待时间（秒）
+            max_failure_interval: 持续失败时的最长等待时间（秒）
+            jitter: 随机抖动比例，0.2 表示在 ±20% 范围内浮动
+        """
+        self.idle_interval = idle_interval
+        self.max_idle_interval = max(max_idle_interval, idle_interval)
+        self.failure_interval = failure_interval
+        self.max_failure_interval = max(max_failure_interval, failure_interval)
+        self.jitter = jitter
+
+        self.idle_streak = 0
+        self.failure_streak = 0
+
+        self.polls = 0
+        self.busy_polls = 0
+        self.idle_polls = 0
+        self.failed_polls = 0
+        self.messages = 0
+        self.last_delay = 0.0
+        # 从 sync_message 返回到整批消息交给分发器的耗时
+        self.dispatch_latency = LatencyHistogram()
+        # 消息从发出（CreateTime）到交给分发器的耗时，CreateTime 精度为秒
+        self.message_age = LatencyHistogram()
+
+    def _backoff(self, base: float, ceiling: float, streak: int) -> float:
+        delay = min(base * (2 ** max(streak - 1, 0)), ceiling)
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def on_messages(self, count: int) -> float:
+        """同步到了消息，返回下次同步前的等待时间（立即同步）"""
+        self.polls += 1
+        self.busy_polls += 1
+        self.messages += count
+        self.idle_streak = 0
+        self.failure_streak = 0
+        self.last_delay = 0.0
+        return self.last_delay
+
+    def on_idle(self, more: bool = False) -> float:
+        """同步成功但没有消息，返回下次同步前的等待时间
+
+        参数:
+            more: 服务端表示还有数据未同步完（ContinueFlag），此时立即再次同步
+        """
+        self.polls += 1
+        self.idle_polls += 1
+        self.failure_streak = 0
+        if more:
+            self.last_delay = 0.0
+            return self.last_delay
+        self.idle_streak += 1
+        self.last_delay = self._backoff(self.idle_interval, self.max_idle_interval, self.idle_streak)
+        return self.last_delay
+
+    def on_failure(self) -> float:
+        """同步失败，返回下次同步前的等待时间"""
+        self.polls += 1
+        self.failed_polls += 1
+        self.failure_streak += 1
+        self.last_delay = self._backoff(self.failure_interval, self.max_failure_interval, self.failure_streak)
+        return self.last_delay
+
+    def record_dispatch(self, polled_at: float, messages: list):
+        """记录一批消息从拉取到交给分发器的延迟
+
+        参数:
+            polled_at: sync_message 返回时的 time.monotonic()
+            messages: 本批消息
+        """
+        self.dispatch_latency.observe(time.monotonic() - polled_at)
+        now = time.time()
+        for message in messages:
+            create_time = message.get("CreateTime") if isinstance(message, dict) else None
+            if isinstance(create_time, (int, float)) and create_time > 0:
+                self.message_age.observe(now - create_time)
+
+    def get_stats(self) -> dict:
+        """获取轮询指标"""
+        return {
+            "polls": self.polls,
+            "busy_polls": self.busy_polls,
+            "idle_polls": self.idle_polls,
+            "failed_polls": self.failed_polls,
+            "messages": self.messages,
+            "idle_streak": self.idle_streak,
+            "failure_streak": self.failure_streak,
+            "last_delay_ms": round(self.last_delay * 1000, 3),
+            "dispatch_latency": self.dispatch_latency.to_dict(),
+            "message_age": self.message_age.to_dict(),
+        }
+
+
+# 当前正在运行的调度器，供管理后台读取指标
+_instance: Optional[AdaptivePollScheduler] = None
+
+
+def set_instance(scheduler: AdaptivePollScheduler):
+    """登记当前正在运行的调度器"""
+    global _instance
+    _instance = scheduler
+
+
+def get_instance() -> Optional[AdaptivePollScheduler]:
+    """获取当前正在运行的调度器，未启动时返回 None"""
+    return _instance
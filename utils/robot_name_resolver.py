@@ -0,0 +1,148 @@
+"""
+机器人名称解析模块
+为 @ 消息前缀的移除提供机器人的各种名称：
+配置文件中的 robot-names 在文件修改后才重新读取，
+机器人在各个群里的群昵称按 TTL 缓存，群成员变化时在后台刷新，
+常见情况下不需要读文件，也不需要请求群成员列表。
+"""
+
+import asyncio
+import os
+import time
+import tomllib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# 配置文件中没有设置 robot-names 时使用的默认名称
+DEFAULT_ROBOT_NAMES = ["小小x", "小x", "机器人"]
+
+
+class RobotNameResolver:
+    """机器人名称与群昵称缓存"""
+
+    def __init__(self, member_fetcher: Callable[[str], Awaitable[list]], wxid_getter: Callable[[], str],
+                 config_path: str = "main_config.toml", group_ttl: float = 1800,
+                 config_check_interval: float = 5):
+        """
+        参数:
+            member_fetcher: 获取群成员列表的协程函数，例如 XYBot.get_chatroom_member_list
+            wxid_getter: 返回机器人当前 wxid 的函数
+            config_path: 主配置文件路径
+            group_ttl: 群昵称缓存的有效期（秒），过期后先返回旧值并在后台刷新
+            config_check_interval: 检查配置文件是否修改的最短间隔（秒）
+        """
+        self.member_fetcher = member_fetcher
+        self.wxid_getter = wxid_getter
+        self.config_path = config_path
+        self.group_ttl = group_ttl
+        self.config_check_interval = config_check_interval
+
+        self._config_names: List[str] = []
+        self._config_mtime: Optional[float] = None
+        self._config_checked_at = 0.0
+
+        # 群 wxid -> (机器人的群昵称, 获取时间)，群昵称为空字符串表示群里没有找到机器人
+        self._group_names: Dict[str, Tuple[str, float]] = {}
+        # 正在刷新的群，保证同一个群同一时刻只请求一次
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    # 配置文件中的名称
+
+    def config_names(self) -> List[str]:
+        """获取配置文件中的机器人名称，文件修改后才重新读取"""
+        now = time.monotonic()
+        if self._config_mtime is not None and now - self._config_checked_at < self.config_check_interval:
+            return self._config_names
+        self._config_checked_at = now
+
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError as e:
+            logger.error(f"读取main_config.toml中的机器人名称失败: {e}")
+            return self._config_names or DEFAULT_ROBOT_NAMES
+
+        if mtime != self._config_mtime:
+            try:
+                with open(self.config_path, "rb") as f:
+                    main_config = tomllib.load(f)
+                self._config_names = list(main_config.get("XYBot", {}).get("robot-names", []))
+                logger.debug(f"从main_config.toml中读取到机器人名称列表: {self._config_names}")
+            except Exception as e:
+                logger.error(f"读取main_config.toml中的机器人名称失败: {e}")
+            self._config_mtime = mtime
+
+        return self._config_names or DEFAULT_ROBOT_NAMES
+
+    # 群昵称
+
+    async def _fetch_group_name(self, group_wxid: str) -> str:
+        wxid = self.wxid_getter()
+        name = ""
+        try:
+            members = await self.member_fetcher(group_wxid)
+            for member in members:
+                if member.get("wxid") == wxid and member.get("nickname"):
+                    name = member["nickname"]
+                    logger.debug(f"从群成员列表中获取到机器人的群昵称: {name}")
+                    break
+        except Exception as e:
+            logger.warning(f"获取群成员列表失败: {e}")
+            # 获取失败时保留旧值
+            cached = self._group_names.get(group_wxid)
+            name = cached[0] if cached else ""
+        self._group_names[group_wxid] = (name, time.monotonic())
+        return name
+
+    def _refresh(self, group_wxid: str) -> asyncio.Task:
+        task = self._refreshing.get(group_wxid)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch_group_name(group_wxid))
+            self._refreshing[group_wxid] = task
+            task.add_done_callback(lambda t: self._refreshing.pop(group_wxid, None)
+                                   if self._refreshing.get(group_wxid) is t else None)
+        return task
+
+    async def group_name(self, group_wxid: str) -> str:
+        """获取机器人在群里的群昵称
+
+        有缓存时直接返回，过期的缓存会在后台刷新；从未获取过时等待获取完成。
+        """
+        cached = self._group_names.get(group_wxid)
+        if cached is None:
+            return await asyncio.shield(self._refresh(group_wxid))
+        name, fetched_at = cached
+        if time.monotonic() - fetched_at > self.group_ttl:
+            self._refresh(group_wxid)
+        return name
+
+    def on_members_changed(self, group_wxid: str):
+        """群成员变化时调用，已缓存的群在后台刷新群昵称"""
+        if group_wxid in self._group_names:
+            logger.debug(f"群 {group_wxid} 成员变化，后台刷新机器人群昵称")
+            self._refresh(group_wxid)
+
+    def invalidate(self, group_wxid: Optional[str] = None):
+        """清除群昵称缓存，不指定群时清除全部"""
+        if group_wxid is None:
+            self._group_names.clear()
+        else:
+            self._group_names.pop(group_wxid, None)
+
+    # 汇总
+
+    async def robot_names(self, group_wxid: Optional[str] = None, nickname: Optional[str] = None) -> List[str]:
+        """获取用于匹配 @ 前缀的机器人名称列表
+
+        参数:
+            group_wxid: 群聊 wxid，提供时包含机器人在该群的群昵称
+            nickname: 机器人的微信昵称
+        """
+        names = list(self.config_names())
+        if nickname and nickname not in names:
+            names.append(nickname)
+        if group_wxid and group_wxid.endswith("@chatroom"):
+            group_name = await self.group_name(group_wxid)
+            if group_name and group_name not in names:
+                names.append(group_name)
+        return names
@@ -0,0 +1,80 @@
+"""
+退出清理模块
+消息分发队列、数据库写入缓冲、HTTP 会话等需要在进程退出或重启前，在机器人的事件循环里收尾。
+各组件启动时注册一个异步清理函数，退出和重启的各条路径在结束进程前统一调用 run_shutdown_hooks。
+os.execv、os._exit 不会执行 atexit 和 finally，所以这些路径需要在调用前显式执行清理。
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from loguru import logger
+
+# 单个清理函数的默认最长执行时间（秒）
+DEFAULT_HOOK_TIMEOUT = 10
+
+_lock = threading.Lock()
+# (名称, 清理函数, 最长执行时间)，按注册顺序排列，执行时倒序
+_hooks: List[Tuple[str, Callable[[], Awaitable], float]] = []
+# 注册清理函数的事件循环，清理函数都在这个循环里执行
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_ran = False
+
+
+def register_shutdown_hook(name: str, hook: Callable[[], Awaitable], timeout: float = DEFAULT_HOOK_TIMEOUT):
+    """注册退出时执行的异步清理函数，需要在机器人的事件循环中调用
+
+    后注册的先执行：先停止产生新工作的组件（如消息分发器），再关闭它们依赖的资源（如数据库、HTTP 会话）。
+
+    Args:
+        name (str): 用于日志的名称
+        hook (Callable[[], Awaitable]): 无参数的协程函数
+        timeout (float): 最长执行时间（秒），超时后放弃并继续执行下一个
+    """
+    global _loop
+    with _lock:
+        _loop = asyncio.get_running_loop()
+        _hooks.append((name, hook, timeout))
+
+
+async def _run_hooks():
+    global _ran
+    with _lock:
+        if _ran:
+            return
+        _ran = True
+        hooks = list(reversed(_hooks))
+    for name, hook, timeout in hooks:
+        try:
+            await asyncio.wait_for(hook(), timeout)
+            logger.info(f"退出清理完成: {name}")
+        except asyncio.TimeoutError:
+            logger.warning(f"退出清理超时（{timeout}秒）: {name}")
+        except Exception as e:
+            logger.error(f"退出清理失败: {name}: {e}")
+
+
+async def run_shutdown_hooks():
+    """执行所有清理函数，只执行一次；在其他线程的事件循环中调用时转到注册时的事件循环执行"""
+    with _lock:
+        loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    if loop is asyncio.get_running_loop():
+        await _run_hooks()
+    else:
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_run_hooks(), loop))
+
+
+def run_shutdown_hooks_sync(timeout: float = 30):
+    """在没有事件循环的线程中（如文件监控线程）执行所有清理函数并等待完成"""
+    with _lock:
+        loop = _loop
+    if loop is None or loop.is_closed() or not loop.is_running():
+        return
+    future = asyncio.run_coroutine_threadsafe(_run_hooks(), loop)
+    try:
+        future.result(timeout)
+    except Exception as e:
+        logger.error(f"执行退出清理失败: {e}")
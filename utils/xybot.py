@@ -13,10 +13,13 @@ from loguru import logger
 
 from WechatAPI import WechatAPIClient
 from WechatAPI.Client.protect import protector
+from WechatAPI.media_cache import media_cache
 from database.messsagDB import MessageDB
 from database.message_counter import get_instance as get_message_counter  # 导入消息计数器
-from database.contacts_db import update_contact_in_db, get_contact_from_db
 from utils.event_manager import EventManager
+from utils.account_filter import AccountFilter
+from utils.contact_refresher import ContactRefresher
+from utils.robot_name_resolver import RobotNameResolver
 
 # 获取消息计数器实例
 message_counter = get_message_counter()
@@ -25,6 +28,8 @@ message_counter = get_message_counter()
 class XYBot:
     def __init__(self, bot_client: WechatAPIClient):
         self.bot = bot_client
+        # 消息来源过滤，ignore_mode/whitelist/blacklist 读写的都是这里的设置
+        self.account_filter = AccountFilter()
         self.wxid = None
         self.nickname = None
         self.alias = None
@@ -93,6 +98,15 @@ class XYBot:
 
         self.msg_db = MessageDB()
 
+        # 媒体缓存磁盘上限
+        media_cache.max_bytes = int(xybot_config.get("media-cache-max-mb", 512)) * 1024 * 1024
+
+        # 机器人名称与群昵称缓存，用于移除@机器人前缀
+        self.name_resolver = RobotNameResolver(self.get_chatroom_member_list, lambda: self.wxid)
+
+        # 联系人资料刷新
+        self.contact_refresher = ContactRefresher(self.bot.get_contract_detail)
+
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
         """更新机器人信息"""
         self.wxid = wxid
@@ -299,203 +313,7 @@ class XYBot:
             wxid: 联系人的wxid
         """
         try:
-            # 先检查数据库中是否已有该联系人的信息
-            existing_contact = get_contact_from_db(wxid)
-
-            # 如果数据库中没有该联系人的信息，或者信息不完整，则从 API 获取
-            if not existing_contact or not existing_contact.get('nickname'):
-                # 从 API 获取联系人信息
-                try:
-                    # 如果是群聊，不获取详细信息
-                    if wxid.endswith("@chatroom"):
-                        contact_info = {
-                            'wxid': wxid,
-                            'nickname': wxid,
-                            'type': 'group'
-                        }
-                        # 更新到数据库
-                        update_contact_in_db(contact_info)
-                        logger.debug(f"已在消息处理中更新群聊 {wxid} 的基本信息")
-                    else:
-                        # 获取联系人详细信息
-                        logger.debug(f"开始获取联系人 {wxid} 的详细信息")
-                        try:
-                            detail = await self.bot.get_contract_detail(wxid)
-                            logger.debug(f"获取到联系人 {wxid} 的详细信息: {detail}")
-
-                            if detail:
-                                # 处理返回结果
-                                if isinstance(detail, list) and len(detail) > 0:
-                                    detail_item = detail[0]
-                                    logger.debug(f"联系人 {wxid} 详情项类型: {type(detail_item)}")
-
-                                    if isinstance(detail_item, dict):
-                                        # 记录详细的字段信息，帮助调试
-                                        logger.debug(f"联系人 {wxid} 详情字段: {list(detail_item.keys())}")
-
-                                        # 检查nickname字段的类型和值
-                                        nickname_value = detail_item.get('nickname')
-                                        if nickname_value is None:
-                                            # 尝试其他可能的字段名
-                                            nickname_value = detail_item.get('NickName')
-                                            if nickname_value is None:
-                                                logger.warning(f"联系人 {wxid} 没有找到nickname或NickName字段")
-                                            else:
-                                                logger.debug(f"联系人 {wxid} 使用NickName字段: {nickname_value}")
-                                        else:
-                                            logger.debug(f"联系人 {wxid} 使用nickname字段: {nickname_value}")
-
-                                        # 如果nickname是字典类型，尝试获取其中的string字段
-                                        if isinstance(nickname_value, dict):
-                                            logger.debug(f"联系人 {wxid} 的nickname是字典类型: {nickname_value}")
-                                            nickname_string = nickname_value.get('string')
-                                            if nickname_string:
-                                                nickname_value = nickname_string
-                                                logger.debug(f"从字典中提取nickname.string: {nickname_string}")
-
-                                        # 处理头像字段 - 优先使用BigHeadImgUrl或SmallHeadImgUrl
-                                        avatar_value = detail_item.get('BigHeadImgUrl', '')
-                                        if not avatar_value:
-                                            avatar_value = detail_item.get('SmallHeadImgUrl', '')
-                                        if not avatar_value:
-                                            # 如果没有直接的URL，尝试使用avatar字段
-                                            avatar_value = detail_item.get('avatar', '')
-                                            if isinstance(avatar_value, dict):
-                                                avatar_value = avatar_value.get('string', '')
-
-                                        logger.debug(f"联系人 {wxid} 的头像地址: {avatar_value}")
-
-                                        # 处理备注字段
-                                        remark_value = detail_item.get('remark', '')
-                                        if remark_value is None or not remark_value:
-                                            remark_value = detail_item.get('Remark', '')
-                                        if isinstance(remark_value, dict):
-                                            remark_value = remark_value.get('string', '')
-
-                                        # 处理微信号字段
-                                        alias_value = detail_item.get('alias', '')
-                                        if alias_value is None or not alias_value:
-                                            alias_value = detail_item.get('Alias', '')
-                                        if isinstance(alias_value, dict):
-                                            alias_value = alias_value.get('string', '')
-
-                                        # 构建联系人信息
-                                        contact_info = {
-                                            'wxid': wxid,
-                                            'nickname': nickname_value if nickname_value else wxid,
-                                            'avatar': avatar_value,
-                                            'remark': remark_value,
-                                            'alias': alias_value
-                                        }
-                                        logger.debug(f"解析联系人 {wxid} 详情成功: {contact_info}")
-                                    else:
-                                        logger.warning(f"联系人 {wxid} 详情格式不是字典: {detail_item}")
-                                        # 创建基本联系人信息
-                                        contact_info = {
-                                            'wxid': wxid,
-                                            'nickname': wxid,
-                                            'type': 'friend'
-                                        }
-                                elif isinstance(detail, dict):
-                                    # 记录详细的字段信息，帮助调试
-                                    logger.debug(f"联系人 {wxid} 详情字段(字典格式): {list(detail.keys())}")
-
-                                    # 检查nickname字段的类型和值
-                                    nickname_value = detail.get('nickname')
-                                    if nickname_value is None:
-                                        # 尝试其他可能的字段名
-                                        nickname_value = detail.get('NickName')
-                                        if nickname_value is None:
-                                            logger.warning(f"联系人 {wxid} 没有找到nickname或NickName字段")
-                                        else:
-                                            logger.debug(f"联系人 {wxid} 使用NickName字段: {nickname_value}")
-                                    else:
-                                        logger.debug(f"联系人 {wxid} 使用nickname字段: {nickname_value}")
-
-                                    # 如果nickname是字典类型，尝试获取其中的string字段
-                                    if isinstance(nickname_value, dict):
-                                        logger.debug(f"联系人 {wxid} 的nickname是字典类型: {nickname_value}")
-                                        nickname_string = nickname_value.get('string')
-                                        if nickname_string:
-                                            nickname_value = nickname_string
-                                            logger.debug(f"从字典中提取nickname.string: {nickname_string}")
-
-                                    # 处理头像字段 - 优先使用BigHeadImgUrl或SmallHeadImgUrl
-                                    avatar_value = detail.get('BigHeadImgUrl', '')
-                                    if not avatar_value:
-                                        avatar_value = detail.get('SmallHeadImgUrl', '')
-                                    if not avatar_value:
-                                        # 如果没有直接的URL，尝试使用avatar字段
-                                        avatar_value = detail.get('avatar', '')
-                                        if isinstance(avatar_value, dict):
-                                            avatar_value = avatar_value.get('string', '')
-
-                                    logger.debug(f"联系人 {wxid} 的头像地址(字典格式): {avatar_value}")
-
-                                    # 处理备注字段
-                                    remark_value = detail.get('remark', '')
-                                    if remark_value is None or not remark_value:
-                                        remark_value = detail.get('Remark', '')
-                                    if isinstance(remark_value, dict):
-                                        remark_value = remark_value.get('string', '')
-
-                                    # 处理微信号字段
-                                    alias_value = detail.get('alias', '')
-                                    if alias_value is None or not alias_value:
-                                        alias_value = detail.get('Alias', '')
-                                    if isinstance(alias_value, dict):
-                                        alias_value = alias_value.get('string', '')
-
-                                    # 构建联系人信息
-                                    contact_info = {
-                                        'wxid': wxid,
-                                        'nickname': nickname_value if nickname_value else wxid,
-                                        'avatar': avatar_value,
-                                        'remark': remark_value,
-                                        'alias': alias_value
-                                    }
-                                    logger.debug(f"解析联系人 {wxid} 详情成功(字典格式): {contact_info}")
-                                else:
-                                    logger.warning(f"联系人 {wxid} 详情格式不支持: {type(detail)}")
-                                    # 创建基本联系人信息
-                                    contact_info = {
-                                        'wxid': wxid,
-                                        'nickname': wxid,
-                                        'type': 'friend'
-                                    }
-                            else:
-                                logger.warning(f"无法获取联系人 {wxid} 的详细信息，API返回空数据")
-                                # 创建基本联系人信息
-                                contact_info = {
-                                    'wxid': wxid,
-                                    'nickname': wxid,
-                                    'type': 'friend'
-                                }
-
-                            # 更新到数据库
-                            update_contact_in_db(contact_info)
-                            logger.debug(f"已在消息处理中更新联系人 {wxid} 的信息")
-                        except Exception as e:
-                            logger.error(f"调用API获取联系人 {wxid} 详情失败: {str(e)}")
-                            # 创建基本联系人信息
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': wxid,
-                                'type': 'friend'
-                            }
-                            # 仍然更新到数据库，确保至少有基本信息
-                            update_contact_in_db(contact_info)
-                            logger.debug(f"已在消息处理中更新联系人 {wxid} 的基本信息")
-                except Exception as e:
-                    logger.error(f"在消息处理中获取联系人 {wxid} 信息失败: {str(e)}")
-                    # 创建基本联系人信息并保存
-                    contact_info = {
-                        'wxid': wxid,
-                        'nickname': wxid,
-                        'type': 'friend' if not wxid.endswith("@chatroom") else 'group'
-                    }
-                    update_contact_in_db(contact_info)
-                    logger.debug(f"已在消息处理中更新联系人 {wxid} 的基本信息(异常处理)")
+            await self.contact_refresher.refresh(wxid)
         except Exception as e:
             logger.error(f"更新联系人信息时发生异常: {str(e)}")
 
@@ -529,7 +347,7 @@ class XYBot:
             # 新增：保存到消息数据库
             try:
                 await self.msg_db.save_message(
-                    msg_id=message.get("ID", 0),
+                    msg_id=int(message.get("MsgId", 0) or 0),
                     sender_wxid=SenderWxid or "",
                     from_wxid=FromWxid or "",
                     msg_type=Type,
@@ -562,25 +380,11 @@ class XYBot:
             if message.get("FromWxid") == self.wxid and isinstance(to_wxid, str) and to_wxid.endswith("@chatroom"):
                 message["FromWxid"], message["ToWxid"] = message["ToWxid"], message["FromWxid"]
 
-            # 异步更新发送者联系人信息
+            # 异步更新发送者联系人信息，群聊只更新群聊本身信息
+            # 同一个 wxid 只排队一次，多个未知联系人合并为一次接口请求
             from_wxid = message.get("FromWxid", "")
             if from_wxid and from_wxid != self.wxid:
-                # 如果是群聊，只更新群聊本身信息
-                if from_wxid.endswith("@chatroom"):
-                    logger.info(f"开始异步更新群聊信息: {from_wxid}")
-                    update_task = asyncio.create_task(self.update_contact_info(from_wxid))
-                    # 添加回调以记录完成状态
-                    update_task.add_done_callback(
-                        lambda t: logger.info(f"完成群聊信息更新: {from_wxid}, 状态: {'success' if not t.exception() else f'error: {t.exception()}'}")
-                    )
-                # 如果是私聊，更新发送者信息
-                elif not from_wxid.endswith("@chatroom"):
-                    logger.info(f"开始异步更新发送者联系人信息: {from_wxid}")
-                    update_task = asyncio.create_task(self.update_contact_info(from_wxid))
-                    # 添加回调以记录完成状态
-                    update_task.add_done_callback(
-                        lambda t: logger.info(f"完成发送者联系人信息更新: {from_wxid}, 状态: {'success' if not t.exception() else f'error: {t.exception()}'}")
-                    )
+                self.contact_refresher.request(from_wxid)
 
             # 根据消息类型触发不同的事件
             if msg_type == 1:  # 文本消息
@@ -762,9 +566,15 @@ class XYBot:
             logger.error("解析图片消息失败: {}, 内容: {}", e, message["Content"])
             return
 
+        # 同一张图片（例如被多次引用）已下载过时直接使用缓存
+        cached_image = await media_cache.get_base64(media_cache.key("md5", md5)) if md5 else None
+
         # 尝试使用新的get_msg_image方法分段下载图片
         try:
-            if length and length.isdigit():
+            if cached_image:
+                logger.debug(f"图片已缓存，跳过下载: md5={md5}")
+                message["Content"] = cached_image
+            elif length and length.isdigit():
                 img_length = int(length)
                 logger.debug(f"尝试使用get_msg_image下载图片: MsgId={message.get('MsgId')}, length={img_length}")
 
@@ -835,6 +645,8 @@ class XYBot:
                 # 解码base64获取图片数据
                 import base64
                 image_data = base64.b64decode(message["Content"])
+                if not cached_image:
+                    await media_cache.put(image_data, media_cache.key("md5", message["ImageMD5"]))
 
                 # 确保files目录存在
                 files_dir = os.path.join(os.getcwd(), "files")
@@ -1306,6 +1118,10 @@ class XYBot:
             logger.error("解析系统消息失败: {}, 内容: {}", e, message["Content"])
             return
 
+        if message["IsGroup"] and msg_type in ("sysmsgtemplate", "delchatroommember"):
+            # 群成员变化，后台刷新机器人的群昵称缓存
+            self.name_resolver.on_members_changed(message["FromWxid"])
+
         if msg_type == "pat":
             await self.process_pat_message(message)
         elif msg_type == "ClientCheckGetExtInfo":
@@ -1380,39 +1196,8 @@ class XYBot:
         # 检查消息是否包含Ats字段，并且机器人的wxid在Ats列表中
         if "Ats" in message and self.wxid in message["Ats"]:
             # 尝试从消息内容中移除@部分
-            # 从main_config.toml中读取机器人名称列表
-            robot_names = []
-            try:
-                # 读取main_config.toml中的配置
-                import tomllib
-                with open("main_config.toml", "rb") as f:
-                    main_config = tomllib.load(f)
-                    robot_names = main_config.get("XYBot", {}).get("robot-names", [])
-                    logger.debug(f"从main_config.toml中读取到机器人名称列表: {robot_names}")
-            except Exception as e:
-                logger.error(f"读取main_config.toml中的机器人名称失败: {e}")
-
-            # 如果配置文件中没有设置或读取失败，使用默认值
-            if not robot_names:
-                robot_names = ["小小x", "小x", "机器人"]
-                logger.debug(f"使用默认机器人名称列表: {robot_names}")
-
-            # 添加机器人自己的昵称
-            if self.nickname and self.nickname not in robot_names:
-                robot_names.append(self.nickname)
-
-            # 尝试从群成员列表中获取机器人的群昵称
-            if message["FromWxid"].endswith("@chatroom"):
-                try:
-                    # 异步获取群成员列表
-                    members = await self.get_chatroom_member_list(message["FromWxid"])
-                    for member in members:
-                        if member.get("wxid") == self.wxid and member.get("nickname"):
-                            robot_names.append(member["nickname"])
-                            logger.debug(f"从群成员列表中获取到机器人的群昵称: {member['nickname']}")
-                            break
-                except Exception as e:
-                    logger.warning(f"获取群成员列表失败: {e}")
+            # 机器人名称列表：配置文件中的名称、机器人昵称和机器人在该群的群昵称，均来自缓存
+            robot_names = await self.name_resolver.robot_names(message["FromWxid"], self.nickname)
 
             # 移除@机器人前缀
             original_content = content
@@ -1856,89 +1641,32 @@ class XYBot:
         return True
 
     def ignore_check(self, FromWxid: str, SenderWxid: str):
-        # 过滤公众号消息（公众号wxid通常以gh_开头）
-        if SenderWxid and isinstance(SenderWxid, str) and SenderWxid.startswith('gh_'):
-            logger.debug(f"忽略公众号消息: {SenderWxid}")
-            return False
-        if FromWxid and isinstance(FromWxid, str) and FromWxid.startswith('gh_'):
-            logger.debug(f"忽略公众号消息: {FromWxid}")
-            return False
+        return self.account_filter.check(FromWxid, SenderWxid)
 
-        # 过滤微信团队和系统通知
-        system_accounts = [
-            'weixin', # 微信团队
-            'filehelper', # 文件传输助手
-            'fmessage', # 朋友推荐通知
-            'medianote', # 语音记事本
-            'floatbottle', # 漂流瓶
-            'qmessage', # QQ离线消息
-            'qqmail', # QQ邮箱提醒
-            'tmessage', # 腾讯新闻
-            'weibo', # 微博推送
-            'newsapp', # 新闻推送
-            'notification_messages', # 服务通知
-            'helper_entry', # 新版微信运动
-            'mphelper', # 公众号助手
-            'brandsessionholder', # 公众号消息
-            'weixinreminder', # 微信提醒
-            'officialaccounts', # 公众平台
-        ]
-
-        # 检查是否是系统账号
-        for account in system_accounts:
-            if (SenderWxid and isinstance(SenderWxid, str) and SenderWxid == account) or \
-               (FromWxid and isinstance(FromWxid, str) and FromWxid == account):
-                logger.debug(f"忽略系统账号消息: {SenderWxid or FromWxid}")
-                return False
+    # 消息过滤设置，重新赋值时清空过滤结果缓存
+    @property
+    def ignore_mode(self) -> str:
+        return self.account_filter.ignore_mode
 
-        # 检测其他特殊账号特征
-        # 微信支付相关通知
-        if (SenderWxid and isinstance(SenderWxid, str) and 'wxpay' in SenderWxid) or \
-           (FromWxid and isinstance(FromWxid, str) and 'wxpay' in FromWxid):
-            logger.debug(f"忽略微信支付相关消息: {SenderWxid or FromWxid}")
-            return False
+    @ignore_mode.setter
+    def ignore_mode(self, value: str):
+        self.account_filter.update(ignore_mode=value)
 
-        # 腾讯游戏相关通知
-        if (SenderWxid and isinstance(SenderWxid, str) and ('tencent' in SenderWxid.lower() or 'game' in SenderWxid.lower())) or \
-           (FromWxid and isinstance(FromWxid, str) and ('tencent' in FromWxid.lower() or 'game' in FromWxid.lower())):
-            logger.debug(f"忽略腾讯游戏相关消息: {SenderWxid or FromWxid}")
-            return False
+    @property
+    def whitelist(self) -> list:
+        return self.account_filter.whitelist
 
-        # 其他特殊账号特征
-        # 微信官方账号通常包含"service"或"official"
-        if (SenderWxid and isinstance(SenderWxid, str) and ('service' in SenderWxid.lower() or 'official' in SenderWxid.lower())) or \
-           (FromWxid and isinstance(FromWxid, str) and ('service' in FromWxid.lower() or 'official' in FromWxid.lower())):
-            logger.debug(f"忽略官方服务账号消息: {SenderWxid or FromWxid}")
-            return False
-
-
-
-        # 先检查是否是群聊消息
-        is_group = FromWxid and isinstance(FromWxid, str) and FromWxid.endswith("@chatroom")
+    @whitelist.setter
+    def whitelist(self, value: list):
+        self.account_filter.update(whitelist=value)
 
-        if self.ignore_mode == "Whitelist":
-            if is_group:
-                # 群聊消息：有两种情况
-                # 1. 群聊ID在白名单中（处理该群中的所有消息）
-                # 2. 发送者ID在白名单中（无论群聊ID是否在白名单中）
+    @property
+    def blacklist(self) -> list:
+        return self.account_filter.blacklist
 
-                # 当发送者ID在白名单中，或者群聊ID在白名单中时，才处理消息
-                # 修改逻辑，允许处理白名单群聊中的所有消息，而不仅仅是机器人自己发送的消息
-                logger.debug(f"白名单检查: 群聊ID={FromWxid}, 发送者ID={SenderWxid}, 群聊ID在白名单中={FromWxid in self.whitelist}, 发送者ID在白名单中={SenderWxid in self.whitelist}")
-                return SenderWxid in self.whitelist or FromWxid in self.whitelist
-            else:
-                # 私聊消息：发送者ID在白名单中
-                return SenderWxid in self.whitelist
-        elif self.ignore_mode == "Blacklist":
-            if is_group:
-                # 群聊消息：群聊ID不在黑名单中且发送者ID不在黑名单中
-                return (FromWxid not in self.blacklist) and (SenderWxid not in self.blacklist)
-            else:
-                # 私聊消息：发送者ID不在黑名单中
-                return SenderWxid not in self.blacklist
-        else:
-            # 默认处理所有消息
-            return True
+    @blacklist.setter
+    def blacklist(self, value: list):
+        self.account_filter.update(blacklist=value)
 
     # 朋友圈相关方法
     async def get_friend_circle_list(self, max_id: int = 0) -> dict: